@@ -1,5 +1,12 @@
 import { fetchAuthSession } from "aws-amplify/auth";
-import type { EventData, EventsResponse, Exclusion, HarvestQuest } from "../types";
+import type {
+  EventData,
+  EventsResponse,
+  Exclusion,
+  ExclusionsResponse,
+  HarvestQuestPage,
+  HarvestQuestQuery,
+} from "../types";
 
 const API_URL = import.meta.env.VITE_API_URL as string;
 
@@ -16,22 +23,56 @@ async function authHeaders(): Promise<Record<string, string>> {
   };
 }
 
+/** 管理 API がエラーを返したことを表す。status は HTTP ステータスコード。 */
+export class ApiError extends Error {
+  constructor(
+    readonly status: number,
+    message: string,
+  ) {
+    super(message);
+    this.name = "ApiError";
+  }
+}
+
+/**
+ * 他の管理者の更新と競合した (409) ことを表す。
+ * 画面ではメッセージをそのまま表示し、再読み込みしてからやり直してもらう。
+ */
+export class ConflictError extends ApiError {
+  constructor() {
+    super(409, "他の管理者が先に更新しました。再読み込みしてからやり直してください");
+    this.name = "ConflictError";
+  }
+}
+
 /**
- * 認証ヘッダーを付けて管理 API へリクエストを送る汎用関数。
- * レスポンスが ok でない場合はレスポンスボディを含むエラーをスローする。
+ * 認証ヘッダーを付けて管理 API へリクエストを送り、レスポンスを返す。
+ * 409 の場合は ConflictError、それ以外でレスポンスが ok でない場合は
+ * レスポンスボディを含む ApiError をスローする。
  * @param path API パス（VITE_API_URL からの相対パス）
  * @param init fetch の追加オプション（method, body など）
  */
-async function request<T>(path: string, init?: RequestInit): Promise<T> {
+async function send(path: string, init?: RequestInit): Promise<Response> {
   const headers = await authHeaders();
   const res = await fetch(`${API_URL}${path}`, {
     ...init,
     headers: { ...headers, ...init?.headers },
   });
+  if (res.status === 409) throw new ConflictError();
   if (!res.ok) {
     const body = await res.text();
-    throw new Error(`API error ${res.status}: ${body}`);
+    throw new ApiError(res.status, `API error ${res.status}: ${body}`);
   }
+  return res;
+}
+
+/**
+ * 認証ヘッダーを付けて管理 API へリクエストを送り、レスポンスボディの JSON を返す汎用関数。
+ * @param path API パス（VITE_API_URL からの相対パス）
+ * @param init fetch の追加オプション（method, body など）
+ */
+async function request<T>(path: string, init?: RequestInit): Promise<T> {
+  const res = await send(path, init);
   return res.json() as Promise<T>;
 }
 
@@ -67,28 +108,47 @@ export function deleteEvent(eventId: string) {
   });
 }
 
-/** 指定クエストの除外リストを取得する。 */
-export function getExclusions(questId: string) {
-  return request<Exclusion[]>(`/exclusions/${questId}`);
+/**
+ * 指定クエストの除外リストと、そのバージョン（ETag）を取得する。
+ * 更新時は etag を updateExclusions() に渡す。
+ */
+export async function getExclusions(questId: string): Promise<ExclusionsResponse> {
+  const res = await send(`/exclusions/${questId}`);
+  return { exclusions: (await res.json()) as Exclusion[], etag: res.headers.get("ETag") };
 }
 
 /**
  * 指定クエストの除外リストを更新する（全件置き換え）。
- * 更新後の除外リストを返す。
+ * 更新後の除外リストと新しい ETag を返す。
+ * 取得後に他の管理者が更新（未作成だった場合は作成）していた場合は上書きせず ConflictError をスローする。
  * @param questId クエスト ID
  * @param exclusions 除外リスト（全件置き換え）
+ * @param etag getExclusions() / 前回の updateExclusions() が返した ETag
+ *   （未作成の場合は null。未作成のままであることを If-None-Match: * で条件にする）
  */
-export function updateExclusions(questId: string, exclusions: Exclusion[]) {
-  return request<Exclusion[]>(`/exclusions/${questId}`, {
+export async function updateExclusions(
+  questId: string,
+  exclusions: Exclusion[],
+  etag: string | null,
+): Promise<ExclusionsResponse> {
+  const res = await send(`/exclusions/${questId}`, {
     method: "PUT",
+    headers: etag ? { "If-Match": etag } : { "If-None-Match": "*" },
     body: JSON.stringify(exclusions),
   });
+  return { exclusions: (await res.json()) as Exclusion[], etag: res.headers.get("ETag") };
 }
 
 /**
- * Harvest のクエスト一覧を取得する。
+ * Harvest のクエスト一覧を検索条件で絞り込んで1ページ分取得する。
  * EventFormPage でイベントクエスト候補を絞り込む際に使用する。
+ * @param query 検索条件（未指定の条件は絞り込まない）
  */
-export function fetchHarvestQuests() {
-  return request<HarvestQuest[]>("/harvest/quests");
+export function fetchHarvestQuests(query: HarvestQuestQuery = {}) {
+  const params = new URLSearchParams();
+  for (const [key, value] of Object.entries(query)) {
+    if (value !== undefined && value !== "") params.set(key, String(value));
+  }
+  const qs = params.toString();
+  return request<HarvestQuestPage>(`/harvest/quests${qs ? `?${qs}` : ""}`);
 }
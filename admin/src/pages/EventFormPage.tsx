@@ -173,15 +173,21 @@ export function EventFormPage() {
     setCandidatesLoading(true);
     setError("");
     try {
-      const all = await fetchHarvestQuests();
-      const startDate = new Date(toISO(start));
-      const endDate = new Date(toISO(end));
-      const filtered = all.filter((q) => {
-        if (q.is_freequest) return false;
-        const since = new Date(q.since);
-        return since >= startDate && since <= endDate;
-      });
-      setCandidates(filtered);
+      // 管理 API は1ページ HARVEST_QUEST_LIMIT 件までのため、nextOffset をたどって全件取得する
+      const found: HarvestQuest[] = [];
+      let offset: number | null = 0;
+      while (offset !== null) {
+        const page = await fetchHarvestQuests({
+          freequest: false,
+          since: toISO(start),
+          until: toISO(end),
+          limit: HARVEST_QUEST_LIMIT,
+          offset,
+        });
+        found.push(...page.quests);
+        offset = page.nextOffset;
+      }
+      setCandidates(found);
     } catch (err) {
       setError(err instanceof Error ? err.message : "Harvest データ取得に失敗");
     } finally {
@@ -595,6 +601,9 @@ function toLocalInput(iso: string): string {
   return local.toISOString().slice(0, 16);
 }
 
+// 候補として一度に取得するクエスト数 (管理 API の上限)
+const HARVEST_QUEST_LIMIT = 500;
+
 /**
  * `<input type="datetime-local">` の値（"YYYY-MM-DDTHH:mm"）を
  * JST オフセット付きの ISO 形式（"YYYY-MM-DDTHH:mm:00+09:00"）に変換する。
@@ -28,6 +28,12 @@ export interface Exclusion {
   reason: string;
 }
 
+/** 除外リストとそのバージョン（ETag）。更新時に If-Match として送る（未作成の場合は null） */
+export interface ExclusionsResponse {
+  exclusions: Exclusion[];
+  etag: string | null;
+}
+
 export interface HarvestQuest {
   id: string;
   name: string;
@@ -37,4 +43,27 @@ export interface HarvestQuest {
   since: string;
   latest: string;
   count: number;
+  /** events.json に登録済みのクエストのみ */
+  level?: string;
+  ap?: number;
+}
+
+export interface HarvestQuestPage {
+  quests: HarvestQuest[];
+  total: number;
+  offset: number;
+  limit: number;
+  nextOffset: number | null;
+}
+
+export interface HarvestQuestQuery {
+  q?: string;
+  id?: string;
+  level?: string;
+  ap?: number;
+  freequest?: boolean;
+  since?: string;
+  until?: string;
+  limit?: number;
+  offset?: number;
 }
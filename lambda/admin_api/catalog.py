@@ -0,0 +1,229 @@
+"""Harvest のクエスト一覧 (all.json) の検索インデックス。
+
+all.json のクエストは出現順を保ったまま位置 (0 始まりの番号) で管理し、
+検索条件ごとの候補を位置の集合として絞り込む。
+
+- キーワード (q): 名前・チャプター・場所・ID を NFKC 正規化・小文字化した文字列の部分一致。
+  2文字以上のキーワードは文字 bigram の転置インデックスで候補を絞ってから照合する
+- ID (id): 完全一致 (カンマ区切りで複数指定可)
+- 推奨レベル (level)・消費 AP (ap): all.json には含まれないため、
+  events.json に登録済みのクエストの値 (set_known) で検索する
+- 初回報告日時 (since / until): all.json の since が範囲内のもの
+- フリークエストか (freequest)
+"""
+
+import unicodedata
+from datetime import datetime
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+
+_BOOL_VALUES = {"true": True, "1": True, "false": False, "0": False}
+
+
+def normalize(text):
+    """検索用に文字列を正規化する (NFKC・小文字化)。"""
+    return unicodedata.normalize("NFKC", text).casefold()
+
+
+def _bigrams(text):
+    return {text[i : i + 2] for i in range(len(text) - 1)}
+
+
+def _parse_time(value):
+    """ISO 8601 形式の日時を datetime に変換する。解釈できない場合は None を返す。"""
+    if not isinstance(value, str) or not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    # タイムゾーンなしの日時は比較できないため扱わない
+    return parsed if parsed.tzinfo is not None else None
+
+
+def known_quests(events_data):
+    """events.json に登録済みのクエストの推奨レベル・消費 AP を Harvest ページ ID ごとに返す。
+
+    追加集計元 (additionalSourceQuestIds) のページにも同じ値を割り当てる。
+    複数のイベントに登録されている場合は後のイベントの値を使う。
+    """
+    known = {}
+    for event in (events_data or {}).get("events", []):
+        for quest in event.get("quests", []):
+            value = {"level": quest.get("level"), "ap": quest.get("ap")}
+            for quest_id in [quest.get("questId")] + list(
+                quest.get("additionalSourceQuestIds") or []
+            ):
+                if quest_id:
+                    known[quest_id] = value
+    return known
+
+
+def parse_query(params):
+    """クエリ文字列パラメータを QuestCatalog.query() の引数に変換する。
+
+    不正な値の場合は ValueError を送出する。
+    """
+    params = params or {}
+    query = {}
+    if params.get("q"):
+        query["q"] = params["q"]
+    if params.get("id"):
+        query["ids"] = [i for i in params["id"].split(",") if i]
+    if params.get("level"):
+        query["level"] = params["level"]
+    if params.get("ap"):
+        try:
+            query["ap"] = int(params["ap"])
+        except ValueError:
+            raise ValueError("ap must be an integer") from None
+    if params.get("freequest"):
+        if params["freequest"] not in _BOOL_VALUES:
+            raise ValueError("freequest must be true or false")
+        query["freequest"] = _BOOL_VALUES[params["freequest"]]
+    for name in ("since", "until"):
+        if params.get(name):
+            value = _parse_time(params[name])
+            if value is None:
+                raise ValueError(f"{name} must be an ISO 8601 datetime with timezone")
+            query[name] = value
+    try:
+        limit = int(params.get("limit") or DEFAULT_LIMIT)
+        offset = int(params.get("offset") or 0)
+    except ValueError:
+        raise ValueError("limit and offset must be integers") from None
+    if limit < 1 or offset < 0:
+        raise ValueError("limit must be positive and offset must not be negative")
+    query["limit"] = min(limit, MAX_LIMIT)
+    query["offset"] = offset
+    return query
+
+
+class QuestCatalog:
+    """all.json のクエスト一覧と検索インデックス。
+
+    quests を受け取った時点でキーワード・ID・日時のインデックスを作る。
+    推奨レベル・消費 AP のインデックスは set_known() で events.json の内容から作り直す。
+    """
+
+    def __init__(self, quests):
+        self.quests = quests
+        self.by_id = {}
+        self._text = []
+        self._since = []
+        self._postings = {}
+        for pos, quest in enumerate(quests):
+            self.by_id.setdefault(quest.get("id"), pos)
+            fields = (quest.get(k) for k in ("name", "chapter", "place", "id"))
+            text = normalize("\n".join(f for f in fields if isinstance(f, str)))
+            self._text.append(text)
+            self._since.append(_parse_time(quest.get("since")))
+            for gram in _bigrams(text):
+                self._postings.setdefault(gram, []).append(pos)
+        self.set_known({})
+
+    def set_known(self, known):
+        """登録済みクエストの推奨レベル・消費 AP (known_quests() の戻り値) を設定する。"""
+        self.known = known
+        self._by_level = {}
+        self._by_ap = {}
+        for quest_id, value in known.items():
+            pos = self.by_id.get(quest_id)
+            if pos is None:
+                continue
+            if value.get("level"):
+                self._by_level.setdefault(value["level"], set()).add(pos)
+            if value.get("ap") is not None:
+                self._by_ap.setdefault(value["ap"], set()).add(pos)
+
+    def _keyword_candidates(self, keyword):
+        grams = _bigrams(keyword)
+        if not grams:
+            return None
+        postings = sorted((self._postings.get(g, []) for g in grams), key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates.intersection_update(posting)
+            if not candidates:
+                break
+        return candidates
+
+    def search(
+        self,
+        q=None,
+        ids=None,
+        level=None,
+        ap=None,
+        freequest=None,
+        since=None,
+        until=None,
+    ):
+        """条件をすべて満たすクエストの位置を all.json の出現順で返す。"""
+        candidates = None
+
+        def narrow(positions):
+            nonlocal candidates
+            positions = set(positions)
+            candidates = positions if candidates is None else candidates & positions
+
+        if ids is not None:
+            narrow(self.by_id[i] for i in ids if i in self.by_id)
+        if level is not None:
+            narrow(self._by_level.get(level, ()))
+        if ap is not None:
+            narrow(self._by_ap.get(ap, ()))
+        keyword = normalize(q) if q else ""
+        if keyword:
+            positions = self._keyword_candidates(keyword)
+            if positions is not None:
+                narrow(positions)
+
+        positions = sorted(candidates) if candidates is not None else range(len(self.quests))
+        result = []
+        for pos in positions:
+            if keyword and keyword not in self._text[pos]:
+                continue
+            if freequest is not None and bool(self.quests[pos].get("is_freequest")) != freequest:
+                continue
+            if since is not None or until is not None:
+                quest_since = self._since[pos]
+                if quest_since is None:
+                    continue
+                if since is not None and quest_since < since:
+                    continue
+                if until is not None and quest_since > until:
+                    continue
+            result.append(pos)
+        return result
+
+    def entry(self, pos):
+        """位置 pos のクエストを返す。登録済みのクエストには level / ap を付ける。"""
+        quest = self.quests[pos]
+        known = self.known.get(quest.get("id"))
+        if known is None:
+            return quest
+        return {**quest, "level": known.get("level"), "ap": known.get("ap")}
+
+    def query(self, limit=DEFAULT_LIMIT, offset=0, **conditions):
+        """search() の結果のうち offset 件目から limit 件を返す。
+
+        Returns:
+            {
+                "quests": [...],
+                "total": <条件に一致した件数>,
+                "offset": <offset>,
+                "limit": <limit>,
+                "nextOffset": <次のページの offset (最後のページなら None)>,
+            }
+        """
+        positions = self.search(**conditions)
+        page = positions[offset : offset + limit]
+        next_offset = offset + limit if offset + limit < len(positions) else None
+        return {
+            "quests": [self.entry(pos) for pos in page],
+            "total": len(positions),
+            "offset": offset,
+            "limit": limit,
+            "nextOffset": next_offset,
+        }
@@ -1,26 +1,81 @@
 import json
+import logging
 import os
-import uuid
-from urllib.request import urlopen
-
-import boto3
-from botocore.exceptions import ClientError
-
-s3 = boto3.client("s3")
+import time
+from datetime import datetime, timedelta, timezone
+
+from anomalies import (
+    apply_exclusions_to_queue,
+    build_event_queue,
+    page_queue,
+    parse_queue_query,
+)
+from aws_clients import LazyClient, error_code, prewarm
+from catalog import QuestCatalog, known_quests, parse_query
+from harvest_client import CircuitOpenError, HarvestClient, HarvestHTTPError
+from rollup import build_event_rollup
+from s3_cache import S3JsonCache
+from stats import (
+    apply_report_to_reporters,
+    apply_report_to_stats,
+    report_shard,
+    report_shard_key,
+)
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# boto3 の読み込みとクライアントの作成は最初に S3 を使うリクエストまで遅らせる
+s3 = LazyClient("s3")
 BUCKET = os.environ["S3_BUCKET_NAME"]
 EVENTS_KEY = "events.json"
-EXCLUSIONS_KEY = "exclusions.json"
+EXCLUSIONS_PREFIX = "exclusions/"
+EXCLUSIONS_INDEX_KEY = "exclusions/_index.json"
 HARVEST_ALL_URL = "https://fgojunks.max747.org/harvest/contents/quest/all.json"
+HARVEST_CATALOG_KEY = "harvest/all.json"
+# 304 で再検証した時刻だけを記録する小さなオブジェクト (all.json 本体を書き直さないため)
+HARVEST_CATALOG_META_KEY = "harvest/all.meta.json"
+# クエスト一覧のキャッシュを Harvest に再検証せずに使う秒数
+HARVEST_CATALOG_TTL = int(os.environ.get("HARVEST_CATALOG_TTL", "600"))
+JST = timezone(timedelta(hours=9))
+
+# API Gateway の統合タイムアウト (Lambda の timeout 10秒) 内に収まるよう短めに設定する
+harvest = HarvestClient(connect_timeout=3, read_timeout=6, max_retries=1, backoff_max=1)
+
+# ウォームスタート時に前回の読み込み結果を再利用する S3 オブジェクトのキャッシュ。
+# S3_CACHE_TTL 秒以内に検証したオブジェクトは S3 に問い合わせずに使う (既定は毎回 ETag で再検証)
+s3_cache = S3JsonCache(max_entries=32, ttl=float(os.environ.get("S3_CACHE_TTL", "0")))
+
+# 条件付き書き込みが競合した場合に読み直して再適用する最大回数
+MAX_WRITE_ATTEMPTS = 3
+
+# ウォームスタート時に再利用するクエスト一覧 (検索インデックス付き) のキャッシュ
+_catalog_cache = {}
+
+prewarm(s3)
+
+
+class ConflictError(Exception):
+    """条件付き書き込みが競合し、再試行しても解消しなかったことを表す。
+
+    version には競合時点のオブジェクトの ETag (存在しない場合は None) が入る。
+    """
+
+    def __init__(self, key, version):
+        super().__init__(f"Conflict on {key}")
+        self.key = key
+        self.version = version
 
 
 def lambda_handler(event, context):
     """管理 API Lambda のエントリーポイント。
 
     HTTP メソッドとパスに基づいてルーティングし、対応するハンドラ関数を呼び出す。
-    未定義のルートは 404、ハンドラ内の例外は 500 を返す。
+    未定義のルートは 404、書き込みの競合は 409、ハンドラ内の例外は 500 を返す。
     """
     method = event["requestContext"]["http"]["method"]
     path = event["requestContext"]["http"]["path"]
+    headers = event.get("headers") or {}
 
     try:
         if path == "/events" and method == "GET":
@@ -38,12 +93,25 @@ def lambda_handler(event, context):
             return get_exclusions(quest_id)
         if path.startswith("/exclusions/") and method == "PUT":
             quest_id = event["pathParameters"]["questId"]
-            return put_exclusions(quest_id, json.loads(event.get("body", "{}")))
+            return put_exclusions(
+                quest_id,
+                json.loads(event.get("body", "{}")),
+                headers.get("if-match"),
+                headers.get("if-none-match") == "*",
+            )
+        if path.startswith("/anomalies/") and method == "GET":
+            event_id = event["pathParameters"]["eventId"]
+            return get_anomalies(event_id, event.get("queryStringParameters"))
         if path == "/harvest/quests" and method == "GET":
-            return get_harvest_quests()
+            harvest.reset_breaker()
+            return get_harvest_quests(event.get("queryStringParameters"))
         return response(404, {"error": "Not found"})
+    except ConflictError as e:
+        return response(409, {"error": "Conflict", "version": e.version})
     except Exception as e:
         return response(500, {"error": str(e)})
+    finally:
+        logger.info("S3 cache: %s", s3_cache.take_stats())
 
 
 # --- S3 helpers ---
@@ -51,23 +119,86 @@ def lambda_handler(event, context):
 
 def read_json(key):
     """S3 から指定キーの JSON を読み込む。キーが存在しない場合は None を返す。"""
+    data, _version = read_json_versioned(key)
+    return data
+
+
+def read_json_versioned(key):
+    """S3 から指定キーの JSON とその ETag を読み込む。
+
+    前回の読み込み結果を s3_cache に保持し、変わっていなければ本文を転送せずに再利用する。
+    キーが存在しない場合は (None, None) を返す。
+    """
     try:
-        obj = s3.get_object(Bucket=BUCKET, Key=key)
-        return json.loads(obj["Body"].read().decode("utf-8"))
-    except ClientError as e:
-        if e.response["Error"]["Code"] == "NoSuchKey":
-            return None
+        return s3_cache.get(s3, BUCKET, key)
+    except Exception as e:
+        if error_code(e) == "NoSuchKey":
+            return None, None
         raise
 
 
 def write_json(key, data):
     """data を JSON シリアライズして S3 の指定キーに書き込む。"""
-    s3.put_object(
+    body = json.dumps(data, ensure_ascii=False, indent=2)
+    result = s3.put_object(
         Bucket=BUCKET,
         Key=key,
-        Body=json.dumps(data, ensure_ascii=False, indent=2),
+        Body=body,
         ContentType="application/json",
     )
+    s3_cache.put(key, body, result.get("ETag"))
+
+
+def write_json_if_match(key, data, version):
+    """オブジェクトが version (ETag) のままである場合に限り data を書き込み、新しい ETag を返す。
+
+    version が None の場合はオブジェクトが存在しない場合に限り書き込む。
+    条件を満たさなかった場合は ConflictError を送出する (version は不明のため None)。
+    """
+    condition = {"IfMatch": version} if version is not None else {"IfNoneMatch": "*"}
+    body = json.dumps(data, ensure_ascii=False, indent=2)
+    try:
+        result = s3.put_object(
+            Bucket=BUCKET,
+            Key=key,
+            Body=body,
+            ContentType="application/json",
+            **condition,
+        )
+    except Exception as e:
+        if error_code(e) in ("PreconditionFailed", "ConditionalRequestConflict"):
+            # 保持している内容は古いため、次の読み込みでは S3 から取得し直す
+            s3_cache.invalidate(key)
+            raise ConflictError(key, None) from e
+        raise
+    s3_cache.put(key, body, result.get("ETag"))
+    return result.get("ETag")
+
+
+def update_json(key, mutate, expected_version=None):
+    """key の JSON を読み込み、mutate で変更して条件付きで書き込む。
+
+    mutate(data) は (書き込むデータ, 戻り値) を返す。書き込むデータが None の場合は書き込まない。
+    書き込みが他のリクエストと競合した場合は最新の内容を読み直して mutate を再適用する
+    (他の要素への変更はそのまま取り込まれる)。MAX_WRITE_ATTEMPTS 回競合した場合、
+    または expected_version が指定されていて現在の ETag と異なる場合は ConflictError を送出する。
+    """
+    for _ in range(MAX_WRITE_ATTEMPTS):
+        data, version = read_json_versioned(key)
+        if expected_version is not None and version != expected_version:
+            raise ConflictError(key, version)
+        new_data, result = mutate(data)
+        if new_data is None:
+            return result
+        try:
+            write_json_if_match(key, new_data, version)
+        except ConflictError:
+            logger.info("Write conflict on %s, retrying", key)
+            continue
+        return result
+
+    _data, version = read_json_versioned(key)
+    raise ConflictError(key, version)
 
 
 # --- Events ---
@@ -83,89 +214,420 @@ def get_events():
 
 def post_event(body):
     """イベントを新規作成する。eventId が未指定または空の場合は UUID を自動生成する。"""
-    data = read_json(EVENTS_KEY)
-    if data is None:
-        data = {"events": []}
-
     if "eventId" not in body or not body["eventId"]:
+        # uuid は読み込みに時間がかかるため、使う時まで遅らせる (コールドスタートの短縮)
+        import uuid
+
         body["eventId"] = str(uuid.uuid4())
 
-    data["events"].append(body)
-    write_json(EVENTS_KEY, data)
-    return response(201, body)
+    def mutate(data):
+        if data is None:
+            data = {"events": []}
+        data["events"].append(body)
+        return data, response(201, body)
+
+    return update_json(EVENTS_KEY, mutate)
 
 
 def put_event(event_id, body):
     """指定 eventId のイベントを更新する。イベントが存在しない場合は 404 を返す。"""
-    data = read_json(EVENTS_KEY)
-    if data is None:
-        return response(404, {"error": "Event not found"})
+    body["eventId"] = event_id
 
-    for i, ev in enumerate(data["events"]):
-        if ev["eventId"] == event_id:
-            body["eventId"] = event_id
-            data["events"][i] = body
-            write_json(EVENTS_KEY, data)
-            return response(200, body)
+    def mutate(data):
+        if data is None:
+            return None, response(404, {"error": "Event not found"})
+        for i, ev in enumerate(data["events"]):
+            if ev["eventId"] == event_id:
+                data["events"][i] = body
+                return data, response(200, body)
+        return None, response(404, {"error": "Event not found"})
 
-    return response(404, {"error": "Event not found"})
+    return update_json(EVENTS_KEY, mutate)
 
 
 def delete_event(event_id):
     """指定 eventId のイベントを削除する。イベントが存在しない場合は 404 を返す。"""
-    data = read_json(EVENTS_KEY)
-    if data is None:
-        return response(404, {"error": "Event not found"})
 
-    original_len = len(data["events"])
-    data["events"] = [ev for ev in data["events"] if ev["eventId"] != event_id]
-    if len(data["events"]) == original_len:
-        return response(404, {"error": "Event not found"})
+    def mutate(data):
+        if data is None:
+            return None, response(404, {"error": "Event not found"})
+        original_len = len(data["events"])
+        data["events"] = [ev for ev in data["events"] if ev["eventId"] != event_id]
+        if len(data["events"]) == original_len:
+            return None, response(404, {"error": "Event not found"})
+        return data, response(200, {"message": "Deleted"})
 
-    write_json(EVENTS_KEY, data)
-    return response(200, {"message": "Deleted"})
+    return update_json(EVENTS_KEY, mutate)
 
 
 # --- Exclusions ---
 
 
+def exclusions_key(quest_id):
+    """クエストの除外リスト (シャード) の S3 キーを返す。"""
+    return f"{EXCLUSIONS_PREFIX}{quest_id}.json"
+
+
 def get_exclusions(quest_id):
-    """指定クエストの除外リストを返す。exclusions.json が存在しない場合は空リストを返す。"""
-    data = read_json(EXCLUSIONS_KEY)
-    if data is None:
-        data = {}
-    exclusions = data.get(quest_id, [])
-    return response(200, exclusions)
+    """指定クエストの除外リストを返す。シャードが存在しない場合は空リストを返す。
 
+    シャードのバージョン (ETag) を ETag ヘッダで返す。PUT 時に If-Match で指定できる。
+    """
+    exclusions, version = read_json_versioned(exclusions_key(quest_id))
+    if exclusions is None:
+        exclusions = []
+    headers = {"ETag": version} if version is not None else None
+    return response(200, exclusions, headers)
+
+
+def put_exclusions(quest_id, body, expected_version=None, expect_absent=False):
+    """指定クエストの除外リストを更新する（全件置き換え）。
+
+    除外リストを持つクエストの索引にクエストを登録してから、クエスト単位のシャードを書き込む。
+    先に登録するため、シャードの書き込みに失敗しても索引に余分な登録が残るだけで済む
+    (集計 Lambda は登録されたクエストのシャードを読むだけ)。
+    シャードは読み込み時の ETag を条件に1回だけ書き込み、全件置き換えの内容で再試行しない。
+    expected_version (If-Match) が指定されシャードがその後に更新されていた場合、
+    expect_absent (If-None-Match: *) が指定されシャードがその後に作成されていた場合、
+    または書き込みが他のリクエストと競合した場合は 409 を返す。
+    書き込み後の索引の件数の更新・登録の削除は、失敗しても警告を記録するだけにする (次回の更新で直る)。
+    その後、そのクエストのドロップ統計に除外・除外解除の差分を反映する。
+    統計の更新に失敗しても除外リストの保存は成功として扱う (次回の集計で再計算される)。
+    書き込み後のシャードの ETag を ETag ヘッダで返す。
+    """
+    entry = {"count": len(body)} if body else None
+
+    def register_in_index(index):
+        if index is None:
+            index = {"quests": {}}
+        if quest_id in index["quests"]:
+            return None, None
+        index["quests"][quest_id] = entry
+        return index, None
+
+    def mutate_index(index):
+        if index is None:
+            index = {"quests": {}}
+        if index["quests"].get(quest_id) == entry:
+            return None, None
+        if entry is None:
+            del index["quests"][quest_id]
+        else:
+            index["quests"][quest_id] = entry
+        return index, None
+
+    if body:
+        update_json(EXCLUSIONS_INDEX_KEY, register_in_index)
+
+    key = exclusions_key(quest_id)
+    _data, version = read_json_versioned(key)
+    if expected_version is not None and version != expected_version:
+        raise ConflictError(key, version)
+    if expect_absent and version is not None:
+        raise ConflictError(key, version)
+    try:
+        new_version = write_json_if_match(key, body, version)
+    except ConflictError:
+        _data, current = read_json_versioned(key)
+        raise ConflictError(key, current) from None
 
-def put_exclusions(quest_id, body):
-    """指定クエストの除外リストを更新する（全件置き換え）。"""
-    data = read_json(EXCLUSIONS_KEY)
-    if data is None:
-        data = {}
+    try:
+        update_json(EXCLUSIONS_INDEX_KEY, mutate_index)
+    except ConflictError:
+        logger.warning("Failed to update exclusions index entry of quest %s", quest_id)
 
-    data[quest_id] = body
-    write_json(EXCLUSIONS_KEY, data)
-    return response(200, body)
+    try:
+        update_quest_stats(quest_id, {e["reportId"] for e in body})
+    except Exception:
+        logger.exception("Failed to update stats of quest %s", quest_id)
+    headers = {"ETag": new_version} if new_version is not None else None
+    return response(200, body, headers)
 
 
-# --- Harvest proxy ---
+# --- Stats ---
 
 
-def get_harvest_quests():
-    """Harvest API から全クエスト一覧を取得してそのまま返す（プロキシ）。"""
-    with urlopen(HARVEST_ALL_URL) as resp:
-        data = json.loads(resp.read().decode("utf-8"))
-    return response(200, data)
+def read_toggled_reports(event_id, quest_id, report_ids):
+    """除外・除外解除した報告の 報告 ID → 報告 を返す (中間 JSON に存在しない ID は含まない)。
+
+    集計 Lambda が出力した報告の索引から、report_ids が属するシャードだけを読み込む。
+    索引が未作成の場合は中間 JSON を読み込む。中間 JSON もなければ None を返す。
+    """
+    shards = {
+        shard: read_json(report_shard_key(event_id, quest_id, shard))
+        for shard in {report_shard(rid) for rid in report_ids}
+    }
+    if all(shard is not None for shard in shards.values()):
+        found = {}
+        for rid in report_ids:
+            report = shards[report_shard(rid)].get(rid)
+            if report is not None:
+                found[rid] = {"id": rid, **report}
+        return found
+    quest_data = read_json(f"{event_id}/{quest_id}.json")
+    if quest_data is None:
+        return None
+    return {r["id"]: r for r in quest_data["reports"] if r["id"] in report_ids}
+
+
+def update_event_rollup(ev):
+    """イベントの全クエストの stats JSON を合算し、イベント単位の集計 (<eventId>/rollup.json) を書き直す。"""
+    quest_stats = [
+        read_json(f"{ev['eventId']}/{q['questId']}.stats.json") for q in ev.get("quests", [])
+    ]
+    rollup = build_event_rollup(ev["eventId"], quest_stats)
+    rollup["lastUpdated"] = datetime.now(JST).isoformat()
+    write_json(f"{ev['eventId']}/rollup.json", rollup)
+
+
+def update_quest_stats(quest_id, excluded_ids):
+    """クエストのドロップ統計 (<eventId>/<questId>.stats.json) に除外リストの変更を反映する。
+
+    統計に記録された excludedReportIds との差分の報告だけを、報告の索引から読み込んで加減算する
+    (read_toggled_reports)。計算量は差分の報告のアイテム数に比例する。
+    報告者ごとの集計も同じく差分で更新し、統計を更新したイベントの集計 (rollup.json) を書き直す。
+    クエストとイベントのレビューキューにも差分を反映する (update_anomalies)。
+    統計が未作成のイベントはスキップする (集計 Lambda の初回出力時に作成される)。
+    """
+    events = read_json(EVENTS_KEY) or {"events": []}
+    for ev in events["events"]:
+        if not any(q["questId"] == quest_id for q in ev.get("quests", [])):
+            continue
+        stats_key = f"{ev['eventId']}/{quest_id}.stats.json"
+        stats = read_json(stats_key)
+        if stats is None:
+            continue
+
+        previous = set(stats.get("excludedReportIds", []))
+        added = excluded_ids - previous
+        removed = previous - excluded_ids
+        if not added and not removed:
+            continue
+
+        toggled = read_toggled_reports(ev["eventId"], quest_id, added | removed)
+        if toggled is None:
+            continue
+        items = {item["itemName"]: item for item in stats["items"]}
+        # reporters を持たない古い形式の統計は報告者ごとの集計を更新しない (集計 Lambda が作り直す)
+        has_reporters = "reporters" in stats
+        reporters = {r["reporter"]: r for r in stats.get("reporters", [])}
+        for rid in sorted(toggled):
+            sign = -1 if rid in added else 1
+            apply_report_to_stats(stats, items, toggled[rid], sign)
+            if has_reporters:
+                apply_report_to_reporters(stats, reporters, toggled[rid], sign)
+
+        # 有効報告に1件も現れなくなったアイテムは取り除く
+        stats["items"] = [item for item in stats["items"] if item["presentCount"] > 0]
+        if has_reporters:
+            stats["reporters"] = [r for r in stats["reporters"] if r["reportCount"] > 0]
+        stats["excludedReportIds"] = sorted(excluded_ids)
+        stats["lastUpdated"] = datetime.now(JST).isoformat()
+        write_json(stats_key, stats)
+        update_event_rollup(ev)
+        update_anomalies(
+            ev, stats, excluded_ids, [toggled[rid] for rid in sorted(removed) if rid in toggled]
+        )
+
+
+# --- Anomaly queue ---
+
+
+def update_anomalies(ev, stats, excluded_ids, restored):
+    """クエストのレビューキュー (<eventId>/<questId>.anomalies.json) に除外リストの変更を反映し、
+    イベントのレビューキュー (<eventId>/anomalies.json) を作り直す。
+
+    除外した報告はキューから外れ、除外を解除した報告 (restored) は判定して再びキューに入れる
+    (anomalies.apply_exclusions_to_queue)。キューが未作成の場合は何もしない (集計 Lambda が作成する)。
+    """
+    event_id = ev["eventId"]
+    quest_id = stats["quest"]["questId"]
+    queue_key = f"{event_id}/{quest_id}.anomalies.json"
+    queue = read_json(queue_key)
+    if queue is None:
+        return
+    queue = apply_exclusions_to_queue(queue, stats["items"], excluded_ids, restored)
+    queue["lastUpdated"] = datetime.now(JST).isoformat()
+    write_json(queue_key, queue)
+
+    quest_queues = [
+        queue
+        if q["questId"] == quest_id
+        else read_json(f"{event_id}/{q['questId']}.anomalies.json")
+        for q in ev.get("quests", [])
+    ]
+    event_queue = build_event_queue(event_id, quest_queues)
+    event_queue["lastUpdated"] = queue["lastUpdated"]
+    write_json(f"{event_id}/anomalies.json", event_queue)
+
+
+def get_anomalies(event_id, params=None):
+    """イベント (questId を指定した場合はそのクエスト) のレビューキューを1ページ分返す。
+
+    検索条件は anomalies.parse_queue_query() を参照。不正な検索条件は 400、
+    キューが未作成 (集計 Lambda が未出力) の場合は 404 を返す。
+    """
+    try:
+        query = parse_queue_query(params)
+    except ValueError as e:
+        return response(400, {"error": str(e)})
+    if query["questId"]:
+        queue = read_json(f"{event_id}/{query['questId']}.anomalies.json")
+    else:
+        queue = read_json(f"{event_id}/anomalies.json")
+    if queue is None:
+        return response(404, {"error": "Not found"})
+    return response(200, page_queue(queue, query["kind"], query["limit"], query["offset"]))
+
+
+# --- Harvest quest catalog ---
+
+
+def fetch_harvest_catalog(cached=None):
+    """Harvest から全クエスト一覧を取得する。
+
+    cached (前回取得時のキャッシュ) の ETag / Last-Modified を条件に付け、
+    304 が返った場合は None を返す。
+    """
+    cached = cached or {}
+    headers = {}
+    if cached.get("etag"):
+        headers["If-None-Match"] = cached["etag"]
+    if cached.get("lastModified"):
+        headers["If-Modified-Since"] = cached["lastModified"]
+    with harvest.get(HARVEST_ALL_URL, headers) as resp:
+        if resp.status == 304:
+            return None
+        quests = json.loads(resp.read().decode("utf-8"))
+        return {
+            "etag": resp.headers.get("ETag"),
+            "lastModified": resp.headers.get("Last-Modified"),
+            "quests": quests,
+        }
+
+
+def _store_catalog(stored, catalog=None):
+    """取得したクエスト一覧をメモリに保持し、S3 のキャッシュを更新する。
+
+    S3 への書き込みに失敗してもメモリ上のキャッシュはそのまま使う。
+    """
+    if catalog is None:
+        catalog = QuestCatalog(stored["quests"])
+        _catalog_cache.pop("eventsVersion", None)
+    _catalog_cache["stored"] = stored
+    _catalog_cache["catalog"] = catalog
+    try:
+        write_json(HARVEST_CATALOG_KEY, stored)
+    except Exception:
+        logger.exception("Failed to write Harvest quest list cache")
+
+
+def _touch_catalog(fetched_at):
+    """304 で再検証したクエスト一覧の取得時刻を更新する。
+
+    一覧本体 (数 MB) は変わっていないため書き直さず、ETag / Last-Modified と
+    取得時刻だけを HARVEST_CATALOG_META_KEY に書き込む。
+    """
+    stored = {**_catalog_cache["stored"], "fetchedAt": fetched_at}
+    _catalog_cache["stored"] = stored
+    meta = {
+        "etag": stored.get("etag"),
+        "lastModified": stored.get("lastModified"),
+        "fetchedAt": fetched_at,
+    }
+    try:
+        write_json(HARVEST_CATALOG_META_KEY, meta)
+    except Exception:
+        logger.exception("Failed to write Harvest quest list cache metadata")
+
+
+def _read_stored_catalog():
+    """S3 のキャッシュを読み込み、再検証の記録があれば取得時刻に反映して返す。
+
+    記録の ETag / Last-Modified が一覧本体と一致しない場合 (記録より後に一覧を更新した場合) は無視する。
+    """
+    stored = read_json(HARVEST_CATALOG_KEY)
+    if stored is None:
+        return None
+    meta = read_json(HARVEST_CATALOG_META_KEY) or {}
+    if (meta.get("etag"), meta.get("lastModified")) == (
+        stored.get("etag"),
+        stored.get("lastModified"),
+    ) and meta.get("fetchedAt", 0) > stored.get("fetchedAt", 0):
+        stored = {**stored, "fetchedAt": meta["fetchedAt"]}
+    return stored
+
+
+def load_catalog():
+    """検索インデックス付きのクエスト一覧 (QuestCatalog) を返す。
+
+    1. メモリ上のキャッシュが HARVEST_CATALOG_TTL 秒以内に取得したものならそのまま使う
+    2. メモリにない場合 (コールドスタート) は S3 のキャッシュを読み込み、TTL 内ならそれを使う
+    3. TTL を過ぎていれば Harvest に条件付きリクエストで再検証し、304 なら取得時刻だけ更新する
+       (一覧本体は書き直さず、HARVEST_CATALOG_META_KEY に取得時刻を記録する)
+
+    Harvest の取得に失敗した場合、キャッシュがあれば期限切れでもそれを返す。
+    キャッシュもない場合は例外をそのまま送出する。
+    """
+    if "catalog" not in _catalog_cache:
+        stored = _read_stored_catalog()
+        if stored is not None:
+            _catalog_cache["stored"] = stored
+            _catalog_cache["catalog"] = QuestCatalog(stored["quests"])
+            _catalog_cache.pop("eventsVersion", None)
+
+    cached = _catalog_cache.get("stored")
+    now = time.time()
+    if cached is not None and now - cached.get("fetchedAt", 0) < HARVEST_CATALOG_TTL:
+        return _catalog_cache["catalog"]
+
+    try:
+        fetched = fetch_harvest_catalog(cached)
+    except (HarvestHTTPError, CircuitOpenError, OSError) as e:
+        if cached is None:
+            raise
+        logger.warning("Failed to revalidate Harvest quest list, serving cached copy: %s", e)
+        return _catalog_cache["catalog"]
+
+    if fetched is None:
+        _touch_catalog(now)
+    else:
+        _store_catalog({**fetched, "fetchedAt": now})
+    return _catalog_cache["catalog"]
+
+
+def get_harvest_quests(params=None):
+    """Harvest の全クエスト一覧を検索し、条件に一致したクエストを1ページ分返す。
+
+    一覧は S3 とメモリにキャッシュし、TTL ごとに Harvest へ再検証する (load_catalog)。
+    検索条件は catalog.parse_query() を参照。events.json に登録済みのクエストには
+    推奨レベル・消費 AP を付けて返す。
+    不正な検索条件は 400、Harvest が再試行後もエラーを返しキャッシュもない場合は 502 を返す。
+    """
+    try:
+        query = parse_query(params)
+    except ValueError as e:
+        return response(400, {"error": str(e)})
+    try:
+        catalog = load_catalog()
+    except (HarvestHTTPError, CircuitOpenError, OSError) as e:
+        logger.warning("Failed to fetch Harvest quest list: %s", e)
+        return response(502, {"error": "Bad Gateway"})
+
+    events, version = read_json_versioned(EVENTS_KEY)
+    if _catalog_cache.get("eventsVersion", object()) != version:
+        catalog.set_known(known_quests(events))
+        _catalog_cache["eventsVersion"] = version
+    return response(200, catalog.query(**query))
 
 
 # --- Response helper ---
 
 
-def response(status_code, body):
+def response(status_code, body, headers=None):
     """API Gateway (HTTP API) 互換のレスポンス辞書を生成する。"""
     return {
         "statusCode": status_code,
-        "headers": {"Content-Type": "application/json"},
+        "headers": {"Content-Type": "application/json", **(headers or {})},
         "body": json.dumps(body, ensure_ascii=False),
     }
@@ -0,0 +1,119 @@
+"""catalog.py のユニットテスト"""
+
+import pytest
+
+from catalog import MAX_LIMIT, QuestCatalog, known_quests, parse_query
+
+QUESTS = [
+    {
+        "id": "AAA",
+        "name": "ｸｴｽﾄ A",
+        "chapter": "バレンタイン",
+        "place": "花畑",
+        "is_freequest": False,
+        "since": "2026-02-01T00:00:00+09:00",
+    },
+    {
+        "id": "BBB",
+        "name": "Free Quest",
+        "chapter": "冬木",
+        "place": "大橋",
+        "is_freequest": True,
+        "since": "2025-01-01T00:00:00+09:00",
+    },
+    {
+        "id": "CCC",
+        "name": "クエスト C",
+        "chapter": "バレンタイン",
+        "place": "花畑作り",
+        "is_freequest": False,
+        "since": "2026-02-10T00:00:00+09:00",
+    },
+]
+
+
+def _ids(catalog, **conditions):
+    return [catalog.quests[pos]["id"] for pos in catalog.search(**conditions)]
+
+
+def test_keyword_search_is_normalized():
+    catalog = QuestCatalog(QUESTS)
+    assert _ids(catalog, q="クエスト") == ["AAA", "CCC"]
+    assert _ids(catalog, q="FREE") == ["BBB"]
+    assert _ids(catalog, q="花畑作") == ["CCC"]
+    assert _ids(catalog, q="存在しない") == []
+
+
+def test_single_character_keyword_scans_all():
+    catalog = QuestCatalog(QUESTS)
+    assert _ids(catalog, q="C") == ["CCC"]
+
+
+def test_filter_by_ids_and_dates():
+    catalog = QuestCatalog(QUESTS)
+    assert _ids(catalog, ids=["CCC", "AAA", "ZZZ"]) == ["AAA", "CCC"]
+    query = parse_query(
+        {"since": "2026-01-29T18:00:00+09:00", "until": "2026-02-05T00:00:00+09:00"}
+    )
+    assert _ids(catalog, since=query["since"], until=query["until"]) == ["AAA"]
+    assert _ids(catalog, freequest=True) == ["BBB"]
+
+
+def test_utc_designator_accepted():
+    query = parse_query({"since": "2026-01-31T15:00:00Z", "until": "2026-02-01T00:00:00Z"})
+    assert _ids(QuestCatalog(QUESTS), since=query["since"], until=query["until"]) == ["AAA"]
+
+
+def test_level_and_ap_use_registered_quests():
+    catalog = QuestCatalog(QUESTS)
+    events = {
+        "events": [
+            {
+                "eventId": "ev",
+                "quests": [
+                    {
+                        "questId": "AAA",
+                        "level": "90+",
+                        "ap": 40,
+                        "additionalSourceQuestIds": ["CCC"],
+                    }
+                ],
+            }
+        ]
+    }
+    catalog.set_known(known_quests(events))
+    assert _ids(catalog, level="90+") == ["AAA", "CCC"]
+    assert _ids(catalog, ap=40, q="C") == ["CCC"]
+    assert catalog.entry(0)["level"] == "90+"
+    assert "level" not in catalog.entry(1)
+
+
+def test_query_paginates():
+    catalog = QuestCatalog(QUESTS)
+    first = catalog.query(limit=2)
+    assert [q["id"] for q in first["quests"]] == ["AAA", "BBB"]
+    assert first["total"] == 3
+    assert first["nextOffset"] == 2
+    last = catalog.query(limit=2, offset=first["nextOffset"])
+    assert [q["id"] for q in last["quests"]] == ["CCC"]
+    assert last["nextOffset"] is None
+
+
+def test_parse_query_clamps_limit():
+    assert parse_query({"limit": "100000"})["limit"] == MAX_LIMIT
+    assert parse_query(None) == {"limit": 50, "offset": 0}
+
+
+@pytest.mark.parametrize(
+    "params",
+    [
+        {"ap": "x"},
+        {"freequest": "maybe"},
+        {"since": "2026-02-01"},
+        {"limit": "0"},
+        {"offset": "-1"},
+    ],
+)
+def test_parse_query_rejects_invalid_values(params):
+    with pytest.raises(ValueError):
+        parse_query(params)
@@ -0,0 +1,666 @@
+"""handler.py のユニットテスト"""
+
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+from unittest.mock import MagicMock
+
+# boto3 はテスト環境に存在しないため、インポート前にモック化する
+os.environ.setdefault("S3_BUCKET_NAME", "test-bucket")
+sys.modules["boto3"] = MagicMock()
+sys.modules["botocore"] = MagicMock()
+sys.modules["botocore.exceptions"] = MagicMock()
+
+from unittest.mock import patch
+
+import pytest
+
+import handler
+from anomalies import build_quest_queue
+from handler import (
+    ConflictError,
+    get_exclusions,
+    lambda_handler,
+    post_event,
+    put_event,
+    put_exclusions,
+)
+from harvest_client import HarvestHTTPError
+from stats import (
+    apply_report_to_reporters,
+    apply_report_to_stats,
+    build_report_shards,
+    report_shard_key,
+)
+
+
+class _VersionedStore:
+    """S3 の ETag 付き読み書きを模したインメモリストア。
+
+    書き込みのたびにバージョンを更新し、書き込まれた (キー, データ) を順に記録する。
+    before_write[key] に関数を登録すると、そのキーへの条件付き書き込みの直前に
+    1度だけ呼び出す (他のリクエストによる同時更新の再現用)。
+    """
+
+    def __init__(self, data: dict):
+        self.data = dict(data)
+        self.versions = {key: '"v0"' for key in data}
+        self.writes: list[tuple[str, object]] = []
+        self.before_write: dict = {}
+        self._seq = 0
+
+    def _store(self, key, data):
+        self._seq += 1
+        self.data[key] = data
+        self.versions[key] = f'"v{self._seq}"'
+
+    def read_json_versioned(self, key):
+        return self.data.get(key), self.versions.get(key)
+
+    def write_json(self, key, data):
+        self._store(key, data)
+        self.writes.append((key, data))
+
+    def write_json_if_match(self, key, data, version):
+        hook = self.before_write.pop(key, None)
+        if hook is not None:
+            hook(self)
+        if self.versions.get(key) != version:
+            raise ConflictError(key, None)
+        self.write_json(key, data)
+        return self.versions[key]
+
+    def written(self) -> dict:
+        return dict(self.writes)
+
+
+@contextmanager
+def _patched(store: _VersionedStore):
+    """handler の S3 読み書きを store に差し替える。"""
+    with (
+        patch("handler.read_json_versioned", side_effect=store.read_json_versioned),
+        patch("handler.write_json", side_effect=store.write_json),
+        patch("handler.write_json_if_match", side_effect=store.write_json_if_match),
+    ):
+        yield store
+
+
+# --- get_exclusions / put_exclusions (クエスト単位のシャード) ---
+
+
+def test_get_exclusions_reads_only_quest_shard():
+    store = {"exclusions/AAA.json": [{"reportId": "r1", "reason": "異常値"}]}
+    with patch(
+        "handler.read_json_versioned", side_effect=lambda key: (store.get(key), '"v1"')
+    ) as mock_read:
+        result = get_exclusions("AAA")
+    assert json.loads(result["body"]) == store["exclusions/AAA.json"]
+    assert result["headers"]["ETag"] == '"v1"'
+    mock_read.assert_called_once_with("exclusions/AAA.json")
+
+
+def test_get_exclusions_missing_shard():
+    with patch("handler.read_json_versioned", return_value=(None, None)):
+        result = get_exclusions("AAA")
+    assert json.loads(result["body"]) == []
+    assert "ETag" not in result["headers"]
+
+
+def test_put_exclusions_updates_index():
+    store = {"exclusions/_index.json": {"quests": {"BBB": {"count": 3}}}}
+    written = _put(store, [{"reportId": "r1", "reason": "異常値"}])
+    assert written["exclusions/AAA.json"] == [{"reportId": "r1", "reason": "異常値"}]
+    assert written["exclusions/_index.json"] == {
+        "quests": {"AAA": {"count": 1}, "BBB": {"count": 3}}
+    }
+
+
+def test_put_empty_exclusions_removes_from_index():
+    store = {"exclusions/_index.json": {"quests": {"AAA": {"count": 1}}}}
+    written = _put(store, [])
+    assert written["exclusions/AAA.json"] == []
+    assert written["exclusions/_index.json"] == {"quests": {}}
+
+
+# --- put_exclusions (ドロップ統計の差分更新) ---
+
+
+def _report(rid: str, runcount: int, items: dict, reporter: str = "u1") -> dict:
+    return {"id": rid, "reporter": reporter, "runcount": runcount, "items": items}
+
+
+REPORTS = [
+    _report("r1", 10, {"素材A": 5, "礼装": None}),
+    _report("r2", 20, {"素材A": 80, "素材B": 3}, reporter="u2"),
+    _report("r3", 40, {"素材A": 30, "礼装": 1}),
+]
+
+
+def _stats_of(reports: list[dict], excluded: list[str]) -> dict:
+    """空の統計に報告を1件ずつ加えて統計を作る。"""
+    stats = {
+        "quest": {"questId": "AAA", "name": "Q1", "level": "90", "ap": 40},
+        "reportCount": len(REPORTS),
+        "validReportCount": 0,
+        "totalRuns": 0,
+        "excludedReportIds": sorted(excluded),
+        "items": [],
+        "reporters": [],
+    }
+    items: dict = {}
+    reporters: dict = {}
+    for report in reports:
+        apply_report_to_stats(stats, items, report, 1)
+        apply_report_to_reporters(stats, reporters, report, 1)
+    return stats
+
+
+def _store() -> dict:
+    return {
+        "events.json": {"events": [{"eventId": "ev1", "quests": [{"questId": "AAA"}]}]},
+        "exclusions/_index.json": {"quests": {}},
+        "ev1/AAA.json": {"reports": REPORTS},
+        "ev1/AAA.stats.json": _stats_of(REPORTS, []),
+    }
+
+
+def _put(store: dict, exclusions: list[dict]) -> dict:
+    """put_exclusions を実行し、書き込まれた {キー: データ} を返す。"""
+    versioned = _VersionedStore(store)
+    with _patched(versioned):
+        put_exclusions("AAA", exclusions)
+    return versioned.written()
+
+
+def _assert_stats_equal(actual: dict, expected: dict) -> None:
+    assert actual["validReportCount"] == expected["validReportCount"]
+    assert actual["totalRuns"] == expected["totalRuns"]
+    assert actual["excludedReportIds"] == expected["excludedReportIds"]
+    actual_items = {item["itemName"]: item for item in actual["items"]}
+    expected_items = {item["itemName"]: item for item in expected["items"]}
+    assert actual_items.keys() == expected_items.keys()
+    for name, item in expected_items.items():
+        for field, value in item.items():
+            assert actual_items[name][field] == pytest.approx(value), (name, field)
+
+
+def test_exclusion_applied_incrementally():
+    written = _put(_store(), [{"reportId": "r2", "reason": "異常値"}])
+    expected = _stats_of([REPORTS[0], REPORTS[2]], ["r2"])
+    _assert_stats_equal(written["ev1/AAA.stats.json"], expected)
+
+
+def test_item_only_in_excluded_report_removed():
+    written = _put(_store(), [{"reportId": "r2", "reason": "異常値"}])
+    names = {item["itemName"] for item in written["ev1/AAA.stats.json"]["items"]}
+    assert "素材B" not in names
+
+
+def test_unexclusion_applied_incrementally():
+    store = _store()
+    store["ev1/AAA.stats.json"] = _stats_of([REPORTS[0], REPORTS[2]], ["r2"])
+    written = _put(store, [])
+    _assert_stats_equal(written["ev1/AAA.stats.json"], _stats_of(REPORTS, []))
+
+
+def test_exclusion_updates_reporters_and_event_rollup():
+    written = _put(_store(), [{"reportId": "r3", "reason": "異常値"}])
+    reporters = {r["reporter"]: r for r in written["ev1/AAA.stats.json"]["reporters"]}
+    assert reporters["u1"]["reportCount"] == 1
+    assert reporters["u1"]["totalRuns"] == 10
+    assert reporters["u1"]["items"] == {"素材A": 5, "礼装": 0}
+    rollup = written["ev1/rollup.json"]
+    assert [(r["reporter"], r["totalRuns"]) for r in rollup["reporters"]] == [
+        ("u2", 20),
+        ("u1", 10),
+    ]
+
+
+def test_reporter_without_valid_reports_removed():
+    written = _put(_store(), [{"reportId": "r2", "reason": "異常値"}])
+    names = [r["reporter"] for r in written["ev1/AAA.stats.json"]["reporters"]]
+    assert names == ["u1"]
+
+
+def test_no_stats_file_only_saves_exclusions():
+    store = _store()
+    del store["ev1/AAA.stats.json"]
+    written = _put(store, [{"reportId": "r2", "reason": "異常値"}])
+    assert list(written) == ["exclusions/_index.json", "exclusions/AAA.json"]
+
+
+def test_unchanged_exclusions_do_not_rewrite_stats():
+    store = _store()
+    store["ev1/AAA.stats.json"] = _stats_of([REPORTS[0], REPORTS[2]], ["r2"])
+    store["exclusions/_index.json"] = {"quests": {"AAA": {"count": 1}}}
+    written = _put(store, [{"reportId": "r2", "reason": "理由だけ変更"}])
+    assert list(written) == ["exclusions/AAA.json"]
+
+
+# --- レビューキュー ---
+
+
+def _store_with_warning() -> dict:
+    """r2 に warnings のある (キューに入る) 報告とレビューキューを持つストア。"""
+    store = _store()
+    reports = [REPORTS[0], {**REPORTS[1], "warnings": ["raw count"]}, REPORTS[2]]
+    stats = store["ev1/AAA.stats.json"]
+    store["ev1/AAA.json"] = {"reports": reports}
+    store["ev1/AAA.anomalies.json"] = build_quest_queue(
+        stats["quest"], reports, stats["items"], set()
+    )
+    return store
+
+
+def _with_report_index(store: dict) -> dict:
+    """中間 JSON の報告から報告の索引を作り、中間 JSON を除いたストアを返す。"""
+    store = dict(store)
+    reports = store.pop("ev1/AAA.json")["reports"]
+    for shard, index in enumerate(build_report_shards(reports)):
+        store[report_shard_key("ev1", "AAA", shard)] = index
+    return store
+
+
+def test_exclusion_removes_report_from_anomaly_queues():
+    written = _put(_store_with_warning(), [{"reportId": "r3", "reason": "異常値"}])
+    assert [a["reportId"] for a in written["ev1/AAA.anomalies.json"]["anomalies"]] == ["r2"]
+    written = _put(_store_with_warning(), [{"reportId": "r2", "reason": "異常値"}])
+    assert written["ev1/AAA.anomalies.json"]["anomalies"] == []
+    event_queue = written["ev1/anomalies.json"]
+    assert event_queue["quests"] == [{"questId": "AAA", "anomalyCount": 0, "outlierCount": 0}]
+    assert event_queue["anomalies"] == []
+
+
+def test_unexclusion_requeues_report():
+    store = _store_with_warning()
+    store["ev1/AAA.stats.json"] = _stats_of([REPORTS[0], REPORTS[2]], ["r2"])
+    store["ev1/AAA.anomalies.json"] = {**store["ev1/AAA.anomalies.json"], "anomalies": []}
+    written = _put(_with_report_index(store), [])
+    queue = written["ev1/AAA.anomalies.json"]
+    assert [(a["reportId"], a["warnings"]) for a in queue["anomalies"]] == [("r2", ["raw count"])]
+
+
+def test_no_anomaly_queue_leaves_queues_unwritten():
+    written = _put(_store(), [{"reportId": "r2", "reason": "異常値"}])
+    assert "ev1/AAA.anomalies.json" not in written
+    assert "ev1/anomalies.json" not in written
+
+
+def test_exclusion_reads_only_report_index_shards():
+    store = _VersionedStore(_with_report_index(_store()))
+    with _patched(store):
+        put_exclusions("AAA", [{"reportId": "r2", "reason": "異常値"}])
+        read_keys = [call.args[0] for call in handler.read_json_versioned.call_args_list]
+    expected = _stats_of([REPORTS[0], REPORTS[2]], ["r2"])
+    _assert_stats_equal(store.data["ev1/AAA.stats.json"], expected)
+    assert "ev1/AAA.json" not in read_keys
+    assert [k for k in read_keys if ".reports/" in k] == [
+        report_shard_key("ev1", "AAA", handler.report_shard("r2"))
+    ]
+
+
+def _get_anomalies(event_id, params=None):
+    return lambda_handler(
+        {
+            "requestContext": {"http": {"method": "GET", "path": f"/anomalies/{event_id}"}},
+            "pathParameters": {"eventId": event_id},
+            "queryStringParameters": params,
+        },
+        None,
+    )
+
+
+def _queue_entry(rid: str, score: float, warnings: list[str] | None = None) -> dict:
+    outliers = [{"itemName": "素材A", "value": 20, "zScore": score}] if score else []
+    return {
+        "questId": "AAA",
+        "reportId": rid,
+        "score": score,
+        "outliers": outliers,
+        "warnings": warnings or [],
+    }
+
+
+def test_get_anomalies_pages_event_queue():
+    queue = {
+        "eventId": "ev1",
+        "anomalies": [
+            _queue_entry("r1", 9.0),
+            _queue_entry("r2", 4.0),
+            _queue_entry("r3", 0, ["w"]),
+        ],
+        "lastUpdated": "2026-01-01T00:00:00+09:00",
+    }
+    store = _VersionedStore({"ev1/anomalies.json": queue})
+    with _patched(store):
+        body = json.loads(_get_anomalies("ev1", {"kind": "outlier", "limit": "1"})["body"])
+    assert [a["reportId"] for a in body["anomalies"]] == ["r1"]
+    assert (body["total"], body["nextOffset"]) == (2, 1)
+    assert body["lastUpdated"] == queue["lastUpdated"]
+
+
+def test_get_anomalies_reads_quest_queue():
+    queue = {"anomalies": [_queue_entry("r1", 9.0)]}
+    store = _VersionedStore({"ev1/AAA.anomalies.json": queue})
+    with _patched(store):
+        result = _get_anomalies("ev1", {"questId": "AAA"})
+    assert json.loads(result["body"])["total"] == 1
+
+
+def test_get_anomalies_missing_queue_and_invalid_query():
+    with _patched(_VersionedStore({})):
+        assert _get_anomalies("ev1")["statusCode"] == 404
+        assert _get_anomalies("ev1", {"kind": "all"})["statusCode"] == 400
+
+
+# --- 楽観的排他制御 ---
+
+
+def _events(*event_ids: str) -> dict:
+    return {"events": [{"eventId": eid, "quests": []} for eid in event_ids]}
+
+
+def test_post_event_retries_and_merges_concurrent_update():
+    store = _VersionedStore({"events.json": _events("ev1")})
+    # 読み込み後・書き込み前に別リクエストが ev2 を追加する
+    store.before_write["events.json"] = lambda s: s._store("events.json", _events("ev1", "ev2"))
+    with _patched(store):
+        result = post_event({"eventId": "ev3", "quests": []})
+    assert result["statusCode"] == 201
+    ids = [ev["eventId"] for ev in store.data["events.json"]["events"]]
+    assert ids == ["ev1", "ev2", "ev3"]
+
+
+def test_post_event_creates_missing_events_file():
+    store = _VersionedStore({})
+    with _patched(store):
+        post_event({"eventId": "ev1", "quests": []})
+    assert store.data["events.json"] == _events("ev1")
+
+
+def test_put_event_not_found_does_not_write():
+    store = _VersionedStore({"events.json": _events("ev1")})
+    with _patched(store):
+        result = put_event("ev9", {"quests": []})
+    assert result["statusCode"] == 404
+    assert store.writes == []
+
+
+def test_persistent_conflict_returns_409_with_current_version():
+    store = _VersionedStore({"events.json": _events("ev1")})
+    with (
+        _patched(store),
+        patch("handler.write_json_if_match", side_effect=ConflictError("events.json", None)),
+    ):
+        result = lambda_handler(
+            {
+                "requestContext": {"http": {"method": "POST", "path": "/events"}},
+                "body": json.dumps({"eventId": "ev2", "quests": []}),
+            },
+            None,
+        )
+    assert result["statusCode"] == 409
+    assert json.loads(result["body"]) == {"error": "Conflict", "version": '"v0"'}
+
+
+def test_put_exclusions_stale_if_match_returns_409():
+    store = _VersionedStore({"exclusions/AAA.json": [{"reportId": "r1", "reason": "異常値"}]})
+    with _patched(store):
+        result = lambda_handler(
+            {
+                "requestContext": {"http": {"method": "PUT", "path": "/exclusions/AAA"}},
+                "pathParameters": {"questId": "AAA"},
+                "headers": {"if-match": '"stale"'},
+                "body": json.dumps([]),
+            },
+            None,
+        )
+    assert result["statusCode"] == 409
+    assert json.loads(result["body"])["version"] == '"v0"'
+    assert store.writes == []
+
+
+def _put_request(body, if_match=None, if_none_match=None) -> dict:
+    headers = {}
+    if if_match:
+        headers["if-match"] = if_match
+    if if_none_match:
+        headers["if-none-match"] = if_none_match
+    return {
+        "requestContext": {"http": {"method": "PUT", "path": "/exclusions/AAA"}},
+        "pathParameters": {"questId": "AAA"},
+        "headers": headers,
+        "body": json.dumps(body),
+    }
+
+
+def test_put_exclusions_returns_new_etag():
+    store = _VersionedStore({"exclusions/AAA.json": []})
+    with _patched(store):
+        result = lambda_handler(
+            _put_request([{"reportId": "r1", "reason": "異常値"}], '"v0"'), None
+        )
+    assert result["statusCode"] == 200
+    assert result["headers"]["ETag"] == store.versions["exclusions/AAA.json"]
+
+
+def test_put_exclusions_concurrent_write_not_overwritten():
+    """全件置き換えの内容で再試行せず、他の管理者の更新を残して 409 を返す"""
+    theirs = [{"reportId": "r9", "reason": "他の管理者"}]
+    store = _VersionedStore({"exclusions/AAA.json": []})
+    store.before_write["exclusions/AAA.json"] = lambda s: s._store("exclusions/AAA.json", theirs)
+    with _patched(store):
+        result = lambda_handler(_put_request([{"reportId": "r1", "reason": "異常値"}]), None)
+    assert result["statusCode"] == 409
+    assert json.loads(result["body"])["version"] == store.versions["exclusions/AAA.json"]
+    assert store.data["exclusions/AAA.json"] == theirs
+    # 索引には先に登録される (シャードが空でも集計 Lambda が読むだけ)
+    assert store.data["exclusions/_index.json"] == {"quests": {"AAA": {"count": 1}}}
+
+
+def test_put_exclusions_shard_created_after_absent_get_returns_409():
+    """未作成の状態で取得 (If-None-Match: *) した後に他の管理者が作成したシャードを上書きしない"""
+    theirs = [{"reportId": "r9", "reason": "他の管理者"}]
+    store = _VersionedStore({})
+    store._store("exclusions/AAA.json", theirs)
+    with _patched(store):
+        result = lambda_handler(
+            _put_request([{"reportId": "r1", "reason": "異常値"}], if_none_match="*"), None
+        )
+    assert result["statusCode"] == 409
+    assert json.loads(result["body"])["version"] == store.versions["exclusions/AAA.json"]
+    assert store.data["exclusions/AAA.json"] == theirs
+
+
+def test_put_exclusions_if_none_match_creates_absent_shard():
+    store = _VersionedStore({})
+    with _patched(store):
+        result = lambda_handler(
+            _put_request([{"reportId": "r1", "reason": "異常値"}], if_none_match="*"), None
+        )
+    assert result["statusCode"] == 200
+    assert store.data["exclusions/AAA.json"] == [{"reportId": "r1", "reason": "異常値"}]
+
+
+def test_index_conflict_after_shard_write_is_not_fatal():
+    store = _VersionedStore(
+        {
+            "exclusions/AAA.json": [{"reportId": "r1", "reason": "異常値"}],
+            "exclusions/_index.json": {"quests": {"AAA": {"count": 1}}},
+        }
+    )
+    with (
+        _patched(store),
+        patch("handler.update_json", side_effect=ConflictError("exclusions/_index.json", None)),
+    ):
+        result = lambda_handler(_put_request([]), None)
+    assert result["statusCode"] == 200
+    assert store.data["exclusions/AAA.json"] == []
+
+
+def test_read_after_own_write_uses_cache():
+    """自分で書き込んだオブジェクトは ETag で再検証し、304 なら書き込んだ内容を返す"""
+    not_modified = Exception("304")
+    not_modified.response = {"Error": {"Code": "304"}}
+    s3 = MagicMock()
+    s3.put_object.return_value = {"ETag": '"v1"'}
+    s3.get_object.side_effect = not_modified
+    handler.s3_cache.clear()
+    with patch("handler.s3", s3):
+        handler.write_json("events.json", {"events": []})
+        assert handler.read_json_versioned("events.json") == ({"events": []}, '"v1"')
+    assert s3.get_object.call_args.kwargs["IfNoneMatch"] == '"v1"'
+    handler.s3_cache.clear()
+
+
+# --- Harvest quest catalog ---
+
+_QUESTS = [
+    {"id": "AAA", "name": "クエストA", "is_freequest": False, "since": "2026-02-01T00:00:00+09:00"},
+    {"id": "BBB", "name": "クエストB", "is_freequest": True, "since": "2026-01-01T00:00:00+09:00"},
+]
+
+
+class _FakeResponse:
+    def __init__(self, status, body=None, headers=None):
+        self.status = status
+        self.headers = headers or {}
+        self._body = json.dumps(body).encode("utf-8")
+
+    def read(self):
+        return self._body
+
+
+class _FakeHarvest:
+    """harvest.get を模したスタブ。受け取った条件ヘッダを記録する。"""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    @contextmanager
+    def get(self, url, headers=None):
+        self.requests.append(headers or {})
+        result = self.responses.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        yield result
+
+
+@pytest.fixture(autouse=True)
+def _clear_catalog_cache():
+    handler._catalog_cache.clear()
+    yield
+    handler._catalog_cache.clear()
+
+
+def _get_harvest_quests(params=None):
+    return lambda_handler(
+        {
+            "requestContext": {"http": {"method": "GET", "path": "/harvest/quests"}},
+            "queryStringParameters": params,
+        },
+        None,
+    )
+
+
+@contextmanager
+def _harvest(store, *responses):
+    fake = _FakeHarvest(*responses)
+    with _patched(store), patch("handler.harvest.get", side_effect=fake.get):
+        yield fake
+
+
+def test_harvest_quests_fetches_and_caches_catalog():
+    store = _VersionedStore({})
+    ok = _FakeResponse(200, _QUESTS, {"ETag": '"h1"'})
+    with _harvest(store, ok) as fake:
+        first = _get_harvest_quests({"freequest": "false"})
+        second = _get_harvest_quests({"q": "クエスト"})
+    assert first["statusCode"] == 200
+    assert [q["id"] for q in json.loads(first["body"])["quests"]] == ["AAA"]
+    assert json.loads(second["body"])["total"] == 2
+    # 2回目はメモリ上のキャッシュを使う
+    assert len(fake.requests) == 1
+    cached = store.data[handler.HARVEST_CATALOG_KEY]
+    assert cached["quests"] == _QUESTS
+    assert cached["etag"] == '"h1"'
+
+
+def test_harvest_quests_cold_start_uses_fresh_s3_cache():
+    cached = {"etag": '"h1"', "fetchedAt": time.time(), "quests": _QUESTS}
+    store = _VersionedStore({handler.HARVEST_CATALOG_KEY: cached})
+    with _harvest(store) as fake:
+        result = _get_harvest_quests()
+    assert json.loads(result["body"])["total"] == 2
+    assert fake.requests == []
+
+
+def test_harvest_quests_revalidates_expired_cache():
+    cached = {"etag": '"h1"', "fetchedAt": 0, "quests": _QUESTS}
+    store = _VersionedStore({handler.HARVEST_CATALOG_KEY: cached})
+    with _harvest(store, _FakeResponse(304)) as fake:
+        result = _get_harvest_quests()
+    assert json.loads(result["body"])["total"] == 2
+    assert fake.requests == [{"If-None-Match": '"h1"'}]
+    # 一覧本体は書き直さず、取得時刻だけを別オブジェクトに記録する
+    assert [key for key, _ in store.writes] == [handler.HARVEST_CATALOG_META_KEY]
+    meta = store.data[handler.HARVEST_CATALOG_META_KEY]
+    assert meta["etag"] == '"h1"'
+    assert meta["fetchedAt"] > 0
+
+
+def test_harvest_quests_cold_start_uses_revalidated_time_from_meta():
+    cached = {"etag": '"h1"', "fetchedAt": 0, "quests": _QUESTS}
+    meta = {"etag": '"h1"', "lastModified": None, "fetchedAt": time.time()}
+    store = _VersionedStore(
+        {handler.HARVEST_CATALOG_KEY: cached, handler.HARVEST_CATALOG_META_KEY: meta}
+    )
+    with _harvest(store) as fake:
+        result = _get_harvest_quests()
+    assert json.loads(result["body"])["total"] == 2
+    assert fake.requests == []
+
+
+def test_harvest_quests_ignores_meta_for_other_etag():
+    cached = {"etag": '"h2"', "fetchedAt": 0, "quests": _QUESTS}
+    meta = {"etag": '"h1"', "lastModified": None, "fetchedAt": time.time()}
+    store = _VersionedStore(
+        {handler.HARVEST_CATALOG_KEY: cached, handler.HARVEST_CATALOG_META_KEY: meta}
+    )
+    with _harvest(store, _FakeResponse(304)) as fake:
+        _get_harvest_quests()
+    assert fake.requests == [{"If-None-Match": '"h2"'}]
+
+
+def test_harvest_quests_serves_stale_cache_on_upstream_error():
+    cached = {"etag": '"h1"', "fetchedAt": 0, "quests": _QUESTS}
+    store = _VersionedStore({handler.HARVEST_CATALOG_KEY: cached})
+    with _harvest(store, HarvestHTTPError("url", 503)):
+        result = _get_harvest_quests()
+    assert result["statusCode"] == 200
+    assert json.loads(result["body"])["total"] == 2
+
+
+def test_harvest_quests_adds_known_level_and_ap():
+    events = {
+        "events": [{"eventId": "ev", "quests": [{"questId": "AAA", "level": "90+", "ap": 40}]}]
+    }
+    store = _VersionedStore({"events.json": events})
+    with _harvest(store, _FakeResponse(200, _QUESTS)):
+        result = _get_harvest_quests({"ap": "40"})
+    body = json.loads(result["body"])
+    assert body["quests"] == [{**_QUESTS[0], "level": "90+", "ap": 40}]
+
+
+def test_harvest_quests_invalid_query_returns_400():
+    result = _get_harvest_quests({"limit": "abc"})
+    assert result["statusCode"] == 400
+
+
+def test_harvest_quests_upstream_error_returns_502():
+    with _harvest(_VersionedStore({}), HarvestHTTPError("url", 503)):
+        result = _get_harvest_quests()
+    assert result["statusCode"] == 502
@@ -0,0 +1,247 @@
+"""終了したイベントのアーカイブ (列指向データセット) のエンコード・読み込み。
+
+グレースピリオドを過ぎて更新されなくなったイベントの中間 JSON を、
+報告 × アイテムを1行とする列指向のデータセットにまとめる。
+
+- 列ごとに1ファイル (archive/<eventId>/<列名>.json.gz) に分け、gzip 圧縮した JSON 配列で保存する。
+  クエリは必要な列だけを読み込めばよい。書き込み時はクエストごとに列へ追記して圧縮するため、
+  イベント全体の行をメモリに載せない
+- 文字列の重複が多い列 (DICTIONARY_COLUMNS) は archive/<eventId>/_meta.json の辞書への
+  インデックスで表す
+- archive/_index.json にアーカイブ済みのイベントと、そのイベントに含まれるアイテム名を記録する。
+  アイテムを含まないイベントはクエリ時に読み飛ばせる
+
+eventId はパーティション (ディレクトリ) で表すため列には含めない。
+"""
+
+import contextlib
+import gzip
+import json
+import tempfile
+from collections.abc import Callable
+from datetime import datetime
+from typing import IO, Any, Self
+
+from compact import loads_gzip
+from jsonstream import SPOOL_MAX_BYTES
+from stats import reporter_name
+
+ARCHIVE_FORMAT = "eventstats-archive"
+ARCHIVE_VERSION = 1
+ARCHIVE_INDEX_KEY = "archive/_index.json"
+
+# 列 (出力順)。1行 = 1報告 × 1アイテム
+# - questId / reporter / itemName: 辞書のインデックス
+# - reportId: 報告 ID
+# - timestamp: 報告日時の UNIX 時間 (秒)。解釈できない場合は null
+# - runcount: 報告の周回数
+# - count: アイテムのドロップ数。未入力 (NaN) の場合は null
+# - excluded: アーカイブ時点の除外リストに含まれていれば 1
+COLUMNS = (
+    "questId",
+    "reportId",
+    "reporter",
+    "timestamp",
+    "runcount",
+    "itemName",
+    "count",
+    "excluded",
+)
+DICTIONARY_COLUMNS = ("questId", "reporter", "itemName")
+
+
+def archive_meta_key(event_id: str) -> str:
+    """アーカイブのメタデータ (行数・辞書・クエストごとの集計) の S3 キーを返す。"""
+    return f"archive/{event_id}/_meta.json"
+
+
+def archive_column_key(event_id: str, column: str) -> str:
+    """アーカイブの列ファイルの S3 キーを返す。"""
+    return f"archive/{event_id}/{column}.json.gz"
+
+
+def _epoch_seconds(timestamp: Any) -> int | None:
+    try:
+        return int(datetime.fromisoformat(timestamp).timestamp())
+    except (TypeError, ValueError):
+        return None
+
+
+class EventArchiveBuilder:
+    """イベント1件のアーカイブをクエストごとに追加しながら組み立てる。
+
+    add_quest() はクエスト1件分の行を列ごとの gzip ストリームに追記してすぐに手放す。
+    メモリに残るのは辞書とクエストごとの集計だけで、イベントの行数には比例しない。
+    圧縮した列は SPOOL_MAX_BYTES を超えると一時ファイル (/tmp) に書き出される。
+    一時ファイルは close() で削除されるため with 文で使う。
+    """
+
+    def __init__(self, event: dict):
+        self.event = event
+        self.dictionaries: dict[str, dict[str, int]] = {col: {} for col in DICTIONARY_COLUMNS}
+        self.quests: list[dict] = []
+        self.row_count = 0
+        self._spools: dict[str, IO[bytes]] = {}
+        self._streams: dict[str, gzip.GzipFile] = {}
+        with contextlib.ExitStack() as stack:
+            for col in COLUMNS:
+                spool = stack.enter_context(tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES))
+                # compact.dumps_gzip と同じく mtime を 0 に固定する
+                stream = gzip.GzipFile(fileobj=spool, mode="wb", mtime=0)
+                stream.write(b"[")
+                self._spools[col] = spool
+                self._streams[col] = stream
+            stack.pop_all()
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """列の一時ファイルを削除する。"""
+        for spool in self._spools.values():
+            spool.close()
+
+    def _code(self, column: str, value: str) -> int:
+        codes = self.dictionaries[column]
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(codes)
+        return code
+
+    def add_quest(self, output: dict, excluded_ids: set[str]) -> None:
+        """クエスト1件の中間 JSON (レガシー形式) の報告を行として列に追記する。"""
+        quest = output["quest"]
+        quest_code = self._code("questId", quest["questId"])
+        rows: dict[str, list] = {col: [] for col in COLUMNS}
+        report_count = 0
+        valid_report_count = 0
+        total_runs = 0
+        for report in output.get("reports", []):
+            excluded = 1 if report["id"] in excluded_ids else 0
+            report_count += 1
+            if not excluded:
+                valid_report_count += 1
+                total_runs += report["runcount"]
+            reporter_code = self._code("reporter", reporter_name(report))
+            timestamp = _epoch_seconds(report.get("timestamp"))
+            for item_name, value in report["items"].items():
+                rows["questId"].append(quest_code)
+                rows["reportId"].append(report["id"])
+                rows["reporter"].append(reporter_code)
+                rows["timestamp"].append(timestamp)
+                rows["runcount"].append(report["runcount"])
+                rows["itemName"].append(self._code("itemName", item_name))
+                rows["count"].append(value)
+                rows["excluded"].append(excluded)
+        self._append(rows)
+        self.quests.append(
+            {
+                **quest,
+                "reportCount": report_count,
+                "validReportCount": valid_report_count,
+                "totalRuns": total_runs,
+            }
+        )
+
+    def _append(self, rows: dict[str, list]) -> None:
+        """各列の JSON 配列に rows の値を続けて書き込む。"""
+        added = len(rows["questId"])
+        if not added:
+            return
+        sep = "," if self.row_count else ""
+        for col, values in rows.items():
+            # 配列の角括弧を除いた要素の並びを追記する
+            body = json.dumps(values, ensure_ascii=False, separators=(",", ":"))[1:-1]
+            self._streams[col].write((sep + body).encode("utf-8"))
+        self.row_count += added
+
+    def build(self) -> tuple[dict, dict[str, IO[bytes]]]:
+        """(メタデータ, 列名 → gzip 圧縮した JSON 配列のファイルオブジェクト) を返す。
+
+        列は compact.loads_gzip で読める。ファイルオブジェクトは先頭にシークしてあり、
+        close() まで有効。build() の後に add_quest() は呼べない。
+        """
+        for col in COLUMNS:
+            stream = self._streams[col]
+            stream.write(b"]")
+            stream.close()
+            self._spools[col].seek(0)
+        meta = {
+            "format": ARCHIVE_FORMAT,
+            "version": ARCHIVE_VERSION,
+            "eventId": self.event["eventId"],
+            "name": self.event.get("name", ""),
+            "period": self.event.get("period", {}),
+            "rowCount": self.row_count,
+            "columns": list(COLUMNS),
+            "dictionaries": {col: list(codes) for col, codes in self.dictionaries.items()},
+            "quests": self.quests,
+        }
+        return meta, dict(self._spools)
+
+
+def index_entry(meta: dict, archived_at: str) -> dict:
+    """archive/_index.json に記録するイベント1件分のエントリを返す。"""
+    return {
+        "name": meta["name"],
+        "period": meta["period"],
+        "rowCount": meta["rowCount"],
+        "reportCount": sum(q["reportCount"] for q in meta["quests"]),
+        "itemNames": sorted(meta["dictionaries"]["itemName"]),
+        "archivedAt": archived_at,
+    }
+
+
+class ArchiveReader:
+    """アーカイブを読み込む。
+
+    read はキーを受け取って本文 (bytes) を返す関数。キーが存在しない場合は None を返す。
+    読み込んだメタデータと列はインスタンスに保持する。
+    """
+
+    def __init__(self, read: Callable[[str], bytes | None]):
+        self._read = read
+        self._index: dict | None = None
+        self._metas: dict[str, dict] = {}
+        self._columns: dict[tuple[str, str], list] = {}
+
+    def index(self) -> dict[str, dict]:
+        """アーカイブ済みのイベント ID → 索引のエントリ を返す。"""
+        if self._index is None:
+            body = self._read(ARCHIVE_INDEX_KEY)
+            self._index = json.loads(body.decode("utf-8"))["events"] if body else {}
+        return self._index
+
+    def meta(self, event_id: str) -> dict:
+        """イベントのメタデータを返す。アーカイブされていなければ KeyError を送出する。"""
+        meta = self._metas.get(event_id)
+        if meta is None:
+            body = self._read(archive_meta_key(event_id))
+            if body is None:
+                raise KeyError(event_id)
+            meta = json.loads(body.decode("utf-8"))
+            if meta.get("format") != ARCHIVE_FORMAT:
+                raise ValueError(f"Unknown format: {meta.get('format')!r}")
+            if meta.get("version") != ARCHIVE_VERSION:
+                raise ValueError(f"Unsupported archive version: {meta.get('version')!r}")
+            self._metas[event_id] = meta
+        return meta
+
+    def column(self, event_id: str, name: str) -> list:
+        """列の値を返す。辞書エンコードされた列はインデックスのまま返す (dictionary() で解決する)。"""
+        if name not in COLUMNS:
+            raise ValueError(f"Unknown column: {name!r}")
+        values = self._columns.get((event_id, name))
+        if values is None:
+            body = self._read(archive_column_key(event_id, name))
+            if body is None:
+                raise KeyError(f"{event_id}/{name}")
+            values = self._columns[(event_id, name)] = loads_gzip(body)
+        return values
+
+    def dictionary(self, event_id: str, name: str) -> list[str]:
+        """辞書エンコードされた列の辞書 (インデックス → 値) を返す。"""
+        return self.meta(event_id)["dictionaries"][name]
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""終了したイベントのアーカイブ (archive.py) に対するクエリ。
+
+集計 Lambda が S3 の archive/ 以下に出力したデータセットを読み込み、
+イベントを横断した分析を行う。クエリに必要な列のファイルだけを取得する。
+S3 から直接読むほか、`aws s3 sync s3://<bucket>/archive <dir>/archive` で
+取得したローカルのコピーも読める。
+
+    python archive_query.py (--bucket NAME | --dir PATH) events
+    python archive_query.py (--bucket NAME | --dir PATH) drop-rate ITEM [--event ID ...]
+"""
+
+import argparse
+import sys
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+from typing import Any
+
+from archive import DICTIONARY_COLUMNS, ArchiveReader
+
+
+def s3_reader(bucket: str, client: Any = None) -> ArchiveReader:
+    """S3 バケットのアーカイブを読み込む ArchiveReader を返す。"""
+    if client is None:
+        import boto3
+
+        client = boto3.client("s3")
+
+    def read(key: str) -> bytes | None:
+        try:
+            return client.get_object(Bucket=bucket, Key=key)["Body"].read()
+        except client.exceptions.NoSuchKey:
+            return None
+
+    return ArchiveReader(read)
+
+
+def dir_reader(root: str | Path) -> ArchiveReader:
+    """ローカルに同期したアーカイブ (root/archive/...) を読み込む ArchiveReader を返す。"""
+    root = Path(root)
+
+    def read(key: str) -> bytes | None:
+        path = root / key
+        return path.read_bytes() if path.exists() else None
+
+    return ArchiveReader(read)
+
+
+def select_events(
+    reader: ArchiveReader,
+    events: Iterable[str] | None = None,
+    item_name: str | None = None,
+) -> list[str]:
+    """対象のイベント ID を返す。item_name を指定した場合は索引でそのアイテムを含むイベントに絞る。"""
+    index = reader.index()
+    event_ids = list(index) if events is None else [e for e in events if e in index]
+    if item_name is not None:
+        event_ids = [e for e in event_ids if item_name in index[e]["itemNames"]]
+    return event_ids
+
+
+def scan(
+    reader: ArchiveReader,
+    columns: Iterable[str],
+    events: Iterable[str] | None = None,
+    item_name: str | None = None,
+) -> Iterator[dict]:
+    """指定した列だけを読み込み、行を eventId を加えた dict として返す。
+
+    辞書エンコードされた列は値に戻す。item_name を指定した場合はそのアイテムの行だけを返す。
+    """
+    columns = list(columns)
+    for event_id in select_events(reader, events, item_name):
+        names = columns if item_name is None or "itemName" in columns else [*columns, "itemName"]
+        values = [reader.column(event_id, name) for name in names]
+        dictionaries = [
+            reader.dictionary(event_id, name) if name in DICTIONARY_COLUMNS else None
+            for name in names
+        ]
+        item_code = None
+        if item_name is not None:
+            item_code = reader.dictionary(event_id, "itemName").index(item_name)
+            item_values = values[names.index("itemName")]
+        for i in range(reader.meta(event_id)["rowCount"]):
+            if item_code is not None and item_values[i] != item_code:
+                continue
+            row = {"eventId": event_id}
+            for name, column, dictionary in zip(columns, values, dictionaries):
+                value = column[i]
+                row[name] = dictionary[value] if dictionary is not None else value
+            yield row
+
+
+def item_drop_rates(
+    reader: ArchiveReader,
+    item_name: str,
+    events: Iterable[str] | None = None,
+    include_excluded: bool = False,
+) -> list[dict]:
+    """イベント・クエストごとのアイテムのドロップ率を返す。
+
+    集計 Lambda の stats JSON と同じく、未入力 (null) の報告はドロップ数・周回数のどちらにも含めない。
+    questId・itemName・count・runcount・excluded の列だけを読み込む。
+    """
+    results = []
+    for event_id in select_events(reader, events, item_name):
+        meta = reader.meta(event_id)
+        item_code = meta["dictionaries"]["itemName"].index(item_name)
+        quest_codes = reader.column(event_id, "questId")
+        item_codes = reader.column(event_id, "itemName")
+        counts = reader.column(event_id, "count")
+        runcounts = reader.column(event_id, "runcount")
+        excluded = reader.column(event_id, "excluded")
+
+        per_quest: dict[int, list] = {}
+        for i, code in enumerate(item_codes):
+            if code != item_code or counts[i] is None:
+                continue
+            if excluded[i] and not include_excluded:
+                continue
+            acc = per_quest.setdefault(quest_codes[i], [0, 0, 0])
+            acc[0] += 1
+            acc[1] += counts[i]
+            acc[2] += runcounts[i]
+
+        quest_ids = meta["dictionaries"]["questId"]
+        quest_names = {q["questId"]: q.get("name", "") for q in meta["quests"]}
+        for quest_code, (report_count, total_drops, total_runs) in sorted(per_quest.items()):
+            quest_id = quest_ids[quest_code]
+            results.append(
+                {
+                    "eventId": event_id,
+                    "questId": quest_id,
+                    "questName": quest_names.get(quest_id, ""),
+                    "reportCount": report_count,
+                    "totalDrops": total_drops,
+                    "totalRuns": total_runs,
+                    "dropRate": total_drops / total_runs if total_runs > 0 else 0.0,
+                }
+            )
+    return results
+
+
+def _print_tsv(header: list[str], rows: Iterable[Iterable[Any]]) -> None:
+    print("\t".join(header))
+    for row in rows:
+        print("\t".join(str(v) for v in row))
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="終了したイベントのアーカイブに対するクエリ")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--bucket", help="S3 バケット名")
+    source.add_argument("--dir", help="アーカイブを同期したローカルディレクトリ")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("events", help="アーカイブ済みのイベント一覧")
+    drop_rate = sub.add_parser("drop-rate", help="アイテムのイベント・クエストごとのドロップ率")
+    drop_rate.add_argument("item", help="アイテム名")
+    drop_rate.add_argument("--event", action="append", help="対象のイベント ID (複数指定可)")
+    drop_rate.add_argument(
+        "--include-excluded", action="store_true", help="除外リストの報告も含める"
+    )
+    args = parser.parse_args(argv)
+
+    reader = s3_reader(args.bucket) if args.bucket else dir_reader(args.dir)
+    if args.command == "events":
+        _print_tsv(
+            ["eventId", "name", "end", "reportCount", "rowCount"],
+            (
+                [event_id, e["name"], e["period"].get("end", ""), e["reportCount"], e["rowCount"]]
+                for event_id, e in reader.index().items()
+            ),
+        )
+        return 0
+
+    rows = item_drop_rates(reader, args.item, args.event, args.include_excluded)
+    if not rows:
+        print(f"No archived reports for {args.item}", file=sys.stderr)
+        return 1
+    _print_tsv(
+        ["eventId", "questId", "questName", "reportCount", "totalDrops", "totalRuns", "dropRate"],
+        (
+            [
+                r["eventId"],
+                r["questId"],
+                r["questName"],
+                r["reportCount"],
+                r["totalDrops"],
+                r["totalRuns"],
+                f"{r['dropRate']:.4f}",
+            ]
+            for r in rows
+        ),
+    )
+    total_drops = sum(r["totalDrops"] for r in rows)
+    total_runs = sum(r["totalRuns"] for r in rows)
+    overall = total_drops / total_runs if total_runs > 0 else 0.0
+    print(f"# total\t{total_drops}\t{total_runs}\t{overall:.4f}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
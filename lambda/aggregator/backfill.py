@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""過去のイベントの再集計 (バックフィル)。
+
+変換ルールを変更した場合などに、集計 Lambda の process_quest() を任意のイベント・クエストに対して
+まとめて実行し直し、中間 JSON・stats JSON・イベント集計を作り直す。
+クエスト単位でプロセスプールに分配し、最後にスループットを出力する。
+
+- 出力先 (--storage): S3 バケット (s3://<bucket>)、ローカルディレクトリ (dir:<path>)、
+  メモリ (memory: 結果を保存しない。計測用)。events.json・除外リストも出力先から読む
+  (--events で events.json をローカルのファイルから読むこともできる)
+- 取得元: 既定は Harvest API。--snapshots を指定すると、Harvest のレスポンスを
+  <dir>/<ソース ID>.json に保存したスナップショットから読む
+- 既定では前回の取得メタデータを使わず全報告を変換し直す (--incremental で差分のみ)。
+  内容が前回と同一の出力は書き込まない
+
+    python backfill.py --storage s3://<bucket> [--event ID ...] [--quest ID ...] [--workers N]
+    python backfill.py --storage dir:./data --snapshots ./harvest --archive
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+
+# handler の既定の出力先 (Lambda の S3 バケット) は使わず、出力先は Storage で渡す
+os.environ.setdefault("S3_BUCKET_NAME", "backfill")
+# 共通モジュール (Lambda ではレイヤーで提供される)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "shared"))
+
+import handler
+from archive import ARCHIVE_INDEX_KEY, index_entry
+from fanout import (
+    STATUS_FAILED,
+    STATUS_SKIPPED,
+    STATUS_WRITTEN,
+    quest_payload,
+    quest_result,
+)
+from jsonstream import CountingReader
+from storage import open_storage
+
+logger = logging.getLogger(__name__)
+
+# (eventId, クエスト, イベントアイテム)
+Task = tuple[str, dict, set[str]]
+
+
+def read_snapshot(snapshots: str | Path, source_id: str) -> handler.SourceFetch:
+    """スナップショットのディレクトリからソース1件の報告を読み込む。"""
+    path = Path(snapshots) / f"{source_id}.json"
+    start = time.perf_counter()
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        body = CountingReader(f)
+        reports = handler.read_harvest_reports(body, hasher)
+    return handler.SourceFetch(
+        source_id,
+        reports,
+        content_hash=hasher.hexdigest(),
+        elapsed=time.perf_counter() - start,
+        bytes_read=body.bytes_read,
+    )
+
+
+def select_tasks(
+    events_data: dict,
+    event_ids: Iterable[str] | None = None,
+    quest_ids: Iterable[str] | None = None,
+) -> list[Task]:
+    """events.json から対象のクエストを選ぶ。指定がなければ全イベントの全クエスト。"""
+    event_ids = set(event_ids) if event_ids else None
+    quest_ids = set(quest_ids) if quest_ids else None
+    events = [
+        ev
+        for ev in events_data.get("events", [])
+        if event_ids is None or ev["eventId"] in event_ids
+    ]
+    return [
+        task
+        for task in handler.quest_tasks(events)
+        if quest_ids is None or task[1]["questId"] in quest_ids
+    ]
+
+
+def create_storage(spec: str) -> handler.Storage:
+    """出力先の指定 (s3://<bucket> / dir:<path> / memory) から handler の読み書き先を作る。"""
+    client, bucket = open_storage(spec)
+    return handler.Storage(client, bucket)
+
+
+# ワーカーの設定 (プロセスごとに configure() で設定する)
+_storage: handler.Storage | None = None
+_snapshots: str | None = None
+_incremental = False
+
+
+def configure(storage: handler.Storage, snapshots: str | None, incremental: bool) -> None:
+    """このプロセスで run_task() が使う出力先と取得元を設定する。"""
+    global _storage, _snapshots, _incremental
+    _storage, _snapshots, _incremental = storage, snapshots, incremental
+
+
+def _init_worker(storage: str, snapshots: str | None, incremental: bool) -> None:
+    logging.basicConfig(level=logging.WARNING, format="%(message)s")
+    configure(create_storage(storage), snapshots, incremental)
+
+
+def run_task(task: Task) -> dict:
+    """クエスト1件を再集計し、処理結果に報告数と処理時間を加えて返す。"""
+    event_id, quest, event_items = task
+    payload = quest_payload(event_id, quest, event_items)
+    quest_id = quest["questId"]
+    start = time.perf_counter()
+    records: list[dict] = []
+    try:
+        with handler.using_storage(_storage):
+            written = _run_task(event_id, quest, event_items, records)
+        result = quest_result(payload, STATUS_WRITTEN if written else STATUS_SKIPPED)
+    except Exception as e:
+        logger.exception("Failed to backfill quest %s", quest_id)
+        result = quest_result(payload, STATUS_FAILED, str(e))
+    values = records[-1] if records else {}
+    result["reports"] = int(values.get("reports", 0))
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def _run_task(event_id: str, quest: dict, event_items: set[str], records: list[dict]) -> bool:
+    quest_id = quest["questId"]
+    exclusions = handler.read_json(handler.exclusions_key(quest_id)) or []
+    fetch_meta = handler.read_json(handler.fetch_meta_key(event_id, quest_id))
+    if not _incremental and fetch_meta is not None:
+        # 全報告を変換し直す。出力記録 (差分ファイルの連番を含む) と報告の索引のハッシュだけは引き継ぐ
+        fetch_meta = {k: fetch_meta.get(k) for k in ("output", "reportShards")}
+    if _snapshots is not None:
+        fetched = [read_snapshot(_snapshots, sid) for sid in handler.quest_source_ids(quest)]
+    else:
+        source_metas = [handler.source_metas_for(quest, event_items, fetch_meta)]
+        _, fetched, error = next(handler.iter_fetched_quests([quest], source_metas))
+        if error is not None:
+            raise error
+    # クエストごとの計測値は標準出力ではなく records に集める
+    return handler.process_quest(
+        event_id,
+        quest,
+        event_items,
+        fetched,
+        fetch_meta,
+        exclusions,
+        storage=_storage,
+        emit=records.append,
+    )
+
+
+def iter_results(
+    tasks: list[Task],
+    storage: str,
+    snapshots: str | None = None,
+    workers: int = 1,
+    incremental: bool = False,
+) -> Iterator[dict]:
+    """クエストを再集計し、完了したクエストから順に結果を返す。
+
+    workers が 1 の場合は呼び出し元のプロセスで、それ以外はプロセスプールで処理する。
+    memory の出力先はプロセスごとに別になる。
+    """
+    if workers <= 1:
+        configure(create_storage(storage), snapshots, incremental)
+        for task in tasks:
+            yield run_task(task)
+        return
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        # ワーカーはスレッド (取得の並列化) を使うため、fork ではなく spawn で起動する
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(storage, snapshots, incremental),
+    ) as executor:
+        futures = [executor.submit(run_task, task) for task in tasks]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def rebuild_event_outputs(
+    storage: handler.Storage, events_data: dict, event_ids: Iterable[str], archive: bool = False
+) -> int:
+    """イベント集計・マニフェスト・レビューキューを作り直す。archive の場合はグレースピリオドを過ぎたイベントをアーカイブし直す。
+
+    アーカイブし直したイベント数を返す。
+    """
+    with handler.using_storage(storage):
+        return _rebuild_event_outputs(events_data, event_ids, archive)
+
+
+def _rebuild_event_outputs(events_data: dict, event_ids: Iterable[str], archive: bool) -> int:
+    event_ids = set(event_ids)
+    events = [ev for ev in events_data.get("events", []) if ev["eventId"] in event_ids]
+    for ev in events:
+        quests = ev.get("quests", [])
+        handler.write_event_rollup(ev["eventId"], handler.read_event_stats(ev["eventId"], quests))
+        handler.write_event_manifest(ev["eventId"], quests)
+        handler.write_event_anomalies(ev["eventId"], quests)
+    if not archive:
+        return 0
+
+    now = datetime.now(handler.JST)
+    finished = [
+        ev for ev in handler.find_finished_events(events_data, now) if ev["eventId"] in event_ids
+    ]
+    if not finished:
+        return 0
+    index = handler.read_json(ARCHIVE_INDEX_KEY) or {"events": {}}
+    for ev in finished:
+        meta = handler.archive_event(ev)
+        index["events"][ev["eventId"]] = index_entry(meta, now.isoformat())
+        index.get("failed", {}).pop(ev["eventId"], None)
+    handler.write_json(ARCHIVE_INDEX_KEY, index)
+    return len(finished)
+
+
+def summarize(results: list[dict], seconds: float, workers: int) -> dict:
+    """クエストごとの結果からスループットのサマリを作る。"""
+    reports = sum(r["reports"] for r in results)
+    return {
+        "quests": len(results),
+        "written": sum(1 for r in results if r["status"] == STATUS_WRITTEN),
+        "skipped": sum(1 for r in results if r["status"] == STATUS_SKIPPED),
+        "failed": sum(1 for r in results if r["status"] == STATUS_FAILED),
+        "reports": reports,
+        "seconds": round(seconds, 3),
+        "workers": workers,
+        "reportsPerSecond": round(reports / seconds, 1) if seconds > 0 else None,
+        "questsPerSecond": round(len(results) / seconds, 3) if seconds > 0 else None,
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="過去のイベントの再集計")
+    parser.add_argument(
+        "--storage", required=True, help="出力先 (s3://<bucket> / dir:<path> / memory)"
+    )
+    parser.add_argument("--events", help="events.json のローカルファイル (省略時は出力先から読む)")
+    parser.add_argument(
+        "--snapshots", help="Harvest のスナップショット (<ソース ID>.json) のディレクトリ"
+    )
+    parser.add_argument("--event", action="append", help="対象のイベント ID (複数指定可)")
+    parser.add_argument("--quest", action="append", help="対象のクエスト ID (複数指定可)")
+    parser.add_argument(
+        "--workers", "-j", type=int, default=os.cpu_count() or 1, help="ワーカープロセス数"
+    )
+    parser.add_argument(
+        "--incremental", action="store_true", help="前回の取得メタデータを使い差分だけを処理する"
+    )
+    parser.add_argument(
+        "--archive", action="store_true", help="グレースピリオドを過ぎたイベントをアーカイブし直す"
+    )
+    parser.add_argument("--output", "-o", help="クエストごとの結果とサマリを JSON で保存する")
+    args = parser.parse_args(argv)
+
+    storage = create_storage(args.storage)
+    if args.events:
+        events_data = json.loads(Path(args.events).read_text(encoding="utf-8"))
+    else:
+        with handler.using_storage(storage):
+            events_data = handler.read_json(handler.EVENTS_KEY) or {}
+    tasks = select_tasks(events_data, args.event, args.quest)
+    if not tasks:
+        print("No quests selected", file=sys.stderr)
+        return 1
+
+    workers = max(1, min(args.workers, len(tasks)))
+    print(f"Backfilling {len(tasks)} quest(s) with {workers} worker(s)", file=sys.stderr)
+    start = time.perf_counter()
+    results = []
+    print("eventId\tquestId\tstatus\treports\tseconds")
+    for result in iter_results(tasks, args.storage, args.snapshots, workers, args.incremental):
+        results.append(result)
+        print(
+            f"{result['eventId']}\t{result['questId']}\t{result['status']}"
+            f"\t{result['reports']}\t{result['seconds']:.2f}",
+            flush=True,
+        )
+        if result["status"] == STATUS_FAILED:
+            print(f"# {result['questId']}: {result.get('error')}", file=sys.stderr)
+    seconds = time.perf_counter() - start
+
+    archived = 0
+    if args.storage != "memory":
+        archived = rebuild_event_outputs(
+            storage, events_data, {r["eventId"] for r in results}, args.archive
+        )
+    summary = {**summarize(results, seconds, workers), "eventsArchived": archived}
+    print(
+        f"# {summary['quests']} quest(s): {summary['written']} written,"
+        f" {summary['skipped']} skipped, {summary['failed']} failed",
+        file=sys.stderr,
+    )
+    print(
+        f"# {summary['reports']:,} reports in {seconds:.1f} s"
+        f" ({summary['reportsPerSecond'] or 0:,.0f} reports/s,"
+        f" {summary['questsPerSecond'] or 0:.2f} quests/s)",
+        file=sys.stderr,
+    )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"summary": summary, "results": results}, f, ensure_ascii=False, indent=2)
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING, format="%(message)s")
+    sys.exit(main())
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""集計 Lambda のベンチマーク。
+
+合成した Harvest データ (synthetic.py) を使い、次の処理のスループットを計測する。
+S3 はインメモリ実装、Harvest はローカル HTTP サーバー (stubs.py) で代替する。
+
+- transform: detect_event_items + transform_report
+- transform_batch: detect_event_items + transform_reports (バッチ変換)
+- process_quest: クエスト1件の変換・出力 (初回 / ソース変更なし)
+- lambda_handler: 取得を含むエントリーポイント全体 (初回 / ソース変更なし)
+
+各ベンチマークは別プロセスで実行し、報告数/秒・ピーク RSS・tracemalloc による
+確保メモリのピークを計測する。結果は --output に JSON で保存する。
+
+    python bench.py [--reports 50000] [--quests 4] [--sources 2] [--output bench.json] [NAME ...]
+"""
+
+import argparse
+import io
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import time
+import tracemalloc
+from collections.abc import Callable
+from dataclasses import asdict
+from typing import Any
+
+from storage import MemoryS3
+from stubs import HarvestStub, install_aws_stubs
+
+install_aws_stubs()
+os.environ.setdefault("S3_BUCKET_NAME", "bench")
+# 共通モジュール (Lambda ではレイヤーで提供される)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "shared"))
+
+import handler
+from synthetic import SyntheticConfig, SyntheticHarvest, make_events
+
+logger = logging.getLogger(__name__)
+
+# (セットアップ済みの計測対象, 1回あたりの報告数) を返す関数
+Setup = Callable[[SyntheticConfig, argparse.Namespace], tuple[Callable[[], Any], int]]
+
+
+def _all_reports(sources: dict[str, list[dict]]) -> list[dict]:
+    return [r for reports in sources.values() for r in reports]
+
+
+def setup_transform(config: SyntheticConfig, args: argparse.Namespace):
+    reports = _all_reports(SyntheticHarvest(config).quest_sources("Q1"))
+
+    def run():
+        event_items = handler.detect_event_items(reports)
+        for report in reports:
+            handler.transform_report(report, event_items)
+
+    return run, len(reports)
+
+
+def setup_transform_batch(config: SyntheticConfig, args: argparse.Namespace):
+    reports = _all_reports(SyntheticHarvest(config).quest_sources("Q1"))
+
+    def run():
+        event_items = handler.detect_event_items(reports)
+        list(handler.transform_reports(reports, event_items))
+
+    return run, len(reports)
+
+
+def _quest(sources: dict[str, list[dict]]) -> dict:
+    quest_id, *additional = sources
+    return {
+        "questId": quest_id,
+        "name": quest_id,
+        "level": "90+",
+        "ap": 40,
+        "additionalSourceQuestIds": additional,
+    }
+
+
+def _parsed_sources(sources: dict[str, list[dict]]) -> dict[str, list[dict]]:
+    # 取得時と同じく読み込み時に不要なフィールドを落とした報告を使う
+    return {
+        sid: handler.read_harvest_reports(io.BytesIO(json.dumps(reports).encode("utf-8")))
+        for sid, reports in sources.items()
+    }
+
+
+def setup_process_quest(config: SyntheticConfig, args: argparse.Namespace):
+    sources = _parsed_sources(SyntheticHarvest(config).quest_sources("Q1"))
+    quest = _quest(sources)
+
+    def run():
+        storage = handler.Storage(MemoryS3(), "bench")
+        fetched = [handler.SourceFetch(sid, reports) for sid, reports in sources.items()]
+        handler.process_quest("bench", quest, set(), fetched, storage=storage)
+
+    return run, config.reports
+
+
+def setup_process_quest_unchanged(config: SyntheticConfig, args: argparse.Namespace):
+    sources = _parsed_sources(SyntheticHarvest(config).quest_sources("Q1"))
+    quest = _quest(sources)
+    s3 = MemoryS3()
+    storage = handler.Storage(s3, "bench")
+    fetched = [handler.SourceFetch(sid, reports, etag=sid) for sid, reports in sources.items()]
+    handler.process_quest("bench", quest, set(), fetched, storage=storage)
+    meta = s3.get_json(handler.fetch_meta_key("bench", "Q1"))
+
+    def run():
+        unchanged = [handler.SourceFetch(sid, None, etag=sid) for sid in sources]
+        handler.process_quest("bench", quest, set(), unchanged, meta, storage=storage)
+
+    return run, config.reports
+
+
+def _handler_fixture(config: SyntheticConfig, args: argparse.Namespace):
+    harvest = SyntheticHarvest(config)
+    all_sources: dict[str, list[dict]] = {}
+    quest_sources: dict[str, list[str]] = {}
+    for i in range(args.quests):
+        sources = harvest.quest_sources(f"Q{i + 1}")
+        all_sources.update(sources)
+        quest_sources[f"Q{i + 1}"] = list(sources)
+    return HarvestStub(all_sources), make_events(quest_sources)
+
+
+def setup_lambda_handler(config: SyntheticConfig, args: argparse.Namespace):
+    stub, events = _handler_fixture(config, args)
+    stub.__enter__()
+    handler.HARVEST_QUEST_URL = stub.url_template
+
+    def run():
+        # コールドスタート相当にするため、前回の実行で保持した S3 オブジェクトも破棄する
+        handler.s3 = s3 = MemoryS3()
+        handler.s3_cache.clear()
+        s3.put_json(handler.EVENTS_KEY, events)
+        handler.lambda_handler({}, None)
+
+    return run, config.reports * args.quests
+
+
+def setup_lambda_handler_unchanged(config: SyntheticConfig, args: argparse.Namespace):
+    stub, events = _handler_fixture(config, args)
+    stub.__enter__()
+    handler.HARVEST_QUEST_URL = stub.url_template
+    handler.s3 = s3 = MemoryS3()
+    s3.put_json(handler.EVENTS_KEY, events)
+    handler.lambda_handler({}, None)
+
+    def run():
+        # 直前に更新したクエストは更新時期が来ていないため、スケジュールに関係なく処理させる
+        handler.lambda_handler({"force": True}, None)
+
+    return run, config.reports * args.quests
+
+
+BENCHMARKS: dict[str, Setup] = {
+    "transform": setup_transform,
+    "transform_batch": setup_transform_batch,
+    "process_quest": setup_process_quest,
+    "process_quest_unchanged": setup_process_quest_unchanged,
+    "lambda_handler": setup_lambda_handler,
+    "lambda_handler_unchanged": setup_lambda_handler_unchanged,
+}
+
+
+def measure(run: Callable[[], Any], reports: int, repeat: int) -> dict:
+    """run を repeat 回計時し、最後に tracemalloc を有効にして1回実行する。"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    run()
+    _current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    best = min(times)
+    return {
+        "reports": reports,
+        "repeat": repeat,
+        "bestSeconds": best,
+        "meanSeconds": sum(times) / len(times),
+        "reportsPerSecond": reports / best if best > 0 else None,
+        "tracemallocPeakBytes": peak,
+        # Linux の ru_maxrss は KiB 単位
+        "peakRssBytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+    }
+
+
+def _run_child(name: str, config: SyntheticConfig, args: argparse.Namespace, conn: Any) -> None:
+    try:
+        run, reports = BENCHMARKS[name](config, args)
+        conn.send(measure(run, reports, args.repeat))
+    except Exception as e:
+        logger.exception("Benchmark %s failed", name)
+        conn.send({"error": str(e)})
+    finally:
+        conn.close()
+
+
+def run_benchmark(name: str, config: SyntheticConfig, args: argparse.Namespace) -> dict:
+    """ベンチマーク1件を別プロセスで実行する (ピーク RSS をベンチマークごとに分けるため)。"""
+    ctx = multiprocessing.get_context("fork")
+    parent, child = ctx.Pipe(duplex=False)
+    proc = ctx.Process(target=_run_child, args=(name, config, args, child))
+    proc.start()
+    child.close()
+    result = parent.recv()
+    proc.join()
+    return result
+
+
+def main(args: argparse.Namespace):
+    config = SyntheticConfig(
+        reports=args.reports,
+        sources=args.sources,
+        raw_rate=args.raw_rate,
+        nan_rate=args.nan_rate,
+        duplicate_rate=args.duplicate_rate,
+        seed=args.seed,
+    )
+    names = args.names or list(BENCHMARKS)
+    results = {}
+    for name in names:
+        result = run_benchmark(name, config, args)
+        results[name] = result
+        if "error" in result:
+            print(f"{name:26s} ERROR {result['error']}")
+            continue
+        print(
+            f"{name:26s} {result['reportsPerSecond']:>12,.0f} reports/s"
+            f"  best {result['bestSeconds'] * 1000:8.1f} ms"
+            f"  peak RSS {result['peakRssBytes'] / 2**20:7.1f} MiB"
+            f"  traced peak {result['tracemallocPeakBytes'] / 2**20:7.1f} MiB"
+        )
+
+    output = {
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpuCount": os.cpu_count(),
+        },
+        "config": {**asdict(config), "quests": args.quests, "repeat": args.repeat},
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(output, f, ensure_ascii=False, indent=2)
+    return output
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("names", nargs="*", metavar="NAME", help=", ".join(BENCHMARKS))
+    parser.add_argument("--reports", "-n", type=int, default=50000, help="クエストあたりの報告数")
+    parser.add_argument("--quests", "-q", type=int, default=4)
+    parser.add_argument("--sources", "-s", type=int, default=2, help="クエストあたりのソース数")
+    parser.add_argument("--raw-rate", type=float, default=0.1)
+    parser.add_argument("--nan-rate", type=float, default=0.02)
+    parser.add_argument("--duplicate-rate", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", "-r", type=int, default=3)
+    parser.add_argument("--output", "-o")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+    return args
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING, format="%(message)s")
+    args = parse_args()
+    main(args)
@@ -0,0 +1,102 @@
+"""中間 JSON のコンパクト形式のエンコード・デコード。
+
+レガシー形式 (`<eventId>/<questId>.json`) と同じ内容を、アイテム名の辞書と
+報告単位の列指向配列で表現する。S3 へは gzip 圧縮済みで書き込む。
+"""
+
+import gzip
+import json
+
+COMPACT_FORMAT = "eventstats-compact"
+COMPACT_VERSION = 1
+
+# 報告のアイテム以外のフィールド (出力順)
+REPORT_COLUMNS = ("id", "reporter", "reporterName", "runcount", "timestamp", "note", "warnings")
+
+
+def encode_quest_output(output: dict) -> dict:
+    """レガシー形式の中間 JSON をコンパクト形式に変換する。
+
+    アイテム名は初出順に itemNames へ1度だけ格納し、items[j][i] に
+    i 番目の報告のアイテム itemNames[j] の値を置く。報告にキーがない場合は null、
+    キーがあり値が null (NaN) の場合は nullItems[j] にその報告のインデックスを記録する。
+    """
+    reports = output.get("reports", [])
+
+    item_index: dict[str, int] = {}
+    for report in reports:
+        for key in report["items"]:
+            if key not in item_index:
+                item_index[key] = len(item_index)
+
+    items: list[list[int | float | None]] = [[None] * len(reports) for _ in item_index]
+    null_items: list[list[int]] = [[] for _ in item_index]
+    for i, report in enumerate(reports):
+        for key, value in report["items"].items():
+            j = item_index[key]
+            if value is None:
+                null_items[j].append(i)
+            else:
+                items[j][i] = value
+
+    compact = {
+        "format": COMPACT_FORMAT,
+        "version": COMPACT_VERSION,
+        "quest": output["quest"],
+        "lastUpdated": output["lastUpdated"],
+        "reportCount": len(reports),
+        "columns": {col: [r[col] for r in reports] for col in REPORT_COLUMNS},
+        "itemNames": list(item_index),
+        "items": items,
+        "nullItems": null_items,
+    }
+    if "cursor" in output:
+        compact["cursor"] = output["cursor"]
+    return compact
+
+
+def decode_quest_output(compact: dict) -> dict:
+    """コンパクト形式をレガシー形式の中間 JSON に戻す。"""
+    if compact.get("format") != COMPACT_FORMAT:
+        raise ValueError(f"Unknown format: {compact.get('format')!r}")
+    if compact.get("version") != COMPACT_VERSION:
+        raise ValueError(f"Unsupported compact version: {compact.get('version')!r}")
+
+    count = compact["reportCount"]
+    report_items: list[dict[str, int | float | None]] = [{} for _ in range(count)]
+    for name, values, nulls in zip(compact["itemNames"], compact["items"], compact["nullItems"]):
+        null_set = set(nulls)
+        for i, value in enumerate(values):
+            if value is not None or i in null_set:
+                report_items[i][name] = value
+
+    columns = compact["columns"]
+    reports = []
+    for i in range(count):
+        report = {col: columns[col][i] for col in REPORT_COLUMNS if col != "warnings"}
+        report["items"] = report_items[i]
+        report["warnings"] = columns["warnings"][i]
+        reports.append(report)
+
+    output = {
+        "quest": compact["quest"],
+        "lastUpdated": compact["lastUpdated"],
+        "reports": reports,
+    }
+    if "cursor" in compact:
+        output["cursor"] = compact["cursor"]
+    return output
+
+
+def dumps_gzip(data: dict | list) -> bytes:
+    """data を区切り文字を詰めた JSON にシリアライズし、gzip 圧縮して返す。
+
+    同一内容から同一バイト列が得られるよう、gzip ヘッダの mtime は 0 に固定する。
+    """
+    body = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return gzip.compress(body, mtime=0)
+
+
+def loads_gzip(body: bytes) -> dict | list:
+    """dumps_gzip で書き込んだバイト列を読み込む。"""
+    return json.loads(gzip.decompress(body).decode("utf-8"))
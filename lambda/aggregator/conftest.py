@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# 共通モジュール (Lambda ではレイヤーで提供される) をインポートできるようにする
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "shared"))
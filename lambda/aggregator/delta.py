@@ -0,0 +1,128 @@
+"""中間 JSON の差分ファイル (報告の追加・変更・削除) の作成・適用と、差分を使った読み込み。
+
+集計 Lambda は中間 JSON (スナップショット) を書き換えるたびに、前回の中間 JSON からの差分を
+連番付きの差分ファイルとして書き込み、中間 JSON の cursor に連番を記録する。
+期間中に繰り返し取得するクライアントは、手元の状態から差分だけを取得して最新の状態にできる。
+
+- 差分ファイル: deltas/<eventId>/<questId>/<seq (8桁)>.json
+  (quest・lastUpdated・contentHash は適用後の中間 JSON のもの)
+- cursor: {"seq": 最新の連番, "base": 差分を辿れる起点の連番}。seq が base より大きい場合、
+  base + 1 〜 seq の差分ファイルが揃っている
+- 差分の連鎖が長くなった、または差分がスナップショットに比べて大きい場合は、
+  差分を書かずに base = seq として連鎖を打ち切る (スナップショットへの集約)
+
+報告は ID で突き合わせるため、ID のない報告・重複した ID を含む場合は差分を作らない。
+"""
+
+from collections.abc import Callable
+from typing import Any
+
+DELTA_PREFIX = "deltas"
+
+
+def delta_key(event_id: str, quest_id: str, seq: int) -> str:
+    """差分ファイルの S3 キー"""
+    return f"{DELTA_PREFIX}/{event_id}/{quest_id}/{seq:08d}.json"
+
+
+def _ids(reports: list[dict]) -> list[str] | None:
+    ids = [r.get("id") for r in reports]
+    if not all(ids) or len(set(ids)) != len(ids):
+        return None
+    return ids
+
+
+def _merged_ids(prev_ids: list[str], delta: dict) -> list[str]:
+    # 削除されていない報告は前回の順序のまま、新しい報告は末尾に追加する
+    removed = set(delta["removed"])
+    known = set(prev_ids)
+    return [rid for rid in prev_ids if rid not in removed] + [
+        r["id"] for r in delta["upserts"] if r["id"] not in known
+    ]
+
+
+def diff_reports(prev_reports: list[dict], reports: list[dict]) -> dict | None:
+    """前回の報告リストから今回の報告リストへの差分を返す。
+
+    - upserts: 追加された報告と、内容が変わった報告
+    - removed: 削除された報告の ID
+    - order: 報告 ID の並び。前回の順序に新しい報告を末尾へ追加した並びと異なる場合だけ含める
+
+    ID のない報告・重複した ID を含む場合は None を返す。
+    """
+    prev_ids = _ids(prev_reports)
+    ids = _ids(reports)
+    if prev_ids is None or ids is None:
+        return None
+    prev_by_id = dict(zip(prev_ids, prev_reports))
+    current = set(ids)
+    delta: dict[str, Any] = {
+        "upserts": [r for r in reports if (prev := prev_by_id.get(r["id"])) is not r and prev != r],
+        "removed": [rid for rid in prev_ids if rid not in current],
+    }
+    if _merged_ids(prev_ids, delta) != ids:
+        delta["order"] = ids
+    return delta
+
+
+def apply_delta(reports: list[dict], delta: dict) -> list[dict]:
+    """報告リストに差分を適用した新しい報告リストを返す。"""
+    by_id = {r["id"]: r for r in reports}
+    for rid in delta["removed"]:
+        by_id.pop(rid, None)
+    for report in delta["upserts"]:
+        by_id[report["id"]] = report
+    order = delta.get("order") or _merged_ids([r["id"] for r in reports], delta)
+    return [by_id[rid] for rid in order]
+
+
+def advance_cursor(
+    cursor: dict | None, delta: dict | None, report_count: int, max_chain: int
+) -> dict:
+    """中間 JSON を書き換える時の新しい cursor を返す。
+
+    次の場合は base を新しい seq にして連鎖を打ち切る (差分ファイルは書かない)。
+    それ以外は base を引き継ぎ、呼び出し側が seq の差分ファイルを書き込む。
+
+    - 前回の cursor がない、または差分を作れなかった
+    - 連鎖の長さ (seq - base) が max_chain を超える
+    - 差分の報告数が報告数の半分を超える (スナップショットを取得し直す方が小さい)
+    """
+    seq = (cursor["seq"] if cursor else 0) + 1
+    if (
+        cursor is None
+        or delta is None
+        or seq - cursor["base"] > max_chain
+        or len(delta["upserts"]) * 2 > report_count
+    ):
+        return {"seq": seq, "base": seq}
+    return {"seq": seq, "base": cursor["base"]}
+
+
+def sync_quest_output(
+    read_json: Callable[[str], Any],
+    output_key: str,
+    delta_key_of: Callable[[int], str],
+    latest: dict | None,
+    state: dict | None = None,
+) -> dict | None:
+    """手元の中間 JSON (state) を差分で最新の cursor (latest) まで進めて返す。
+
+    latest はマニフェストの項目等から得た最新の cursor。不明 (None) の場合はスナップショットを読む。
+    state がない、state の連番が latest の base 未満 (連鎖が打ち切られた)・latest の seq を超える、
+    または差分ファイルが欠けている場合はスナップショット (output_key) を読み込む。
+    read_json はキーを受け取り JSON (存在しなければ None) を返す関数。
+    """
+    held = (state or {}).get("cursor")
+    if latest is None or held is None or not latest["base"] <= held["seq"] <= latest["seq"]:
+        return read_json(output_key)
+    synced = dict(state)
+    for seq in range(held["seq"] + 1, latest["seq"] + 1):
+        delta = read_json(delta_key_of(seq))
+        if delta is None:
+            return read_json(output_key)
+        synced["quest"] = delta["quest"]
+        synced["lastUpdated"] = delta["lastUpdated"]
+        synced["reports"] = apply_delta(synced["reports"], delta)
+    synced["cursor"] = dict(latest)
+    return synced
@@ -0,0 +1,138 @@
+"""集計処理のコーディネーター / ワーカー分割。
+
+コーディネーターはアクティブなクエストごとにペイロードを作り、ディスパッチャーで
+ワーカーに配る。ワーカーはクエスト1件だけを処理し、結果を1件の辞書で返す。
+ディスパッチャーはローカル実行・テスト用のプロセス内実行と、
+Lambda の同期呼び出しによるファンアウトの2種類がある。
+Lambda のファンアウトでは、コーディネーターはワーカーとは別の関数として
+ワーカーの timeout より長い timeout で動かす (terraform/lambda.tf)。
+"""
+
+import json
+import logging
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Any
+
+logger = logging.getLogger()
+
+# ワーカーの処理結果 (status)
+STATUS_WRITTEN = "written"
+STATUS_SKIPPED = "skipped"
+STATUS_FAILED = "failed"
+
+
+def quest_payload(event_id: str, quest: dict, event_items: set[str]) -> dict:
+    """ワーカーに渡すクエスト1件分のペイロードを作る。"""
+    return {"eventId": event_id, "quest": quest, "eventItems": sorted(event_items)}
+
+
+def quest_result(payload: dict, status: str, error: str | None = None) -> dict:
+    """ワーカーの処理結果を作る。"""
+    result = {
+        "eventId": payload["eventId"],
+        "questId": payload["quest"]["questId"],
+        "status": status,
+    }
+    if error is not None:
+        result["error"] = error
+    return result
+
+
+@dataclass
+class RunSummary:
+    """1回の集計実行のクエストごとの処理結果。
+
+    deferred は更新時期が来ていないため処理しなかったクエスト数。
+    """
+
+    results: list[dict] = field(default_factory=list)
+    deferred: int = 0
+
+    def add(self, result: dict) -> None:
+        self.results.append(result)
+
+    def count(self, status: str) -> int:
+        return sum(1 for r in self.results if r["status"] == status)
+
+    @property
+    def failed(self) -> list[dict]:
+        return [r for r in self.results if r["status"] == STATUS_FAILED]
+
+    def to_dict(self) -> dict[str, int]:
+        """lambda_handler の戻り値形式 (件数のみ) に変換する。"""
+        written = self.count(STATUS_WRITTEN)
+        skipped = self.count(STATUS_SKIPPED)
+        return {
+            "processed": written + skipped,
+            "written": written,
+            "skipped": skipped,
+            "failed": self.count(STATUS_FAILED),
+        }
+
+
+class InProcessDispatcher:
+    """ワーカー関数を同じプロセス内のスレッドで呼び出すディスパッチャー (ローカル実行・テスト用)。"""
+
+    def __init__(self, worker: Callable[[dict], dict], max_workers: int = 4):
+        self.worker = worker
+        self.max_workers = max_workers
+
+    def _invoke(self, payload: dict) -> dict:
+        return self.worker(payload)
+
+    def dispatch(self, payloads: list[dict]) -> Iterator[dict]:
+        """全ペイロードをワーカーに配り、完了順に結果を返す。
+
+        ワーカーの呼び出し自体が失敗した場合もそのクエストの失敗結果として返す。
+        """
+        if not payloads:
+            return
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self._invoke, p): p for p in payloads}
+            for future in as_completed(futures):
+                payload = futures[future]
+                try:
+                    yield future.result()
+                except Exception as e:
+                    logger.exception("Worker failed for quest %s", payload["quest"]["questId"])
+                    yield quest_result(payload, STATUS_FAILED, str(e))
+
+
+class LambdaDispatcher(InProcessDispatcher):
+    """ワーカー Lambda を同期呼び出し (RequestResponse) するディスパッチャー。
+
+    client にはワーカーの timeout より長い読み取りタイムアウトを持ち、再試行しない
+    Lambda クライアント (handler.create_lambda_client) を渡す。
+    time_left (コーディネーターの残り時間 (秒) を返す関数) を指定した場合、
+    残り時間が min_time 未満になったらワーカーを呼び出さず、そのクエストを失敗として返す
+    (応答を待ち切れずにコーディネーターがタイムアウトしないようにする。次回の実行で処理される)。
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        function_name: str,
+        max_workers: int = 8,
+        time_left: Callable[[], float] | None = None,
+        min_time: float = 0,
+    ):
+        super().__init__(self._invoke_lambda, max_workers)
+        self.client = client
+        self.function_name = function_name
+        self.time_left = time_left
+        self.min_time = min_time
+
+    def _invoke_lambda(self, payload: dict) -> dict:
+        if self.time_left is not None and self.time_left() < self.min_time:
+            return quest_result(payload, STATUS_FAILED, "coordinator time limit reached")
+        resp = self.client.invoke(
+            FunctionName=self.function_name,
+            InvocationType="RequestResponse",
+            Payload=json.dumps(payload, ensure_ascii=False).encode("utf-8"),
+        )
+        body = json.loads(resp["Payload"].read().decode("utf-8"))
+        if resp.get("FunctionError"):
+            return quest_result(payload, STATUS_FAILED, body.get("errorMessage", "worker error"))
+        return body
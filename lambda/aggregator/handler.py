@@ -1,45 +1,298 @@
+import hashlib
+import http.client
 import json
 import logging
 import os
 import re
+import time
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta, timezone
-from typing import Any
-from urllib.request import urlopen
+from functools import lru_cache
+from typing import IO, Any, NamedTuple
 
-import boto3
-from botocore.exceptions import ClientError
+import metrics
+from anomalies import build_event_queue, build_quest_queue
+from archive import (
+    ARCHIVE_INDEX_KEY,
+    EventArchiveBuilder,
+    archive_column_key,
+    archive_meta_key,
+    index_entry,
+)
+from aws_clients import LazyClient, error_code, prewarm
+from compact import dumps_gzip, encode_quest_output
+from delta import advance_cursor, delta_key, diff_reports
+from fanout import (
+    STATUS_FAILED,
+    STATUS_SKIPPED,
+    STATUS_WRITTEN,
+    InProcessDispatcher,
+    LambdaDispatcher,
+    RunSummary,
+    quest_payload,
+    quest_result,
+)
+from harvest_client import CircuitOpenError, HarvestClient, HarvestHTTPError
+from jsonstream import CountingReader, iter_json_array, spool_json
+from rollup import build_event_rollup
+from s3_cache import S3JsonCache
+from schedule import ScheduleConfig, is_due, refresh_interval, update_state
+from stats import build_report_shards, compute_quest_stats, report_shard_key
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-s3 = boto3.client("s3")
+# boto3 の読み込みとクライアントの作成は最初に使う時まで遅らせる
+s3 = LazyClient("s3")
 BUCKET = os.environ["S3_BUCKET_NAME"]
 EVENTS_KEY = "events.json"
+EXCLUSIONS_PREFIX = "exclusions/"
+EXCLUSIONS_INDEX_KEY = "exclusions/_index.json"
 HARVEST_QUEST_URL = "https://fgojunks.max747.org/harvest/contents/quest/{quest_id}.json"
 JST = timezone(timedelta(hours=9))
 
+# Harvest 取得の並列度。全体のワーカー数と、同一ホストへの同時接続数の上限
+FETCH_MAX_WORKERS = int(os.environ.get("FETCH_MAX_WORKERS", "8"))
+FETCH_MAX_PER_HOST = int(os.environ.get("FETCH_MAX_PER_HOST", "4"))
+FETCH_TIMEOUT = float(os.environ.get("FETCH_TIMEOUT", "30"))
+FETCH_CONNECT_TIMEOUT = float(os.environ.get("FETCH_CONNECT_TIMEOUT", "5"))
+# 接続エラー・429・5xx の再試行回数と、サーキットブレーカーが開く連続失敗回数
+FETCH_MAX_RETRIES = int(os.environ.get("FETCH_MAX_RETRIES", "3"))
+FETCH_FAILURE_THRESHOLD = int(os.environ.get("FETCH_FAILURE_THRESHOLD", "10"))
+
+# レガシー形式と並べてコンパクト形式 (<eventId>/<questId>.compact.json) を出力するか
+WRITE_COMPACT_OUTPUT = os.environ.get("WRITE_COMPACT_OUTPUT", "1") == "1"
+
+# 中間 JSON を書き換えるたびに前回からの差分ファイル (deltas/...) を出力するか
+WRITE_DELTAS = os.environ.get("WRITE_DELTAS", "1") == "1"
+# 差分の連鎖の長さの上限。超えたら差分を書かずに連鎖を打ち切る (スナップショットへの集約)
+DELTA_MAX_CHAIN = int(os.environ.get("DELTA_MAX_CHAIN", "48"))
+
+# "1" の場合、クエストごとにワーカー Lambda を呼び出して並列処理する (コーディネーターモード)。
+# ワーカーは WORKER_FUNCTION_NAME (未指定なら自分自身) を同じハンドラで呼び出す。
+# 応答を待つコーディネーターはワーカーより長い timeout の別関数にする (terraform/lambda.tf)。
+FANOUT_ENABLED = os.environ.get("FANOUT_ENABLED", "0") == "1"
+WORKER_FUNCTION_NAME = os.environ.get("WORKER_FUNCTION_NAME") or os.environ.get(
+    "AWS_LAMBDA_FUNCTION_NAME", ""
+)
+FANOUT_MAX_CONCURRENCY = int(os.environ.get("FANOUT_MAX_CONCURRENCY", "8"))
+# ワーカー Lambda の timeout (秒)。同期呼び出しの応答待ちはこれに WORKER_TIMEOUT_MARGIN を足した時間で打ち切る
+WORKER_TIMEOUT = float(os.environ.get("WORKER_TIMEOUT", "120"))
+WORKER_TIMEOUT_MARGIN = 10
+# コーディネーターがワーカーの呼び出し後に集計 JSON の書き込み・アーカイブ・サマリの出力に残しておく時間 (秒)。
+# 残り時間が WORKER_TIMEOUT + WORKER_TIMEOUT_MARGIN + これ未満になったらワーカーを呼び出さない
+COORDINATOR_RESERVE = float(os.environ.get("COORDINATOR_RESERVE", "30"))
+
+
+def create_lambda_client() -> Any:
+    """ワーカーの呼び出しに使う Lambda クライアントを作成する。
+
+    同期呼び出しはワーカーが終わるまで応答しないため、読み取りタイムアウトをワーカーの timeout より長くする。
+    botocore の既定 (60 秒で打ち切って再試行) ではワーカーを二重に実行してしまうため、再試行もしない。
+    コーディネーターは残り時間がこの読み取りタイムアウト + COORDINATOR_RESERVE 以上ある場合だけ
+    ワーカーを呼び出すため、応答待ちはコーディネーターの timeout に収まる。
+    """
+    import boto3
+    from botocore.config import Config
+
+    config = Config(
+        read_timeout=WORKER_TIMEOUT + WORKER_TIMEOUT_MARGIN,
+        retries={"max_attempts": 0},
+    )
+    return boto3.client("lambda", config=config)
+
+
+# ワーカーの呼び出しに使う Lambda クライアント (コーディネーターモードでのみ作成する)
+lambda_client = LazyClient("lambda", create_lambda_client)
+
+# 報告の変換を transform_reports() でまとめて行うか (0 で報告ごとに transform_report() を使う)
+BATCH_TRANSFORM = os.environ.get("BATCH_TRANSFORM", "1") == "1"
+
+# 報告の増加ペースに応じて、更新時期が来たクエストだけを処理するか (0 で毎回全クエストを処理する)
+ADAPTIVE_SCHEDULE = os.environ.get("ADAPTIVE_SCHEDULE", "1") == "1"
+SCHEDULE_CONFIG = ScheduleConfig(
+    # EventBridge のスケジュールの間隔と合わせる
+    tick=timedelta(minutes=float(os.environ.get("SCHEDULE_TICK_MINUTES", "30"))),
+    min_interval=timedelta(minutes=float(os.environ.get("SCHEDULE_MIN_INTERVAL_MINUTES", "30"))),
+    max_interval=timedelta(minutes=float(os.environ.get("SCHEDULE_MAX_INTERVAL_MINUTES", "180"))),
+    target_reports=float(os.environ.get("SCHEDULE_TARGET_REPORTS", "100")),
+)
+
+# 1回の実行でアーカイブする終了済みイベントの上限 (0 でアーカイブしない)
+ARCHIVE_MAX_EVENTS = int(os.environ.get("ARCHIVE_MAX_EVENTS", "1"))
+
+# ウォームスタート時に前回の実行で読み込んだ events.json・除外リスト・取得メタデータを
+# ETag で再検証して再利用する。大きな中間 JSON は保持しない
+s3_cache = S3JsonCache(max_entries=int(os.environ.get("S3_CACHE_MAX_ENTRIES", "256")))
+
+# 中間 JSON の内容ハッシュを保存する S3 オブジェクトメタデータ名 (x-amz-meta-content-hash)
+CONTENT_HASH_METADATA = "content-hash"
+
+prewarm(s3)
+if FANOUT_ENABLED:
+    prewarm(lambda_client)
+
 # --- S3 ヘルパー ---
 
 
+@dataclass(frozen=True)
+class Storage:
+    """中間 JSON 等の読み書き先 (S3 互換クライアントとバケット名)。
+
+    cache は読み込んだ JSON のキャッシュで、読み書き先ごとに持つ。
+    既定の読み書き先 (Lambda の s3 / BUCKET / s3_cache) 以外に出力する場合は
+    process_quest() / run_batch() に渡すか、using_storage() で切り替える。
+    """
+
+    client: Any
+    bucket: str
+    cache: S3JsonCache = field(default_factory=S3JsonCache)
+
+
+_storage: ContextVar[Storage | None] = ContextVar("storage", default=None)
+
+
+def current_storage() -> Storage:
+    """現在の読み書き先を返す。using_storage() の外では Lambda の S3 バケット。"""
+    return _storage.get() or Storage(s3, BUCKET, s3_cache)
+
+
+@contextmanager
+def using_storage(storage: Storage | None) -> Iterator[Storage]:
+    """with ブロック内の S3 ヘルパーの読み書き先を storage にする (None なら変えない)。"""
+    if storage is None:
+        yield current_storage()
+        return
+    token = _storage.set(storage)
+    try:
+        yield storage
+    finally:
+        _storage.reset(token)
+
+
+def map_with_storage(
+    executor: ThreadPoolExecutor, fn: Callable[[Any], Any], items: Iterable[Any]
+) -> Iterator[Any]:
+    """executor.map と同じ。ワーカースレッドでも呼び出し元と同じ読み書き先を使う。"""
+    storage = current_storage()
+
+    def run(item: Any) -> Any:
+        with using_storage(storage):
+            return fn(item)
+
+    return executor.map(run, items)
+
+
 def read_json(key: str) -> dict | list | None:
-    """S3 から指定キーの JSON を読み込む。キーが存在しない場合は None を返す。"""
+    """S3 から指定キーの JSON を読み込む。キーが存在しない場合は None を返す。
+
+    前回の読み込み結果を読み書き先のキャッシュ (既定は s3_cache) に保持し、
+    変わっていなければ本文を転送せずに再利用する。
+    """
+    storage = current_storage()
     try:
-        obj = s3.get_object(Bucket=BUCKET, Key=key)
-        return json.loads(obj["Body"].read().decode("utf-8"))
-    except ClientError as e:
-        if e.response["Error"]["Code"] == "NoSuchKey":
+        data, _etag = storage.cache.get(storage.client, storage.bucket, key)
+        return data
+    except Exception as e:
+        if error_code(e) == "NoSuchKey":
             return None
         raise
 
 
-def write_json(key: str, data: dict | list) -> None:
-    """data を JSON シリアライズして S3 の指定キーに書き込む。"""
-    s3.put_object(
-        Bucket=BUCKET,
-        Key=key,
-        Body=json.dumps(data, ensure_ascii=False, indent=2),
-        ContentType="application/json",
-    )
+def write_json(key: str, data: dict | list, content_hash: str | None = None) -> int:
+    """data を JSON シリアライズして S3 の指定キーに書き込み、書き込んだバイト数を返す。
+
+    シリアライズ結果は文字列全体を作らずにスプールへ書き出してからアップロードする。
+    content_hash が指定された場合はオブジェクトメタデータに保存する。
+    """
+    extra = {}
+    if content_hash is not None:
+        extra["Metadata"] = {CONTENT_HASH_METADATA: content_hash}
+    with metrics.stage("serialize"):
+        body = spool_json(data, ensure_ascii=False, indent=2)
+    with body:
+        size = body.seek(0, os.SEEK_END)
+        body.seek(0)
+        storage = current_storage()
+        metrics.count("s3Puts")
+        storage.cache.invalidate(key)
+        with metrics.stage("s3Put"):
+            storage.client.put_object(
+                Bucket=storage.bucket,
+                Key=key,
+                Body=body,
+                ContentType="application/json",
+                **extra,
+            )
+    return size
+
+
+def json_size(data: dict | list) -> int:
+    """data を write_json で書き込んだ場合のバイト数を返す。"""
+    with spool_json(data, ensure_ascii=False, indent=2) as body:
+        return body.seek(0, os.SEEK_END)
+
+
+def write_gzip_json(key: str, data: dict | list, content_hash: str | None = None) -> None:
+    """data を区切り文字を詰めた JSON にシリアライズし、gzip 圧縮して S3 に書き込む。
+
+    Content-Encoding: gzip を付与するため、ブラウザは透過的に展開して受け取る。
+    """
+    with metrics.stage("serialize"):
+        body = dumps_gzip(data)
+    write_gzip_body(key, body, content_hash)
+
+
+def write_gzip_body(key: str, body: bytes | IO[bytes], content_hash: str | None = None) -> None:
+    """gzip 圧縮済みの JSON (バイト列またはファイルオブジェクト) を S3 に書き込む。"""
+    extra = {}
+    if content_hash is not None:
+        extra["Metadata"] = {CONTENT_HASH_METADATA: content_hash}
+    storage = current_storage()
+    metrics.count("s3Puts")
+    with metrics.stage("s3Put"):
+        storage.client.put_object(
+            Bucket=storage.bucket,
+            Key=key,
+            Body=body,
+            ContentType="application/json",
+            ContentEncoding="gzip",
+            **extra,
+        )
+
+
+def read_content_hash(key: str) -> str | None:
+    """S3 オブジェクトのメタデータに保存されたコンテンツハッシュを HEAD で取得する。
+
+    キーが存在しない、またはハッシュが保存されていない場合は None を返す。
+    """
+    try:
+        storage = current_storage()
+        obj = storage.client.head_object(Bucket=storage.bucket, Key=key)
+    except Exception as e:
+        if error_code(e) in ("404", "NoSuchKey"):
+            return None
+        raise
+    return obj.get("Metadata", {}).get(CONTENT_HASH_METADATA)
+
+
+def content_hash(data: dict | list) -> str:
+    """data を正規化した JSON にシリアライズし、その SHA-256 を返す。"""
+    canonical = json.dumps(data, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def report_hash(report: dict) -> str:
+    """Harvest の報告1件の内容のハッシュ (16桁) を返す。
+
+    同じ ID の報告が Harvest 上で編集されたかを判定するために取得メタデータに記録する。
+    """
+    canonical = json.dumps(report, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.blake2b(canonical.encode("utf-8"), digest_size=8).hexdigest()
 
 
 # --- アイテム分類 ---
@@ -57,6 +310,66 @@ def strip_modifier(key: str) -> str:
     return key
 
 
+# classify_item_key() のカテゴリ
+ITEM_BOX_COUNT = "box_count"  # 枠数報告アイテム: 例 ぐん肥(x3)
+ITEM_POINT_BONUS = "point_bonus"  # ポイントアイテム: 例 ポイント(+600)
+ITEM_PLAIN = "plain"  # 修飾子なしのアイテム
+
+# RE_BOX_COUNT (search) と RE_POINT_BONUS (match) を1回の照合で判定する。
+# 末尾が (xN) なら枠数報告、(+N) でベース名が空でなければポイント
+RE_ITEM_KEY = re.compile(r"^(.*?)(?:\(x(\d+)\)|\(\+(\d+)\))$")
+
+
+class ItemKey(NamedTuple):
+    """アイテムキー1件の分類結果。"""
+
+    category: str
+    base_name: str
+    box_count: int | None = None
+    point_bonus: int | None = None
+
+
+@lru_cache(maxsize=4096)
+def classify_item_key(key: str) -> ItemKey:
+    """アイテムキーを分類する。
+
+    同じキーは報告間で繰り返し現れるため、結果をキャッシュして正規表現の照合を1回にする。
+    """
+    m = RE_ITEM_KEY.match(key)
+    if m:
+        base_name, box_count, point_bonus = m.groups()
+        if box_count is not None:
+            return ItemKey(ITEM_BOX_COUNT, base_name, box_count=int(box_count))
+        if base_name:
+            return ItemKey(ITEM_POINT_BONUS, base_name, point_bonus=int(point_bonus))
+    return ItemKey(ITEM_PLAIN, key)
+
+
+@lru_cache(maxsize=4096)
+def _parse_value(value_str: str) -> int | float | None:
+    return _parse_value_uncached(value_str)
+
+
+def _parse_value_uncached(value_str: Any) -> int | float | None:
+    # NaN → null に変換
+    if value_str == "NaN":
+        return None
+    try:
+        return int(value_str)
+    except (ValueError, TypeError):
+        try:
+            return float(value_str)
+        except (ValueError, TypeError):
+            return None
+
+
+def parse_item_value(value_str: Any) -> int | float | None:
+    """Harvest のドロップ数 (文字列) を数値に変換する。NaN や数値でない値は None を返す。"""
+    if isinstance(value_str, str):
+        return _parse_value(value_str)
+    return _parse_value_uncached(value_str)
+
+
 def detect_event_items(reports: list[dict]) -> set[str]:
     """全報告の枠数報告キーからイベントアイテム名を特定する。
 
@@ -64,12 +377,10 @@ def detect_event_items(reports: list[dict]) -> set[str]:
     """
     event_items = set()
     for report in reports:
-        items = report.get("items", {})
-        for key in items:
-            m = RE_BOX_COUNT.search(key)
-            if m:
-                base_name = RE_BOX_COUNT.sub("", key)
-                event_items.add(base_name)
+        for key in report.get("items", {}):
+            kind = classify_item_key(key)
+            if kind.category == ITEM_BOX_COUNT:
+                event_items.add(kind.base_name)
     return event_items
 
 
@@ -80,7 +391,7 @@ def is_raw_count_report(items: dict[str, str], event_items: set[str]) -> bool:
     - (xN) キーが1つもない
     - イベントアイテム名が修飾子なしで存在する
     """
-    has_box_count = any(RE_BOX_COUNT.search(k) for k in items)
+    has_box_count = any(classify_item_key(k).category == ITEM_BOX_COUNT for k in items)
     if has_box_count:
         return False
     has_event_item_raw = any(k in event_items for k in items)
@@ -93,177 +404,1314 @@ def transform_report(
     """Harvest の報告1件を中間 JSON 形式に変換する。
 
     (変換済みアイテム辞書, warnings リスト) を返す。
+    キーの分類と値の変換を1回の走査で行う。
     """
     items = report.get("items", {})
     result = {}
+    has_box_count = False
+    event_item_keys = []
+
+    for key, value_str in items.items():
+        category = classify_item_key(key).category
+        if category == ITEM_BOX_COUNT:
+            has_box_count = True
+        if key in event_items:
+            event_item_keys.append(key)
+            # イベントアイテムのベース名（添字なし）: 実数報告かどうかに関わらず除外
+            if category == ITEM_PLAIN:
+                continue
+        # 枠数報告アイテム・ポイントアイテムはキーも値もそのまま保持する
+        result[key] = parse_item_value(value_str)
+
     warnings = []
+    if event_item_keys:
+        # 実数報告: (xN) キーが1つもなく、イベントアイテム名が修飾子なしで存在する
+        reason = "実数報告のため除外" if not has_box_count else "添字なしイベントアイテムのため除外"
+        warnings.append("excluded_items:" + ",".join(sorted(event_item_keys)) + f"({reason})")
 
-    raw_count = is_raw_count_report(items, event_items)
+    return result, warnings
 
-    if raw_count:
-        excluded_names = sorted(k for k in items if k in event_items)
-        if excluded_names:
-            warnings.append("excluded_items:" + ",".join(excluded_names) + "(実数報告のため除外)")
-    else:
-        bare_event_items = sorted(k for k in items if k in event_items)
-        if bare_event_items:
-            warnings.append(
-                "excluded_items:"
-                + ",".join(bare_event_items)
-                + "(添字なしイベントアイテムのため除外)"
-            )
 
-    for key, value_str in items.items():
-        # NaN → null に変換
-        if value_str == "NaN":
-            value = None
-        else:
-            try:
-                value = int(value_str)
-            except (ValueError, TypeError):
-                try:
-                    value = float(value_str)
-                except (ValueError, TypeError):
-                    value = None
-
-        # 枠数報告アイテム: 例 ぐん肥(x3) → キーも値もそのまま保持
-        m_box = RE_BOX_COUNT.search(key)
-        if m_box:
-            result[key] = value
-            continue
+class _ValueMemo(dict):
+    """Harvest のドロップ数の文字列 → 変換後の値 (transform_reports() の1回の呼び出しの間だけ保持)。"""
 
-        # ポイントアイテム: 例 ポイント(+600) → キーも値もそのまま保持
-        m_point = RE_POINT_BONUS.match(key)
-        if m_point:
-            result[key] = value
-            continue
+    def __missing__(self, value_str: Any) -> int | float | None:
+        value = self[value_str] = _parse_value_uncached(value_str)
+        return value
 
-        # イベントアイテムのベース名（添字なし）: 実数報告かどうかに関わらず除外
-        if key in event_items:
-            continue
 
-        # 通常アイテム
-        result[key] = value
+def transform_reports(
+    reports: Iterable[dict], event_items: set[str]
+) -> Iterator[tuple[dict[str, int | float | None], list[str]]]:
+    """報告を順に変換して返す。結果は各報告に transform_report() を適用したものと同じ。
 
-    return result, warnings
+    除外や警告の対象になるのはイベントアイテムのベース名そのもののキーだけなので、
+    それを含まない報告 (枠数報告の大半) はキーの分類を省き、値の変換と辞書の作成だけを行う。
+    値の変換結果は文字列ごとに1回だけ計算する。イベントアイテムのベース名を含む報告は
+    transform_report() で変換する。
+
+    変換結果は1件ずつ返し、自身では報告数に比例するリストを作らない (保持するのは値の変換結果のメモだけ)。
+    ただし呼び出し元の _process_quest() は、イベントアイテムの検出・重複排除・統計計算と
+    中間 JSON (1つの JSON 文書) の出力のためにクエストの全報告とその変換結果を保持するため、
+    クエスト1件の処理のピークメモリは報告数に比例する (O(reports))。
+    """
+    memo = _ValueMemo()
+    disjoint = event_items.isdisjoint
+    for report in reports:
+        items = report.get("items", {})
+        if disjoint(items):
+            try:
+                yield {key: memo[value] for key, value in items.items()}, []
+                continue
+            except TypeError:
+                # ハッシュできない値は報告ごとの変換に任せる
+                pass
+        yield transform_report(report, event_items)
 
 
 # --- メインロジック ---
 
+# 変換ルール (transform_report 等) を変更した場合はインクリメントする。
+# 取得メタデータの configHash に含まれ、前回の変換結果が再利用されなくなる。
+TRANSFORM_VERSION = 1
+
+# stats JSON (とレビューキュー) の形式を変更した場合はインクリメントする。
+# 取得メタデータの statsVersion と異なれば、ソースに変更のないクエストも stats JSON を作り直す。
+STATS_VERSION = 3
+
+
+@dataclass
+class SourceFetch:
+    """Harvest ソース1件の取得結果。
+
+    reports が None の場合は前回取得時から内容が変わっていない (304 または同一ハッシュ)。
+    """
+
+    source_id: str
+    reports: list[dict] | None
+    etag: str | None = None
+    last_modified: str | None = None
+    content_hash: str | None = None
+    # 取得にかかった秒数と受信した本文のバイト数 (計測用)
+    elapsed: float = 0.0
+    bytes_read: int = 0
+
+
+# ウォームスタート時は接続を再利用する。サーキットブレーカーは実行ごとに閉じる
+harvest = HarvestClient(
+    connect_timeout=FETCH_CONNECT_TIMEOUT,
+    read_timeout=FETCH_TIMEOUT,
+    max_retries=FETCH_MAX_RETRIES,
+    failure_threshold=FETCH_FAILURE_THRESHOLD,
+    max_per_host=FETCH_MAX_PER_HOST,
+)
+
+# ソースの取得失敗として想定する例外 (HTTP エラー・ブレーカー・通信エラー・不正な本文)。
+# それ以外の例外も iter_fetched_quests() はそのクエストの失敗とするが、トレースバックをログに出す
+FETCH_ERRORS = (
+    HarvestHTTPError,
+    CircuitOpenError,
+    OSError,
+    http.client.HTTPException,
+    ValueError,
+)
+
+
+# 変換・重複排除で使う Harvest 報告のフィールド。それ以外 (quest_id 等) は読み込み時に捨てる
+HARVEST_REPORT_FIELDS = (
+    "id",
+    "report_id",
+    "reporter",
+    "reporter_name",
+    "runcount",
+    "items",
+    "note",
+    "timestamp",
+)
+
+
+def read_harvest_reports(stream: Any, hasher: Any = None) -> list[dict]:
+    """Harvest のレスポンス本文をストリーミングで読み込み、報告リストを返す。
+
+    本文全体を保持せず1件ずつデコードし、使わないフィールドを落として保持する。
+    要素ごとのデコードでは報告間でキー文字列が共有されないため、
+    items のキーと値は同じ文字列オブジェクトにまとめる。
+    hasher を渡すと本文全体のバイト列をハッシュに入力する。
+    """
+    strings: dict[str, str] = {}
+    reports = []
+    for report in iter_json_array(stream, hasher):
+        slim = {k: report[k] for k in HARVEST_REPORT_FIELDS if k in report}
+        items = slim.get("items")
+        if isinstance(items, dict):
+            slim["items"] = {
+                strings.setdefault(k, k): strings.setdefault(v, v) if isinstance(v, str) else v
+                for k, v in items.items()
+            }
+        reports.append(slim)
+    return reports
+
 
 def fetch_harvest_reports(quest_id: str) -> list[dict]:
     """指定クエストの報告データを Harvest API から取得する。"""
     url = HARVEST_QUEST_URL.format(quest_id=quest_id)
-    with urlopen(url) as resp:
-        return json.loads(resp.read().decode("utf-8"))
+    with harvest.get(url) as resp:
+        return read_harvest_reports(resp)
+
+
+def fetch_harvest_source(source_id: str, meta: dict | None = None) -> SourceFetch:
+    """指定ソースの報告データを条件付きリクエストで取得する。
+
+    meta (前回取得時のソースメタデータ) の ETag / Last-Modified を条件に付け、
+    304 が返るか本文のハッシュが前回と同一であれば reports=None の結果を返す。
+    本文はストリーミングで読み込みながらハッシュを計算する。
+    """
+    meta = meta or {}
+    url = HARVEST_QUEST_URL.format(quest_id=source_id)
+    headers = {}
+    if meta.get("etag"):
+        headers["If-None-Match"] = meta["etag"]
+    if meta.get("lastModified"):
+        headers["If-Modified-Since"] = meta["lastModified"]
+
+    start = time.perf_counter()
+    with harvest.get(url, headers) as resp:
+        if resp.status == 304:
+            return SourceFetch(
+                source_id,
+                None,
+                etag=meta.get("etag"),
+                last_modified=meta.get("lastModified"),
+                content_hash=meta.get("contentHash"),
+                elapsed=time.perf_counter() - start,
+            )
+        hasher = hashlib.sha256()
+        body = CountingReader(resp)
+        reports = read_harvest_reports(body, hasher)
+        etag = resp.headers.get("ETag")
+        last_modified = resp.headers.get("Last-Modified")
+    elapsed = time.perf_counter() - start
+
+    content_hash = hasher.hexdigest()
+    if content_hash == meta.get("contentHash"):
+        reports = None
+    return SourceFetch(
+        source_id, reports, etag, last_modified, content_hash, elapsed, body.bytes_read
+    )
+
+
+def quest_source_ids(quest: dict) -> list[str]:
+    """クエストの集計元 Harvest ページ ID リストを返す。questId が常に先頭。"""
+    return [quest["questId"]] + list(quest.get("additionalSourceQuestIds") or [])
+
+
+def output_key(event_id: str, quest_id: str) -> str:
+    """クエストの中間 JSON (レガシー形式) の S3 キーを返す。"""
+    return f"{event_id}/{quest_id}.json"
+
+
+def compact_output_key(event_id: str, quest_id: str) -> str:
+    """クエストのコンパクト形式の中間 JSON の S3 キーを返す。"""
+    return f"{event_id}/{quest_id}.compact.json"
+
+
+def exclusions_key(quest_id: str) -> str:
+    """クエストの除外リスト (シャード) の S3 キーを返す。"""
+    return f"{EXCLUSIONS_PREFIX}{quest_id}.json"
+
+
+def stats_key(event_id: str, quest_id: str) -> str:
+    """クエストのドロップ統計 JSON の S3 キーを返す。"""
+    return f"{event_id}/{quest_id}.stats.json"
+
+
+def anomalies_key(event_id: str, quest_id: str) -> str:
+    """クエストのレビューキューの S3 キーを返す。"""
+    return f"{event_id}/{quest_id}.anomalies.json"
+
+
+def event_anomalies_key(event_id: str) -> str:
+    """イベントのレビューキューの S3 キーを返す。"""
+    return f"{event_id}/anomalies.json"
+
+
+def rollup_key(event_id: str) -> str:
+    """イベント単位の集計 JSON の S3 キーを返す。"""
+    return f"{event_id}/rollup.json"
+
 
+def manifest_key(event_id: str) -> str:
+    """イベントのマニフェストの S3 キー"""
+    return f"{event_id}/manifest.json"
 
-def process_quest(event_id: str, quest: dict, event_items: set[str]) -> None:
-    """クエスト1件を処理: 取得・変換・中間 JSON 出力。"""
+
+def schedule_key(event_id: str) -> str:
+    """イベントのクエストごとの更新スケジュールの状態の S3 キーを返す。"""
+    return f"{event_id}/schedule.json"
+
+
+def fetch_meta_key(event_id: str, quest_id: str) -> str:
+    """クエストの取得メタデータを保存する S3 キーを返す。"""
+    return f"{event_id}/{quest_id}.fetch.json"
+
+
+def quest_config_hash(quest: dict, event_items: set[str]) -> str:
+    """出力内容に影響するクエスト設定と変換ルールのハッシュを返す。
+
+    前回の取得メタデータとこの値が一致する場合のみ、前回の変換結果を再利用できる。
+    """
+    config = {
+        "transformVersion": TRANSFORM_VERSION,
+        "quest": quest,
+        "eventItems": sorted(event_items),
+    }
+    return hashlib.sha256(
+        json.dumps(config, ensure_ascii=False, sort_keys=True).encode("utf-8")
+    ).hexdigest()
+
+
+def _report_id(report: dict) -> str:
+    return report.get("id", report.get("report_id", ""))
+
+
+def _quest_header(quest: dict) -> dict:
+    return {
+        "questId": quest["questId"],
+        "name": quest["name"],
+        "level": quest["level"],
+        "ap": quest["ap"],
+    }
+
+
+def exclusions_hash(exclusions: list[dict]) -> str:
+    """除外リストの報告 ID 集合のハッシュを返す。理由の変更は統計に影響しないため含めない。"""
+    return content_hash(sorted({e["reportId"] for e in exclusions}))
+
+
+def write_report_shards(
+    event_id: str, quest_id: str, reports: list[dict], prev_hashes: list[str] | None
+) -> list[str]:
+    """報告の索引 (管理 API の差分更新用) をシャードごとに出力し、シャードの内容ハッシュのリストを返す。
+
+    prev_hashes (前回の取得メタデータの reportShards) とハッシュが同じシャードは書き込まない。
+    """
+    shards = build_report_shards(reports)
+    hashes = [content_hash(shard) for shard in shards]
+    changed = [
+        i
+        for i, h in enumerate(hashes)
+        if prev_hashes is None or i >= len(prev_hashes) or prev_hashes[i] != h
+    ]
+    # 新しい報告が入るシャードだけが変わるため、通常は数件の書き込みで済む
+    for i in changed:
+        write_json(report_shard_key(event_id, quest_id, i), shards[i], content_hash=hashes[i])
+    if changed:
+        logger.info("Wrote %d report index shard(s) of quest %s", len(changed), quest_id)
+    return hashes
+
+
+def write_quest_stats(
+    event_id: str, quest: dict, reports: list[dict], exclusions: list[dict]
+) -> bool:
+    """変換済み報告と除外リストからドロップ統計を計算し、stats JSON に出力する。
+
+    続けて統計を基準に外れ値を判定し、クエストのレビューキューを出力する (write_quest_anomalies)。
+    stats JSON の内容 (lastUpdated を除く) が前回と同一の場合は書き込まず False を返す。
+    """
+    excluded_ids = {e["reportId"] for e in exclusions}
+    with metrics.stage("stats"):
+        stats = {"quest": _quest_header(quest), **compute_quest_stats(reports, excluded_ids)}
+    write_quest_anomalies(event_id, stats, reports, excluded_ids)
+    stats_hash = content_hash(stats)
+    key = stats_key(event_id, quest["questId"])
+    if read_content_hash(key) == stats_hash:
+        return False
+    stats["lastUpdated"] = datetime.now(JST).isoformat()
+    write_json(key, stats, content_hash=stats_hash)
+    logger.info("Wrote %s (%d items)", key, len(stats["items"]))
+    return True
+
+
+def write_quest_anomalies(
+    event_id: str, stats: dict, reports: list[dict], excluded_ids: set[str]
+) -> bool:
+    """報告リストを1回走査して外れ値・warnings のある報告を集め、クエストのレビューキューに出力する。
+
+    内容 (lastUpdated を除く) が前回と同一の場合は書き込まず False を返す。
+    """
+    with metrics.stage("anomalies"):
+        queue = build_quest_queue(stats["quest"], reports, stats["items"], excluded_ids)
+    metrics.count("anomalies", len(queue["anomalies"]))
+    queue_hash = content_hash(queue)
+    key = anomalies_key(event_id, stats["quest"]["questId"])
+    if read_content_hash(key) == queue_hash:
+        return False
+    queue["lastUpdated"] = datetime.now(JST).isoformat()
+    write_json(key, queue, content_hash=queue_hash)
+    logger.info("Wrote %s (%d anomalies)", key, len(queue["anomalies"]))
+    return True
+
+
+def write_event_anomalies(event_id: str, quests: list[dict]) -> bool:
+    """イベントの全クエストのレビューキューを合わせ、イベントのレビューキューに出力する。
+
+    内容 (lastUpdated を除く) が前回と同一の場合は書き込まず False を返す。
+    """
+    with ThreadPoolExecutor(max_workers=FETCH_MAX_WORKERS) as executor:
+        queues = list(
+            map_with_storage(
+                executor, lambda q: read_json(anomalies_key(event_id, q["questId"])), quests
+            )
+        )
+    queue = build_event_queue(event_id, queues)
+    queue_hash = content_hash(queue)
+    key = event_anomalies_key(event_id)
+    if read_content_hash(key) == queue_hash:
+        return False
+    queue["lastUpdated"] = datetime.now(JST).isoformat()
+    write_json(key, queue, content_hash=queue_hash)
+    logger.info("Wrote %s (%d anomalies)", key, len(queue["anomalies"]))
+    return True
+
+
+def read_event_stats(event_id: str, quests: list[dict]) -> list[dict | None]:
+    """イベントのクエストの stats JSON をクエスト順に並列で読み込む (未作成は None)。"""
+    with ThreadPoolExecutor(max_workers=FETCH_MAX_WORKERS) as executor:
+        return list(
+            map_with_storage(
+                executor, lambda q: read_json(stats_key(event_id, q["questId"])), quests
+            )
+        )
+
+
+def write_event_rollup(event_id: str, quest_stats: list[dict | None]) -> bool:
+    """イベントの全クエストの stats JSON を合算し、イベント単位の集計 JSON に出力する。
+
+    stats JSON は変更のあったクエストだけが書き換わるため、ここでは合算し直すだけでよい。
+    内容 (lastUpdated を除く) が前回と同一の場合は書き込まず False を返す。
+    """
+    rollup = build_event_rollup(event_id, quest_stats)
+    rollup_hash = content_hash(rollup)
+    key = rollup_key(event_id)
+    if read_content_hash(key) == rollup_hash:
+        return False
+    rollup["lastUpdated"] = datetime.now(JST).isoformat()
+    write_json(key, rollup, content_hash=rollup_hash)
+    logger.info("Wrote %s (%d reporters)", key, len(rollup["reporters"]))
+    return True
+
+
+def output_record(output_hash: str, output: dict, size: int | None) -> dict:
+    """中間 JSON の出力記録 (取得メタデータの output・マニフェストのクエストごとの項目) を作る。"""
+    reports = output["reports"]
+    record = {
+        "contentHash": output_hash,
+        "reportCount": len(reports),
+        "totalRuns": sum(r.get("runcount") or 0 for r in reports),
+        "bytes": size,
+        "lastUpdated": output.get("lastUpdated"),
+    }
+    if "cursor" in output:
+        record["cursor"] = output["cursor"]
+    return record
+
+
+def stored_output_record(key: str, output_hash: str, record: dict | None) -> dict | None:
+    """書き込まなかった (前回と同一の) 中間 JSON の出力記録を返す。
+
+    record (前回の取得メタデータの出力記録) がない、またはハッシュが異なる場合は
+    中間 JSON を読み込んで作る (記録を始める前の出力)。
+    """
+    if record is not None and record.get("contentHash") == output_hash:
+        return record
+    stored = read_json(key)
+    if stored is None:
+        return None
+    return output_record(output_hash, stored, json_size(stored))
+
+
+def write_quest_delta(
+    event_id: str,
+    quest_id: str,
+    prev_output: dict | None,
+    prev_record: dict | None,
+    output: dict,
+    output_hash: str,
+) -> dict:
+    """前回の中間 JSON からの差分ファイルを書き込み、新しい中間 JSON に記録する cursor を返す。
+
+    prev_output (前回の中間 JSON) がない場合は差分を作らず、prev_record (前回の出力記録) の
+    連番を引き継いで連鎖を打ち切る。連鎖を打ち切る場合 (delta.advance_cursor) は差分ファイルを書き込まない。
+    """
+    if prev_output is not None and "cursor" in prev_output:
+        cursor = prev_output["cursor"]
+        delta = diff_reports(prev_output["reports"], output["reports"])
+    else:
+        cursor = (prev_record or {}).get("cursor")
+        delta = None
+    new_cursor = advance_cursor(cursor, delta, len(output["reports"]), DELTA_MAX_CHAIN)
+    if new_cursor["base"] < new_cursor["seq"]:
+        key = delta_key(event_id, quest_id, new_cursor["seq"])
+        write_json(
+            key,
+            {
+                "seq": new_cursor["seq"],
+                "quest": output["quest"],
+                "lastUpdated": output["lastUpdated"],
+                "contentHash": output_hash,
+                **delta,
+            },
+        )
+        logger.info(
+            "Wrote %s (%d upserts, %d removed)", key, len(delta["upserts"]), len(delta["removed"])
+        )
+    return new_cursor
+
+
+def read_event_fetch_metas(event_id: str, quests: list[dict]) -> list[dict | None]:
+    """イベントのクエストの取得メタデータをクエスト順に並列で読み込む (未作成は None)。"""
+    with ThreadPoolExecutor(max_workers=FETCH_MAX_WORKERS) as executor:
+        return list(
+            map_with_storage(
+                executor, lambda q: read_json(fetch_meta_key(event_id, q["questId"])), quests
+            )
+        )
+
+
+def build_event_manifest(event_id: str, quests: list[dict], fetch_metas: list[dict | None]) -> dict:
+    """取得メタデータに記録した出力記録から、イベントのクエストごとの中間 JSON の一覧を作る。
+
+    出力記録のないクエスト (未処理) は含めない。lastUpdated は含めない。
+    """
+    entries = []
+    for quest, meta in zip(quests, fetch_metas):
+        record = (meta or {}).get("output")
+        if record is None:
+            continue
+        quest_id = quest["questId"]
+        entry = {"questId": quest_id, "key": output_key(event_id, quest_id)}
+        if WRITE_COMPACT_OUTPUT:
+            entry["compactKey"] = compact_output_key(event_id, quest_id)
+        entries.append({**entry, **record})
+    return {"eventId": event_id, "quests": entries}
+
+
+def write_event_manifest(event_id: str, quests: list[dict]) -> bool:
+    """イベントのマニフェスト (クエストごとの中間 JSON のハッシュ・報告数等) を書き込む。
+
+    クライアントはマニフェストだけを取得し、ハッシュが変わったクエストの中間 JSON だけを取得し直せる。
+    内容 (lastUpdated を除く) が前回と同一の場合は書き込まず False を返す。
+    """
+    manifest = build_event_manifest(event_id, quests, read_event_fetch_metas(event_id, quests))
+    manifest_hash = content_hash(manifest)
+    key = manifest_key(event_id)
+    if read_content_hash(key) == manifest_hash:
+        return False
+    manifest["lastUpdated"] = datetime.now(JST).isoformat()
+    write_json(key, manifest, content_hash=manifest_hash)
+    logger.info("Wrote %s (%d quests)", key, len(manifest["quests"]))
+    return True
+
+
+def write_event_schedule(
+    plan: "RunPlan",
+    event_id: str,
+    quests: list[dict],
+    quest_stats: list[dict | None],
+    refreshed: set[tuple[str, str]],
+) -> None:
+    """今回更新したクエストの報告数から増加ペースと次回の更新間隔を求め、スケジュールの状態を書き込む。"""
+    period = plan.events[event_id]["period"]
+    start = datetime.fromisoformat(period["start"])
+    end = datetime.fromisoformat(period["end"])
+    previous = plan.schedules.get(event_id, {})
+    states = {}
+    for quest, stats in zip(quests, quest_stats):
+        quest_id = quest["questId"]
+        state = previous.get(quest_id)
+        if (event_id, quest_id) in refreshed and stats is not None:
+            state = update_state(state, stats["reportCount"], plan.now, start, SCHEDULE_CONFIG)
+            interval = refresh_interval(state["velocity"], end - plan.now, SCHEDULE_CONFIG)
+            state["intervalMinutes"] = round(interval.total_seconds() / 60)
+        if state is not None:
+            states[quest_id] = state
+    write_json(schedule_key(event_id), {"quests": states})
+
+
+def finish_run(plan: "RunPlan", summary: RunSummary) -> None:
+    """更新したクエストのイベントごとに集計 JSON・マニフェスト・レビューキュー・更新スケジュールを書き込む。
+
+    更新したクエストのないイベントは何もしない。失敗してもクエストの結果には影響させない。
+    """
+    refreshed = {
+        (r["eventId"], r["questId"]) for r in summary.results if r["status"] != STATUS_FAILED
+    }
+    quests_by_event: dict[str, list[dict]] = {}
+    for event_id, quest, _event_items in plan.tasks:
+        quests_by_event.setdefault(event_id, []).append(quest)
+    for event_id, quests in quests_by_event.items():
+        if not any((event_id, q["questId"]) in refreshed for q in quests):
+            continue
+        try:
+            quest_stats = read_event_stats(event_id, quests)
+        except Exception:
+            logger.exception("Failed to read stats of event %s", event_id)
+            continue
+        try:
+            write_event_rollup(event_id, quest_stats)
+        except Exception:
+            logger.exception("Failed to write rollup of event %s", event_id)
+        try:
+            write_event_manifest(event_id, quests)
+        except Exception:
+            logger.exception("Failed to write manifest of event %s", event_id)
+        try:
+            write_event_anomalies(event_id, quests)
+        except Exception:
+            logger.exception("Failed to write anomalies of event %s", event_id)
+        if ADAPTIVE_SCHEDULE:
+            try:
+                write_event_schedule(plan, event_id, quests, quest_stats, refreshed)
+            except Exception:
+                logger.exception("Failed to write schedule of event %s", event_id)
+
+
+def iter_fetched_quests(
+    quests: list[dict],
+    source_metas: list[dict[str, dict]] | None = None,
+    max_workers: int = FETCH_MAX_WORKERS,
+) -> Iterator[tuple[int, list[SourceFetch] | None, Exception | None]]:
+    """全クエストの全ソースを並列に取得し、クエスト単位で取得完了順に返す。
+
+    source_metas にはクエストごとの {ソース ID: 前回のソースメタデータ} を渡す。
+    (quests のインデックス, ソース順の取得結果リスト, 例外) を yield する。
+    いずれかのソースの取得に失敗したクエストは取得結果が None、例外が設定される。
+    FETCH_ERRORS 以外の例外 (不正な本文による TypeError 等) もトレースバックをログに出して同様に扱う。
+    失敗は当該クエストに閉じ、他のクエストの取得・処理は継続する。
+    """
+    if not quests:
+        return
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        results: list[list[SourceFetch | None]] = []
+        remaining: list[int] = []
+        errors: list[Exception | None] = []
+        for qi, quest in enumerate(quests):
+            source_ids = quest_source_ids(quest)
+            metas = source_metas[qi] if source_metas else {}
+            results.append([None] * len(source_ids))
+            remaining.append(len(source_ids))
+            errors.append(None)
+            for si, sid in enumerate(source_ids):
+                future = executor.submit(fetch_harvest_source, sid, metas.get(sid))
+                futures[future] = (qi, si)
+
+        for future in as_completed(futures):
+            qi, si = futures[future]
+            try:
+                results[qi][si] = future.result()
+            except FETCH_ERRORS as e:
+                if errors[qi] is None:
+                    errors[qi] = e
+            except Exception as e:
+                # 不正な本文による TypeError / KeyError 等。そのクエストの失敗として扱い、他のクエストは続ける
+                logger.exception("Unexpected error while fetching quest %s", quests[qi]["questId"])
+                if errors[qi] is None:
+                    errors[qi] = e
+            remaining[qi] -= 1
+            if remaining[qi] == 0:
+                if errors[qi] is not None:
+                    yield qi, None, errors[qi]
+                else:
+                    yield qi, results[qi], None
+                results[qi] = []
+
+
+def process_quest(
+    event_id: str,
+    quest: dict,
+    event_items: set[str],
+    fetched_sources: list[SourceFetch] | None = None,
+    fetch_meta: dict | None = None,
+    exclusions: list[dict] | None = None,
+    storage: Storage | None = None,
+    emit: Callable[[dict], None] | None = None,
+) -> bool:
+    """クエスト1件を処理: 取得・変換・中間 JSON 出力・ドロップ統計出力。
+
+    fetched_sources にソース順の取得結果が渡された場合は取得を省略する。
+    fetch_meta に前回の取得メタデータが渡され、クエスト設定が変わっていない場合は
+    インクリメンタルに処理する:
+
+    - 全ソースが前回から変更なしなら変換・出力を行わない
+    - 前回の中間 JSON に存在し、内容のハッシュ (report_hash) も前回と同じ報告は
+      変換せず前回の変換結果を再利用する。Harvest 上で編集された報告は変換し直す
+
+    中間 JSON (レガシー形式) を出力した場合は True、変更なしでスキップした場合は False を返す。
+    変換結果が前回と同一の場合も中間 JSON の書き込みは行わない。コンパクト形式だけを
+    書き込んだ場合は False を返し、計測値の compactWrites にだけ数える。
+    ドロップ統計は exclusions (そのクエストの除外リスト) を適用して計算し、
+    ソースに変更がなくても除外リストが変わっていれば再計算する。
+
+    storage を指定した場合はその読み書き先に出力する (省略時は current_storage())。
+    クエストごとの計測値は emit (省略時は metrics.emit) に渡す。
+    """
+    quest_metrics = metrics.QuestMetrics(event_id, quest["questId"])
+    status = STATUS_FAILED
+    try:
+        with using_storage(storage), metrics.collecting(quest_metrics):
+            written = _process_quest(
+                event_id, quest, event_items, fetched_sources, fetch_meta, exclusions, quest_metrics
+            )
+        status = STATUS_WRITTEN if written else STATUS_SKIPPED
+        return written
+    finally:
+        # クエストごとの計測値を EMF 形式で出力する
+        (emit or metrics.emit)(quest_metrics.record(status))
+
+
+def _process_quest(
+    event_id: str,
+    quest: dict,
+    event_items: set[str],
+    fetched_sources: list[SourceFetch] | None,
+    fetch_meta: dict | None,
+    exclusions: list[dict] | None,
+    quest_metrics: metrics.QuestMetrics,
+) -> bool:
     quest_id = quest["questId"]
-    source_ids = [quest_id] + list(quest.get("additionalSourceQuestIds") or [])
+    source_ids = quest_source_ids(quest)
     logger.info("Processing quest %s (%s), sources: %s", quest_id, quest["name"], source_ids)
 
+    if fetched_sources is None:
+        fetched_sources = []
+        for sid in source_ids:
+            start = time.perf_counter()
+            fetched = SourceFetch(sid, fetch_harvest_reports(sid))
+            fetched.elapsed = time.perf_counter() - start
+            fetched_sources.append(fetched)
+    for f in fetched_sources:
+        quest_metrics.add_source(f.source_id, f.elapsed, f.bytes_read, f.reports is not None)
+
+    config_hash = quest_config_hash(quest, event_items)
+    prev_record = (fetch_meta or {}).get("output")
+    prev_shards = (fetch_meta or {}).get("reportShards")
+    if fetch_meta is None or fetch_meta.get("configHash") != config_hash:
+        fetch_meta = {}
+    prev_sources: dict[str, dict] = fetch_meta.get("sources", {})
+
+    exclusions = exclusions or []
+    excl_hash = exclusions_hash(exclusions)
+    key = output_key(event_id, quest_id)
+
+    if prev_sources and all(f.reports is None for f in fetched_sources):
+        stats_state = {"exclusionsHash": excl_hash, "statsVersion": STATS_VERSION}
+        stats_changed = any(fetch_meta.get(k) != v for k, v in stats_state.items())
+        if stats_changed or "output" not in fetch_meta or "reportShards" not in fetch_meta:
+            prev_output = read_json(key)
+            if prev_output is not None:
+                if stats_changed:
+                    logger.info(
+                        "Exclusions or stats format of quest %s changed, updating stats", quest_id
+                    )
+                    write_quest_stats(event_id, quest, prev_output["reports"], exclusions)
+                # 出力記録のない取得メタデータ (記録を始める前の出力) は前回の中間 JSON から補う
+                output_state = {
+                    "output": fetch_meta.get("output")
+                    or output_record(
+                        content_hash(
+                            {"quest": prev_output["quest"], "reports": prev_output["reports"]}
+                        ),
+                        prev_output,
+                        json_size(prev_output),
+                    ),
+                    # 報告の索引も同様に、記録を始める前の出力から作る
+                    "reportShards": fetch_meta.get("reportShards")
+                    or write_report_shards(event_id, quest_id, prev_output["reports"], None),
+                }
+                write_json(
+                    fetch_meta_key(event_id, quest_id),
+                    {**fetch_meta, **stats_state, **output_state},
+                )
+        logger.info("Quest %s unchanged since last run, skipping", quest_id)
+        return False
+
+    existing: dict[str, dict] = {}
+    prev_output = None
+    prev_hashes: dict[str, str] = {}
+    if prev_sources:
+        prev_output = read_json(key)
+        if prev_output is not None:
+            existing = {r["id"]: r for r in prev_output.get("reports", []) if r.get("id")}
+        for meta in prev_sources.values():
+            if meta.get("reportIds") and meta.get("reportHashes"):
+                prev_hashes.update(zip(meta["reportIds"], meta["reportHashes"]))
+
+    # 変更なしのソースは前回の中間 JSON から報告を復元する。復元できなければ取得し直す
+    for f in fetched_sources:
+        if f.reports is None:
+            prev_ids = prev_sources.get(f.source_id, {}).get("reportIds")
+            if prev_ids is None or any(rid not in existing for rid in prev_ids):
+                logger.info("Cannot reuse previous reports of source %s, refetching", f.source_id)
+                with quest_metrics.stage("refetch"):
+                    f.reports = fetch_harvest_reports(f.source_id)
+
+    def source_entries(f: SourceFetch) -> list[dict]:
+        if f.reports is not None:
+            return f.reports
+        return [existing[rid] for rid in prev_sources[f.source_id]["reportIds"]]
+
+    if not event_items:
+        # 変換済み報告も (xN) キーをそのまま保持しているため、混在したまま判定できる
+        event_items = detect_event_items([r for f in fetched_sources for r in source_entries(f)])
+        logger.info("Detected event items: %s", event_items)
+        if existing and sorted(event_items) != fetch_meta.get("eventItems"):
+            logger.info("Event items changed since last run, re-transforming all reports")
+            existing = {}
+            for f in fetched_sources:
+                if f.reports is None:
+                    with quest_metrics.stage("refetch"):
+                        f.reports = fetch_harvest_reports(f.source_id)
+    else:
+        logger.info("Using configured event items: %s", event_items)
+
     all_reports: list[dict] = []
+    # all_reports と同じ順に、前回の変換結果を再利用できるか
+    reusable: list[bool] = []
     seen_ids: set[str] = set()
-    for sid in source_ids:
-        fetched = fetch_harvest_reports(sid)
-        logger.info("Fetched %d reports from source %s", len(fetched), sid)
-        for r in fetched:
-            rid = r.get("id", r.get("report_id", ""))
+    duplicates = 0
+    sources_meta: dict[str, dict] = {}
+    for f in fetched_sources:
+        entries = source_entries(f)
+        if f.reports is None:
+            logger.info("Reused %d reports of unchanged source %s", len(entries), f.source_id)
+        else:
+            logger.info("Fetched %d reports from source %s", len(entries), f.source_id)
+        entry_ids = [_report_id(r) for r in entries]
+        if f.reports is None:
+            # 変更なしのソースの報告は前回の変換結果そのもの。ハッシュも前回の値を引き継ぐ
+            prev_meta = prev_sources[f.source_id]
+            entry_hashes = prev_meta.get("reportHashes") or [None] * len(entries)
+        else:
+            entry_hashes = [report_hash(r) for r in entries]
+        sources_meta[f.source_id] = {
+            "etag": f.etag,
+            "lastModified": f.last_modified,
+            "contentHash": f.content_hash,
+            "reportCount": len(entries),
+            "reportIds": entry_ids if all(entry_ids) else None,
+            "reportHashes": entry_hashes if all(entry_ids) and all(entry_hashes) else None,
+        }
+        for r, rid, rhash in zip(entries, entry_ids, entry_hashes):
             if rid:
                 if rid in seen_ids:
+                    duplicates += 1
                     continue
                 seen_ids.add(rid)
             all_reports.append(r)
+            reusable.append(
+                rid in existing
+                and (f.reports is None or (rhash is not None and prev_hashes.get(rid) == rhash))
+            )
 
     reports = all_reports
     logger.info("Total %d unique reports for quest %s", len(reports), quest_id)
-
-    if not event_items:
-        event_items = detect_event_items(reports)
-        logger.info("Detected event items: %s", event_items)
-    else:
-        logger.info("Using configured event items: %s", event_items)
+    quest_metrics.add("reports", len(reports))
+    quest_metrics.add("duplicateReports", duplicates)
 
     transformed_reports = []
-    for report in reports:
-        items, warnings = transform_report(report, event_items)
-        transformed_reports.append(
-            {
-                "id": report.get("id", report.get("report_id", "")),
-                "reporter": report.get("reporter", ""),
-                "reporterName": report.get("reporter_name", ""),
-                "runcount": report.get("runcount", 0),
-                "timestamp": report.get("timestamp", ""),
-                "note": report.get("note", ""),
-                "items": items,
-                "warnings": warnings,
-            }
-        )
+    reused = 0
+    with quest_metrics.stage("transform"):
+        # 変換結果は transformed_reports に1件ずつ追加し、変換前後の報告リストを二重に持たない
+        pending = (r for r, reuse in zip(reports, reusable) if not reuse)
+        if BATCH_TRANSFORM:
+            converted = transform_reports(pending, event_items)
+        else:
+            converted = (transform_report(r, event_items) for r in pending)
+        for report, reuse in zip(reports, reusable):
+            rid = _report_id(report)
+            if reuse:
+                transformed_reports.append(existing[rid])
+                reused += 1
+                continue
+            items, warnings = next(converted)
+            transformed_reports.append(
+                {
+                    "id": rid,
+                    "reporter": report.get("reporter", ""),
+                    "reporterName": report.get("reporter_name", ""),
+                    "runcount": report.get("runcount", 0),
+                    "timestamp": report.get("timestamp", ""),
+                    "note": report.get("note", ""),
+                    "items": items,
+                    "warnings": warnings,
+                }
+            )
+    if reused:
+        logger.info("Reused %d previously transformed reports", reused)
+    quest_metrics.add("reusedReports", reused)
 
     now = datetime.now(JST)
     output = {
-        "quest": {
-            "questId": quest["questId"],
-            "name": quest["name"],
-            "level": quest["level"],
-            "ap": quest["ap"],
-        },
+        "quest": _quest_header(quest),
         "lastUpdated": now.isoformat(),
         "reports": transformed_reports,
     }
 
-    key = f"{event_id}/{quest_id}.json"
-    write_json(key, output)
-    logger.info("Wrote %s (%d reports)", key, len(transformed_reports))
+    # lastUpdated を除いた内容が前回と同一なら PUT しない (CloudFront のキャッシュも維持される)
+    with quest_metrics.stage("hash"):
+        output_hash = content_hash({"quest": output["quest"], "reports": transformed_reports})
+    written = False
+    if read_content_hash(key) != output_hash:
+        if WRITE_DELTAS:
+            # 差分ファイルを中間 JSON より先に書き込み、cursor が指す差分が必ず存在するようにする
+            with quest_metrics.stage("delta"):
+                output["cursor"] = write_quest_delta(
+                    event_id, quest_id, prev_output, prev_record, output, output_hash
+                )
+        size = write_json(key, output, content_hash=output_hash)
+        logger.info("Wrote %s (%d reports)", key, len(transformed_reports))
+        written = True
+        record = output_record(output_hash, output, size)
+    else:
+        logger.info("Output of %s unchanged, skipped writing", key)
+        record = stored_output_record(key, output_hash, prev_record)
+        if record is not None and "cursor" in record:
+            output["cursor"] = record["cursor"]
 
+    if WRITE_COMPACT_OUTPUT:
+        compact_key = compact_output_key(event_id, quest_id)
+        if read_content_hash(compact_key) != output_hash:
+            # コンパクト形式だけの書き込み (形式の追加・欠落の補完) はクエストの書き込みに数えない
+            write_gzip_json(compact_key, encode_quest_output(output), content_hash=output_hash)
+            logger.info("Wrote %s", compact_key)
+            quest_metrics.add("compactWrites", 1)
 
-def lambda_handler(event: Any, context: Any) -> dict[str, int]:
-    """集計 Lambda のエントリーポイント。
+    write_quest_stats(event_id, quest, transformed_reports, exclusions)
+    with quest_metrics.stage("reportIndex"):
+        shard_hashes = write_report_shards(event_id, quest_id, transformed_reports, prev_shards)
 
-    events.json を読み込み、現在時刻にアクティブなイベントのクエストを順に処理する。
-    イベント終了直前の報告や Harvest への反映遅延を考慮し、
-    終了後5時間はグレースピリオドとして集計を継続する。
+    # 中間 JSON の出力に成功した後でメタデータを更新する
+    write_json(
+        fetch_meta_key(event_id, quest_id),
+        {
+            "configHash": config_hash,
+            "eventItems": sorted(event_items),
+            "exclusionsHash": excl_hash,
+            "statsVersion": STATS_VERSION,
+            "sources": sources_meta,
+            "output": record,
+            "reportShards": shard_hashes,
+        },
+    )
+    return written
 
-    Returns:
-        {"processed": <処理したクエスト数>}
-    """
-    data = read_json(EVENTS_KEY)
-    if data is None:
-        logger.info("No events.json found, exiting")
-        return {"processed": 0}
 
-    now = datetime.now(JST)
-    active_events = []
+# イベント終了直前の報告と Harvest への反映遅延(30-60分)を考慮し、終了後も集計を継続する期間
+GRACE_PERIOD = timedelta(hours=5)
+
 
+def find_active_events(data: dict, now: datetime) -> list[dict]:
+    """events.json から now 時点でアクティブなイベントを返す。
+
+    イベント終了直前の報告と Harvest への反映遅延(30-60分)を考慮し、
+    終了後も5時間は集計を継続する。
+    """
+    active_events = []
     for ev in data.get("events", []):
         period = ev.get("period", {})
         start = datetime.fromisoformat(period["start"])
         end = datetime.fromisoformat(period["end"])
-        # イベント終了直前の報告と Harvest への反映遅延(30-60分)を考慮し、
-        # 終了後も5時間は集計を継続する
-        grace = end + timedelta(hours=5)
+        grace = end + GRACE_PERIOD
         if start <= now <= grace:
             active_events.append(ev)
+    return active_events
+
+
+def find_finished_events(data: dict, now: datetime) -> list[dict]:
+    """events.json から now 時点でグレースピリオドを過ぎたイベントを終了の早い順に返す。"""
+    finished = [
+        ev
+        for ev in data.get("events", [])
+        if datetime.fromisoformat(ev["period"]["end"]) + GRACE_PERIOD < now
+    ]
+    return sorted(finished, key=lambda ev: datetime.fromisoformat(ev["period"]["end"]))
+
 
+def load_active_events(now: datetime) -> list[dict]:
+    """events.json を読み込み、now 時点でアクティブなイベントを返す。"""
+    data = read_json(EVENTS_KEY)
+    if data is None:
+        logger.info("No events.json found, exiting")
+        return []
+
+    active_events = find_active_events(data, now)
     if not active_events:
         logger.info("No active events at %s, exiting", now.isoformat())
-        return {"processed": 0}
+        return []
 
     logger.info(
         "Found %d active event(s): %s",
         len(active_events),
         [e["name"] for e in active_events],
     )
+    return active_events
+
 
-    total_quests = 0
-    for ev in active_events:
+def quest_tasks(events: list[dict]) -> list[tuple[str, dict, set[str]]]:
+    """イベントのリストから (eventId, クエスト, イベントアイテム) のリストを作る。"""
+    tasks: list[tuple[str, dict, set[str]]] = []
+    for ev in events:
         event_id = ev["eventId"]
         event_items = set(ev.get("eventItems", []))
         for quest in ev.get("quests", []):
-            process_quest(event_id, quest, event_items)
-            total_quests += 1
+            tasks.append((event_id, quest, event_items))
+    return tasks
+
+
+def active_quest_tasks() -> list[tuple[str, dict, set[str]]]:
+    """events.json を読み込み、アクティブなイベントの (eventId, クエスト, イベントアイテム) を返す。"""
+    return quest_tasks(load_active_events(datetime.now(JST)))
+
+
+@dataclass
+class RunPlan:
+    """1回の実行で処理するクエスト。
+
+    tasks はアクティブなイベントの全クエスト、due はそのうち今回更新するクエスト。
+    schedules はイベントごとの前回までのスケジュールの状態 ({questId: 状態})。
+    """
+
+    now: datetime
+    events: dict[str, dict]
+    tasks: list[tuple[str, dict, set[str]]]
+    due: list[tuple[str, dict, set[str]]]
+    schedules: dict[str, dict[str, dict]]
+
+    @property
+    def deferred(self) -> int:
+        return len(self.tasks) - len(self.due)
+
+
+def plan_run(force: bool = False) -> RunPlan:
+    """アクティブなクエストのうち、今回更新するクエストを決める。
+
+    ADAPTIVE_SCHEDULE が無効な場合と force の場合は全クエストを更新する。
+    """
+    now = datetime.now(JST)
+    events = load_active_events(now)
+    tasks = quest_tasks(events)
+    plan = RunPlan(now, {ev["eventId"]: ev for ev in events}, tasks, tasks, {})
+    if not ADAPTIVE_SCHEDULE or not events:
+        return plan
 
-    logger.info("Processed %d quest(s) total", total_quests)
-    return {"processed": total_quests}
+    with ThreadPoolExecutor(max_workers=FETCH_MAX_WORKERS) as executor:
+        states = map_with_storage(
+            executor, lambda ev: read_json(schedule_key(ev["eventId"])) or {}, events
+        )
+        plan.schedules = {
+            ev["eventId"]: state.get("quests", {}) for ev, state in zip(events, states)
+        }
+    if force:
+        return plan
+
+    due = []
+    for task in tasks:
+        event_id, quest, _event_items = task
+        end = datetime.fromisoformat(plan.events[event_id]["period"]["end"])
+        state = plan.schedules[event_id].get(quest["questId"])
+        if is_due(state, now, end, end + GRACE_PERIOD, SCHEDULE_CONFIG):
+            due.append(task)
+    plan.due = due
+    if plan.deferred:
+        logger.info("Deferred %d quest(s) not yet due for refresh", plan.deferred)
+    return plan
+
+
+def source_metas_for(quest: dict, event_items: set[str], fetch_meta: dict | None) -> dict:
+    """クエスト設定が前回から変わっていなければ、条件付きリクエストに使うソースメタデータを返す。"""
+    if fetch_meta and fetch_meta.get("configHash") == quest_config_hash(quest, event_items):
+        return fetch_meta.get("sources", {})
+    return {}
+
+
+def run_quest(payload: dict) -> dict:
+    """ワーカー: ペイロードで指定されたクエスト1件を取得・処理する。
+
+    失敗しても例外は送出せず、status が failed の結果を返す。
+    """
+    event_id = payload["eventId"]
+    quest = payload["quest"]
+    event_items = set(payload.get("eventItems", []))
+    quest_id = quest["questId"]
+    try:
+        fetch_meta = read_json(fetch_meta_key(event_id, quest_id))
+        exclusions = read_json(exclusions_key(quest_id)) or []
+        source_metas = [source_metas_for(quest, event_items, fetch_meta)]
+        _, fetched_sources, error = next(iter_fetched_quests([quest], source_metas))
+        if error is not None:
+            logger.error("Failed to fetch quest %s: %s", quest_id, error)
+            return quest_result(payload, STATUS_FAILED, str(error))
+        written = process_quest(
+            event_id, quest, event_items, fetched_sources, fetch_meta, exclusions
+        )
+        return quest_result(payload, STATUS_WRITTEN if written else STATUS_SKIPPED)
+    except Exception as e:
+        logger.exception("Failed to process quest %s", quest_id)
+        return quest_result(payload, STATUS_FAILED, str(e))
+
+
+def run_coordinator(dispatcher: InProcessDispatcher, force: bool = False) -> RunSummary:
+    """コーディネーター: 更新時期が来たクエストごとにペイロードを作り、ワーカーに配って結果を集める。"""
+    plan = plan_run(force)
+    summary = RunSummary(deferred=plan.deferred)
+    payloads = [quest_payload(*task) for task in plan.due]
+    for result in dispatcher.dispatch(payloads):
+        summary.add(result)
+    finish_run(plan, summary)
+    for result in summary.failed:
+        logger.error("Quest %s failed: %s", result["questId"], result.get("error"))
+    return summary
+
+
+def run_batch(force: bool = False, storage: Storage | None = None) -> RunSummary:
+    """更新時期が来たクエストを1プロセスで処理する。
+
+    Harvest からの取得は全クエスト・全ソースを並列に行い、
+    取得が完了したクエストから順に変換・出力する。
+    storage を指定した場合はその読み書き先で events.json 等を読み、出力する。
+    """
+    with using_storage(storage):
+        return _run_batch(force)
+
+
+def _run_batch(force: bool) -> RunSummary:
+    plan = plan_run(force)
+    summary = RunSummary(deferred=plan.deferred)
+    tasks = plan.due
+    if not tasks:
+        return summary
+
+    # 除外リストは索引に載っているクエストのシャードだけを読み込む
+    exclusions_index = (read_json(EXCLUSIONS_INDEX_KEY) or {}).get("quests", {})
+
+    def read_quest_exclusions(quest_id: str) -> list[dict]:
+        if quest_id not in exclusions_index:
+            return []
+        return read_json(exclusions_key(quest_id)) or []
+
+    # 前回の取得メタデータを読み込み、クエスト設定が変わっていなければ条件付きリクエストに使う
+    with ThreadPoolExecutor(max_workers=FETCH_MAX_WORKERS) as executor:
+        metas_iter = map_with_storage(
+            executor, lambda t: read_json(fetch_meta_key(t[0], t[1]["questId"])), tasks
+        )
+        exclusions_iter = map_with_storage(
+            executor, lambda t: read_quest_exclusions(t[1]["questId"]), tasks
+        )
+        fetch_metas = list(metas_iter)
+        quest_exclusions = list(exclusions_iter)
+    source_metas = [
+        source_metas_for(quest, event_items, meta)
+        for (_, quest, event_items), meta in zip(tasks, fetch_metas)
+    ]
+
+    quests = [quest for _, quest, _ in tasks]
+    for qi, fetched_sources, error in iter_fetched_quests(quests, source_metas):
+        event_id, quest, event_items = tasks[qi]
+        payload = quest_payload(event_id, quest, event_items)
+        if error is not None:
+            logger.error("Failed to fetch quest %s: %s", quest["questId"], error)
+            summary.add(quest_result(payload, STATUS_FAILED, str(error)))
+            continue
+        try:
+            written = process_quest(
+                event_id,
+                quest,
+                event_items,
+                fetched_sources,
+                fetch_metas[qi],
+                quest_exclusions[qi],
+            )
+        except Exception as e:
+            logger.exception("Failed to process quest %s", quest["questId"])
+            summary.add(quest_result(payload, STATUS_FAILED, str(e)))
+            continue
+        summary.add(quest_result(payload, STATUS_WRITTEN if written else STATUS_SKIPPED))
+    finish_run(plan, summary)
+    return summary
+
+
+# --- アーカイブ ---
+
+
+def archive_event(ev: dict) -> dict:
+    """終了したイベントの中間 JSON を列指向のアーカイブにまとめて書き込み、メタデータを返す。
+
+    中間 JSON はクエスト1件ずつ読み込み、行を列ごとの gzip ストリームに追記してから手放す
+    (EventArchiveBuilder)。除外リストはアーカイブ時点のものを excluded 列に記録する。
+    列ファイル → メタデータの順に書き込み、索引への登録は呼び出し側が最後に行う。
+    """
+    event_id = ev["eventId"]
+    exclusions_index = (read_json(EXCLUSIONS_INDEX_KEY) or {}).get("quests", {})
+    with EventArchiveBuilder(ev) as builder:
+        for quest in ev.get("quests", []):
+            quest_id = quest["questId"]
+            output = read_json(output_key(event_id, quest_id))
+            if output is None:
+                continue
+            exclusions = (
+                read_json(exclusions_key(quest_id)) if quest_id in exclusions_index else None
+            )
+            builder.add_quest(output, {e["reportId"] for e in exclusions or []})
+            # 次のクエストを読み込む間に前のクエストを保持しない
+            del output
+
+        meta, columns = builder.build()
+        for name, body in columns.items():
+            write_gzip_body(archive_column_key(event_id, name), body)
+    write_json(archive_meta_key(event_id), meta)
+    logger.info("Archived event %s (%d rows)", event_id, meta["rowCount"])
+    return meta
+
+
+def archive_finished_events(now: datetime | None = None) -> int:
+    """グレースピリオドを過ぎ、まだアーカイブしていないイベントを ARCHIVE_MAX_EVENTS 件までアーカイブする。
+
+    アーカイブ済みのイベントは archive/_index.json に記録し、次回以降は対象にしない。
+    アーカイブに失敗したイベントは索引の failed に記録して次のイベントに進み、
+    次回以降は失敗していないイベントを先に処理する (失敗したイベントは失敗が古い順に後回し)。
+    アーカイブしたイベント数を返す。
+    """
+    if ARCHIVE_MAX_EVENTS <= 0:
+        return 0
+    data = read_json(EVENTS_KEY)
+    if data is None:
+        return 0
+    now = now or datetime.now(JST)
+    finished = find_finished_events(data, now)
+    if not finished:
+        return 0
+
+    index = read_json(ARCHIVE_INDEX_KEY) or {"events": {}}
+    failed = index.setdefault("failed", {})
+    pending = [ev for ev in finished if ev["eventId"] not in index["events"]]
+    # sort は安定なので、失敗していないイベントは終了順のまま先頭に並ぶ
+    pending.sort(
+        key=lambda ev: (
+            ev["eventId"] in failed,
+            failed.get(ev["eventId"], {}).get("failedAt", ""),
+        )
+    )
+    archived = 0
+    for ev in pending[:ARCHIVE_MAX_EVENTS]:
+        event_id = ev["eventId"]
+        try:
+            meta = archive_event(ev)
+        except Exception as e:
+            logger.exception("Failed to archive event %s", event_id)
+            failed[event_id] = {"failedAt": now.isoformat(), "error": str(e)}
+        else:
+            failed.pop(event_id, None)
+            index["events"][event_id] = index_entry(meta, now.isoformat())
+            archived += 1
+        write_json(ARCHIVE_INDEX_KEY, index)
+    return archived
+
+
+def remaining_time(context: Any) -> Callable[[], float] | None:
+    """Lambda の context から実行の残り時間 (秒) を返す関数を作る。context がなければ None。"""
+    get_remaining = getattr(context, "get_remaining_time_in_millis", None)
+    if get_remaining is None:
+        return None
+    return lambda: get_remaining() / 1000
+
+
+def lambda_handler(event: Any, context: Any) -> dict:
+    """集計 Lambda のエントリーポイント。
+
+    events.json を読み込み、現在時刻にアクティブなイベントのクエストを処理する。
+    イベント終了直前の報告や Harvest への反映遅延を考慮し、
+    終了後5時間はグレースピリオドとして集計を継続する。
+
+    呼び出し方により次のいずれかで動作する。
+
+    - ペイロードに quest を含む場合: ワーカーとしてそのクエスト1件だけを処理し、
+      run_quest() の結果を返す
+    - FANOUT_ENABLED の場合: コーディネーターとしてクエストごとにワーカー Lambda を呼び出す。
+      残り時間がワーカーの応答を待ち切れなくなったクエストは呼び出さず、次回の実行に回す
+    - それ以外: 全クエストを1プロセスで処理する
+
+    コーディネーター・1プロセスのいずれでも、ADAPTIVE_SCHEDULE が有効なら
+    報告の増加ペースから更新時期が来たと判断したクエストだけを処理する (plan_run)。
+    ペイロードに {"force": true} を指定すると全クエストを処理する。
+    ワーカー以外では、続けてグレースピリオドを過ぎたイベントをアーカイブする
+    (archive_finished_events)。
+    クエストごとの計測値と実行全体のサマリを EMF 形式で出力する。
+    ペイロードの "profile" に "cprofile" / "tracemalloc" (またはそのリスト) を指定すると
+    プロファイラを有効にして実行し、結果をログに出力する。
+
+    Returns:
+        {
+            "processed": <処理したクエスト数>,
+            "written": <中間 JSON を書き込んだクエスト数>,
+            "skipped": <変更なしで書き込みを省略したクエスト数>,
+            "failed": <失敗したクエスト数>,
+        }
+    """
+    with metrics.profiling(metrics.profile_options(event)):
+        if isinstance(event, dict) and "quest" in event:
+            harvest.reset_breaker()
+            result = run_quest(event)
+            logger.info("S3 cache: %s", s3_cache.take_stats())
+            return result
+
+        start = time.perf_counter()
+        harvest.reset_breaker()
+        force = isinstance(event, dict) and bool(event.get("force"))
+        if FANOUT_ENABLED:
+            dispatcher = LambdaDispatcher(
+                lambda_client,
+                WORKER_FUNCTION_NAME,
+                FANOUT_MAX_CONCURRENCY,
+                time_left=remaining_time(context),
+                min_time=WORKER_TIMEOUT + WORKER_TIMEOUT_MARGIN + COORDINATOR_RESERVE,
+            )
+            summary = run_coordinator(dispatcher, force)
+        else:
+            summary = run_batch(force)
+        try:
+            archived = archive_finished_events()
+        except Exception:
+            logger.exception("Failed to archive finished events")
+            archived = 0
+        duration_ms = (time.perf_counter() - start) * 1000
+
+    counts = summary.to_dict()
+    cache_stats = s3_cache.take_stats()
+    metrics.emit(
+        metrics.emf_record(
+            {"Mode": "coordinator" if FANOUT_ENABLED else "batch"},
+            {
+                "questsProcessed": counts["processed"],
+                "questsWritten": counts["written"],
+                "questsSkipped": counts["skipped"],
+                "questsFailed": counts["failed"],
+                "questsDeferred": summary.deferred,
+                "runMs": round(duration_ms, 3),
+                "eventsArchived": archived,
+                "s3CacheHits": cache_stats["hits"],
+                "s3CacheMisses": cache_stats["misses"],
+            },
+            failedQuests=[r["questId"] for r in summary.failed],
+        )
+    )
+    logger.info(
+        "Processed %d quest(s) total (%d written, %d skipped), %d failed, %d deferred",
+        counts["processed"],
+        counts["written"],
+        counts["skipped"],
+        counts["failed"],
+        summary.deferred,
+    )
+    return counts
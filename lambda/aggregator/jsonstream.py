@@ -0,0 +1,138 @@
+"""JSON のストリーミング読み書き。
+
+Harvest のレスポンス本文や中間 JSON の全体を1つの文字列としてメモリに載せずに
+読み書きするためのヘルパー。
+"""
+
+import codecs
+import contextlib
+import json
+import tempfile
+from collections.abc import Iterator
+from typing import IO, Any
+
+# ストリームから1回に読み込むバイト数
+CHUNK_SIZE = 64 * 1024
+
+# シリアライズ結果をメモリに保持する上限。超えた分は一時ファイル (/tmp) に書き出す
+SPOOL_MAX_BYTES = 8 * 1024 * 1024
+
+_WHITESPACE = " \t\r\n"
+
+
+def iter_json_array(
+    stream: IO[bytes], hasher: Any = None, chunk_size: int = CHUNK_SIZE
+) -> Iterator:
+    """バイナリストリーム上のトップレベルの JSON 配列を要素ごとに返す。
+
+    chunk_size ずつ読み込みながら要素を1件ずつデコードするため、
+    本文全体のバイト列・文字列を保持しない。
+    hasher (hashlib のハッシュオブジェクト) を渡すと、読み込んだバイト列をすべて入力する。
+    配列の終端以降も末尾まで読み込むため、ジェネレータを最後まで消費すれば本文全体のハッシュになる。
+    不正な JSON の場合は ValueError を送出する。
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    buf = ""
+    pos = 0
+    eof = False
+    # start: "[" 待ち / first: 最初の要素または "]" / value: 要素 / sep: "," または "]" / end: 終端後
+    state = "start"
+
+    while True:
+        while pos < len(buf) and buf[pos] in _WHITESPACE:
+            pos += 1
+        if pos == len(buf):
+            if eof:
+                if state == "end":
+                    return
+                raise ValueError("Unexpected end of JSON array")
+            buf, pos, eof = _fill(stream, utf8, buf, pos, hasher, chunk_size)
+            continue
+
+        if state == "value":
+            try:
+                value, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                buf, pos, eof = _fill(stream, utf8, buf, pos, hasher, chunk_size)
+                continue
+            if end == len(buf) and not eof:
+                # 数値などが chunk 境界で切れていないことを確認するため読み足してやり直す
+                buf, pos, eof = _fill(stream, utf8, buf, pos, hasher, chunk_size)
+                continue
+            pos = end
+            state = "sep"
+            yield value
+            continue
+
+        ch = buf[pos]
+        if state == "start":
+            if ch != "[":
+                raise ValueError(f"Expected JSON array, got {ch!r}")
+            pos += 1
+            state = "first"
+        elif state == "first" and ch == "]":
+            pos += 1
+            state = "end"
+        elif state == "first":
+            state = "value"
+        elif state == "sep" and ch == ",":
+            pos += 1
+            state = "value"
+        elif state == "sep" and ch == "]":
+            pos += 1
+            state = "end"
+        else:
+            raise ValueError(f"Unexpected {ch!r} in JSON array")
+
+
+def _fill(
+    stream: IO[bytes], utf8: Any, buf: str, pos: int, hasher: Any, chunk_size: int
+) -> tuple[str, int, bool]:
+    """ストリームから chunk を読み、未処理部分に連結した (バッファ, 位置, EOF) を返す。"""
+    chunk = stream.read(chunk_size)
+    if hasher is not None and chunk:
+        hasher.update(chunk)
+    if not chunk:
+        return buf[pos:] + utf8.decode(b"", final=True), 0, True
+    return buf[pos:] + utf8.decode(chunk), 0, False
+
+
+def spool_json(data: Any, **kwargs: Any) -> IO[bytes]:
+    """data を UTF-8 の JSON にシリアライズし、先頭にシークしたファイルオブジェクトで返す。
+
+    JSONEncoder.iterencode の断片を順に書き込むため、シリアライズ結果全体の文字列を作らない。
+    SPOOL_MAX_BYTES を超えた場合は一時ファイルに書き出される。kwargs は json.JSONEncoder に渡す。
+    返したファイルオブジェクトは呼び出し側が閉じる。
+    """
+    with contextlib.ExitStack() as stack:
+        # シリアライズに失敗した場合は閉じて一時ファイルを消し、成功した場合は呼び出し側に所有権を渡す
+        spool = stack.enter_context(tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES))
+        pending: list[str] = []
+        pending_len = 0
+        for part in json.JSONEncoder(**kwargs).iterencode(data):
+            pending.append(part)
+            pending_len += len(part)
+            if pending_len >= CHUNK_SIZE:
+                spool.write("".join(pending).encode("utf-8"))
+                pending = []
+                pending_len = 0
+        spool.write("".join(pending).encode("utf-8"))
+        spool.seek(0)
+        stack.pop_all()
+    return spool
+
+
+class CountingReader:
+    """読み込んだバイト数を数えるストリームのラッパー。"""
+
+    def __init__(self, stream: IO[bytes]):
+        self.stream = stream
+        self.bytes_read = 0
+
+    def read(self, size: int = -1) -> bytes:
+        chunk = self.stream.read(size)
+        self.bytes_read += len(chunk)
+        return chunk
@@ -0,0 +1,207 @@
+"""集計処理の段階別の計測と CloudWatch Embedded Metric Format (EMF) での出力。
+
+process_quest() はクエストごとに QuestMetrics を作って current() から参照できるようにし、
+S3 ヘルパー等は stage() でその中の処理時間を記録する。
+計測結果は EMF 形式の JSON 1行として標準出力に書き出す
+(Lambda のロガーは行頭に接頭辞を付けるため、EMF には print を使う)。
+"""
+
+import json
+import logging
+import time
+import tracemalloc
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any
+
+logger = logging.getLogger()
+
+NAMESPACE = "eventstats/aggregator"
+
+# 記録する値の単位 (名前の接尾辞で決める)
+_UNITS = (("Ms", "Milliseconds"), ("Bytes", "Bytes"))
+
+# 呼び出しペイロードの "profile" に指定できる値
+PROFILE_CPROFILE = "cprofile"
+PROFILE_TRACEMALLOC = "tracemalloc"
+PROFILE_TOP_N = 25
+
+_current: ContextVar["QuestMetrics | None"] = ContextVar("quest_metrics", default=None)
+
+
+def _unit(name: str) -> str:
+    for suffix, unit in _UNITS:
+        if name.endswith(suffix):
+            return unit
+    return "Count"
+
+
+def emf_record(dimensions: dict[str, str], values: dict[str, float], **properties: Any) -> dict:
+    """EMF 形式のログレコードを作る。
+
+    values のキーが CloudWatch のメトリクス名になり、単位は名前の接尾辞
+    (Ms: ミリ秒 / Bytes: バイト / それ以外: 個数) で決まる。
+    properties はメトリクスにならない付加情報としてそのまま出力される。
+    """
+    return {
+        "_aws": {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [
+                {
+                    "Namespace": NAMESPACE,
+                    "Dimensions": [list(dimensions)],
+                    "Metrics": [{"Name": name, "Unit": _unit(name)} for name in values],
+                }
+            ],
+        },
+        **dimensions,
+        **values,
+        **properties,
+    }
+
+
+def emit(record: dict) -> None:
+    """ログレコードを JSON 1行で標準出力に書き出す。"""
+    print(json.dumps(record, ensure_ascii=False, separators=(",", ":")), flush=True)
+
+
+class QuestMetrics:
+    """クエスト1件の処理の計測値。
+
+    values には段階ごとの処理時間 (<name>Ms)、バイト数 (<name>Bytes)、件数を累積する。
+    sources にはソースごとの取得結果 (レイテンシ・バイト数・変更有無) を記録する。
+    """
+
+    def __init__(self, event_id: str, quest_id: str):
+        self.event_id = event_id
+        self.quest_id = quest_id
+        self.values: dict[str, float] = {}
+        self.sources: list[dict] = []
+
+    def add(self, name: str, value: float) -> None:
+        self.values[name] = self.values.get(name, 0) + value
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """with ブロックの処理時間を <name>Ms に加算する。"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(f"{name}Ms", (time.perf_counter() - start) * 1000)
+
+    def add_source(self, source_id: str, elapsed: float, bytes_read: int, changed: bool) -> None:
+        self.sources.append(
+            {
+                "sourceId": source_id,
+                "latencyMs": round(elapsed * 1000, 3),
+                "bytes": bytes_read,
+                "changed": changed,
+            }
+        )
+        self.add("fetchMs", elapsed * 1000)
+        self.add("downloadBytes", bytes_read)
+
+    def record(self, status: str) -> dict:
+        """EMF 形式のレコードに変換する。"""
+        return emf_record(
+            {"EventId": self.event_id, "QuestId": self.quest_id},
+            {k: round(v, 3) for k, v in self.values.items()},
+            status=status,
+            sources=self.sources,
+        )
+
+
+def current() -> QuestMetrics | None:
+    """処理中のクエストの QuestMetrics を返す。計測中でなければ None。"""
+    return _current.get()
+
+
+@contextmanager
+def collecting(metrics: QuestMetrics) -> Iterator[QuestMetrics]:
+    """with ブロック内で current() が metrics を返すようにする。
+
+    tracemalloc が有効な場合はブロック内の確保メモリのピークを tracedPeakBytes に記録する。
+    """
+    token = _current.set(metrics)
+    if tracemalloc.is_tracing():
+        tracemalloc.reset_peak()
+    try:
+        yield metrics
+    finally:
+        if tracemalloc.is_tracing():
+            metrics.values["tracedPeakBytes"] = tracemalloc.get_traced_memory()[1]
+        _current.reset(token)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """処理中のクエストがあれば、with ブロックの処理時間をその <name>Ms に加算する。"""
+    metrics = current()
+    if metrics is None:
+        yield
+        return
+    with metrics.stage(name):
+        yield
+
+
+def count(name: str, value: float = 1) -> None:
+    """処理中のクエストがあれば、その name に value を加算する。"""
+    metrics = current()
+    if metrics is not None:
+        metrics.add(name, value)
+
+
+def profile_options(event: Any) -> set[str]:
+    """呼び出しペイロードの "profile" (文字列またはリスト) から有効にするプロファイラを返す。"""
+    if not isinstance(event, dict):
+        return set()
+    value = event.get("profile") or []
+    if isinstance(value, str):
+        value = [value]
+    options = set(value)
+    unknown = options - {PROFILE_CPROFILE, PROFILE_TRACEMALLOC}
+    if unknown:
+        logger.warning("Unknown profile option(s) ignored: %s", sorted(unknown))
+    return options - unknown
+
+
+@contextmanager
+def profiling(options: set[str]) -> Iterator[None]:
+    """指定されたプロファイラを有効にして with ブロックを実行し、結果をログに出力する。
+
+    - cprofile: 累積時間の上位 PROFILE_TOP_N 関数
+    - tracemalloc: 確保メモリのピークと、終了時点の確保量の上位 PROFILE_TOP_N 行
+      (有効な間は QuestMetrics にクエストごとのピークも記録される)
+    """
+    profiler = None
+    if PROFILE_CPROFILE in options:
+        # プロファイラを使わない実行では読み込まない (コールドスタートの短縮)
+        import cProfile
+
+        profiler = cProfile.Profile()
+    trace = PROFILE_TRACEMALLOC in options and not tracemalloc.is_tracing()
+    if trace:
+        tracemalloc.start()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            import io
+            import pstats
+
+            out = io.StringIO()
+            pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(PROFILE_TOP_N)
+            logger.info("cProfile:\n%s", out.getvalue())
+        if trace:
+            snapshot = tracemalloc.take_snapshot()
+            _current_bytes, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            top = snapshot.statistics("lineno")[:PROFILE_TOP_N]
+            logger.info(
+                "tracemalloc: peak %d bytes\n%s", peak, "\n".join(str(stat) for stat in top)
+            )
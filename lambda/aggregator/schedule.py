@@ -0,0 +1,99 @@
+"""クエストごとの更新間隔の決定 (報告の増加ペースに応じた適応スケジューリング)。
+
+集計 Lambda は短い間隔 (tick) で定期実行し、そのたびに更新時期が来たクエストだけを処理する。
+
+- クエストごとに前回更新時の報告数と報告の増加ペース (件/時、指数移動平均) を記録する
+- 次回更新までの間隔は「1回の更新で target_reports 件の新着を取り込む」間隔とし、
+  min_interval 〜 max_interval に収める。イベント終了が近いほど間隔を短くする (残り時間の半分以下)
+- 初回・イベント終了後の初回・グレースピリオド終了前の最後の実行では、ペースに関係なく更新する
+
+状態は JSON にそのまま保存できる dict で扱う。
+"""
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+
+@dataclass(frozen=True)
+class ScheduleConfig:
+    """スケジューリングのパラメータ。
+
+    - tick: 集計 Lambda の定期実行の間隔 (EventBridge のスケジュールと合わせる)
+    - min_interval / max_interval: クエストの更新間隔の下限・上限
+    - target_reports: 1回の更新で取り込む新着報告数の目安
+    - smoothing: 増加ペースの指数移動平均で今回の観測値に掛ける重み
+    """
+
+    tick: timedelta = timedelta(minutes=30)
+    min_interval: timedelta = timedelta(minutes=30)
+    max_interval: timedelta = timedelta(hours=3)
+    target_reports: float = 100.0
+    smoothing: float = 0.5
+
+
+def _hours(delta: timedelta) -> float:
+    return delta.total_seconds() / 3600
+
+
+def refresh_interval(velocity: float, remaining: timedelta, config: ScheduleConfig) -> timedelta:
+    """報告の増加ペース (件/時) とイベント終了までの残り時間から更新間隔を決める。"""
+    if velocity > 0:
+        interval = timedelta(hours=config.target_reports / velocity)
+    else:
+        interval = config.max_interval
+    if remaining > timedelta(0):
+        interval = min(interval, remaining / 2)
+    return max(config.min_interval, min(interval, config.max_interval))
+
+
+def is_due(
+    state: dict | None,
+    now: datetime,
+    end: datetime,
+    grace_end: datetime,
+    config: ScheduleConfig,
+) -> bool:
+    """クエストを今回の実行で更新するかどうかを返す。
+
+    state は前回更新時の状態 (update_state() の戻り値)。未更新のクエストは None。
+    """
+    if state is None:
+        return True
+    # グレースピリオド終了前の最後の実行では必ず更新する
+    if now + config.tick > grace_end:
+        return True
+    last_run = datetime.fromisoformat(state["lastRunAt"])
+    # イベント終了直前の報告を取り込むため、終了後の初回は必ず更新する
+    if last_run < end <= now:
+        return True
+    interval = refresh_interval(state["velocity"], end - now, config)
+    # 実行時刻のずれで1 tick 遅れないよう、半 tick 早めに判定する
+    return now - last_run + config.tick / 2 >= interval
+
+
+def update_state(
+    state: dict | None,
+    report_count: int,
+    now: datetime,
+    start: datetime,
+    config: ScheduleConfig,
+) -> dict:
+    """クエストを更新した後の状態を返す。
+
+    初回はイベント開始からの平均、以降は前回更新からの増加数を指数移動平均したものを増加ペースとする。
+    """
+    if state is None:
+        elapsed = _hours(now - start)
+        velocity = report_count / elapsed if elapsed > 0 else 0.0
+    else:
+        elapsed = _hours(now - datetime.fromisoformat(state["lastRunAt"]))
+        if elapsed > 0:
+            observed = max(0, report_count - state["reportCount"]) / elapsed
+            velocity = config.smoothing * observed + (1 - config.smoothing) * state["velocity"]
+        else:
+            velocity = state["velocity"]
+    return {
+        "lastRunAt": now.isoformat(),
+        "reportCount": report_count,
+        "velocity": round(velocity, 3),
+    }
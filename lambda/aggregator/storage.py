@@ -0,0 +1,240 @@
+"""handler の読み書き先にできる S3 互換クライアント (backfill.py・ベンチマーク・テスト用)。
+
+handler は S3 API のうち get_object / put_object / head_object だけを使う。
+同じ API をローカルで実装し、S3 に接続せずに再集計・計測できるようにする。
+
+- MemoryS3: インメモリ実装 (結果を保存しない計測用)
+- DirS3: ローカルディレクトリ実装 (`aws s3 sync` で取得したファイルもそのまま読める)
+- open_storage: 出力先の指定 (s3://<bucket> / dir:<path> / memory) からクライアントを作る
+
+s3:// の場合だけ boto3 が必要になる。
+"""
+
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any
+
+
+class S3ClientError(Exception):
+    """botocore.exceptions.ClientError と同じ形の例外。"""
+
+    def __init__(self, error_response: dict, operation_name: str):
+        super().__init__(f"{error_response['Error']['Code']} ({operation_name})")
+        self.response = error_response
+        self.operation_name = operation_name
+
+
+def _client_error(code: str, operation: str) -> Exception:
+    # botocore が読み込まれていれば S3 と同じ ClientError で送出する
+    client_error = getattr(sys.modules.get("botocore.exceptions"), "ClientError", S3ClientError)
+    if not (isinstance(client_error, type) and issubclass(client_error, Exception)):
+        client_error = S3ClientError
+    return client_error({"Error": {"Code": code, "Message": code}}, operation)
+
+
+def _etag(body: bytes) -> str:
+    return '"' + hashlib.md5(body).hexdigest() + '"'
+
+
+def _body_bytes(body: Any) -> bytes:
+    if hasattr(body, "read"):
+        body = body.read()
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    return body
+
+
+def _check_put_conditions(current_etag: str | None, kwargs: dict) -> None:
+    """条件付き書き込み (IfMatch / IfNoneMatch: *) の条件を満たさなければ PreconditionFailed を送出する。"""
+    if "IfMatch" in kwargs and (current_etag is None or current_etag != kwargs["IfMatch"]):
+        raise _client_error("PreconditionFailed", "PutObject")
+    if kwargs.get("IfNoneMatch") == "*" and current_etag is not None:
+        raise _client_error("PreconditionFailed", "PutObject")
+
+
+class _Body:
+    def __init__(self, data: bytes):
+        self._data = data
+
+    def read(self) -> bytes:
+        return self._data
+
+
+class MemoryS3:
+    """S3 クライアントのインメモリ実装。
+
+    条件付き読み込み (IfNoneMatch)・条件付き書き込み (IfMatch / IfNoneMatch) と ETag に対応する。
+    呼び出し回数と転送バイト数を stats に記録する。
+    """
+
+    def __init__(self):
+        self.objects: dict[str, dict[str, Any]] = {}
+        self.stats = {"get": 0, "put": 0, "head": 0, "bytesIn": 0, "bytesOut": 0}
+        self._lock = threading.Lock()
+
+    def put_json(self, key: str, data: Any) -> None:
+        """テスト・ベンチマークの準備用に JSON を直接格納する。"""
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self._store(key, body, {}, "application/json", None)
+
+    def get_json(self, key: str) -> Any:
+        return json.loads(self.objects[key]["Body"].decode("utf-8"))
+
+    def _store(self, key, body, metadata, content_type, content_encoding) -> str:
+        etag = _etag(body)
+        self.objects[key] = {
+            "Body": body,
+            "ETag": etag,
+            "Metadata": dict(metadata or {}),
+            "ContentType": content_type,
+            "ContentEncoding": content_encoding,
+        }
+        return etag
+
+    def get_object(self, Bucket: str, Key: str, **kwargs: Any) -> dict:
+        with self._lock:
+            self.stats["get"] += 1
+            obj = self.objects.get(Key)
+            if obj is None:
+                raise _client_error("NoSuchKey", "GetObject")
+            if kwargs.get("IfNoneMatch") == obj["ETag"]:
+                raise _client_error("304", "GetObject")
+            self.stats["bytesOut"] += len(obj["Body"])
+            return {**obj, "Body": _Body(obj["Body"])}
+
+    def head_object(self, Bucket: str, Key: str, **kwargs: Any) -> dict:
+        with self._lock:
+            self.stats["head"] += 1
+            obj = self.objects.get(Key)
+            if obj is None:
+                raise _client_error("404", "HeadObject")
+            return {k: v for k, v in obj.items() if k != "Body"}
+
+    def put_object(self, Bucket: str, Key: str, Body: Any, **kwargs: Any) -> dict:
+        Body = _body_bytes(Body)
+        with self._lock:
+            self.stats["put"] += 1
+            self.stats["bytesIn"] += len(Body)
+            current = self.objects.get(Key)
+            _check_put_conditions(current["ETag"] if current else None, kwargs)
+            etag = self._store(
+                Key,
+                Body,
+                kwargs.get("Metadata"),
+                kwargs.get("ContentType"),
+                kwargs.get("ContentEncoding"),
+            )
+            return {"ETag": etag}
+
+
+class DirS3:
+    """S3 クライアントのローカルディレクトリ実装。
+
+    オブジェクトの本文は root/<キー> にそのまま保存し、オブジェクトメタデータ・Content-Type 等は
+    root/.s3meta/<キー>.json に保存する。ETag は本文の MD5 から求める。
+    `aws s3 sync` で取得したファイル (メタデータなし) もそのまま読める。
+    本文は一時ファイルに書いてから置き換えるため、複数プロセスから異なるキーに並行して書き込める。
+    条件付き書き込みの判定と書き込みはアトミックではない。
+    """
+
+    META_DIR = ".s3meta"
+
+    def __init__(self, root: str | Path):
+        self.root = Path(root)
+
+    def _path(self, key: str) -> Path:
+        path = self.root / key
+        if self.root.resolve() not in path.resolve().parents:
+            raise ValueError(f"Invalid key: {key!r}")
+        return path
+
+    def _meta_path(self, key: str) -> Path:
+        return self.root / self.META_DIR / f"{key}.json"
+
+    def _load(self, key: str) -> tuple[bytes, dict] | None:
+        try:
+            body = self._path(key).read_bytes()
+        except FileNotFoundError:
+            return None
+        etag = _etag(body)
+        try:
+            meta = json.loads(self._meta_path(key).read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            meta = {}
+        # 本文だけ置き換えられていた場合 (aws s3 sync 等) は古いメタデータを使わない
+        if meta.get("ETag") != etag:
+            meta = {}
+        return body, {
+            "ETag": etag,
+            "Metadata": meta.get("Metadata", {}),
+            "ContentType": meta.get("ContentType"),
+            "ContentEncoding": meta.get("ContentEncoding"),
+        }
+
+    @staticmethod
+    def _write_atomic(path: Path, data: bytes) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def get_object(self, Bucket: str, Key: str, **kwargs: Any) -> dict:
+        loaded = self._load(Key)
+        if loaded is None:
+            raise _client_error("NoSuchKey", "GetObject")
+        body, attrs = loaded
+        if kwargs.get("IfNoneMatch") == attrs["ETag"]:
+            raise _client_error("304", "GetObject")
+        return {**attrs, "Body": _Body(body)}
+
+    def head_object(self, Bucket: str, Key: str, **kwargs: Any) -> dict:
+        loaded = self._load(Key)
+        if loaded is None:
+            raise _client_error("404", "HeadObject")
+        return loaded[1]
+
+    def put_object(self, Bucket: str, Key: str, Body: Any, **kwargs: Any) -> dict:
+        body = _body_bytes(Body)
+        path = self._path(Key)
+        current = self._load(Key)
+        _check_put_conditions(current[1]["ETag"] if current else None, kwargs)
+        etag = _etag(body)
+        self._write_atomic(path, body)
+        meta = {
+            "ETag": etag,
+            "Metadata": dict(kwargs.get("Metadata") or {}),
+            "ContentType": kwargs.get("ContentType"),
+            "ContentEncoding": kwargs.get("ContentEncoding"),
+        }
+        self._write_atomic(
+            self._meta_path(Key), json.dumps(meta, ensure_ascii=False).encode("utf-8")
+        )
+        return {"ETag": etag}
+
+
+def open_storage(spec: str) -> tuple[Any, str]:
+    """出力先の指定から (S3 互換クライアント, バケット名) を返す。
+
+    s3:// で boto3 がインストールされていない場合は RuntimeError を送出する。
+    """
+    if spec.startswith("s3://"):
+        try:
+            import boto3
+        except ImportError as e:
+            raise RuntimeError("boto3 is required to use s3:// storage") from e
+        return boto3.client("s3"), spec[len("s3://") :].rstrip("/")
+    if spec.startswith("dir:"):
+        return DirS3(spec[len("dir:") :]), "local"
+    if spec == "memory":
+        return MemoryS3(), "memory"
+    raise ValueError(f"Unknown storage: {spec!r} (s3://<bucket>, dir:<path> or memory)")
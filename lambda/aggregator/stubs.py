@@ -0,0 +1,122 @@
+"""ベンチマーク・テスト用の Harvest / AWS の代替実装。
+
+- HarvestStub: Harvest API (`/harvest/contents/quest/<id>.json`) を返すローカル HTTP サーバー
+- install_aws_stubs: boto3 / botocore がない環境に最小限の代替モジュールを登録する
+  (Lambda ランタイムには boto3 が含まれる)
+
+S3 の代替 (MemoryS3 / DirS3) は storage.py にある。
+"""
+
+import hashlib
+import json
+import sys
+import threading
+import types
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Self
+
+from storage import MemoryS3, S3ClientError
+
+
+def install_aws_stubs() -> None:
+    """boto3 / botocore がインストールされていなければ代替モジュールを登録する。
+
+    boto3.client() は MemoryS3 を返す。実際の S3 には接続しない。
+    """
+    try:
+        import boto3
+        import botocore.exceptions
+
+        return
+    except ImportError:
+        pass
+
+    exceptions = types.ModuleType("botocore.exceptions")
+    exceptions.ClientError = S3ClientError
+    botocore = types.ModuleType("botocore")
+    botocore.exceptions = exceptions
+    boto3 = types.ModuleType("boto3")
+    boto3.client = lambda service, *args, **kwargs: MemoryS3()
+    sys.modules.setdefault("botocore", botocore)
+    sys.modules.setdefault("botocore.exceptions", exceptions)
+    sys.modules.setdefault("boto3", boto3)
+
+
+def _etag(body: bytes) -> str:
+    return '"' + hashlib.md5(body).hexdigest() + '"'
+
+
+class HarvestStub:
+    """Harvest API を模したローカル HTTP サーバー。
+
+    sources[source_id] の報告リストを `/harvest/contents/quest/<source_id>.json` で返す。
+    ETag / Last-Modified を付与し、If-None-Match が一致すれば 304 を返す。
+    with 文で使うとバックグラウンドスレッドで起動・停止する。
+    """
+
+    def __init__(self, sources: dict[str, list[dict]]):
+        self.bodies: dict[str, bytes] = {}
+        self.requests = 0
+        self.not_modified = 0
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        self.last_modified = formatdate(usegmt=True)
+        for sid, reports in sources.items():
+            self.set_source(sid, reports)
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def set_source(self, source_id: str, reports: list[dict]) -> None:
+        self.bodies[source_id] = json.dumps(reports, ensure_ascii=False).encode("utf-8")
+
+    @property
+    def url_template(self) -> str:
+        """handler.HARVEST_QUEST_URL と同じ形式の URL テンプレート。"""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/harvest/contents/quest/{{quest_id}}.json"
+
+    def __enter__(self) -> Self:
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler_class(self) -> type:
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                prefix, suffix = "/harvest/contents/quest/", ".json"
+                sid = self.path[len(prefix) : -len(suffix)]
+                body = stub.bodies.get(sid) if self.path.startswith(prefix) else None
+                with stub._lock:
+                    stub.requests += 1
+                if body is None:
+                    self.send_error(404)
+                    return
+                etag = _etag(body)
+                if self.headers.get("If-None-Match") == etag:
+                    with stub._lock:
+                        stub.not_modified += 1
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("ETag", etag)
+                self.send_header("Last-Modified", stub.last_modified)
+                self.end_headers()
+                self.wfile.write(body)
+                with stub._lock:
+                    stub.bytes_sent += len(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
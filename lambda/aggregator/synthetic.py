@@ -0,0 +1,145 @@
+"""ベンチマーク・テスト用の合成 Harvest データ。
+
+Harvest API のレスポンス (SPEC.md 4章) と同じ形式の報告を乱数で生成する。
+同じ引数・seed からは常に同じデータが得られる。
+"""
+
+import random
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+JST = timezone(timedelta(hours=9))
+
+DEFAULT_EVENT_ITEMS = ("ぐん肥", "ミトン", "三角巾")
+DEFAULT_MATERIALS = ("心臓", "灰", "鎖", "塵", "牙", "羽根", "歯車", "頁", "ランプ", "種")
+
+
+@dataclass
+class SyntheticConfig:
+    """合成データの生成条件。
+
+    - raw_rate: 枠数報告ではなく実数報告 (添字なしイベントアイテム) になる報告の割合
+    - nan_rate: 各アイテムの値が "NaN" になる確率
+    - duplicate_rate: 追加ソースの報告のうち、メインソースの報告と同じ ID を持つものの割合
+    """
+
+    reports: int = 1000
+    sources: int = 1
+    event_items: tuple[str, ...] = DEFAULT_EVENT_ITEMS
+    materials: tuple[str, ...] = DEFAULT_MATERIALS
+    materials_per_report: int = 5
+    box_counts: tuple[int, ...] = (1, 2, 3)
+    point_bonuses: tuple[int, ...] = (400, 600)
+    raw_rate: float = 0.1
+    nan_rate: float = 0.02
+    duplicate_rate: float = 0.0
+    seed: int = 0
+    reporters: int = 200
+
+
+class SyntheticHarvest:
+    """SyntheticConfig に従って Harvest 形式の報告を生成する。"""
+
+    def __init__(self, config: SyntheticConfig):
+        self.config = config
+        self.rng = random.Random(config.seed)
+
+    def _uuid(self) -> str:
+        return str(uuid.UUID(int=self.rng.getrandbits(128), version=4))
+
+    def _value(self, high: int) -> str:
+        if self.rng.random() < self.config.nan_rate:
+            return "NaN"
+        return str(self.rng.randint(0, high))
+
+    def report(self, quest_id: str, report_id: str | None = None) -> dict:
+        """Harvest 形式の報告を1件生成する。"""
+        config = self.config
+        rng = self.rng
+        items: dict[str, str] = {}
+        if rng.random() < config.raw_rate:
+            for name in config.event_items:
+                items[name] = self._value(500)
+        else:
+            for name in config.event_items:
+                for box in config.box_counts:
+                    items[f"{name}(x{box})"] = self._value(200)
+        if config.point_bonuses:
+            items[f"ポイント(+{rng.choice(config.point_bonuses)})"] = self._value(100)
+        items["QP(+2000000)"] = self._value(50)
+        count = min(config.materials_per_report, len(config.materials))
+        for name in rng.sample(config.materials, count):
+            items[name] = self._value(30)
+
+        rid = report_id or self._uuid()
+        reporter = rng.randrange(config.reporters)
+        timestamp = datetime(2026, 1, 1, tzinfo=JST) + timedelta(seconds=rng.randrange(14 * 86400))
+        return {
+            "id": rid,
+            "report_id": rid,
+            "reporter": f"user{reporter}",
+            "reporter_id": self._uuid(),
+            "reporter_name": f"ユーザー{reporter}",
+            "runcount": rng.choice((10, 50, 100, 300, 1000)),
+            "items": items,
+            "note": "",
+            "timestamp": timestamp.isoformat(),
+            "quest_id": quest_id,
+        }
+
+    def quest_sources(self, quest_id: str) -> dict[str, list[dict]]:
+        """クエスト1件分の {ソース ID: 報告リスト} を生成する。
+
+        config.reports 件をソースに均等に振り分け、追加ソースの報告の一部
+        (duplicate_rate) はメインソースの報告 ID を再利用する。
+        """
+        config = self.config
+        ids = source_ids(quest_id, config.sources)
+        per_source = [config.reports // len(ids)] * len(ids)
+        per_source[0] += config.reports - sum(per_source)
+
+        main = [self.report(ids[0]) for _ in range(per_source[0])]
+        result = {ids[0]: main}
+        for sid, count in zip(ids[1:], per_source[1:]):
+            reports = []
+            for _ in range(count):
+                dup_id = None
+                if main and self.rng.random() < config.duplicate_rate:
+                    dup_id = self.rng.choice(main)["id"]
+                reports.append(self.report(sid, dup_id))
+            result[sid] = reports
+        return result
+
+
+def source_ids(quest_id: str, sources: int) -> list[str]:
+    """クエストのソース ID リストを返す。先頭が questId、残りが追加ソース。"""
+    return [quest_id] + [f"{quest_id}-{i}" for i in range(1, sources)]
+
+
+def make_events(quest_sources: dict[str, list[str]], event_id: str = "bench") -> dict:
+    """{questId: ソース ID リスト} から現在アクティブな events.json を生成する。"""
+    now = datetime.now(JST)
+    return {
+        "events": [
+            {
+                "eventId": event_id,
+                "name": "Synthetic Event",
+                "period": {
+                    "start": (now - timedelta(days=1)).isoformat(),
+                    "end": (now + timedelta(days=1)).isoformat(),
+                },
+                "eventItems": [],
+                "quests": [
+                    {
+                        "questId": quest_id,
+                        "name": f"Quest {quest_id}",
+                        "level": "90+",
+                        "ap": 40,
+                        "additionalSourceQuestIds": sids[1:],
+                    }
+                    for quest_id, sids in quest_sources.items()
+                ],
+            }
+        ]
+    }
@@ -0,0 +1,134 @@
+"""archive.py のユニットテスト"""
+
+import json
+
+import pytest
+
+from archive import (
+    ARCHIVE_INDEX_KEY,
+    COLUMNS,
+    ArchiveReader,
+    EventArchiveBuilder,
+    archive_column_key,
+    archive_meta_key,
+    index_entry,
+)
+from compact import dumps_gzip, loads_gzip
+
+EVENT = {
+    "eventId": "ev1",
+    "name": "E1",
+    "period": {"start": "2026-02-01T18:00:00+09:00", "end": "2026-02-14T12:59:00+09:00"},
+}
+
+
+def _output(quest_id: str, reports: list[dict]) -> dict:
+    return {
+        "quest": {"questId": quest_id, "name": f"Q{quest_id}", "level": "90+", "ap": 40},
+        "lastUpdated": "2026-02-14T17:00:00+09:00",
+        "reports": reports,
+    }
+
+
+def _report(rid: str, reporter: str, runcount: int, items: dict) -> dict:
+    return {
+        "id": rid,
+        "reporter": reporter,
+        "reporterName": "",
+        "runcount": runcount,
+        "timestamp": "2026-02-08T16:17:03+09:00",
+        "note": "",
+        "items": items,
+        "warnings": [],
+    }
+
+
+def _build() -> tuple[dict, dict[str, list]]:
+    with EventArchiveBuilder(EVENT) as builder:
+        builder.add_quest(
+            _output(
+                "AAA",
+                [
+                    _report("r1", "u1", 100, {"心臓": 3, "ぐん肥(x3)": 40}),
+                    _report("r2", "u2", 50, {"心臓": None}),
+                ],
+            ),
+            {"r2"},
+        )
+        builder.add_quest(_output("BBB", [_report("r3", "u1", 10, {"心臓": 1})]), set())
+        meta, columns = builder.build()
+        return meta, {name: loads_gzip(body.read()) for name, body in columns.items()}
+
+
+def test_rows_are_report_times_item():
+    meta, columns = _build()
+    assert meta["rowCount"] == 4
+    assert list(columns) == list(COLUMNS)
+    assert all(len(values) == 4 for values in columns.values())
+    assert columns["reportId"] == ["r1", "r1", "r2", "r3"]
+    assert columns["count"] == [3, 40, None, 1]
+    assert columns["excluded"] == [0, 0, 1, 0]
+    assert columns["timestamp"][0] == 1770535023
+
+
+def test_quests_without_reports_leave_columns_empty():
+    with EventArchiveBuilder(EVENT) as builder:
+        builder.add_quest(_output("AAA", []), set())
+        meta, columns = builder.build()
+        assert meta["rowCount"] == 0
+        assert all(loads_gzip(body.read()) == [] for body in columns.values())
+    assert meta["quests"][0]["reportCount"] == 0
+
+
+def test_string_columns_dictionary_encoded():
+    meta, columns = _build()
+    dictionaries = meta["dictionaries"]
+    assert dictionaries["questId"] == ["AAA", "BBB"]
+    assert dictionaries["reporter"] == ["u1", "u2"]
+    assert dictionaries["itemName"] == ["心臓", "ぐん肥(x3)"]
+    assert columns["questId"] == [0, 0, 0, 1]
+    assert columns["itemName"] == [0, 1, 0, 0]
+
+
+def test_quest_totals_skip_excluded_reports():
+    meta, _ = _build()
+    (aaa, bbb) = meta["quests"]
+    assert (aaa["reportCount"], aaa["validReportCount"], aaa["totalRuns"]) == (2, 1, 100)
+    assert (bbb["questId"], bbb["totalRuns"]) == ("BBB", 10)
+
+
+def test_index_entry_lists_item_names():
+    meta, _ = _build()
+    entry = index_entry(meta, "2026-02-15T00:00:00+09:00")
+    assert entry["itemNames"] == ["ぐん肥(x3)", "心臓"]
+    assert entry["reportCount"] == 3
+
+
+def test_reader_loads_only_requested_columns():
+    meta, columns = _build()
+    store = {
+        ARCHIVE_INDEX_KEY: json.dumps({"events": {"ev1": index_entry(meta, "")}}).encode(),
+        archive_meta_key("ev1"): json.dumps(meta).encode(),
+    }
+    for name, values in columns.items():
+        store[archive_column_key("ev1", name)] = dumps_gzip(values)
+    read_keys = []
+
+    def read(key):
+        read_keys.append(key)
+        return store.get(key)
+
+    reader = ArchiveReader(read)
+    assert list(reader.index()) == ["ev1"]
+    assert reader.column("ev1", "count") == [3, 40, None, 1]
+    assert reader.dictionary("ev1", "questId") == ["AAA", "BBB"]
+    reader.column("ev1", "count")
+    assert read_keys == [
+        ARCHIVE_INDEX_KEY,
+        archive_column_key("ev1", "count"),
+        archive_meta_key("ev1"),
+    ]
+    with pytest.raises(ValueError):
+        reader.column("ev1", "note")
+    with pytest.raises(KeyError):
+        reader.meta("missing")
@@ -0,0 +1,98 @@
+"""archive_query.py のユニットテスト"""
+
+import json
+
+import pytest
+
+from archive import (
+    ARCHIVE_INDEX_KEY,
+    EventArchiveBuilder,
+    archive_column_key,
+    archive_meta_key,
+    index_entry,
+)
+from archive_query import dir_reader, item_drop_rates, main, scan
+
+
+def _report(rid: str, runcount: int, items: dict) -> dict:
+    return {
+        "id": rid,
+        "reporter": f"u-{rid}",
+        "reporterName": "",
+        "runcount": runcount,
+        "timestamp": "2026-02-08T16:17:03+09:00",
+        "note": "",
+        "items": items,
+        "warnings": [],
+    }
+
+
+def _write_event(root, event_id: str, quests: dict[str, list[dict]], excluded=frozenset()):
+    (root / "archive" / event_id).mkdir(parents=True)
+    with EventArchiveBuilder({"eventId": event_id, "name": event_id, "period": {}}) as builder:
+        for quest_id, reports in quests.items():
+            output = {"quest": {"questId": quest_id, "name": f"Q{quest_id}"}, "reports": reports}
+            builder.add_quest(output, set(excluded))
+        meta, columns = builder.build()
+        for name, body in columns.items():
+            (root / archive_column_key(event_id, name)).write_bytes(body.read())
+    (root / archive_meta_key(event_id)).write_text(json.dumps(meta), encoding="utf-8")
+    return index_entry(meta, "")
+
+
+@pytest.fixture
+def archive_dir(tmp_path):
+    index = {
+        "ev1": _write_event(
+            tmp_path,
+            "ev1",
+            {
+                "AAA": [
+                    _report("r1", 100, {"心臓": 3, "牙": 5}),
+                    _report("r2", 50, {"心臓": None}),
+                    _report("r3", 40, {"心臓": 900}),
+                ]
+            },
+            excluded={"r3"},
+        ),
+        "ev2": _write_event(tmp_path, "ev2", {"BBB": [_report("r4", 200, {"心臓": 10})]}),
+        "ev3": _write_event(tmp_path, "ev3", {"CCC": [_report("r5", 10, {"牙": 1})]}),
+    }
+    (tmp_path / ARCHIVE_INDEX_KEY).write_text(json.dumps({"events": index}), encoding="utf-8")
+    return tmp_path
+
+
+def test_drop_rate_across_events(archive_dir):
+    rows = item_drop_rates(dir_reader(archive_dir), "心臓")
+    assert [(r["eventId"], r["questId"]) for r in rows] == [("ev1", "AAA"), ("ev2", "BBB")]
+    ev1 = rows[0]
+    # null の報告 (r2) と除外された報告 (r3) は含めない
+    assert (ev1["reportCount"], ev1["totalDrops"], ev1["totalRuns"]) == (1, 3, 100)
+    assert ev1["questName"] == "QAAA"
+    assert rows[1]["dropRate"] == pytest.approx(0.05)
+
+
+def test_drop_rate_include_excluded(archive_dir):
+    rows = item_drop_rates(dir_reader(archive_dir), "心臓", events=["ev1"], include_excluded=True)
+    assert (rows[0]["totalDrops"], rows[0]["totalRuns"]) == (903, 140)
+
+
+def test_events_without_item_are_not_read(archive_dir):
+    (archive_dir / archive_meta_key("ev3")).unlink()
+    assert len(item_drop_rates(dir_reader(archive_dir), "心臓")) == 2
+
+
+def test_scan_decodes_dictionary_columns(archive_dir):
+    rows = list(scan(dir_reader(archive_dir), ["questId", "reportId", "count"], item_name="牙"))
+    assert rows == [
+        {"eventId": "ev1", "questId": "AAA", "reportId": "r1", "count": 5},
+        {"eventId": "ev3", "questId": "CCC", "reportId": "r5", "count": 1},
+    ]
+
+
+def test_cli_drop_rate(archive_dir, capsys):
+    assert main(["--dir", str(archive_dir), "drop-rate", "心臓"]) == 0
+    out, err = capsys.readouterr()
+    assert out.splitlines()[1].split("\t")[:2] == ["ev1", "AAA"]
+    assert "# total\t13\t300" in err
+    assert main(["--dir", str(archive_dir), "drop-rate", "存在しない"]) == 1
@@ -0,0 +1,184 @@
+"""backfill.py のユニットテスト"""
+
+import hashlib
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from backfill import read_snapshot, select_tasks, summarize
+
+BACKFILL = Path(__file__).resolve().parent / "backfill.py"
+
+EVENTS = {
+    "events": [
+        {
+            "eventId": "ev1",
+            "name": "Event 1",
+            "period": {"start": "2025-01-01T00:00:00+09:00", "end": "2025-01-14T00:00:00+09:00"},
+            "eventItems": [],
+            "quests": [
+                {"questId": "Q1", "name": "Quest 1", "level": "90+", "ap": 40},
+                {
+                    "questId": "Q2",
+                    "name": "Quest 2",
+                    "level": "90++",
+                    "ap": 40,
+                    "additionalSourceQuestIds": ["Q2b"],
+                },
+            ],
+        },
+        {
+            "eventId": "ev2",
+            "name": "Event 2",
+            "period": {"start": "2025-02-01T00:00:00+09:00", "end": "2025-02-14T00:00:00+09:00"},
+            "eventItems": ["ぐん肥"],
+            "quests": [{"questId": "Q3", "name": "Quest 3", "level": "90+", "ap": 40}],
+        },
+    ]
+}
+
+
+def _harvest_report(rid: str, runcount: int, items: dict) -> dict:
+    return {
+        "id": rid,
+        "quest_id": "ignored",
+        "reporter": f"u-{rid}",
+        "reporter_name": "",
+        "runcount": runcount,
+        "items": items,
+        "note": "",
+        "timestamp": "2025-01-05T12:00:00+09:00",
+    }
+
+
+SNAPSHOTS = {
+    "Q1": [
+        _harvest_report("r1", 10, {"ぐん肥(x3)": "12", "心臓": "2"}),
+        _harvest_report("r2", 20, {"ぐん肥(x3)": "30", "心臓": "NaN"}),
+    ],
+    "Q2": [_harvest_report("r3", 5, {"心臓": "1"})],
+    "Q2b": [_harvest_report("r3", 5, {"心臓": "1"}), _harvest_report("r4", 5, {"心臓": "0"})],
+}
+
+
+def test_select_tasks_filters_events_and_quests():
+    assert [(e, q["questId"]) for e, q, _ in select_tasks(EVENTS)] == [
+        ("ev1", "Q1"),
+        ("ev1", "Q2"),
+        ("ev2", "Q3"),
+    ]
+    assert [q["questId"] for _, q, _ in select_tasks(EVENTS, event_ids=["ev2"])] == ["Q3"]
+    tasks = select_tasks(EVENTS, quest_ids=["Q2", "Q3"])
+    assert [q["questId"] for _, q, _ in tasks] == ["Q2", "Q3"]
+    assert tasks[1][2] == {"ぐん肥"}
+    assert select_tasks(EVENTS, event_ids=["missing"]) == []
+
+
+def test_read_snapshot_hashes_body(tmp_path):
+    body = json.dumps(SNAPSHOTS["Q1"]).encode("utf-8")
+    (tmp_path / "Q1.json").write_bytes(body)
+    fetched = read_snapshot(tmp_path, "Q1")
+    assert fetched.source_id == "Q1"
+    assert [r["id"] for r in fetched.reports] == ["r1", "r2"]
+    # 読み込み時に不要なフィールドを落とす
+    assert "quest_id" not in fetched.reports[0]
+    assert fetched.content_hash == hashlib.sha256(body).hexdigest()
+    assert fetched.bytes_read == len(body)
+
+
+def test_summarize_counts_statuses_and_throughput():
+    results = [
+        {"status": "written", "reports": 300},
+        {"status": "skipped", "reports": 100},
+        {"status": "failed", "reports": 0},
+    ]
+    summary = summarize(results, 2.0, 4)
+    assert summary["quests"] == 3
+    assert (summary["written"], summary["skipped"], summary["failed"]) == (1, 1, 1)
+    assert summary["reports"] == 400
+    assert summary["reportsPerSecond"] == 200.0
+    assert summary["workers"] == 4
+
+
+@pytest.fixture
+def workspace(tmp_path):
+    data = tmp_path / "data"
+    snapshots = tmp_path / "snapshots"
+    data.mkdir()
+    snapshots.mkdir()
+    (data / "events.json").write_text(json.dumps(EVENTS, ensure_ascii=False), encoding="utf-8")
+    (data / "exclusions").mkdir()
+    (data / "exclusions" / "Q1.json").write_text(
+        json.dumps([{"reportId": "r2", "reason": "test"}]), encoding="utf-8"
+    )
+    for sid, reports in SNAPSHOTS.items():
+        (snapshots / f"{sid}.json").write_text(json.dumps(reports, ensure_ascii=False), "utf-8")
+    return tmp_path
+
+
+def _run(workspace: Path, *args: str) -> subprocess.CompletedProcess:
+    # test_handler が boto3 をモックに差し替えるため、別プロセスで実行する
+    return subprocess.run(
+        [
+            sys.executable,
+            str(BACKFILL),
+            "--storage",
+            f"dir:{workspace / 'data'}",
+            "--snapshots",
+            str(workspace / "snapshots"),
+            *args,
+        ],
+        cwd=workspace,
+        capture_output=True,
+        check=False,
+        text=True,
+        timeout=120,
+    )
+
+
+@pytest.mark.parametrize("workers", ["1", "2"])
+def test_cli_rebuilds_event_from_snapshots(workspace, workers):
+    proc = _run(workspace, "--event", "ev1", "--workers", workers, "--archive", "-o", "out.json")
+    assert proc.returncode == 0, proc.stderr
+    rows = sorted(line.split("\t")[:4] for line in proc.stdout.splitlines()[1:])
+    assert rows == [["ev1", "Q1", "written", "2"], ["ev1", "Q2", "written", "2"]]
+    # クエストごとの EMF は標準出力に出さない
+    assert "_aws" not in proc.stdout
+
+    data = workspace / "data"
+    q2 = json.loads((data / "ev1" / "Q2.json").read_text(encoding="utf-8"))
+    assert [r["id"] for r in q2["reports"]] == ["r3", "r4"]
+    stats = json.loads((data / "ev1" / "Q1.stats.json").read_text(encoding="utf-8"))
+    assert stats["validReportCount"] == 1
+    rollup = json.loads((data / "ev1" / "rollup.json").read_text(encoding="utf-8"))
+    assert [q["questId"] for q in rollup["quests"]] == ["Q1", "Q2"]
+    manifest = json.loads((data / "ev1" / "manifest.json").read_text(encoding="utf-8"))
+    assert [(q["questId"], q["reportCount"]) for q in manifest["quests"]] == [("Q1", 2), ("Q2", 2)]
+    assert manifest["quests"][0]["bytes"] == (data / "ev1" / "Q1.json").stat().st_size
+    index = json.loads((data / "archive" / "_index.json").read_text(encoding="utf-8"))
+    assert list(index["events"]) == ["ev1"]
+    assert not (data / "ev2").exists()
+
+    summary = json.loads((workspace / "out.json").read_text(encoding="utf-8"))["summary"]
+    assert summary["reports"] == 4
+    assert summary["eventsArchived"] == 1
+
+    # 内容が同一なら書き込まない
+    proc = _run(workspace, "--event", "ev1", "--workers", workers)
+    assert proc.returncode == 0, proc.stderr
+    assert [line.split("\t")[2] for line in proc.stdout.splitlines()[1:]] == ["skipped"] * 2
+
+
+def test_cli_reports_failed_quests(workspace):
+    proc = _run(workspace, "--quest", "Q3", "--workers", "1")
+    assert proc.returncode == 1
+    assert proc.stdout.splitlines()[1].split("\t")[:3] == ["ev2", "Q3", "failed"]
+
+
+def test_cli_without_selection_match(workspace):
+    proc = _run(workspace, "--event", "missing")
+    assert proc.returncode == 1
+    assert "No quests selected" in proc.stderr
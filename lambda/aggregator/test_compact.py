@@ -0,0 +1,76 @@
+"""compact.py のユニットテスト"""
+
+import pytest
+
+from compact import decode_quest_output, dumps_gzip, encode_quest_output, loads_gzip
+
+
+def _make_output() -> dict:
+    return {
+        "quest": {"questId": "AAA", "name": "Q1", "level": "90+", "ap": 40},
+        "lastUpdated": "2026-02-08T17:30:00+09:00",
+        "reports": [
+            {
+                "id": "r1",
+                "reporter": "u1",
+                "reporterName": "user1",
+                "runcount": 100,
+                "timestamp": "2026-02-08T16:17:03+09:00",
+                "note": "",
+                "items": {"礼装": 3, "心臓": 33, "ぐん肥(x3)": 1099},
+                "warnings": [],
+            },
+            {
+                "id": "r2",
+                "reporter": "u2",
+                "reporterName": "user2",
+                "runcount": 500,
+                "timestamp": "2026-02-08T12:36:05+09:00",
+                "note": "心臓泥UP",
+                "items": {"礼装": None, "心臓": 154, "灰": 0.5},
+                "warnings": ["excluded_items:ぐん肥(実数報告のため除外)"],
+            },
+        ],
+    }
+
+
+def test_item_names_dictionary_encoded():
+    compact = encode_quest_output(_make_output())
+    assert compact["itemNames"] == ["礼装", "心臓", "ぐん肥(x3)", "灰"]
+    assert compact["items"] == [[3, None], [33, 154], [1099, None], [None, 0.5]]
+    assert compact["nullItems"] == [[1], [], [], []]
+
+
+def test_round_trip():
+    output = _make_output()
+    assert decode_quest_output(encode_quest_output(output)) == output
+
+
+def test_round_trip_keeps_cursor():
+    output = {**_make_output(), "cursor": {"seq": 3, "base": 1}}
+    assert decode_quest_output(encode_quest_output(output)) == output
+
+
+def test_round_trip_distinguishes_missing_and_null():
+    """キーなしと値 null (NaN) を区別して復元する"""
+    decoded = decode_quest_output(encode_quest_output(_make_output()))
+    assert "ぐん肥(x3)" not in decoded["reports"][1]["items"]
+    assert decoded["reports"][1]["items"]["礼装"] is None
+
+
+def test_round_trip_empty():
+    output = {**_make_output(), "reports": []}
+    assert decode_quest_output(encode_quest_output(output)) == output
+
+
+def test_gzip_round_trip_is_deterministic():
+    compact = encode_quest_output(_make_output())
+    body = dumps_gzip(compact)
+    assert body == dumps_gzip(compact)
+    assert decode_quest_output(loads_gzip(body)) == _make_output()
+
+
+def test_unsupported_version():
+    compact = {**encode_quest_output(_make_output()), "version": 999}
+    with pytest.raises(ValueError):
+        decode_quest_output(compact)
@@ -0,0 +1,108 @@
+"""delta.py のユニットテスト"""
+
+from typing import ClassVar
+
+import pytest
+
+from delta import advance_cursor, apply_delta, delta_key, diff_reports, sync_quest_output
+
+
+def _report(rid: str, count: int = 1) -> dict:
+    return {"id": rid, "runcount": 10, "items": {"心臓": count}}
+
+
+PREV = [_report("r1"), _report("r2"), _report("r3")]
+
+
+def test_delta_key():
+    assert delta_key("ev1", "AAA", 12) == "deltas/ev1/AAA/00000012.json"
+
+
+@pytest.mark.parametrize(
+    "reports",
+    [
+        PREV + [_report("r4")],
+        [PREV[0], _report("r2", 5), PREV[2]],
+        [PREV[0], PREV[2]],
+        [_report("r4"), PREV[1], PREV[0]],
+        [],
+    ],
+    ids=["added", "changed", "removed", "reordered", "emptied"],
+)
+def test_apply_delta_restores_reports(reports):
+    delta = diff_reports(PREV, reports)
+    assert apply_delta(PREV, delta) == reports
+
+
+def test_diff_contains_only_changes():
+    delta = diff_reports(PREV, [PREV[0], _report("r2", 5), _report("r4")])
+    assert [r["id"] for r in delta["upserts"]] == ["r2", "r4"]
+    assert delta["removed"] == ["r3"]
+    # 前回の順序に新しい報告を末尾へ追加した並びと同じなら順序は持たない
+    assert "order" not in delta
+    assert diff_reports(PREV, [PREV[1], PREV[0], PREV[2]])["order"] == ["r2", "r1", "r3"]
+
+
+def test_diff_requires_unique_ids():
+    assert diff_reports(PREV, PREV + [{"id": "", "items": {}}]) is None
+    assert diff_reports(PREV + [_report("r1")], PREV) is None
+
+
+def test_advance_cursor():
+    small = {"upserts": [_report("r4")], "removed": []}
+    assert advance_cursor(None, small, 10, 48) == {"seq": 1, "base": 1}
+    assert advance_cursor({"seq": 3, "base": 1}, small, 10, 48) == {"seq": 4, "base": 1}
+    # 差分を作れない・連鎖が長すぎる・差分が大きすぎる場合は連鎖を打ち切る
+    assert advance_cursor({"seq": 3, "base": 1}, None, 10, 48) == {"seq": 4, "base": 4}
+    assert advance_cursor({"seq": 3, "base": 1}, small, 10, 2) == {"seq": 4, "base": 4}
+    assert advance_cursor({"seq": 3, "base": 1}, small, 1, 48) == {"seq": 4, "base": 4}
+
+
+class TestSyncQuestOutput:
+    QUEST: ClassVar[dict] = {"questId": "AAA", "name": "Q1"}
+
+    def _store(self) -> tuple[dict, dict, dict]:
+        """seq 1 のスナップショットと、seq 3 まで差分を適用したスナップショットを作る。"""
+        cursor = {"seq": 1, "base": 1}
+        v1 = {"quest": self.QUEST, "lastUpdated": "t1", "reports": PREV, "cursor": cursor}
+        store = {}
+        reports = PREV
+        for seq, new in [(2, reports + [_report("r4")]), (3, [_report("r1", 2)] + PREV[1:])]:
+            store[delta_key("ev1", "AAA", seq)] = {
+                "seq": seq,
+                "quest": self.QUEST,
+                "lastUpdated": f"t{seq}",
+                **diff_reports(reports, new),
+            }
+            reports = new
+        latest = {"seq": 3, "base": 1}
+        v3 = {"quest": self.QUEST, "lastUpdated": "t3", "reports": reports, "cursor": latest}
+        store["ev1/AAA.json"] = v3
+        return store, v1, v3
+
+    def _sync(self, store: dict, latest: dict | None, state: dict | None) -> tuple[dict, list]:
+        reads = []
+
+        def read(key):
+            reads.append(key)
+            return store.get(key)
+
+        synced = sync_quest_output(
+            read, "ev1/AAA.json", lambda seq: delta_key("ev1", "AAA", seq), latest, state
+        )
+        return synced, reads
+
+    def test_applies_deltas_from_held_state(self):
+        store, v1, v3 = self._store()
+        synced, reads = self._sync(store, v3["cursor"], v1)
+        assert synced == v3
+        assert "ev1/AAA.json" not in reads
+
+    def test_reads_snapshot_without_usable_state(self):
+        store, v1, v3 = self._store()
+        assert self._sync(store, v3["cursor"], None)[0] == v3
+        # 連鎖が打ち切られた後の cursor
+        assert self._sync(store, {"seq": 3, "base": 3}, v1)[1] == ["ev1/AAA.json"]
+        # 差分ファイルが欠けている
+        del store[delta_key("ev1", "AAA", 3)]
+        assert self._sync(store, v3["cursor"], v1)[0] == v3
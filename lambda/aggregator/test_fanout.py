@@ -0,0 +1,91 @@
+"""fanout.py のユニットテスト"""
+
+import io
+import json
+
+from fanout import (
+    InProcessDispatcher,
+    LambdaDispatcher,
+    RunSummary,
+    quest_payload,
+    quest_result,
+)
+
+
+def _payload(quest_id: str) -> dict:
+    return quest_payload("ev1", {"questId": quest_id}, {"B", "A"})
+
+
+def test_quest_payload_is_json_serializable():
+    payload = _payload("AAA")
+    assert payload["eventItems"] == ["A", "B"]
+    assert json.loads(json.dumps(payload)) == payload
+
+
+def test_run_summary_counts():
+    summary = RunSummary()
+    summary.add(quest_result(_payload("AAA"), "written"))
+    summary.add(quest_result(_payload("BBB"), "skipped"))
+    summary.add(quest_result(_payload("CCC"), "failed", "boom"))
+    assert summary.to_dict() == {"processed": 2, "written": 1, "skipped": 1, "failed": 1}
+    assert summary.failed == [
+        {"eventId": "ev1", "questId": "CCC", "status": "failed", "error": "boom"}
+    ]
+
+
+def test_in_process_dispatcher_isolates_worker_exceptions():
+    def worker(payload: dict) -> dict:
+        if payload["quest"]["questId"] == "BAD":
+            raise RuntimeError("boom")
+        return quest_result(payload, "written")
+
+    dispatcher = InProcessDispatcher(worker)
+    results = {r["questId"]: r for r in dispatcher.dispatch([_payload("AAA"), _payload("BAD")])}
+    assert results["AAA"]["status"] == "written"
+    assert results["BAD"] == {
+        "eventId": "ev1",
+        "questId": "BAD",
+        "status": "failed",
+        "error": "boom",
+    }
+
+
+def test_in_process_dispatcher_no_payloads():
+    assert list(InProcessDispatcher(lambda p: p).dispatch([])) == []
+
+
+class _FakeLambdaClient:
+    def __init__(self):
+        self.calls: list[dict] = []
+
+    def invoke(self, **kwargs) -> dict:
+        self.calls.append(kwargs)
+        payload = json.loads(kwargs["Payload"])
+        if payload["quest"]["questId"] == "BAD":
+            body = {"errorMessage": "Task timed out", "errorType": "Timeout"}
+            return {"FunctionError": "Unhandled", "Payload": io.BytesIO(json.dumps(body).encode())}
+        body = quest_result(payload, "skipped")
+        return {"Payload": io.BytesIO(json.dumps(body).encode())}
+
+
+def test_lambda_dispatcher_invokes_worker_function():
+    client = _FakeLambdaClient()
+    dispatcher = LambdaDispatcher(client, "eventstats-aggregator")
+    results = {r["questId"]: r for r in dispatcher.dispatch([_payload("AAA"), _payload("BAD")])}
+    assert results["AAA"]["status"] == "skipped"
+    assert results["BAD"]["status"] == "failed"
+    assert results["BAD"]["error"] == "Task timed out"
+    assert {c["FunctionName"] for c in client.calls} == {"eventstats-aggregator"}
+    assert {c["InvocationType"] for c in client.calls} == {"RequestResponse"}
+
+
+def test_lambda_dispatcher_stops_invoking_near_coordinator_deadline():
+    client = _FakeLambdaClient()
+    remaining = iter([200.0, 100.0])
+    dispatcher = LambdaDispatcher(
+        client, "worker", max_workers=1, time_left=lambda: next(remaining), min_time=160
+    )
+    results = list(dispatcher.dispatch([_payload("AAA"), _payload("BBB")]))
+    assert [r["status"] for r in results] == ["skipped", "failed"]
+    assert results[1]["error"] == "coordinator time limit reached"
+    assert len(client.calls) == 1
@@ -1,5 +1,7 @@
 """handler.py のユニットテスト"""
 
+import io
+import json
 import os
 import sys
 from unittest.mock import MagicMock
@@ -10,9 +12,76 @@ sys.modules["boto3"] = MagicMock()
 sys.modules["botocore"] = MagicMock()
 sys.modules["botocore.exceptions"] = MagicMock()
 
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from datetime import datetime, timedelta, timezone
+from typing import ClassVar
 from unittest.mock import patch
 
-from handler import detect_event_items, is_raw_count_report, process_quest, transform_report  # noqa: E402
+import pytest
+
+from compact import decode_quest_output, loads_gzip
+from delta import delta_key, sync_quest_output
+from fanout import InProcessDispatcher
+from handler import (
+    WORKER_TIMEOUT,
+    ItemKey,
+    SourceFetch,
+    Storage,
+    archive_finished_events,
+    classify_item_key,
+    create_lambda_client,
+    current_storage,
+    detect_event_items,
+    fetch_harvest_source,
+    is_raw_count_report,
+    iter_fetched_quests,
+    json_size,
+    lambda_handler,
+    map_with_storage,
+    parse_item_value,
+    process_quest,
+    read_harvest_reports,
+    remaining_time,
+    run_coordinator,
+    run_quest,
+    s3_cache,
+    transform_report,
+    transform_reports,
+    using_storage,
+)
+from stats import REPORT_SHARDS, report_shard, report_shard_key
+from storage import MemoryS3
+from synthetic import SyntheticConfig, SyntheticHarvest
+
+# --- classify_item_key ---
+
+
+@pytest.mark.parametrize(
+    ("key", "expected"),
+    [
+        ("ぐん肥(x3)", ItemKey("box_count", "ぐん肥", box_count=3)),
+        ("ポイント(+600)", ItemKey("point_bonus", "ポイント", point_bonus=600)),
+        ("QP(+2000000)", ItemKey("point_bonus", "QP", point_bonus=2000000)),
+        ("素材A", ItemKey("plain", "素材A")),
+        # 末尾の修飾子だけを見る
+        ("A(+5)(x3)", ItemKey("box_count", "A(+5)", box_count=3)),
+        ("A(x3)(+5)", ItemKey("point_bonus", "A(x3)", point_bonus=5)),
+        # ベース名のない (+N) は通常アイテム扱い
+        ("(+5)", ItemKey("plain", "(+5)")),
+        ("(x3)", ItemKey("box_count", "", box_count=3)),
+    ],
+)
+def test_classify_item_key(key, expected):
+    assert classify_item_key(key) == expected
+
+
+@pytest.mark.parametrize(
+    ("value", "expected"),
+    [("5", 5), ("0.5", 0.5), ("NaN", None), ("abc", None), ("", None), (None, None), (7, 7)],
+)
+def test_parse_item_value(value, expected):
+    assert parse_item_value(value) == expected
 
 
 # --- detect_event_items ---
@@ -159,6 +228,64 @@ class TestTransformReportNaN:
         assert result["素材A"] is None
 
 
+# --- transform_reports ---
+
+
+class TestTransformReportsEquivalence:
+    """transform_reports が報告ごとの transform_report と同じ結果を返すこと"""
+
+    def _assert_equivalent(self, reports: list[dict], event_items: set[str]) -> None:
+        expected = [transform_report(r, event_items) for r in reports]
+        actual = list(transform_reports(reports, event_items))
+        assert actual == expected
+        # 辞書のキー順 (出力 JSON の順序) も一致する
+        assert [list(items) for items, _ in actual] == [list(items) for items, _ in expected]
+
+    @pytest.mark.parametrize(
+        ("items", "event_items"),
+        [
+            ({"素材A": "10", "ぐん肥(x3)": "5", "ポイント(+600)": "2"}, {"ぐん肥"}),
+            ({"三角巾": "15", "素材A": "10"}, {"三角巾"}),
+            ({"三角巾(x3)": "5", "三角巾": "15", "素材A": "10"}, {"三角巾"}),
+            ({"素材A": "NaN", "素材B": "0.5", "素材C": "abc", "素材D": 7}, set()),
+            ({}, {"三角巾"}),
+        ],
+    )
+    def test_single_report(self, items, event_items):
+        self._assert_equivalent([_make_report(items)], event_items)
+
+    def test_values_of_equal_strings_not_shared_between_reports(self):
+        """同じ値の文字列は1回だけ変換するが、報告ごとに別の辞書・warnings を返す"""
+        reports = [_make_report({"素材A": "3"}), _make_report({"素材A": "3"})]
+        (items1, w1), (items2, w2) = list(transform_reports(reports, set()))
+        items1["素材A"] = 0
+        w1.append("x")
+        assert (items2, w2) == ({"素材A": 3}, [])
+
+    def test_unhashable_value_falls_back(self):
+        self._assert_equivalent([_make_report({"素材A": ["1"]})], set())
+
+    def test_transforms_lazily(self):
+        """報告を1件読むごとに1件の変換結果を返す (全件をリストにまとめない)"""
+        consumed = []
+
+        def reports():
+            for i in range(3):
+                consumed.append(i)
+                yield _make_report({"素材A": str(i)})
+
+        converted = transform_reports(reports(), set())
+        assert next(converted) == ({"素材A": 0}, [])
+        assert consumed == [0]
+
+    @pytest.mark.parametrize("raw_rate", [0.0, 0.1, 1.0])
+    def test_synthetic_reports(self, raw_rate):
+        config = SyntheticConfig(reports=500, raw_rate=raw_rate, nan_rate=0.1, seed=3)
+        reports = SyntheticHarvest(config).quest_sources("AAA")["AAA"]
+        self._assert_equivalent(reports, detect_event_items(reports))
+        self._assert_equivalent(reports, set())
+
+
 # --- process_quest (additionalSourceQuestIds) ---
 
 
@@ -174,6 +301,11 @@ def _make_harvest_report(rid: str, items: dict[str, str]) -> dict:
     }
 
 
+def _written(mock_write) -> dict:
+    """write_json のモックに渡された {キー: データ} を返す。"""
+    return {call[0][0]: call[0][1] for call in mock_write.call_args_list}
+
+
 class TestProcessQuestAdditionalSourceQuestIds:
     """process_quest の additionalSourceQuestIds 対応"""
 
@@ -184,8 +316,7 @@ class TestProcessQuestAdditionalSourceQuestIds:
             patch("handler.write_json") as mock_write,
         ):
             process_quest("ev1", quest, set())
-            _key, output = mock_write.call_args[0]
-        return output
+        return _written(mock_write)[f"ev1/{quest['questId']}.json"]
 
     def test_single_source_no_additional(self):
         """additionalSourceQuestIds 未設定 → questId のみ取得"""
@@ -255,5 +386,1036 @@ class TestProcessQuestAdditionalSourceQuestIds:
             patch("handler.write_json") as mock_write,
         ):
             process_quest("ev1", quest, set())
-            key, _output = mock_write.call_args[0]
-        assert key == "ev1/AAA.json"
+        assert "ev1/AAA.json" in _written(mock_write)
+        assert "ev1/BBB.json" not in _written(mock_write)
+
+
+# --- iter_fetched_quests / lambda_handler (並列取得) ---
+
+
+def _fake_fetch(sources: dict[str, list[dict]]):
+    """ソース ID → 報告リストの辞書から fetch_harvest_source の代替関数を作る。"""
+
+    def fetch(sid: str, meta: dict | None = None) -> SourceFetch:
+        if sid not in sources:
+            raise OSError(f"fetch failed: {sid}")
+        return SourceFetch(sid, sources[sid])
+
+    return fetch
+
+
+class TestIterFetchedQuests:
+    """全クエスト・全ソースの並列取得"""
+
+    def test_results_in_source_order(self):
+        """取得結果はクエストごとにソース順で並ぶ"""
+        quests = [
+            {"questId": "AAA", "additionalSourceQuestIds": ["BBB"]},
+            {"questId": "CCC"},
+        ]
+        sources = {
+            "AAA": [_make_harvest_report("r1", {})],
+            "BBB": [_make_harvest_report("r2", {})],
+            "CCC": [_make_harvest_report("r3", {})],
+        }
+        with patch("handler.fetch_harvest_source", side_effect=_fake_fetch(sources)):
+            results = {qi: (fetched, error) for qi, fetched, error in iter_fetched_quests(quests)}
+        assert [f.reports for f in results[0][0]] == [sources["AAA"], sources["BBB"]]
+        assert [f.reports for f in results[1][0]] == [sources["CCC"]]
+
+    def test_failure_isolated_per_quest(self):
+        """1ソースの取得失敗はそのクエストだけに影響する"""
+        quests = [
+            {"questId": "AAA", "additionalSourceQuestIds": ["BAD"]},
+            {"questId": "CCC"},
+        ]
+        sources = {
+            "AAA": [_make_harvest_report("r1", {})],
+            "CCC": [_make_harvest_report("r3", {})],
+        }
+        with patch("handler.fetch_harvest_source", side_effect=_fake_fetch(sources)):
+            results = {qi: (fetched, error) for qi, fetched, error in iter_fetched_quests(quests)}
+        assert results[0][0] is None
+        assert isinstance(results[0][1], OSError)
+        assert [f.reports for f in results[1][0]] == [sources["CCC"]]
+
+    def test_unexpected_error_isolated_per_quest(self, caplog):
+        """通信エラー以外の例外 (不正な本文による TypeError 等) もそのクエストだけの失敗にする"""
+        quests = [{"questId": "AAA"}, {"questId": "BAD"}, {"questId": "CCC"}]
+        fetch = _fake_fetch(
+            {"AAA": [_make_harvest_report("r1", {})], "CCC": [_make_harvest_report("r3", {})]}
+        )
+
+        def fetch_malformed(sid, meta=None):
+            if sid == "BAD":
+                raise TypeError("'NoneType' object is not subscriptable")
+            return fetch(sid, meta)
+
+        with patch("handler.fetch_harvest_source", side_effect=fetch_malformed):
+            results = {qi: (fetched, error) for qi, fetched, error in iter_fetched_quests(quests)}
+        assert results[1][0] is None
+        assert isinstance(results[1][1], TypeError)
+        assert [f.reports[0]["id"] for f in results[0][0]] == ["r1"]
+        assert [f.reports[0]["id"] for f in results[2][0]] == ["r3"]
+        assert "Unexpected error while fetching quest BAD" in caplog.text
+
+
+class TestLambdaHandler:
+    """lambda_handler のクエスト単位の失敗分離"""
+
+    def _events(self) -> dict:
+        return {
+            "events": [
+                {
+                    "eventId": "ev1",
+                    "name": "E1",
+                    "period": {
+                        "start": "2000-01-01T00:00:00+09:00",
+                        "end": "2999-01-01T00:00:00+09:00",
+                    },
+                    "quests": [
+                        {"questId": "AAA", "name": "Q1", "level": "90+", "ap": 40},
+                        {"questId": "BAD", "name": "Q2", "level": "90++", "ap": 40},
+                    ],
+                }
+            ]
+        }
+
+    def test_failed_quest_does_not_block_others(self):
+        sources = {"AAA": [_make_harvest_report("r1", {"素材A": "5"})]}
+        store = {"events.json": self._events()}
+        with (
+            patch("handler.read_json", side_effect=store.get),
+            patch("handler.fetch_harvest_source", side_effect=_fake_fetch(sources)),
+            patch("handler.read_content_hash", return_value=None),
+            patch("handler.write_json") as mock_write,
+        ):
+            result = lambda_handler({}, None)
+        assert result == {"processed": 1, "written": 1, "skipped": 0, "failed": 1}
+        assert "ev1/AAA.json" in _written(mock_write)
+        assert "ev1/BAD.json" not in _written(mock_write)
+
+    def test_malformed_source_does_not_abort_batch(self):
+        """取得元の不正な本文による KeyError 等でも他のクエストの処理は続ける"""
+        fetch = _fake_fetch({"AAA": [_make_harvest_report("r1", {"素材A": "5"})]})
+
+        def fetch_malformed(sid, meta=None):
+            if sid == "BAD":
+                raise KeyError("items")
+            return fetch(sid, meta)
+
+        store = {"events.json": self._events()}
+        with (
+            patch("handler.read_json", side_effect=store.get),
+            patch("handler.fetch_harvest_source", side_effect=fetch_malformed),
+            patch("handler.read_content_hash", return_value=None),
+            patch("handler.write_json") as mock_write,
+        ):
+            result = lambda_handler({}, None)
+        assert result == {"processed": 1, "written": 1, "skipped": 0, "failed": 1}
+        assert "ev1/AAA.json" in _written(mock_write)
+
+    def test_exclusion_shards_applied_to_stats(self):
+        """索引に載っているクエストの除外リストのシャードだけを読み込んで適用する"""
+        sources = {
+            "AAA": [
+                _make_harvest_report("r1", {"素材A": "5"}),
+                _make_harvest_report("r2", {"素材A": "500"}),
+            ],
+            "BAD": [_make_harvest_report("r3", {"素材A": "5"})],
+        }
+        store = {
+            "events.json": self._events(),
+            "exclusions/_index.json": {"quests": {"AAA": {"count": 1}}},
+            "exclusions/AAA.json": [{"reportId": "r2", "reason": "異常値"}],
+        }
+        with (
+            patch("handler.read_json", side_effect=store.get) as mock_read,
+            patch("handler.fetch_harvest_source", side_effect=_fake_fetch(sources)),
+            patch("handler.read_content_hash", return_value=None),
+            patch("handler.write_gzip_json"),
+            patch("handler.write_json") as mock_write,
+        ):
+            lambda_handler({}, None)
+        written = _written(mock_write)
+        assert written["ev1/AAA.stats.json"]["excludedReportIds"] == ["r2"]
+        assert written["ev1/BAD.stats.json"]["excludedReportIds"] == []
+        read_keys = [call[0][0] for call in mock_read.call_args_list]
+        assert "exclusions/BAD.json" not in read_keys
+
+    def test_event_rollup_written_from_quest_stats(self):
+        """全クエストの処理後、stats JSON を合算したイベント単位の集計を出力する (取得に失敗したクエストは含まない)"""
+        sources = {
+            "AAA": [
+                _make_harvest_report("r1", {"ぐん肥(x3)": "5", "素材A": "1"}),
+                _make_harvest_report("r2", {"ぐん肥(x3)": "7"}),
+            ],
+        }
+        store = {"events.json": self._events()}
+
+        def write(key, data, content_hash=None):
+            store[key] = data
+
+        with (
+            patch("handler.read_json", side_effect=store.get),
+            patch("handler.fetch_harvest_source", side_effect=_fake_fetch(sources)),
+            patch("handler.read_content_hash", return_value=None),
+            patch("handler.write_gzip_json"),
+            patch("handler.write_json", side_effect=write),
+        ):
+            lambda_handler({}, None)
+        rollup = store["ev1/rollup.json"]
+        assert [q["questId"] for q in rollup["quests"]] == ["AAA"]
+        (reporter,) = rollup["reporters"]
+        assert (reporter["reporter"], reporter["reportCount"], reporter["totalRuns"]) == (
+            "user1",
+            2,
+            20,
+        )
+        (item,) = rollup["eventItems"]
+        assert (item["itemName"], item["totalDrops"], item["totalRuns"]) == ("ぐん肥(x3)", 12, 20)
+
+    def test_event_manifest_lists_quest_outputs(self):
+        """中間 JSON のハッシュ・報告数・サイズをイベントのマニフェストに出力する (未出力のクエストは含まない)"""
+        sources = {
+            "AAA": [
+                _make_harvest_report("r1", {"素材A": "1"}),
+                _make_harvest_report("r2", {"素材A": "2"}),
+            ],
+        }
+        store = {"events.json": self._events()}
+        hashes = {}
+
+        def write(key, data, content_hash=None):
+            store[key] = data
+            hashes[key] = content_hash
+            return 1234
+
+        with (
+            patch("handler.read_json", side_effect=store.get),
+            patch("handler.fetch_harvest_source", side_effect=_fake_fetch(sources)),
+            patch("handler.read_content_hash", side_effect=hashes.get),
+            patch("handler.write_gzip_json"),
+            patch("handler.write_json", side_effect=write),
+        ):
+            lambda_handler({}, None)
+            manifest = store["ev1/manifest.json"]
+            assert manifest["eventId"] == "ev1"
+            (entry,) = manifest["quests"]
+            assert entry == {
+                "questId": "AAA",
+                "key": "ev1/AAA.json",
+                "compactKey": "ev1/AAA.compact.json",
+                "contentHash": hashes["ev1/AAA.json"],
+                "reportCount": 2,
+                "totalRuns": 20,
+                "bytes": 1234,
+                "lastUpdated": store["ev1/AAA.json"]["lastUpdated"],
+                "cursor": {"seq": 1, "base": 1},
+            }
+
+            # 内容が同一なら書き込まない
+            del store["ev1/manifest.json"]
+            lambda_handler({"force": True}, None)
+            assert "ev1/manifest.json" not in store
+
+    def test_anomaly_queues_written_from_quest_stats(self):
+        """stats JSON を基準に外れ値の報告をクエストとイベントのレビューキューに出力する"""
+        reports = [
+            {**_make_harvest_report(f"r{i:02d}", {"素材A": str(10 + i % 2)}), "runcount": 20}
+            for i in range(19)
+        ]
+        reports.append({**_make_harvest_report("r99", {"素材A": "60"}), "runcount": 20})
+        store = {"events.json": self._events()}
+        self._run_with_store(store, {"AAA": reports})
+        queue = store["ev1/AAA.anomalies.json"]
+        assert queue["outlierCount"] == 1
+        (entry,) = queue["anomalies"]
+        assert entry["reportId"] == "r99"
+        assert entry["outliers"][0]["itemName"] == "素材A"
+        assert entry["score"] > 3
+        event_queue = store["ev1/anomalies.json"]
+        assert event_queue["quests"] == [{"questId": "AAA", "anomalyCount": 1, "outlierCount": 1}]
+        assert [(a["questId"], a["reportId"]) for a in event_queue["anomalies"]] == [("AAA", "r99")]
+
+    def _run_with_store(self, store: dict, sources: dict, event: dict | None = None) -> dict:
+        def write(key, data, content_hash=None):
+            store[key] = data
+
+        with (
+            patch("handler.read_json", side_effect=store.get),
+            patch("handler.fetch_harvest_source", side_effect=_fake_fetch(sources)) as mock_fetch,
+            patch("handler.read_content_hash", return_value=None),
+            patch("handler.write_gzip_json"),
+            patch("handler.write_json", side_effect=write),
+        ):
+            result = lambda_handler(event or {}, None)
+        fetched = {call.args[0] for call in mock_fetch.call_args_list}
+        return {**result, "fetched": fetched}
+
+    def test_schedule_state_recorded_for_refreshed_quests(self):
+        """更新したクエストの報告数と増加ペースを記録する (失敗したクエストは記録しない)"""
+        sources = {"AAA": [_make_harvest_report("r1", {"素材A": "5"})]}
+        store = {"events.json": self._events()}
+        self._run_with_store(store, sources)
+        states = store["ev1/schedule.json"]["quests"]
+        assert list(states) == ["AAA"]
+        assert states["AAA"]["reportCount"] == 1
+        assert states["AAA"]["intervalMinutes"] == 180
+
+    def test_quests_not_due_are_deferred(self):
+        """前回の更新から間もなく、報告の増えていないクエストは処理しない"""
+        sources = {"AAA": [_make_harvest_report("r1", {"素材A": "5"})]}
+        store = {"events.json": self._events()}
+        self._run_with_store(store, sources)
+        result = self._run_with_store(store, sources)
+        # BAD は前回失敗して状態がないため、毎回処理対象になる
+        assert result["fetched"] == {"BAD"}
+        assert (result["processed"], result["failed"]) == (0, 1)
+
+    def test_force_refreshes_all_quests(self):
+        sources = {"AAA": [_make_harvest_report("r1", {"素材A": "5"})]}
+        store = {"events.json": self._events()}
+        self._run_with_store(store, sources)
+        result = self._run_with_store(store, sources, {"force": True})
+        assert result["fetched"] == {"AAA", "BAD"}
+        assert result["processed"] == 1
+
+
+# --- 読み書き先 ---
+
+
+def test_worker_threads_use_callers_storage():
+    storage = Storage(MemoryS3(), "backfill")
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        with using_storage(storage):
+            bound = list(map_with_storage(executor, lambda _: current_storage(), range(3)))
+        default = list(map_with_storage(executor, lambda _: current_storage(), range(1)))
+    assert all(s is storage for s in bound)
+    assert default[0] is not storage
+    assert default[0].cache is s3_cache
+
+
+# --- アーカイブ ---
+
+
+class TestArchiveFinishedEvents:
+    """グレースピリオドを過ぎたイベントのアーカイブ"""
+
+    NOW = datetime(2026, 3, 1, tzinfo=timezone(timedelta(hours=9)))
+
+    def _event(self, event_id: str, end: str) -> dict:
+        return {
+            "eventId": event_id,
+            "name": event_id,
+            "period": {"start": "2026-01-01T00:00:00+09:00", "end": end},
+            "quests": [{"questId": f"{event_id}-Q", "name": "Q", "level": "90+", "ap": 40}],
+        }
+
+    def _store(self) -> dict:
+        return {
+            "events.json": {
+                "events": [
+                    self._event("late", "2026-02-20T00:00:00+09:00"),
+                    self._event("early", "2026-02-10T00:00:00+09:00"),
+                    # 終了後5時間以内はまだ集計中
+                    self._event("grace", "2026-02-28T20:00:00+09:00"),
+                ]
+            },
+            "early/early-Q.json": {
+                "quest": {"questId": "early-Q", "name": "Q"},
+                "reports": [
+                    {
+                        "id": "r1",
+                        "reporter": "u1",
+                        "reporterName": "",
+                        "runcount": 10,
+                        "timestamp": "",
+                        "items": {"心臓": 2, "牙": None},
+                    },
+                    {
+                        "id": "r2",
+                        "reporter": "u2",
+                        "reporterName": "",
+                        "runcount": 5,
+                        "timestamp": "",
+                        "items": {"心臓": 1},
+                    },
+                ],
+            },
+            "exclusions/_index.json": {"quests": {"early-Q": {"count": 1}}},
+            "exclusions/early-Q.json": [{"reportId": "r2", "reason": "異常値"}],
+        }
+
+    def _run(self, store: dict) -> int:
+        def write(key, data, content_hash=None):
+            store[key] = data
+
+        def write_gzip(key, body, content_hash=None):
+            store[key] = loads_gzip(body.read())
+
+        with (
+            patch("handler.read_json", side_effect=store.get),
+            patch("handler.write_json", side_effect=write),
+            patch("handler.write_gzip_body", side_effect=write_gzip),
+        ):
+            return archive_finished_events(self.NOW)
+
+    def test_archives_oldest_finished_event_first(self):
+        store = self._store()
+        assert self._run(store) == 1
+        assert list(store["archive/_index.json"]["events"]) == ["early"]
+        meta = store["archive/early/_meta.json"]
+        assert meta["rowCount"] == 3
+        assert meta["dictionaries"]["itemName"] == ["心臓", "牙"]
+        assert store["archive/early/count.json.gz"] == [2, None, 1]
+        assert store["archive/early/excluded.json.gz"] == [0, 0, 1]
+
+    def test_archived_events_are_skipped(self):
+        store = self._store()
+        self._run(store)
+        assert self._run(store) == 1
+        assert list(store["archive/_index.json"]["events"]) == ["early", "late"]
+        # 中間 JSON のないイベントも空のアーカイブとして登録し、再試行しない
+        assert store["archive/late/_meta.json"]["rowCount"] == 0
+        assert self._run(store) == 0
+
+    def test_failed_event_is_recorded_and_tried_last(self):
+        store = self._store()
+        # 壊れた中間 JSON (runcount がない) ではアーカイブに失敗する
+        del store["early/early-Q.json"]["reports"][0]["runcount"]
+        assert self._run(store) == 0
+        index = store["archive/_index.json"]
+        assert index["events"] == {}
+        assert index["failed"]["early"]["failedAt"] == self.NOW.isoformat()
+        assert "archive/early/_meta.json" not in store
+
+        # 次の実行では失敗していないイベントを先にアーカイブする
+        assert self._run(store) == 1
+        assert list(store["archive/_index.json"]["events"]) == ["late"]
+
+        store["early/early-Q.json"] = self._store()["early/early-Q.json"]
+        assert self._run(store) == 1
+        index = store["archive/_index.json"]
+        assert list(index["events"]) == ["late", "early"]
+        assert index["failed"] == {}
+
+
+# --- コーディネーター / ワーカー ---
+
+
+class TestFanout:
+    """クエスト単位のワーカーへの分割"""
+
+    def _run(self, run):
+        sources = {"AAA": [_make_harvest_report("r1", {"素材A": "5"})]}
+        store = {"events.json": TestLambdaHandler()._events()}
+        with (
+            patch("handler.read_json", side_effect=store.get),
+            patch("handler.fetch_harvest_source", side_effect=_fake_fetch(sources)),
+            patch("handler.read_content_hash", return_value=None),
+            patch("handler.write_gzip_json"),
+            patch("handler.write_json") as mock_write,
+        ):
+            result = run()
+        return result, _written(mock_write)
+
+    def test_coordinator_matches_batch(self):
+        """プロセス内ディスパッチャーでの実行結果は一括処理と一致する"""
+        summary, written = self._run(lambda: run_coordinator(InProcessDispatcher(run_quest)))
+        batch, batch_written = self._run(lambda: lambda_handler({}, None))
+        assert summary.to_dict() == batch
+        assert written["ev1/AAA.json"]["reports"] == batch_written["ev1/AAA.json"]["reports"]
+        assert [r["questId"] for r in summary.failed] == ["BAD"]
+
+    def test_worker_processes_single_quest(self):
+        """quest を含むペイロードではそのクエストだけを処理する"""
+        payload = {
+            "eventId": "ev1",
+            "quest": {"questId": "AAA", "name": "Q1", "level": "90+", "ap": 40},
+            "eventItems": [],
+        }
+        result, written = self._run(lambda: lambda_handler(payload, None))
+        assert result == {"eventId": "ev1", "questId": "AAA", "status": "written"}
+        assert "ev1/AAA.json" in written
+        assert "ev1/BAD.json" not in written
+
+    def test_worker_reports_fetch_failure(self):
+        payload = {"eventId": "ev1", "quest": {"questId": "BAD"}, "eventItems": []}
+        result, written = self._run(lambda: run_quest(payload))
+        assert result["status"] == "failed"
+        assert "fetch failed" in result["error"]
+        assert written == {}
+
+    def test_lambda_client_waits_for_worker_without_retry(self):
+        """ワーカーの timeout より長く応答を待ち、タイムアウトしても再実行しない"""
+        config_module = MagicMock()
+        with (
+            patch.dict(sys.modules, {"botocore.config": config_module}),
+            patch("boto3.client") as mock_client,
+        ):
+            create_lambda_client()
+        kwargs = config_module.Config.call_args.kwargs
+        assert kwargs["read_timeout"] > WORKER_TIMEOUT
+        assert kwargs["retries"] == {"max_attempts": 0}
+        assert mock_client.call_args.kwargs["config"] is config_module.Config.return_value
+
+    def test_remaining_time_from_lambda_context(self):
+        context = MagicMock()
+        context.get_remaining_time_in_millis.return_value = 45_000
+        assert remaining_time(context)() == 45
+        assert remaining_time(None) is None
+
+
+# --- fetch_harvest_source (条件付き取得) ---
+
+
+class _FakeResponse(io.BytesIO):
+    def __init__(self, body: bytes, headers: dict[str, str], status: int = 200):
+        super().__init__(body)
+        self.headers = headers
+        self.status = status
+
+
+def _harvest_get(resp: _FakeResponse):
+    """handler.harvest.get を置き換え、resp を返すモックを作る"""
+    return patch("handler.harvest.get", return_value=nullcontext(resp))
+
+
+def test_read_harvest_reports_drops_unused_fields():
+    report = {**_make_harvest_report("r1", {"素材A": "5"}), "quest_id": "AAA", "reporter_id": "x"}
+    body = json.dumps([report, _make_harvest_report("r2", {"素材A": "5"})]).encode("utf-8")
+    reports = read_harvest_reports(io.BytesIO(body))
+    assert [r["id"] for r in reports] == ["r1", "r2"]
+    assert "quest_id" not in reports[0]
+    assert "reporter_id" not in reports[0]
+    assert reports[0]["items"] == {"素材A": "5"}
+    # 報告間で items のキー文字列を共有する
+    assert next(iter(reports[0]["items"])) is next(iter(reports[1]["items"]))
+
+
+class TestFetchHarvestSource:
+    """ETag / ハッシュによる変更検知"""
+
+    BODY = json.dumps([_make_harvest_report("r1", {"素材A": "5"})]).encode("utf-8")
+
+    def test_sends_conditional_headers(self):
+        meta = {"etag": '"a1"', "lastModified": "Thu, 01 Jan 2026 00:00:00 GMT"}
+        with _harvest_get(_FakeResponse(self.BODY, {"ETag": '"a2"'})) as mock_get:
+            result = fetch_harvest_source("AAA", meta)
+        url, headers = mock_get.call_args[0]
+        assert url.endswith("/AAA.json")
+        assert headers["If-None-Match"] == '"a1"'
+        assert headers["If-Modified-Since"] == meta["lastModified"]
+        assert result.reports is not None
+        assert result.etag == '"a2"'
+
+    def test_not_modified(self):
+        """304 の場合は reports=None で前回のメタデータを引き継ぐ"""
+        meta = {"etag": '"a1"', "contentHash": "h1"}
+        with _harvest_get(_FakeResponse(b"", {}, status=304)):
+            result = fetch_harvest_source("AAA", meta)
+        assert result.reports is None
+        assert result.etag == '"a1"'
+        assert result.content_hash == "h1"
+
+    def test_identical_hash(self):
+        """本文のハッシュが前回と同一なら reports=None"""
+        with _harvest_get(_FakeResponse(self.BODY, {})):
+            first = fetch_harvest_source("AAA")
+        with _harvest_get(_FakeResponse(self.BODY, {})):
+            second = fetch_harvest_source("AAA", {"contentHash": first.content_hash})
+        assert first.reports is not None
+        assert second.reports is None
+
+
+# --- process_quest (インクリメンタル処理) ---
+
+
+class TestProcessQuestIncremental:
+    """取得メタデータを使ったインクリメンタル処理"""
+
+    QUEST: ClassVar[dict] = {
+        "questId": "AAA",
+        "name": "Q1",
+        "level": "90+",
+        "ap": 40,
+        "additionalSourceQuestIds": ["BBB"],
+    }
+
+    def _first_run(self) -> dict:
+        """初回実行を行い、S3 に書かれた内容を {キー: データ} で返す。"""
+        fetched = [
+            SourceFetch("AAA", [_make_harvest_report("r1", {"素材A": "5"})], etag='"a1"'),
+            SourceFetch("BBB", [_make_harvest_report("r2", {"素材A": "3"})], etag='"b1"'),
+        ]
+        with patch("handler.write_json") as mock_write:
+            assert process_quest("ev1", self.QUEST, set(), fetched) is True
+        return _written(mock_write)
+
+    def test_all_sources_unchanged_skips_write(self):
+        """全ソースが変更なしなら変換・出力しない"""
+        store = self._first_run()
+        fetched = [SourceFetch("AAA", None), SourceFetch("BBB", None)]
+        with (
+            patch("handler.read_json", side_effect=store.get) as mock_read,
+            patch("handler.write_json") as mock_write,
+        ):
+            written = process_quest("ev1", self.QUEST, set(), fetched, store["ev1/AAA.fetch.json"])
+        assert written is False
+        mock_write.assert_not_called()
+        mock_read.assert_not_called()
+
+    def test_unchanged_quest_without_output_record_fills_it(self):
+        """出力記録のない取得メタデータ (記録を始める前の出力) は前回の中間 JSON から補う"""
+        store = self._first_run()
+        record = store["ev1/AAA.fetch.json"].pop("output")
+        assert record["reportCount"] == 2
+        assert record["totalRuns"] == 20
+        assert record["lastUpdated"] == store["ev1/AAA.json"]["lastUpdated"]
+        fetched = [SourceFetch("AAA", None), SourceFetch("BBB", None)]
+        with (
+            patch("handler.read_json", side_effect=store.get),
+            patch("handler.write_json") as mock_write,
+        ):
+            written = process_quest("ev1", self.QUEST, set(), fetched, store["ev1/AAA.fetch.json"])
+        assert written is False
+        meta = _written(mock_write)["ev1/AAA.fetch.json"]
+        assert meta["output"] == {**record, "bytes": json_size(store["ev1/AAA.json"])}
+
+    @pytest.mark.parametrize("batch", [False, True])
+    def test_changed_source_reuses_unchanged_source_reports(self, batch):
+        """変更なしのソースは前回の中間 JSON から復元し、既知の報告は再変換しない"""
+        store = self._first_run()
+        fetched = [
+            SourceFetch("AAA", None),
+            SourceFetch(
+                "BBB",
+                [
+                    _make_harvest_report("r2", {"素材A": "3"}),
+                    _make_harvest_report("r3", {"素材A": "7"}),
+                ],
+                etag='"b2"',
+            ),
+        ]
+        batch_sizes = []
+
+        def batch_spy(reports, event_items):
+            reports = list(reports)
+            batch_sizes.append(len(reports))
+            return transform_reports(reports, event_items)
+
+        with (
+            patch("handler.read_json", side_effect=store.get),
+            patch("handler.fetch_harvest_reports") as mock_fetch,
+            patch("handler.BATCH_TRANSFORM", batch),
+            patch("handler.transform_report", wraps=transform_report) as mock_transform,
+            patch("handler.transform_reports", side_effect=batch_spy),
+            patch("handler.write_json") as mock_write,
+        ):
+            process_quest("ev1", self.QUEST, set(), fetched, store["ev1/AAA.fetch.json"])
+        mock_fetch.assert_not_called()
+        if batch:
+            assert batch_sizes == [1]
+        else:
+            assert mock_transform.call_count == 1
+        written = _written(mock_write)
+        assert [r["id"] for r in written["ev1/AAA.json"]["reports"]] == ["r1", "r2", "r3"]
+        sources = written["ev1/AAA.fetch.json"]["sources"]
+        assert sources["AAA"]["etag"] is None
+        assert sources["BBB"]["etag"] == '"b2"'
+        assert sources["BBB"]["reportIds"] == ["r2", "r3"]
+
+    def test_report_index_written_and_updated_per_shard(self):
+        """報告の索引は初回に全シャードを書き、以降は内容が変わったシャードだけを書く"""
+        store = self._first_run()
+        shard_keys = {k for k in store if ".reports/" in k}
+        assert len(shard_keys) == REPORT_SHARDS
+        r1_shard = store[report_shard_key("ev1", "AAA", report_shard("r1"))]
+        assert r1_shard["r1"]["items"] == {"素材A": 5}
+        assert "note" not in r1_shard["r1"]
+        assert len(store["ev1/AAA.fetch.json"]["reportShards"]) == REPORT_SHARDS
+
+        fetched = [
+            SourceFetch("AAA", None),
+            SourceFetch(
+                "BBB",
+                [
+                    _make_harvest_report("r2", {"素材A": "3"}),
+                    _make_harvest_report("r3", {"素材A": "7"}),
+                ],
+            ),
+        ]
+        with (
+            patch("handler.read_json", side_effect=store.get),
+            patch("handler.write_json") as mock_write,
+        ):
+            process_quest("ev1", self.QUEST, set(), fetched, store["ev1/AAA.fetch.json"])
+        written = _written(mock_write)
+        assert [k for k in written if ".reports/" in k] == [
+            report_shard_key("ev1", "AAA", report_shard("r3"))
+        ]
+
+    def test_unchanged_quest_without_report_index_fills_it(self):
+        """報告の索引のない取得メタデータ (記録を始める前の出力) は前回の中間 JSON から作る"""
+        store = self._first_run()
+        del store["ev1/AAA.fetch.json"]["reportShards"]
+        fetched = [SourceFetch("AAA", None), SourceFetch("BBB", None)]
+        with (
+            patch("handler.read_json", side_effect=store.get),
+            patch("handler.write_json") as mock_write,
+        ):
+            written = process_quest("ev1", self.QUEST, set(), fetched, store["ev1/AAA.fetch.json"])
+        assert written is False
+        written_keys = _written(mock_write)
+        assert len([k for k in written_keys if ".reports/" in k]) == REPORT_SHARDS
+        assert len(written_keys["ev1/AAA.fetch.json"]["reportShards"]) == REPORT_SHARDS
+
+    def test_edited_report_retransformed(self):
+        """ID が同じでも Harvest 上で内容が編集された報告は変換し直す"""
+        store = self._first_run()
+        fetched = [
+            SourceFetch("AAA", None),
+            SourceFetch("BBB", [{**_make_harvest_report("r2", {"素材A": "9"}), "runcount": 20}]),
+        ]
+        with (
+            patch("handler.read_json", side_effect=store.get),
+            patch("handler.BATCH_TRANSFORM", False),
+            patch("handler.transform_report", wraps=transform_report) as mock_transform,
+            patch("handler.write_json") as mock_write,
+        ):
+            process_quest("ev1", self.QUEST, set(), fetched, store["ev1/AAA.fetch.json"])
+        assert mock_transform.call_count == 1
+        written = _written(mock_write)
+        r2 = written["ev1/AAA.json"]["reports"][1]
+        assert (r2["id"], r2["runcount"], r2["items"]) == ("r2", 20, {"素材A": 9})
+        sources = written["ev1/AAA.fetch.json"]["sources"]
+        assert (
+            sources["AAA"]["reportHashes"]
+            == store["ev1/AAA.fetch.json"]["sources"]["AAA"]["reportHashes"]
+        )
+        assert (
+            sources["BBB"]["reportHashes"]
+            != store["ev1/AAA.fetch.json"]["sources"]["BBB"]["reportHashes"]
+        )
+
+    def test_meta_without_report_hashes_retransforms_changed_sources(self):
+        """報告のハッシュを記録する前の取得メタデータでは、変更のあったソースの報告を変換し直す"""
+        store = self._first_run()
+        meta = store["ev1/AAA.fetch.json"]
+        for source in meta["sources"].values():
+            del source["reportHashes"]
+        fetched = [
+            SourceFetch("AAA", None),
+            SourceFetch("BBB", [_make_harvest_report("r2", {"素材A": "3"})], etag='"b2"'),
+        ]
+        with (
+            patch("handler.read_json", side_effect=store.get),
+            patch("handler.BATCH_TRANSFORM", False),
+            patch("handler.transform_report", wraps=transform_report) as mock_transform,
+            patch("handler.write_json") as mock_write,
+        ):
+            process_quest("ev1", self.QUEST, set(), fetched, meta)
+        assert mock_transform.call_count == 1
+        sources = _written(mock_write)["ev1/AAA.fetch.json"]["sources"]
+        assert sources["AAA"]["reportHashes"] is None
+        assert len(sources["BBB"]["reportHashes"]) == 1
+
+    def test_changed_output_writes_delta(self):
+        """中間 JSON を書き換える時は前回からの差分ファイルを書き、差分から同じ内容を復元できる"""
+        store = self._first_run()
+        assert store["ev1/AAA.json"]["cursor"] == {"seq": 1, "base": 1}
+        fetched = [
+            SourceFetch("AAA", None),
+            SourceFetch(
+                "BBB",
+                [
+                    _make_harvest_report("r2", {"素材A": "3"}),
+                    _make_harvest_report("r3", {"素材A": "7"}),
+                ],
+            ),
+        ]
+        with (
+            patch("handler.read_json", side_effect=store.get),
+            patch("handler.write_json") as mock_write,
+        ):
+            process_quest("ev1", self.QUEST, set(), fetched, store["ev1/AAA.fetch.json"])
+        written = _written(mock_write)
+        delta = written["deltas/ev1/AAA/00000002.json"]
+        assert [r["id"] for r in delta["upserts"]] == ["r3"]
+        assert delta["removed"] == []
+        output = written["ev1/AAA.json"]
+        assert output["cursor"] == {"seq": 2, "base": 1}
+        assert written["ev1/AAA.fetch.json"]["output"]["cursor"] == output["cursor"]
+
+        synced = sync_quest_output(
+            {**store, **written}.get,
+            "ev1/AAA.json",
+            lambda seq: delta_key("ev1", "AAA", seq),
+            output["cursor"],
+            store["ev1/AAA.json"],
+        )
+        assert synced == output
+
+    def test_config_change_forces_full_refresh(self):
+        """クエスト設定が変わった場合は前回の結果を再利用しない"""
+        store = self._first_run()
+        quest = {**self.QUEST, "name": "Q1 改"}
+        fetched = [SourceFetch("AAA", None), SourceFetch("BBB", None)]
+        with (
+            patch("handler.read_json", side_effect=store.get),
+            patch(
+                "handler.fetch_harvest_reports",
+                side_effect=[
+                    [_make_harvest_report("r1", {"素材A": "5"})],
+                    [_make_harvest_report("r2", {"素材A": "3"})],
+                ],
+            ) as mock_fetch,
+            patch("handler.write_json") as mock_write,
+        ):
+            written = process_quest("ev1", quest, set(), fetched, store["ev1/AAA.fetch.json"])
+        assert written is True
+        assert mock_fetch.call_count == 2
+        assert _written(mock_write)["ev1/AAA.json"]["quest"]["name"] == "Q1 改"
+
+
+# --- process_quest (内容ハッシュによる書き込み省略) ---
+
+
+class TestProcessQuestContentHash:
+    """変換結果が前回と同一なら中間 JSON を書き込まない"""
+
+    QUEST: ClassVar[dict] = {"questId": "AAA", "name": "Q1", "level": "90+", "ap": 40}
+
+    def _run(self, stored_hash: str | None) -> tuple[bool, MagicMock]:
+        fetched = [SourceFetch("AAA", [_make_harvest_report("r1", {"素材A": "5"})])]
+        with (
+            patch("handler.read_content_hash", return_value=stored_hash),
+            patch("handler.read_json", return_value=None),
+            patch("handler.write_json") as mock_write,
+            patch("handler.write_gzip_json") as mock_write_gzip,
+        ):
+            written = process_quest("ev1", self.QUEST, set(), fetched)
+        self.compact_writes = _written(mock_write_gzip)
+        return written, mock_write
+
+    def _output_hash(self) -> str:
+        _, mock_write = self._run(None)
+        (call,) = [c for c in mock_write.call_args_list if c[0][0] == "ev1/AAA.json"]
+        return call.kwargs["content_hash"]
+
+    def test_written_with_hash_metadata(self):
+        written, mock_write = self._run(None)
+        assert written is True
+        assert "ev1/AAA.json" in _written(mock_write)
+        assert self._output_hash()
+
+    def test_compact_output_written_alongside(self):
+        """レガシー形式と並べてコンパクト形式も出力する"""
+        _, mock_write = self._run(None)
+        output = _written(mock_write)["ev1/AAA.json"]
+        compact = self.compact_writes["ev1/AAA.compact.json"]
+        assert decode_quest_output(compact) == output
+
+    def test_same_hash_skips_put(self):
+        written, mock_write = self._run(self._output_hash())
+        assert written is False
+        assert "ev1/AAA.json" not in _written(mock_write)
+        assert "ev1/AAA.fetch.json" in _written(mock_write)
+        assert self.compact_writes == {}
+
+    def test_compact_only_write_not_counted_as_written(self):
+        """中間 JSON が同一でコンパクト形式だけを書き込んだ場合は書き込みに数えない"""
+        output_hash = self._output_hash()
+        fetched = [SourceFetch("AAA", [_make_harvest_report("r1", {"素材A": "5"})])]
+        hashes = {"ev1/AAA.json": output_hash}
+        with (
+            patch("handler.read_content_hash", side_effect=hashes.get),
+            patch("handler.read_json", return_value=None),
+            patch("handler.write_json") as mock_write,
+            patch("handler.write_gzip_json") as mock_write_gzip,
+        ):
+            written = process_quest("ev1", self.QUEST, set(), fetched)
+        assert written is False
+        assert "ev1/AAA.json" not in _written(mock_write)
+        assert "ev1/AAA.compact.json" in _written(mock_write_gzip)
+
+    def test_different_hash_writes(self):
+        written, mock_write = self._run("stale")
+        assert written is True
+        assert "ev1/AAA.json" in _written(mock_write)
+
+
+# --- process_quest (ドロップ統計) ---
+
+
+class TestProcessQuestStats:
+    """stats JSON の出力"""
+
+    QUEST: ClassVar[dict] = {"questId": "AAA", "name": "Q1", "level": "90+", "ap": 40}
+
+    def _fetched(self) -> list[SourceFetch]:
+        return [
+            SourceFetch(
+                "AAA",
+                [
+                    _make_harvest_report("r1", {"素材A": "5"}),
+                    _make_harvest_report("r2", {"素材A": "500"}),
+                ],
+            )
+        ]
+
+    def test_stats_written_with_exclusions_applied(self):
+        exclusions = [{"reportId": "r2", "reason": "異常値"}]
+        with (
+            patch("handler.read_content_hash", return_value=None),
+            patch("handler.write_gzip_json"),
+            patch("handler.write_json") as mock_write,
+        ):
+            process_quest("ev1", self.QUEST, set(), self._fetched(), None, exclusions)
+        stats = _written(mock_write)["ev1/AAA.stats.json"]
+        assert stats["validReportCount"] == 1
+        (item,) = stats["items"]
+        assert item["itemName"] == "素材A"
+        assert item["totalDrops"] == 5
+        assert item["totalRuns"] == 10
+
+    def test_exclusions_change_updates_stats_of_unchanged_quest(self):
+        """ソースに変更がなくても除外リストが変われば統計を更新する"""
+        with (
+            patch("handler.read_content_hash", return_value=None),
+            patch("handler.write_gzip_json"),
+            patch("handler.write_json") as mock_write,
+        ):
+            process_quest("ev1", self.QUEST, set(), self._fetched())
+        store = _written(mock_write)
+
+        exclusions = [{"reportId": "r2", "reason": "異常値"}]
+        with (
+            patch("handler.read_json", side_effect=store.get),
+            patch("handler.read_content_hash", return_value=None),
+            patch("handler.write_json") as mock_write,
+        ):
+            written = process_quest(
+                "ev1",
+                self.QUEST,
+                set(),
+                [SourceFetch("AAA", None)],
+                store["ev1/AAA.fetch.json"],
+                exclusions,
+            )
+        assert written is False
+        updated = _written(mock_write)
+        assert "ev1/AAA.json" not in updated
+        assert updated["ev1/AAA.stats.json"]["validReportCount"] == 1
+        assert (
+            updated["ev1/AAA.fetch.json"]["exclusionsHash"]
+            != store["ev1/AAA.fetch.json"]["exclusionsHash"]
+        )
+
+
+# --- 計測 (EMF) ---
+
+
+class TestProcessQuestMetrics:
+    """クエストごとの計測値の出力"""
+
+    QUEST: ClassVar[dict] = {
+        "questId": "AAA",
+        "name": "Q1",
+        "level": "90+",
+        "ap": 40,
+        "additionalSourceQuestIds": ["BBB"],
+    }
+
+    def _records(self, capsys) -> list[dict]:
+        lines = capsys.readouterr().out.splitlines()
+        return [json.loads(line) for line in lines if line.startswith('{"_aws"')]
+
+    def test_emits_one_record_per_quest(self, capsys):
+        fetched = [
+            SourceFetch(
+                "AAA", [_make_harvest_report("r1", {"素材A": "5"})], elapsed=0.5, bytes_read=100
+            ),
+            SourceFetch(
+                "BBB", [_make_harvest_report("r1", {"素材A": "5"})], elapsed=0.25, bytes_read=50
+            ),
+        ]
+        with (
+            patch("handler.read_content_hash", return_value=None),
+            patch("handler.s3"),
+        ):
+            process_quest("ev1", self.QUEST, set(), fetched)
+        (record,) = self._records(capsys)
+        assert record["EventId"] == "ev1"
+        assert record["QuestId"] == "AAA"
+        assert record["status"] == "written"
+        assert record["fetchMs"] == 750
+        assert record["downloadBytes"] == 150
+        assert record["reports"] == 1
+        assert record["duplicateReports"] == 1
+        # 中間 JSON / コンパクト形式 / レビューキュー / stats / 報告の索引 (初回は全シャード) / 取得メタデータ
+        assert record["s3Puts"] == 5 + REPORT_SHARDS
+        assert record["anomalies"] == 0
+        for name in ("transformMs", "hashMs", "serializeMs", "s3PutMs", "statsMs", "anomaliesMs"):
+            assert record[name] >= 0
+        assert [s["sourceId"] for s in record["sources"]] == ["AAA", "BBB"]
+
+    def test_failed_quest_still_emits_record(self, capsys):
+        with (
+            patch("handler.read_content_hash", side_effect=OSError("boom")),
+            patch("handler.s3"),
+            pytest.raises(OSError),
+        ):
+            process_quest(
+                "ev1", self.QUEST, set(), [SourceFetch("AAA", []), SourceFetch("BBB", [])]
+            )
+        (record,) = self._records(capsys)
+        assert record["status"] == "failed"
+
+    def test_explicit_storage_and_emit(self, capsys):
+        """storage・emit を指定すると Lambda のバケット・標準出力を使わない"""
+        s3 = MemoryS3()
+        records = []
+        fetched = [
+            SourceFetch("AAA", [_make_harvest_report("r1", {"素材A": "5"})]),
+            SourceFetch("BBB", []),
+        ]
+        with patch("handler.s3") as default_s3:
+            written = process_quest(
+                "ev1",
+                self.QUEST,
+                set(),
+                fetched,
+                storage=Storage(s3, "backfill"),
+                emit=records.append,
+            )
+        assert written
+        default_s3.put_object.assert_not_called()
+        assert s3.get_json("ev1/AAA.json")["reports"][0]["id"] == "r1"
+        assert [r["status"] for r in records] == ["written"]
+        assert self._records(capsys) == []
+
+    def test_lambda_handler_emits_run_summary(self, capsys):
+        with patch("handler.read_json", return_value=None):
+            lambda_handler({}, None)
+        (record,) = self._records(capsys)
+        assert record["Mode"] == "batch"
+        assert record["questsProcessed"] == 0
+        assert record["failedQuests"] == []
+
+    def test_warm_run_revalidates_cached_events(self, capsys):
+        """2回目の実行では events.json を ETag で再検証し、本文を転送しない"""
+        s3 = MemoryS3()
+        s3.put_json("events.json", {"events": []})
+        s3_cache.clear()
+        with patch("handler.s3", s3):
+            lambda_handler({}, None)
+            bytes_out = s3.stats["bytesOut"]
+            lambda_handler({}, None)
+        first, second = self._records(capsys)
+        # アーカイブ処理でも events.json を読み込むが、同じ実行内の2回目はキャッシュから返す
+        assert (first["s3CacheHits"], first["s3CacheMisses"]) == (1, 1)
+        assert (second["s3CacheHits"], second["s3CacheMisses"]) == (2, 0)
+        assert s3.stats["bytesOut"] == bytes_out
+        s3_cache.clear()
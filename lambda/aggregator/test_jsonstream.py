@@ -0,0 +1,63 @@
+"""jsonstream.py のユニットテスト"""
+
+import hashlib
+import io
+import json
+import tempfile
+from unittest.mock import patch
+
+import pytest
+
+from jsonstream import iter_json_array, spool_json
+
+DATA = [
+    {"id": "r1", "items": {"ぐん肥(x3)": "12", "礼装": "NaN"}, "runcount": 100},
+    {"id": "r2", "items": {}, "runcount": 12345, "note": '心臓泥UP "quoted" ]'},
+    [1, 2.5, -3e2, True, None, "]"],
+    1234567890,
+    "文字列",
+]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 64 * 1024])
+def test_iter_json_array_matches_json_loads(chunk_size):
+    body = json.dumps(DATA, ensure_ascii=False, indent=2).encode("utf-8")
+    result = list(iter_json_array(io.BytesIO(body), chunk_size=chunk_size))
+    assert result == json.loads(body)
+
+
+def test_iter_json_array_hashes_whole_body():
+    body = (json.dumps(DATA, ensure_ascii=False) + "\n  ").encode("utf-8")
+    hasher = hashlib.sha256()
+    list(iter_json_array(io.BytesIO(body), hasher, chunk_size=5))
+    assert hasher.hexdigest() == hashlib.sha256(body).hexdigest()
+
+
+@pytest.mark.parametrize("body", [b"[]", b" [ ] ", b"[\n]\n"])
+def test_iter_json_array_empty(body):
+    assert list(iter_json_array(io.BytesIO(body), chunk_size=1)) == []
+
+
+@pytest.mark.parametrize(
+    "body",
+    [b"", b"{}", b"[1,", b"[1 2]", b"[1,]", b"[1] x", b'[{"a": 1}'],
+)
+def test_iter_json_array_invalid(body):
+    with pytest.raises(ValueError):
+        list(iter_json_array(io.BytesIO(body), chunk_size=2))
+
+
+def test_spool_json_matches_json_dumps():
+    with spool_json(DATA, ensure_ascii=False, indent=2) as f:
+        assert f.read() == json.dumps(DATA, ensure_ascii=False, indent=2).encode("utf-8")
+
+
+def test_spool_json_closes_spool_on_error():
+    with (
+        patch.object(
+            tempfile.SpooledTemporaryFile, "__exit__", autospec=True, return_value=False
+        ) as exit_,
+        pytest.raises(TypeError),
+    ):
+        spool_json({"a": object()})
+    assert exit_.call_count == 1
@@ -0,0 +1,89 @@
+"""metrics.py のユニットテスト"""
+
+import json
+import logging
+import tracemalloc
+
+import metrics
+
+
+def test_emf_record_units_and_dimensions():
+    record = metrics.emf_record(
+        {"EventId": "ev1", "QuestId": "AAA"},
+        {"transformMs": 1.5, "downloadBytes": 100, "reports": 3},
+        status="written",
+    )
+    definition = record["_aws"]["CloudWatchMetrics"][0]
+    assert definition["Namespace"] == metrics.NAMESPACE
+    assert definition["Dimensions"] == [["EventId", "QuestId"]]
+    assert definition["Metrics"] == [
+        {"Name": "transformMs", "Unit": "Milliseconds"},
+        {"Name": "downloadBytes", "Unit": "Bytes"},
+        {"Name": "reports", "Unit": "Count"},
+    ]
+    assert record["QuestId"] == "AAA"
+    assert record["transformMs"] == 1.5
+    assert record["status"] == "written"
+
+
+def test_emit_writes_single_json_line(capsys):
+    metrics.emit({"a": "報告", "b": 1})
+    out = capsys.readouterr().out
+    assert out.count("\n") == 1
+    assert json.loads(out) == {"a": "報告", "b": 1}
+
+
+def test_stage_and_count_only_inside_collecting():
+    metrics.count("s3Puts")
+    with metrics.stage("serialize"):
+        pass
+
+    quest_metrics = metrics.QuestMetrics("ev1", "AAA")
+    with metrics.collecting(quest_metrics):
+        assert metrics.current() is quest_metrics
+        metrics.count("s3Puts")
+        metrics.count("s3Puts")
+        with metrics.stage("serialize"):
+            pass
+    assert metrics.current() is None
+    assert quest_metrics.values["s3Puts"] == 2
+    assert quest_metrics.values["serializeMs"] >= 0
+
+
+def test_add_source_accumulates_fetch_totals():
+    quest_metrics = metrics.QuestMetrics("ev1", "AAA")
+    quest_metrics.add_source("AAA", 0.5, 1000, True)
+    quest_metrics.add_source("BBB", 0.25, 0, False)
+    assert quest_metrics.values["fetchMs"] == 750
+    assert quest_metrics.values["downloadBytes"] == 1000
+    record = quest_metrics.record("skipped")
+    assert [s["sourceId"] for s in record["sources"]] == ["AAA", "BBB"]
+    assert record["sources"][1]["changed"] is False
+
+
+def test_collecting_records_traced_peak():
+    quest_metrics = metrics.QuestMetrics("ev1", "AAA")
+    tracemalloc.start()
+    try:
+        with metrics.collecting(quest_metrics):
+            data = [bytearray(1024) for _ in range(100)]
+            del data
+    finally:
+        tracemalloc.stop()
+    assert quest_metrics.values["tracedPeakBytes"] >= 100 * 1024
+
+
+def test_profile_options():
+    assert metrics.profile_options({}) == set()
+    assert metrics.profile_options(None) == set()
+    assert metrics.profile_options({"profile": "cprofile"}) == {"cprofile"}
+    assert metrics.profile_options({"profile": ["tracemalloc", "unknown"]}) == {"tracemalloc"}
+
+
+def test_profiling_logs_results(caplog):
+    with caplog.at_level(logging.INFO), metrics.profiling({"cprofile", "tracemalloc"}):
+        sorted(range(1000), key=lambda x: -x)
+    assert not tracemalloc.is_tracing()
+    messages = "\n".join(r.getMessage() for r in caplog.records)
+    assert "cProfile:" in messages
+    assert "tracemalloc: peak" in messages
@@ -0,0 +1,74 @@
+"""schedule.py のユニットテスト"""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from schedule import ScheduleConfig, is_due, refresh_interval, update_state
+
+JST = timezone(timedelta(hours=9))
+CONFIG = ScheduleConfig()
+START = datetime(2026, 2, 1, 18, 0, tzinfo=JST)
+END = datetime(2026, 2, 14, 13, 0, tzinfo=JST)
+GRACE_END = END + timedelta(hours=5)
+NOW = datetime(2026, 2, 8, 12, 0, tzinfo=JST)
+
+
+def _state(last_run: datetime, velocity: float, report_count: int = 100) -> dict:
+    return {"lastRunAt": last_run.isoformat(), "reportCount": report_count, "velocity": velocity}
+
+
+@pytest.mark.parametrize(
+    ("velocity", "remaining", "expected"),
+    [
+        (1000.0, timedelta(days=5), timedelta(minutes=30)),  # 下限
+        (50.0, timedelta(days=5), timedelta(hours=2)),  # 100件 / 50件/時
+        (0.0, timedelta(days=5), timedelta(hours=3)),  # 上限
+        (0.0, timedelta(hours=2), timedelta(hours=1)),  # 終了が近ければ残り時間の半分
+        (0.0, timedelta(minutes=-30), timedelta(hours=3)),  # 終了後は残り時間を考慮しない
+    ],
+)
+def test_refresh_interval(velocity, remaining, expected):
+    assert refresh_interval(velocity, remaining, CONFIG) == expected
+
+
+def test_new_quest_is_due():
+    assert is_due(None, NOW, END, GRACE_END, CONFIG)
+
+
+def test_due_after_interval_with_half_tick_slack():
+    state = _state(NOW - timedelta(minutes=105), velocity=50.0)  # 間隔 2時間
+    assert is_due(state, NOW, END, GRACE_END, CONFIG)
+    state = _state(NOW - timedelta(minutes=90), velocity=50.0)
+    assert not is_due(state, NOW, END, GRACE_END, CONFIG)
+
+
+def test_first_run_after_event_end_is_due():
+    now = END + timedelta(minutes=10)
+    assert is_due(_state(END - timedelta(minutes=20), 0.0), now, END, GRACE_END, CONFIG)
+    assert not is_due(_state(END + timedelta(minutes=5), 0.0), now, END, GRACE_END, CONFIG)
+
+
+def test_last_run_before_grace_end_is_due():
+    now = GRACE_END - timedelta(minutes=20)
+    assert is_due(_state(now - timedelta(minutes=30), 0.0), now, END, GRACE_END, CONFIG)
+    now = GRACE_END - timedelta(minutes=40)
+    assert not is_due(_state(now - timedelta(minutes=30), 0.0), now, END, GRACE_END, CONFIG)
+
+
+def test_initial_velocity_from_event_start():
+    state = update_state(None, 400, START + timedelta(hours=8), START, CONFIG)
+    assert state == {
+        "lastRunAt": (START + timedelta(hours=8)).isoformat(),
+        "reportCount": 400,
+        "velocity": 50.0,
+    }
+
+
+def test_velocity_is_smoothed():
+    previous = _state(NOW - timedelta(hours=2), velocity=10.0, report_count=100)
+    state = update_state(previous, 300, NOW, START, CONFIG)
+    # 観測値 100件/時 と前回の 10件/時 の平均
+    assert state["velocity"] == 55.0
+    # 報告が減った (削除された) 場合は 0件/時 として扱う
+    assert update_state(previous, 50, NOW, START, CONFIG)["velocity"] == 5.0
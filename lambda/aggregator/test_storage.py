@@ -0,0 +1,92 @@
+"""storage.py のユニットテスト"""
+
+import json
+import sys
+from unittest.mock import patch
+
+import pytest
+
+from storage import DirS3, MemoryS3, S3ClientError, open_storage
+
+
+def test_memory_s3_roundtrip_and_missing_key():
+    s3 = MemoryS3()
+    s3.put_object(Bucket="b", Key="a.json", Body='{"x": 1}', Metadata={"content-hash": "h"})
+    assert json.loads(s3.get_object(Bucket="b", Key="a.json")["Body"].read()) == {"x": 1}
+    assert s3.head_object(Bucket="b", Key="a.json")["Metadata"] == {"content-hash": "h"}
+    with pytest.raises(S3ClientError) as e:
+        s3.get_object(Bucket="b", Key="missing.json")
+    assert e.value.response["Error"]["Code"] == "NoSuchKey"
+
+
+def test_memory_s3_conditional_put():
+    s3 = MemoryS3()
+    etag = s3.put_object(Bucket="b", Key="a.json", Body=b"1", IfNoneMatch="*")["ETag"]
+    with pytest.raises(S3ClientError):
+        s3.put_object(Bucket="b", Key="a.json", Body=b"2", IfNoneMatch="*")
+    s3.put_object(Bucket="b", Key="a.json", Body=b"2", IfMatch=etag)
+    with pytest.raises(S3ClientError):
+        s3.put_object(Bucket="b", Key="a.json", Body=b"3", IfMatch=etag)
+
+
+def test_memory_s3_conditional_get():
+    s3 = MemoryS3()
+    etag = s3.put_object(Bucket="b", Key="a.json", Body=b"1")["ETag"]
+    with pytest.raises(S3ClientError) as e:
+        s3.get_object(Bucket="b", Key="a.json", IfNoneMatch=etag)
+    assert e.value.response["Error"]["Code"] == "304"
+    assert s3.get_object(Bucket="b", Key="a.json", IfNoneMatch='"old"')["Body"].read() == b"1"
+
+
+def test_dir_s3_roundtrip_and_metadata(tmp_path):
+    s3 = DirS3(tmp_path)
+    etag = s3.put_object(
+        Bucket="b",
+        Key="ev/a.json",
+        Body='{"x": 1}',
+        Metadata={"content-hash": "h"},
+        ContentType="application/json",
+    )["ETag"]
+    assert (tmp_path / "ev" / "a.json").read_bytes() == b'{"x": 1}'
+    obj = s3.get_object(Bucket="b", Key="ev/a.json")
+    assert json.loads(obj["Body"].read()) == {"x": 1}
+    assert obj["ETag"] == etag
+    assert s3.head_object(Bucket="b", Key="ev/a.json")["Metadata"] == {"content-hash": "h"}
+    with pytest.raises(S3ClientError) as e:
+        s3.get_object(Bucket="b", Key="ev/a.json", IfNoneMatch=etag)
+    assert e.value.response["Error"]["Code"] == "304"
+    with pytest.raises(S3ClientError) as e:
+        s3.head_object(Bucket="b", Key="missing.json")
+    assert e.value.response["Error"]["Code"] == "404"
+
+
+def test_dir_s3_ignores_stale_metadata_of_replaced_file(tmp_path):
+    s3 = DirS3(tmp_path)
+    s3.put_object(Bucket="b", Key="a.json", Body=b"1", Metadata={"content-hash": "h"})
+    # aws s3 sync 等で本文だけ置き換えられた場合
+    (tmp_path / "a.json").write_bytes(b"2")
+    obj = s3.head_object(Bucket="b", Key="a.json")
+    assert obj["Metadata"] == {}
+    assert s3.get_object(Bucket="b", Key="a.json")["Body"].read() == b"2"
+
+
+def test_dir_s3_conditional_put_and_invalid_key(tmp_path):
+    s3 = DirS3(tmp_path)
+    etag = s3.put_object(Bucket="b", Key="a.json", Body=b"1", IfNoneMatch="*")["ETag"]
+    with pytest.raises(S3ClientError):
+        s3.put_object(Bucket="b", Key="a.json", Body=b"2", IfNoneMatch="*")
+    s3.put_object(Bucket="b", Key="a.json", Body=b"2", IfMatch=etag)
+    with pytest.raises(ValueError):
+        s3.put_object(Bucket="b", Key="../outside.json", Body=b"1")
+
+
+def test_open_storage_selects_client():
+    client, bucket = open_storage("memory")
+    assert (isinstance(client, MemoryS3), bucket) == (True, "memory")
+    with pytest.raises(ValueError):
+        open_storage("ftp://example")
+
+
+def test_open_storage_requires_boto3_for_s3():
+    with patch.dict(sys.modules, {"boto3": None}), pytest.raises(RuntimeError, match="boto3"):
+        open_storage("s3://bucket")
@@ -0,0 +1,25 @@
+"""stubs.py のユニットテスト"""
+
+import json
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+import pytest
+
+from stubs import HarvestStub
+
+
+def test_harvest_stub_serves_sources_with_etag():
+    with HarvestStub({"AAA": [{"id": "r1"}]}) as stub:
+        url = stub.url_template.format(quest_id="AAA")
+        with urlopen(url) as resp:
+            assert json.loads(resp.read()) == [{"id": "r1"}]
+            etag = resp.headers["ETag"]
+        with pytest.raises(HTTPError) as e:
+            urlopen(Request(url, headers={"If-None-Match": etag}))
+        assert e.value.code == 304
+        with pytest.raises(HTTPError) as e:
+            urlopen(stub.url_template.format(quest_id="BBB"))
+        assert e.value.code == 404
+    assert stub.requests == 3
+    assert stub.not_modified == 1
@@ -0,0 +1,44 @@
+"""synthetic.py のユニットテスト"""
+
+from synthetic import SyntheticConfig, SyntheticHarvest, make_events
+
+
+def test_same_seed_same_data():
+    config = SyntheticConfig(reports=50, sources=2, duplicate_rate=0.5)
+    a = SyntheticHarvest(config).quest_sources("AAA")
+    b = SyntheticHarvest(config).quest_sources("AAA")
+    assert a == b
+
+
+def test_reports_split_across_sources():
+    sources = SyntheticHarvest(SyntheticConfig(reports=10, sources=3)).quest_sources("AAA")
+    assert list(sources) == ["AAA", "AAA-1", "AAA-2"]
+    assert [len(r) for r in sources.values()] == [4, 3, 3]
+    assert {r["quest_id"] for r in sources["AAA-1"]} == {"AAA-1"}
+
+
+def test_duplicate_ids_reuse_main_source():
+    config = SyntheticConfig(reports=40, sources=2, duplicate_rate=1.0)
+    sources = SyntheticHarvest(config).quest_sources("AAA")
+    main_ids = {r["id"] for r in sources["AAA"]}
+    assert {r["id"] for r in sources["AAA-1"]} <= main_ids
+
+
+def test_raw_and_box_count_reports():
+    raw = SyntheticHarvest(SyntheticConfig(reports=5, raw_rate=1.0)).quest_sources("AAA")["AAA"]
+    assert all("ぐん肥" in r["items"] for r in raw)
+    box = SyntheticHarvest(SyntheticConfig(reports=5, raw_rate=0.0)).quest_sources("AAA")["AAA"]
+    assert all("ぐん肥(x1)" in r["items"] and "ぐん肥" not in r["items"] for r in box)
+
+
+def test_nan_rate():
+    config = SyntheticConfig(reports=20, nan_rate=1.0)
+    reports = SyntheticHarvest(config).quest_sources("AAA")["AAA"]
+    assert {v for r in reports for v in r["items"].values()} == {"NaN"}
+
+
+def test_make_events_lists_additional_sources():
+    events = make_events({"AAA": ["AAA", "AAA-1"]})
+    quest = events["events"][0]["quests"][0]
+    assert quest["questId"] == "AAA"
+    assert quest["additionalSourceQuestIds"] == ["AAA-1"]
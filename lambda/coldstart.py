@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""管理 API・集計 Lambda のコールドスタートのベンチマーク。
+
+ルート (呼び出し方) ごとに新しい Python プロセスを起動し、次の時間を計測する。
+
+- importMs: handler モジュールの読み込み (Lambda の初期化フェーズに相当)
+- firstMs: 読み込み直後の1回目の呼び出し (コールドスタートのリクエスト)
+- warmMs: 続けて同じ呼び出しをした2回目 (ウォームスタートのリクエスト)
+
+S3 は aggregator/stubs.py の MemoryS3、Harvest はローカル HTTP サーバー (HarvestStub) で代替する。
+boto3 がインストールされている場合は、S3 クライアントの作成時に boto3 の読み込みと
+クライアントの作成も行う (実際の通信はしない) ため、その時間も計測に含まれる。
+結果は各ルートの中央値を表示し、--output に JSON で保存する。
+--max-import-ms を指定すると、読み込み時間の中央値が上限を超えたルートがあれば終了コード 1 を返す。
+
+    python coldstart.py [--repeat 5] [--output coldstart.json] [--max-import-ms 300] [ROUTE ...]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any
+
+LAMBDA_DIR = Path(__file__).resolve().parent
+RESULT_PREFIX = "COLDSTART_RESULT "
+
+
+def _api_event(method: str, path: str, path_parameters=None, body=None, query=None) -> dict:
+    return {
+        "requestContext": {"http": {"method": method, "path": path}},
+        "pathParameters": path_parameters,
+        "queryStringParameters": query,
+        "headers": {},
+        "body": json.dumps(body, ensure_ascii=False) if body is not None else None,
+    }
+
+
+# ルート名 → (Lambda のディレクトリ名, 呼び出しイベント)
+ROUTES: dict[str, tuple[str, Any]] = {
+    "admin:GET /events": ("admin_api", _api_event("GET", "/events")),
+    "admin:GET /exclusions": (
+        "admin_api",
+        _api_event("GET", "/exclusions/Q1", {"questId": "Q1"}),
+    ),
+    "admin:PUT /exclusions": (
+        "admin_api",
+        _api_event(
+            "PUT",
+            "/exclusions/Q1",
+            {"questId": "Q1"},
+            [{"reportId": "r1", "reason": "coldstart"}],
+        ),
+    ),
+    "admin:GET /harvest/quests": (
+        "admin_api",
+        _api_event("GET", "/harvest/quests", query={"q": "クエスト", "limit": "50"}),
+    ),
+    "aggregator:batch": ("aggregator", {"force": True}),
+    "aggregator:worker": ("aggregator", None),
+}
+
+
+def _seed_admin(s3: Any, events: dict) -> None:
+    s3.put_json("events.json", events)
+    s3.put_json("exclusions/Q1.json", [])
+    s3.put_json("exclusions/_index.json", {"quests": {}})
+    catalog = [
+        {
+            "id": f"H{i:05d}",
+            "name": f"クエスト {i}",
+            "chapter": f"チャプター {i % 50}",
+            "place": f"場所 {i % 200}",
+            "since": "2025-01-01T00:00:00+09:00",
+            "is_freequest": i % 3 == 0,
+        }
+        for i in range(3000)
+    ]
+    s3.put_json("harvest/all.json", {"quests": catalog, "fetchedAt": time.time()})
+
+
+def _s3_factory(s3: Any) -> Any:
+    """s3 を返すファクトリ。boto3 があればクライアントの作成まで行ってコストを計測に含める。"""
+
+    def create():
+        try:
+            import boto3
+        except ImportError:
+            boto3 = None
+        if boto3 is not None and hasattr(boto3, "__file__"):
+            boto3.client("s3", region_name="ap-northeast-1")
+        return s3
+
+    return create
+
+
+def run_child(route: str) -> dict:
+    """子プロセス: handler を読み込んでルートを2回呼び出し、計測値を返す。"""
+    lambda_name, event = ROUTES[route]
+    sys.path[:0] = [str(LAMBDA_DIR / lambda_name), str(LAMBDA_DIR / "shared")]
+    if lambda_name != "aggregator":
+        sys.path.append(str(LAMBDA_DIR / "aggregator"))
+    os.environ.setdefault("S3_BUCKET_NAME", "coldstart")
+    from stubs import HarvestStub, MemoryS3, install_aws_stubs
+    from synthetic import SyntheticConfig, SyntheticHarvest, make_events
+
+    install_aws_stubs()
+    harvest = SyntheticHarvest(SyntheticConfig(reports=500, sources=1))
+    sources = harvest.quest_sources("Q1")
+    events = make_events({"Q1": list(sources)})
+    stub = HarvestStub(sources).__enter__()
+    # S3 の初期データは計測の対象外にするため、handler を読み込む前に用意しておく
+    s3 = MemoryS3()
+    if lambda_name == "admin_api":
+        _seed_admin(s3, events)
+    else:
+        s3.put_json("events.json", events)
+
+    modules_before = set(sys.modules)
+    start = time.perf_counter()
+    import handler
+
+    import_ms = (time.perf_counter() - start) * 1000
+    imported = set(sys.modules) - modules_before
+
+    from aws_clients import LazyClient
+
+    handler.s3 = LazyClient("s3", factory=_s3_factory(s3))
+    if lambda_name == "aggregator":
+        handler.HARVEST_QUEST_URL = stub.url_template
+        if event is None:
+            quest = events["events"][0]["quests"][0]
+            event = {"eventId": events["events"][0]["eventId"], "quest": quest, "eventItems": []}
+
+    timings = []
+    for _ in range(2):
+        start = time.perf_counter()
+        result = handler.lambda_handler(event, None)
+        timings.append((time.perf_counter() - start) * 1000)
+    stub.__exit__(None, None, None)
+    # 管理 API は HTTP ステータス、集計 Lambda のワーカーはクエストの処理結果、バッチは失敗数
+    status = result.get("statusCode", result.get("status", result.get("failed")))
+    return {
+        "importMs": import_ms,
+        "firstMs": timings[0],
+        "warmMs": timings[1],
+        "modulesImported": len(imported),
+        "boto3AtImport": "boto3" in imported,
+        "status": status,
+    }
+
+
+def measure(route: str, repeat: int) -> dict:
+    """ルートを repeat 回、それぞれ新しいプロセスで計測し、中央値と全計測値を返す。"""
+    runs = []
+    for _ in range(repeat):
+        proc = subprocess.run(
+            [sys.executable, __file__, "--child", route],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        line = next(
+            line for line in reversed(proc.stdout.splitlines()) if line.startswith(RESULT_PREFIX)
+        )
+        runs.append(json.loads(line[len(RESULT_PREFIX) :]))
+    summary = {
+        key: round(statistics.median(r[key] for r in runs), 3)
+        for key in ("importMs", "firstMs", "warmMs")
+    }
+    return {
+        **summary,
+        "modulesImported": runs[0]["modulesImported"],
+        "boto3AtImport": any(r["boto3AtImport"] for r in runs),
+        "status": runs[0]["status"],
+        "runs": runs,
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="コールドスタートのベンチマーク")
+    parser.add_argument("routes", nargs="*", metavar="ROUTE", help=", ".join(ROUTES))
+    parser.add_argument("--repeat", "-r", type=int, default=5)
+    parser.add_argument("--output", "-o")
+    parser.add_argument("--max-import-ms", type=float, help="読み込み時間の中央値の上限")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        # 子プロセスの標準出力にはログや EMF も出るため、接頭辞を付けた最後の行で結果を返す
+        print(RESULT_PREFIX + json.dumps(run_child(args.child)), flush=True)
+        return 0
+
+    unknown = [route for route in args.routes if route not in ROUTES]
+    if unknown:
+        parser.error(f"unknown route(s): {', '.join(unknown)}")
+
+    results = {}
+    exceeded = []
+    for route in args.routes or list(ROUTES):
+        result = results[route] = measure(route, args.repeat)
+        print(
+            f"{route:28s} import {result['importMs']:7.1f} ms"
+            f"  first {result['firstMs']:7.1f} ms"
+            f"  warm {result['warmMs']:7.1f} ms"
+            f"  modules {result['modulesImported']:4d}"
+            f"{'  (boto3 at import)' if result['boto3AtImport'] else ''}"
+        )
+        if args.max_import_ms is not None and result["importMs"] > args.max_import_ms:
+            exceeded.append(route)
+
+    if args.output:
+        output = {
+            "environment": {"python": sys.version.split()[0], "cpuCount": os.cpu_count()},
+            "repeat": args.repeat,
+            "results": results,
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(output, f, ensure_ascii=False, indent=2)
+    if exceeded:
+        print(
+            f"Import time exceeded {args.max_import_ms} ms: {', '.join(exceeded)}", file=sys.stderr
+        )
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
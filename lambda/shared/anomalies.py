@@ -0,0 +1,225 @@
+"""報告の異常検出とレビューキューの作成 (集計 Lambda・管理 API 共通)。
+
+公開画面の isOutlier() (viewer/src/aggregate.ts) と同じ z スコアの規則で、報告のアイテムごとの
+「1周あたりドロップ数」が外れ値かを判定する。基準値 (平均・標準偏差・ドロップ率) には
+stats JSON の items (除外リスト適用後) を使うため、報告リストは1回走査するだけでよい。
+transform_report() が warnings を記録した報告もキューに含める。
+
+- クエストのキュー (<eventId>/<questId>.anomalies.json): build_quest_queue
+- イベントのキュー (<eventId>/anomalies.json): build_event_queue
+- いずれも外れ値の z スコアの絶対値の最大 (score) の降順に並べる。warnings だけの報告は score 0
+- 除外リストに含まれる報告はレビュー済みとしてキューに含めない
+
+管理 API の GET /anomalies/{eventId} は parse_queue_query() で検索条件を検証し、
+page_queue() でキューを1ページ分に切り出して返す。
+"""
+
+import re
+from typing import Any
+
+from stats import reporter_name
+
+# 公開画面の constants.ts と同じ
+RE_EVENT_ITEM = re.compile(r"\(x(\d+)\)$")
+RE_POINT = re.compile(r"^ポイント\(\+(\d+)\)$")
+RE_QP = re.compile(r"^QP\(\+(\d+)\)$")
+
+# 公開画面の aggregate.ts と同じ
+OUTLIER_Z_THRESHOLD = 3.0
+MIN_SAMPLE_COUNT = 5
+MIN_RUNCOUNT = 20
+MIN_DROP_RATE_FOR_NORMAL = 0.2
+
+# キューの種類 (管理 API の kind パラメータ)
+KIND_OUTLIER = "outlier"
+KIND_WARNING = "warning"
+
+# 管理 API の1ページあたりの件数 (catalog.py と同じ)
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+
+
+def is_always_target_item(item_name: str) -> bool:
+    """イベントアイテム・ポイント・QP は低ドロップ率でも外れ値の判定対象にする。"""
+    return bool(
+        RE_EVENT_ITEM.search(item_name) or RE_POINT.match(item_name) or RE_QP.match(item_name)
+    )
+
+
+def outlier_z(value: float | None, runcount: int, item: dict[str, Any]) -> float | None:
+    """報告の値が外れ値なら z スコアを返す (外れ値でない・判定対象外なら None)。
+
+    item は stats JSON の items の要素 (itemName / mean / stdDev / sampleCount / dropRate)。
+    判定の条件は公開画面の isOutlier() と同じ。
+    """
+    if value is None or runcount < MIN_RUNCOUNT:
+        return None
+    if item["sampleCount"] < MIN_SAMPLE_COUNT or item["stdDev"] < 1e-9:
+        return None
+    if not is_always_target_item(item["itemName"]) and item["dropRate"] < MIN_DROP_RATE_FOR_NORMAL:
+        return None
+    z = (value / runcount - item["mean"]) / item["stdDev"]
+    return z if abs(z) > OUTLIER_Z_THRESHOLD else None
+
+
+def score_report(report: dict, items: dict[str, dict]) -> dict | None:
+    """報告1件を判定し、外れ値か warnings があればキューの項目を返す (なければ None)。
+
+    items は itemName → stats JSON の items の要素。
+    """
+    outliers = []
+    runcount = report.get("runcount") or 0
+    for name, value in report["items"].items():
+        item = items.get(name)
+        if item is None:
+            continue
+        z = outlier_z(value, runcount, item)
+        if z is not None:
+            outliers.append({"itemName": name, "value": value, "zScore": round(z, 3)})
+    warnings = report.get("warnings") or []
+    if not outliers and not warnings:
+        return None
+    return {
+        "reportId": report["id"],
+        "reporter": reporter_name(report),
+        "runcount": runcount,
+        "timestamp": report.get("timestamp", ""),
+        "score": max((abs(o["zScore"]) for o in outliers), default=0),
+        "outliers": outliers,
+        "warnings": warnings,
+    }
+
+
+def _rank(entry: dict) -> tuple:
+    return -entry["score"], -len(entry["outliers"]), entry["reportId"]
+
+
+def build_quest_queue(
+    quest: dict, reports: list[dict], stats_items: list[dict], excluded_ids: set[str]
+) -> dict:
+    """クエストの報告リストと stats JSON の items からクエストのキューを作る。
+
+    lastUpdated は含めない (呼び出し側で内容のハッシュを取ってから付ける)。
+    """
+    items = {item["itemName"]: item for item in stats_items}
+    anomalies = []
+    for report in reports:
+        if report["id"] in excluded_ids:
+            continue
+        entry = score_report(report, items)
+        if entry is not None:
+            anomalies.append(entry)
+    anomalies.sort(key=_rank)
+    return {
+        "quest": quest,
+        "outlierCount": sum(1 for a in anomalies if a["outliers"]),
+        "anomalies": anomalies,
+    }
+
+
+def apply_exclusions_to_queue(
+    queue: dict, stats_items: list[dict], excluded_ids: set[str], restored: list[dict]
+) -> dict:
+    """クエストのキューに除外リストの変更を反映した新しいキューを返す (管理 API 用)。
+
+    除外した報告を取り除き、除外を解除した報告 (restored) を更新後の stats JSON の items で判定して加える。
+    残りの報告は判定し直さない (集計 Lambda の次回の実行で作り直される)。lastUpdated は含めない。
+    """
+    items = {item["itemName"]: item for item in stats_items}
+    restored_ids = {r["id"] for r in restored}
+    anomalies = [
+        a
+        for a in queue["anomalies"]
+        if a["reportId"] not in excluded_ids and a["reportId"] not in restored_ids
+    ]
+    for report in restored:
+        entry = score_report(report, items)
+        if entry is not None:
+            anomalies.append(entry)
+    anomalies.sort(key=_rank)
+    return {
+        "quest": queue["quest"],
+        "outlierCount": sum(1 for a in anomalies if a["outliers"]),
+        "anomalies": anomalies,
+    }
+
+
+def build_event_queue(event_id: str, quest_queues: list[dict | None]) -> dict:
+    """クエストのキュー (イベントのクエスト順、未作成は None) を合わせてイベントのキューを作る。
+
+    各項目に questId を付ける。lastUpdated は含めない。
+    """
+    quests = []
+    anomalies = []
+    for queue in quest_queues:
+        if queue is None:
+            continue
+        quest_id = queue["quest"]["questId"]
+        quests.append(
+            {
+                "questId": quest_id,
+                "anomalyCount": len(queue["anomalies"]),
+                "outlierCount": queue["outlierCount"],
+            }
+        )
+        anomalies.extend({"questId": quest_id, **a} for a in queue["anomalies"])
+    anomalies.sort(key=_rank)
+    return {"eventId": event_id, "quests": quests, "anomalies": anomalies}
+
+
+def filter_kind(anomalies: list[dict], kind: str | None) -> list[dict]:
+    """kind が outlier なら外れ値を含む項目、warning なら warnings だけの項目に絞り込む。"""
+    if kind == KIND_OUTLIER:
+        return [a for a in anomalies if a["outliers"]]
+    if kind == KIND_WARNING:
+        return [a for a in anomalies if not a["outliers"]]
+    return anomalies
+
+
+def parse_queue_query(params: dict | None) -> dict[str, Any]:
+    """クエリ文字列パラメータ (questId / kind / limit / offset) を検証して辞書に変換する。
+
+    不正な値の場合は ValueError を送出する。
+    """
+    params = params or {}
+    kind = params.get("kind") or None
+    if kind not in (None, KIND_OUTLIER, KIND_WARNING):
+        raise ValueError(f"kind must be {KIND_OUTLIER} or {KIND_WARNING}")
+    try:
+        limit = int(params.get("limit") or DEFAULT_LIMIT)
+        offset = int(params.get("offset") or 0)
+    except ValueError:
+        raise ValueError("limit and offset must be integers") from None
+    if limit < 1 or offset < 0:
+        raise ValueError("limit must be positive and offset must not be negative")
+    return {
+        "questId": params.get("questId") or None,
+        "kind": kind,
+        "limit": min(limit, MAX_LIMIT),
+        "offset": offset,
+    }
+
+
+def page_queue(queue: dict, kind: str | None, limit: int, offset: int) -> dict:
+    """キューを kind で絞り込み、offset 件目から limit 件を返す。
+
+    Returns:
+        {
+            "anomalies": [...],
+            "total": <絞り込み後の件数>,
+            "offset": <offset>,
+            "limit": <limit>,
+            "nextOffset": <次のページの offset (最後のページなら None)>,
+            "lastUpdated": <キューの更新日時>,
+        }
+    """
+    anomalies = filter_kind(queue["anomalies"], kind)
+    next_offset = offset + limit if offset + limit < len(anomalies) else None
+    return {
+        "anomalies": anomalies[offset : offset + limit],
+        "total": len(anomalies),
+        "offset": offset,
+        "limit": limit,
+        "nextOffset": next_offset,
+        "lastUpdated": queue.get("lastUpdated"),
+    }
@@ -0,0 +1,72 @@
+"""AWS クライアントの遅延作成 (集計 Lambda・管理 API 共通)。
+
+boto3 の読み込みとクライアントの作成はコールドスタートの初期化時間の大部分を占める。
+モジュールの読み込み時にはクライアントを作らず、最初に API を呼び出した時に作成して、
+以降はコンテナ内で使い回す。使わないクライアント (ファンアウトしない集計 Lambda の
+Lambda クライアント等) は作成されず、テストやベンチマークでは boto3 なしで handler を読み込める。
+
+- LazyClient: 最初の属性アクセスで boto3.client() を呼び出すクライアントの代理
+- error_code: botocore の ClientError を読み込まずにエラーコードを取り出す
+- prewarm: PREWARM_CLIENTS=1 の場合、初期化フェーズでクライアントを作成しておく
+  (Provisioned Concurrency 等で初期化時間がリクエストのレイテンシに含まれない場合向け)
+"""
+
+import os
+import threading
+from collections.abc import Callable
+from typing import Any
+
+
+class LazyClient:
+    """最初に使われた時に作成する AWS クライアントの代理。スレッドセーフ。
+
+    属性アクセスは作成したクライアントにそのまま委譲する。
+    factory を指定しない場合は boto3.client(service, **kwargs) で作成する。
+    """
+
+    def __init__(self, service: str, factory: Callable[[], Any] | None = None, **kwargs: Any):
+        self.service = service
+        self._factory = factory
+        self._kwargs = kwargs
+        self._client: Any = None
+        self._lock = threading.Lock()
+
+    @property
+    def created(self) -> bool:
+        """クライアントを作成済みか。"""
+        return self._client is not None
+
+    def get(self) -> Any:
+        """クライアントを返す (未作成なら作成する)。"""
+        client = self._client
+        if client is None:
+            with self._lock:
+                client = self._client
+                if client is None:
+                    if self._factory is not None:
+                        client = self._factory()
+                    else:
+                        import boto3
+
+                        client = boto3.client(self.service, **self._kwargs)
+                    self._client = client
+        return client
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.get(), name)
+
+
+def error_code(error: Exception) -> str | None:
+    """botocore の ClientError のエラーコードを返す (ClientError 以外は None)。"""
+    response = getattr(error, "response", None)
+    if not isinstance(response, dict):
+        return None
+    return response.get("Error", {}).get("Code")
+
+
+def prewarm(*clients: LazyClient) -> None:
+    """PREWARM_CLIENTS=1 の場合、clients を今すぐ作成する。モジュールの読み込み時に呼び出す。"""
+    if os.environ.get("PREWARM_CLIENTS", "0") != "1":
+        return
+    for client in clients:
+        client.get()
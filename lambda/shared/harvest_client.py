@@ -0,0 +1,243 @@
+"""Harvest API の HTTP クライアント (集計 Lambda・管理 API 共通)。
+
+Lambda レイヤーとして両方の関数に配置される (terraform/lambda.tf)。
+
+- ホストごとに接続を保持して再利用する (keep-alive)。ウォームスタート時は前回の接続を使う
+- 接続タイムアウトと読み込みタイムアウトを分けて設定する
+- 接続エラー・429・5xx はジッター付き指数バックオフで再試行する
+- 失敗が連続した場合はサーキットブレーカーを開き、以降のリクエストを即座に失敗させる。
+  ブレーカーは実行ごとに reset_breaker() で閉じる
+"""
+
+import http.client
+import json
+import logging
+import random
+import threading
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from typing import Any
+from urllib.parse import urlsplit
+
+logger = logging.getLogger()
+
+# 再試行するステータスコード
+RETRYABLE_STATUS = frozenset({429, 500, 502, 503, 504})
+
+# 保持していた接続がサーバー側で閉じられていた場合のエラー。バックオフなしで接続し直す
+_STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    ConnectionResetError,
+    BrokenPipeError,
+)
+
+
+class HarvestHTTPError(Exception):
+    """Harvest が 4xx / 5xx を返した (5xx・429 は再試行しても解消しなかった)。"""
+
+    def __init__(self, url: str, status: int, retry_after: float | None = None):
+        super().__init__(f"HTTP {status}: {url}")
+        self.url = url
+        self.status = status
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(Exception):
+    """サーキットブレーカーが開いているためリクエストを送らなかった。"""
+
+
+class CircuitBreaker:
+    """連続した失敗回数が threshold に達したら開くサーキットブレーカー。
+
+    成功すると失敗回数は 0 に戻る。開いたブレーカーは reset() まで開いたままになる。
+    """
+
+    def __init__(self, threshold: int):
+        self.threshold = threshold
+        self.failures = 0
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self.threshold > 0 and self.failures >= self.threshold
+
+    def check(self, url: str) -> None:
+        if self.is_open:
+            raise CircuitOpenError(f"Circuit open after {self.failures} failures: {url}")
+
+    def record_success(self) -> None:
+        with self._lock:
+            if not self.is_open:
+                self.failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.failures == self.threshold:
+                logger.warning("Harvest circuit breaker opened after %d failures", self.failures)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.failures = 0
+
+
+class HarvestClient:
+    """Harvest API 用の HTTP クライアント。スレッドセーフ。
+
+    max_per_host はホストごとの同時リクエスト数の上限で、保持する接続数の上限も兼ねる。
+    """
+
+    def __init__(
+        self,
+        *,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 30.0,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 8.0,
+        failure_threshold: int = 5,
+        max_per_host: int = 4,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_per_host = max_per_host
+        self.breaker = CircuitBreaker(failure_threshold)
+        self._sleep = sleep
+        self._idle: dict[tuple[str, str], list[http.client.HTTPConnection]] = {}
+        self._semaphores: dict[tuple[str, str], threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+
+    def reset_breaker(self) -> None:
+        """サーキットブレーカーを閉じる。実行の開始時に呼ぶ。"""
+        self.breaker.reset()
+
+    def close(self) -> None:
+        """保持している接続をすべて閉じる。"""
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for conns in idle.values():
+            for conn in conns:
+                conn.close()
+
+    def backoff(self, attempt: int, retry_after: float | None = None) -> float:
+        """attempt 回目 (0 始まり) の再試行までの待ち時間 (full jitter)。
+
+        Retry-After が指定されていればそれ以上待つ。
+        """
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2**attempt))
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.backoff_max))
+        return delay
+
+    def _host_semaphore(self, host: tuple[str, str]) -> threading.BoundedSemaphore:
+        with self._lock:
+            sem = self._semaphores.get(host)
+            if sem is None:
+                sem = self._semaphores[host] = threading.BoundedSemaphore(self.max_per_host)
+            return sem
+
+    def _acquire(self, host: tuple[str, str]) -> tuple[http.client.HTTPConnection, bool]:
+        """保持している接続があれば (接続, True)、なければ新しい接続と False を返す。"""
+        with self._lock:
+            idle = self._idle.get(host)
+            if idle:
+                return idle.pop(), True
+        scheme, netloc = host
+        conn_class = (
+            http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        )
+        return conn_class(netloc, timeout=self.connect_timeout), False
+
+    def _release(self, host: tuple[str, str], conn: http.client.HTTPConnection, resp: Any) -> None:
+        """本文を読み切った再利用可能な接続を保持し、それ以外は閉じる。"""
+        if resp.isclosed() and not resp.will_close:
+            with self._lock:
+                idle = self._idle.setdefault(host, [])
+                if len(idle) < self.max_per_host:
+                    idle.append(conn)
+                    return
+        conn.close()
+
+    def _request(
+        self, url: str, headers: dict[str, str]
+    ) -> tuple[tuple[str, str], http.client.HTTPConnection, http.client.HTTPResponse]:
+        """再試行しながらリクエストを送り、ステータスが成功または 304 のレスポンスを返す。"""
+        parts = urlsplit(url)
+        host = (parts.scheme, parts.netloc)
+        path = parts.path + (f"?{parts.query}" if parts.query else "")
+        attempt = 0
+        while True:
+            self.breaker.check(url)
+            conn, reused = self._acquire(host)
+            retry_after = None
+            try:
+                if conn.sock is None:
+                    conn.connect()
+                conn.sock.settimeout(self.read_timeout)
+                conn.request("GET", path, headers=headers)
+                resp = conn.getresponse()
+            except (OSError, http.client.HTTPException) as e:
+                conn.close()
+                if reused and isinstance(e, _STALE_CONNECTION_ERRORS):
+                    continue
+                error: Exception = e
+            else:
+                if resp.status < 400:
+                    self.breaker.record_success()
+                    return host, conn, resp
+                resp.read()
+                self._release(host, conn, resp)
+                if resp.status not in RETRYABLE_STATUS:
+                    # 404 等はリクエスト側の問題なので障害としては数えない
+                    self.breaker.record_success()
+                    raise HarvestHTTPError(url, resp.status)
+                retry_after = _parse_retry_after(resp.headers.get("Retry-After"))
+                error = HarvestHTTPError(url, resp.status, retry_after)
+
+            self.breaker.record_failure()
+            if attempt >= self.max_retries or self.breaker.is_open:
+                raise error
+            delay = self.backoff(attempt, retry_after)
+            logger.info("Retrying %s in %.2fs after %s", url, delay, error)
+            self._sleep(delay)
+            attempt += 1
+
+    @contextmanager
+    def get(self, url: str, headers: dict[str, str] | None = None) -> Iterator[Any]:
+        """GET リクエストを送り、レスポンス (http.client.HTTPResponse) を返す。
+
+        with ブロック内で本文を read() で読み込む。304 は例外にせずそのまま返す。
+        再試行はレスポンスのステータスを受け取るまでの失敗に限り、本文の読み込み中の失敗は再試行しない。
+        本文を最後まで読み込んだ接続は次のリクエストで再利用する。
+        """
+        parts = urlsplit(url)
+        with self._host_semaphore((parts.scheme, parts.netloc)):
+            host, conn, resp = self._request(url, headers or {})
+            try:
+                yield resp
+                if not resp.isclosed():
+                    # 読み残した本文を破棄してから接続を戻す
+                    resp.read()
+            except BaseException:
+                conn.close()
+                raise
+            self._release(host, conn, resp)
+
+    def get_json(self, url: str) -> Any:
+        """GET リクエストを送り、本文を JSON としてデコードして返す。"""
+        with self.get(url) as resp:
+            return json.loads(resp.read().decode("utf-8"))
+
+
+def _parse_retry_after(value: str | None) -> float | None:
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
@@ -0,0 +1,88 @@
+"""イベント単位の集計 (<eventId>/rollup.json) の作成 (集計 Lambda・管理 API 共通)。
+
+イベントの全クエストのドロップ統計 (<eventId>/<questId>.stats.json) を合算し、
+公開画面の報告者サマリ・イベントアイテムサマリが1回の取得で表示できる形にする。
+クエストごとの統計は除外リストを適用済みのため、ここでは合算だけを行う。
+"""
+
+import re
+from typing import Any
+
+# 枠数報告のイベントアイテム (例: "ぐん肥(x3)")。公開画面の RE_EVENT_ITEM と同じ
+RE_EVENT_ITEM = re.compile(r"\(x(\d+)\)$")
+
+
+def build_event_rollup(event_id: str, quest_stats: list[dict[str, Any] | None]) -> dict:
+    """クエストごとの統計 (イベントのクエスト順、未作成は None) からイベント単位の集計を作る。
+
+    - quests: クエストごとの報告数・有効報告数・周回数
+    - reporters: 報告者ごとの報告数・周回数とクエストごとの内訳 (周回数の降順)
+    - eventItems: イベントアイテムごとの合計ドロップ数・周回数とクエストごとの内訳 (名前順)
+
+    lastUpdated は含めない (呼び出し側で内容のハッシュを取ってから付ける)。
+    """
+    quests = []
+    reporters: dict[str, dict] = {}
+    event_items: dict[str, dict] = {}
+    for stats in quest_stats:
+        if stats is None:
+            continue
+        quest = stats["quest"]
+        quest_id = quest["questId"]
+        quests.append(
+            {
+                **quest,
+                "reportCount": stats["reportCount"],
+                "validReportCount": stats["validReportCount"],
+                "totalRuns": stats["totalRuns"],
+            }
+        )
+
+        for r in stats.get("reporters", []):
+            entry = reporters.get(r["reporter"])
+            if entry is None:
+                entry = reporters[r["reporter"]] = {
+                    "reporter": r["reporter"],
+                    "xId": r["xId"],
+                    "reportCount": 0,
+                    "totalRuns": 0,
+                    "quests": [],
+                }
+            entry["reportCount"] += r["reportCount"]
+            entry["totalRuns"] += r["totalRuns"]
+            entry["quests"].append(
+                {
+                    "questId": quest_id,
+                    "reportCount": r["reportCount"],
+                    "totalRuns": r["totalRuns"],
+                    "items": r["items"],
+                }
+            )
+
+        for item in stats["items"]:
+            if not RE_EVENT_ITEM.search(item["itemName"]):
+                continue
+            entry = event_items.get(item["itemName"])
+            if entry is None:
+                entry = event_items[item["itemName"]] = {
+                    "itemName": item["itemName"],
+                    "totalDrops": 0,
+                    "totalRuns": 0,
+                    "quests": [],
+                }
+            entry["totalDrops"] += item["totalDrops"]
+            entry["totalRuns"] += item["totalRuns"]
+            entry["quests"].append(
+                {
+                    "questId": quest_id,
+                    "totalDrops": item["totalDrops"],
+                    "totalRuns": item["totalRuns"],
+                }
+            )
+
+    return {
+        "eventId": event_id,
+        "quests": quests,
+        "reporters": sorted(reporters.values(), key=lambda r: (-r["totalRuns"], r["reporter"])),
+        "eventItems": [event_items[name] for name in sorted(event_items)],
+    }
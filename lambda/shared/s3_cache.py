@@ -0,0 +1,135 @@
+"""S3 の JSON オブジェクトのメモリキャッシュ (集計 Lambda・管理 API 共通)。
+
+ウォームスタートしたコンテナで同じオブジェクトを何度も読み込む場合に、
+本文の転送を省くためのキャッシュ。
+
+- 読み込んだオブジェクトの本文と ETag をキーごとに保持する (LRU、件数と1件のサイズに上限あり)
+- 保持しているキーは ETag を条件にした GET (If-None-Match) で再検証し、304 なら保持している本文を使う。
+  ttl を指定した場合は、最後の検証から ttl 秒以内であれば再検証せずに使う
+- 自分が書き込んだオブジェクトは put() で本文と新しい ETag を記録するか、invalidate() で破棄する
+- 本文は bytes のまま保持し、読み込むたびに JSON としてデコードする (呼び出し側が変更しても影響しない)
+
+boto3 に依存しないよう、S3 クライアントは呼び出し時に受け取る。
+"""
+
+import json
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Any
+
+
+@dataclass
+class _Entry:
+    body: bytes
+    etag: str
+    validated_at: float
+
+
+def is_not_modified(error: Exception) -> bool:
+    """S3 の条件付き GET が 304 Not Modified を返したことを表す例外か。"""
+    response = getattr(error, "response", None) or {}
+    code = response.get("Error", {}).get("Code")
+    status = response.get("ResponseMetadata", {}).get("HTTPStatusCode")
+    return code in ("304", "NotModified") or status == 304
+
+
+class S3JsonCache:
+    """S3 の JSON オブジェクトをキーごとに保持するキャッシュ。スレッドセーフ。
+
+    max_object_bytes を超える本文は保持しない (大きな中間 JSON でメモリを使い切らないため)。
+    """
+
+    def __init__(
+        self,
+        *,
+        max_entries: int = 64,
+        max_object_bytes: int = 256 * 1024,
+        ttl: float = 0.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_entries = max_entries
+        self.max_object_bytes = max_object_bytes
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._stats = {"hits": 0, "misses": 0, "revalidated": 0}
+        self._lock = threading.Lock()
+
+    def _lookup(self, key: str) -> _Entry | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+    def get(self, client: Any, bucket: str, key: str) -> tuple[Any, str | None]:
+        """key の JSON とその ETag を返す。
+
+        S3 のエラー (NoSuchKey 等) はそのまま送出する。キーが存在しなくなっていれば保持していた本文も破棄する。
+        """
+        entry = self._lookup(key)
+        if entry is not None and self.ttl > 0 and self._clock() - entry.validated_at < self.ttl:
+            self._count("hits")
+            return json.loads(entry.body.decode("utf-8")), entry.etag
+
+        kwargs = {"IfNoneMatch": entry.etag} if entry is not None else {}
+        try:
+            obj = client.get_object(Bucket=bucket, Key=key, **kwargs)
+        except Exception as e:
+            if entry is not None and is_not_modified(e):
+                entry.validated_at = self._clock()
+                self._count("hits")
+                self._count("revalidated")
+                return json.loads(entry.body.decode("utf-8")), entry.etag
+            self.invalidate(key)
+            raise
+
+        body = obj["Body"].read()
+        etag = obj.get("ETag")
+        self._count("misses")
+        if etag is not None:
+            self.put(key, body, etag)
+        else:
+            self.invalidate(key)
+        return json.loads(body.decode("utf-8")), etag
+
+    def put(self, key: str, body: bytes | str, etag: str | None) -> None:
+        """key の本文と ETag を記録する。自分で書き込んだ直後に呼ぶ。
+
+        ETag が不明な場合や本文が大きすぎる場合は保持していた本文を破棄する。
+        """
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        if etag is None or len(body) > self.max_object_bytes:
+            self.invalidate(key)
+            return
+        with self._lock:
+            self._entries[key] = _Entry(body, etag, self._clock())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key: str) -> None:
+        """key の本文を破棄する。"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        """保持している本文をすべて破棄する。"""
+        with self._lock:
+            self._entries.clear()
+
+    def take_stats(self) -> dict[str, int]:
+        """前回の呼び出しからのヒット数・ミス数・304 で再検証した数を返し、0 に戻す。"""
+        with self._lock:
+            stats = dict(self._stats)
+            for name in self._stats:
+                self._stats[name] = 0
+        return stats
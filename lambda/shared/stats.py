@@ -0,0 +1,226 @@
+"""クエスト単位のドロップ統計の計算 (集計 Lambda・管理 API 共通)。
+
+公開画面の aggregate() / calcOutlierStats() (viewer/src/aggregate.ts) と同じ値を、
+報告リストを1回走査するだけで計算する (compute_quest_stats)。
+管理 API は除外・除外解除した報告だけを累積和に加減算して統計を更新する (apply_report_to_stats)。
+
+差分更新で除外した報告の内容を引けるように、集計 Lambda は報告 ID → 報告の索引を
+ID のハッシュで REPORT_SHARDS 個に分けて出力する (<eventId>/<questId>.reports/<nn>.json)。
+管理 API は除外リストの変更で必要なシャードだけを読み込む。
+"""
+
+import math
+import zlib
+
+Z = 1.96  # 95% confidence
+
+
+def wilson_ci(successes: float, n: float) -> tuple[float, float]:
+    """Wilson スコア法による二項比率の 95% 信頼区間 (下限, 上限) を返す。"""
+    if n == 0:
+        return 0.0, 0.0
+    p = successes / n
+    z2 = Z * Z
+    denom = 1 + z2 / n
+    centre = (p + z2 / (2 * n)) / denom
+    margin = (Z / denom) * math.sqrt(max(0.0, (p * (1 - p)) / n + z2 / (4 * n * n)))
+    return max(0.0, centre - margin), min(1.0, centre + margin)
+
+
+def item_stats(
+    item_name: str,
+    total_drops: float,
+    total_runs: float,
+    per_run_sum: float,
+    per_run_sum_sq: float,
+    sample_count: int,
+    present_count: int,
+) -> dict:
+    """アイテム1件の累積和から ItemStats + ItemOutlierStats 相当の辞書を作る。
+
+    mean / stdDev は「1周あたりドロップ数」の平均・母標準偏差。
+    累積和 (perRunSum / perRunSumSq / presentCount) もそのまま含め、
+    管理 API が報告1件の除外・除外解除を差分で反映できるようにする。
+    """
+    lower, upper = wilson_ci(total_drops, total_runs)
+    if sample_count > 0:
+        mean = per_run_sum / sample_count
+        variance = max(0.0, per_run_sum_sq / sample_count - mean * mean)
+    else:
+        mean = 0.0
+        variance = 0.0
+    return {
+        "itemName": item_name,
+        "totalDrops": total_drops,
+        "totalRuns": total_runs,
+        "dropRate": total_drops / total_runs if total_runs > 0 else 0,
+        "ciLower": lower,
+        "ciUpper": upper,
+        "mean": mean,
+        "stdDev": math.sqrt(variance),
+        "sampleCount": sample_count,
+        "perRunSum": per_run_sum,
+        "perRunSumSq": per_run_sum_sq,
+        "presentCount": present_count,
+    }
+
+
+def refresh_item_stats(item: dict) -> None:
+    """アイテム統計の累積和から dropRate・信頼区間・平均・標準偏差を計算し直す (差分更新用)。"""
+    item.update(
+        item_stats(
+            item["itemName"],
+            item["totalDrops"],
+            item["totalRuns"],
+            item["perRunSum"],
+            item["perRunSumSq"],
+            item["sampleCount"],
+            item["presentCount"],
+        )
+    )
+
+
+def reporter_name(report: dict) -> str:
+    """報告者名を返す。公開画面の getReporterName() と同じく reporterName → reporter → "匿名" の順。"""
+    return report.get("reporterName") or report.get("reporter") or "匿名"
+
+
+def _new_reporter(name: str, report: dict) -> dict:
+    return {
+        "reporter": name,
+        "xId": report.get("reporter") or "",
+        "reportCount": 0,
+        "totalRuns": 0,
+        "items": {},
+    }
+
+
+def compute_quest_stats(reports: list[dict], excluded_ids: set[str]) -> dict:
+    """中間 JSON の報告リストからアイテムごとの統計を1パスで計算する。
+
+    excluded_ids に含まれる報告は集計しない。値が null のアイテムはその報告では集計しない。
+    周回数が 0 以下の報告は1周あたりの値を計算できないため平均・標準偏差に含めない。
+    アイテムは有効報告での初出順に並ぶ。
+    同じ走査で報告者ごとの報告数・周回数・アイテムごとの合計ドロップ数も集計する
+    (イベント単位の集計 rollup.json の材料)。報告者は有効報告での初出順に並ぶ。
+    """
+    # itemName -> [totalDrops, totalRuns, perRunSum, perRunSumSq, sampleCount, presentCount]
+    sums: dict[str, list[float]] = {}
+    reporters: dict[str, dict] = {}
+    valid_reports = 0
+    total_runs = 0
+    for report in reports:
+        if report["id"] in excluded_ids:
+            continue
+        valid_reports += 1
+        runcount = report["runcount"]
+        total_runs += runcount
+        name = reporter_name(report)
+        reporter = reporters.get(name)
+        if reporter is None:
+            reporter = reporters[name] = _new_reporter(name, report)
+        reporter["reportCount"] += 1
+        reporter["totalRuns"] += runcount
+        reporter_items = reporter["items"]
+        for item_name, value in report["items"].items():
+            s = sums.get(item_name)
+            if s is None:
+                s = sums[item_name] = [0, 0, 0.0, 0.0, 0, 0]
+            s[5] += 1
+            if value is None:
+                continue
+            reporter_items[item_name] = reporter_items.get(item_name, 0) + value
+            s[0] += value
+            s[1] += runcount
+            if runcount > 0:
+                per_run = value / runcount
+                s[2] += per_run
+                s[3] += per_run * per_run
+                s[4] += 1
+
+    return {
+        "reportCount": len(reports),
+        "validReportCount": valid_reports,
+        "totalRuns": total_runs,
+        "excludedReportIds": sorted(excluded_ids),
+        "items": [item_stats(name, *s) for name, s in sums.items()],
+        "reporters": list(reporters.values()),
+    }
+
+
+def apply_report_to_stats(stats: dict, items: dict[str, dict], report: dict, sign: int) -> None:
+    """報告1件を統計に加える (sign=1) または取り除く (sign=-1)。
+
+    items は stats["items"] の itemName → アイテム統計の索引。
+    報告に含まれるアイテムの累積和だけを更新するため、計算量は報告のアイテム数に比例する。
+    """
+    runcount = report["runcount"]
+    stats["validReportCount"] += sign
+    stats["totalRuns"] += sign * runcount
+    for item_name, value in report["items"].items():
+        item = items.get(item_name)
+        if item is None:
+            item = item_stats(item_name, 0, 0, 0.0, 0.0, 0, 0)
+            stats["items"].append(item)
+            items[item_name] = item
+        item["presentCount"] += sign
+        if value is not None:
+            item["totalDrops"] += sign * value
+            item["totalRuns"] += sign * runcount
+            if runcount > 0:
+                per_run = value / runcount
+                item["perRunSum"] += sign * per_run
+                item["perRunSumSq"] += sign * per_run * per_run
+                item["sampleCount"] += sign
+        refresh_item_stats(item)
+
+
+def apply_report_to_reporters(
+    stats: dict, reporters: dict[str, dict], report: dict, sign: int
+) -> None:
+    """報告1件を報告者ごとの集計 (stats["reporters"]) に加える (sign=1) または取り除く (sign=-1)。
+
+    reporters は stats["reporters"] の報告者名 → 報告者集計の索引。
+    """
+    name = reporter_name(report)
+    reporter = reporters.get(name)
+    if reporter is None:
+        reporter = reporters[name] = _new_reporter(name, report)
+        stats["reporters"].append(reporter)
+    reporter["reportCount"] += sign
+    reporter["totalRuns"] += sign * report["runcount"]
+    for item_name, value in report["items"].items():
+        if value is not None:
+            reporter["items"][item_name] = reporter["items"].get(item_name, 0) + sign * value
+
+
+# --- 報告の索引 (差分更新用) ---
+
+# 索引のシャード数。除外リストの変更で読み込む量は 報告数 / REPORT_SHARDS 件程度になる。
+# 初回は全シャードを書き込むため、集計 Lambda の書き込み回数との兼ね合いで決める
+REPORT_SHARDS = 16
+
+# 索引に含めない報告のフィールド (統計・レビューキューの計算に使わない)
+_UNINDEXED_FIELDS = ("id", "note")
+
+
+def report_shard(report_id: str) -> int:
+    """報告 ID が属する索引のシャード番号を返す。"""
+    return zlib.crc32(report_id.encode("utf-8")) % REPORT_SHARDS
+
+
+def report_shard_key(event_id: str, quest_id: str, shard: int) -> str:
+    """報告の索引のシャードの S3 キーを返す。"""
+    return f"{event_id}/{quest_id}.reports/{shard:02d}.json"
+
+
+def build_report_shards(reports: list[dict]) -> list[dict[str, dict]]:
+    """中間 JSON の報告リストから、シャードごとの 報告 ID → 報告 (note を除く) の索引を作る。"""
+    shards: list[dict[str, dict]] = [{} for _ in range(REPORT_SHARDS)]
+    for report in reports:
+        rid = report.get("id")
+        if rid:
+            shards[report_shard(rid)][rid] = {
+                k: v for k, v in report.items() if k not in _UNINDEXED_FIELDS
+            }
+    return shards
@@ -0,0 +1,129 @@
+"""anomalies.py のユニットテスト"""
+
+import pytest
+
+from anomalies import (
+    apply_exclusions_to_queue,
+    build_event_queue,
+    build_quest_queue,
+    outlier_z,
+    page_queue,
+    parse_queue_query,
+)
+
+QUEST = {"questId": "Q1", "name": "Q1", "level": "90", "ap": 40}
+
+
+def _item(name: str, mean: float, std_dev: float, drop_rate: float, samples: int = 10) -> dict:
+    return {
+        "itemName": name,
+        "mean": mean,
+        "stdDev": std_dev,
+        "dropRate": drop_rate,
+        "sampleCount": samples,
+    }
+
+
+def _report(rid: str, runcount: int, items: dict, warnings: list[str] | None = None) -> dict:
+    report = {"id": rid, "reporter": "u1", "runcount": runcount, "items": items}
+    if warnings:
+        report["warnings"] = warnings
+    return report
+
+
+ITEMS = [_item("素材A", 0.5, 0.05, 0.5), _item("レア素材", 0.01, 0.002, 0.01)]
+
+
+class TestOutlierZ:
+    def test_returns_z_beyond_threshold(self):
+        assert outlier_z(20, 20, ITEMS[0]) == pytest.approx(10)
+        assert outlier_z(11, 20, ITEMS[0]) is None
+
+    def test_skips_small_runcount_and_samples(self):
+        assert outlier_z(20, 19, ITEMS[0]) is None
+        assert outlier_z(20, 20, _item("素材A", 0.5, 0.05, 0.5, samples=4)) is None
+        assert outlier_z(None, 20, ITEMS[0]) is None
+
+    def test_low_drop_rate_item_only_for_event_items(self):
+        assert outlier_z(5, 20, ITEMS[1]) is None
+        assert outlier_z(5, 20, _item("ぐん肥(x3)", 0.01, 0.002, 0.01)) is not None
+
+
+def test_quest_queue_ranked_by_score():
+    reports = [
+        _report("r1", 20, {"素材A": 10}),
+        _report("r2", 20, {"素材A": 14}),
+        _report("r3", 20, {"素材A": 20}),
+        _report("r4", 20, {"素材A": 10}, warnings=["raw count"]),
+    ]
+    queue = build_quest_queue(QUEST, reports, ITEMS, set())
+    assert [a["reportId"] for a in queue["anomalies"]] == ["r3", "r2", "r4"]
+    assert queue["outlierCount"] == 2
+    assert queue["anomalies"][0]["outliers"] == [{"itemName": "素材A", "value": 20, "zScore": 10.0}]
+    assert queue["anomalies"][2]["score"] == 0
+
+
+def test_excluded_reports_not_queued():
+    reports = [_report("r1", 20, {"素材A": 20}), _report("r2", 20, {"素材A": 18})]
+    queue = build_quest_queue(QUEST, reports, ITEMS, {"r1"})
+    assert [a["reportId"] for a in queue["anomalies"]] == ["r2"]
+
+
+def test_apply_exclusions_drops_excluded_and_scores_restored():
+    reports = [_report("r1", 20, {"素材A": 20}), _report("r2", 20, {"素材A": 14})]
+    queue = build_quest_queue(QUEST, reports, ITEMS, {"r2"})
+    queue = apply_exclusions_to_queue(queue, ITEMS, {"r1"}, [reports[1]])
+    assert [a["reportId"] for a in queue["anomalies"]] == ["r2"]
+    assert queue["outlierCount"] == 1
+    assert queue["quest"] == QUEST
+
+
+def test_event_queue_merges_quests():
+    q1 = build_quest_queue(QUEST, [_report("r1", 20, {"素材A": 14})], ITEMS, set())
+    q2 = build_quest_queue(
+        {**QUEST, "questId": "Q2"}, [_report("r2", 20, {"素材A": 20})], ITEMS, set()
+    )
+    queue = build_event_queue("ev1", [q1, None, q2])
+    assert queue["quests"] == [
+        {"questId": "Q1", "anomalyCount": 1, "outlierCount": 1},
+        {"questId": "Q2", "anomalyCount": 1, "outlierCount": 1},
+    ]
+    assert [(a["questId"], a["reportId"]) for a in queue["anomalies"]] == [
+        ("Q2", "r2"),
+        ("Q1", "r1"),
+    ]
+
+
+class TestParseQueueQuery:
+    def test_defaults(self):
+        assert parse_queue_query(None) == {
+            "questId": None,
+            "kind": None,
+            "limit": 50,
+            "offset": 0,
+        }
+
+    def test_limit_capped(self):
+        assert parse_queue_query({"limit": "10000"})["limit"] == 500
+
+    @pytest.mark.parametrize(
+        "params", [{"kind": "all"}, {"limit": "x"}, {"limit": "0"}, {"offset": "-1"}]
+    )
+    def test_invalid(self, params):
+        with pytest.raises(ValueError):
+            parse_queue_query(params)
+
+
+def test_page_queue_filters_kind():
+    reports = [
+        _report("r1", 20, {"素材A": 20}),
+        _report("r2", 20, {"素材A": 14}),
+        _report("r3", 20, {"素材A": 10}, warnings=["raw count"]),
+    ]
+    queue = {**build_quest_queue(QUEST, reports, ITEMS, set()), "lastUpdated": "t"}
+    page = page_queue(queue, "outlier", 1, 0)
+    assert [a["reportId"] for a in page["anomalies"]] == ["r1"]
+    assert (page["total"], page["nextOffset"], page["lastUpdated"]) == (2, 1, "t")
+    page = page_queue(queue, "warning", 50, 0)
+    assert [a["reportId"] for a in page["anomalies"]] == ["r3"]
+    assert page["nextOffset"] is None
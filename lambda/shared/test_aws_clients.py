@@ -0,0 +1,74 @@
+"""aws_clients.py のユニットテスト"""
+
+import sys
+import threading
+from unittest.mock import MagicMock, patch
+
+from aws_clients import LazyClient, error_code, prewarm
+
+
+class _Error(Exception):
+    def __init__(self, code):
+        super().__init__(code)
+        self.response = {"Error": {"Code": code}}
+
+
+def test_lazy_client_creates_on_first_attribute_access():
+    factory = MagicMock(return_value=MagicMock(**{"get_object.return_value": {"ok": True}}))
+    client = LazyClient("s3", factory=factory)
+    assert not client.created
+    factory.assert_not_called()
+
+    assert client.get_object(Bucket="b", Key="k") == {"ok": True}
+    assert client.head_object is factory.return_value.head_object
+    assert client.created
+    factory.assert_called_once()
+
+
+def test_lazy_client_uses_boto3_by_default():
+    boto3 = MagicMock()
+    with patch.dict(sys.modules, {"boto3": boto3}):
+        client = LazyClient("lambda", region_name="ap-northeast-1")
+        boto3.client.assert_not_called()
+        assert client.get() is boto3.client.return_value
+    boto3.client.assert_called_once_with("lambda", region_name="ap-northeast-1")
+
+
+def test_lazy_client_is_created_once_across_threads():
+    created = []
+    barrier = threading.Barrier(8)
+
+    def factory():
+        created.append(object())
+        return created[-1]
+
+    client = LazyClient("s3", factory=factory)
+    results = []
+
+    def use():
+        barrier.wait()
+        results.append(client.get())
+
+    threads = [threading.Thread(target=use) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(created) == 1
+    assert all(r is created[0] for r in results)
+
+
+def test_error_code():
+    assert error_code(_Error("NoSuchKey")) == "NoSuchKey"
+    assert error_code(ValueError("x")) is None
+
+
+def test_prewarm_only_when_enabled(monkeypatch):
+    factory = MagicMock()
+    client = LazyClient("s3", factory=factory)
+    monkeypatch.delenv("PREWARM_CLIENTS", raising=False)
+    prewarm(client)
+    assert not client.created
+    monkeypatch.setenv("PREWARM_CLIENTS", "1")
+    prewarm(client)
+    assert client.created
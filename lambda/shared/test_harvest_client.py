@@ -0,0 +1,158 @@
+"""harvest_client.py のユニットテスト"""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from harvest_client import CircuitOpenError, HarvestClient, HarvestHTTPError
+
+
+class _Server:
+    """responses に積んだ (ステータス, ヘッダ, 本文) を順に返すローカル HTTP/1.1 サーバー。
+
+    空になった後は最後のレスポンスを返し続ける。
+    """
+
+    def __init__(self, responses: list[tuple[int, dict[str, str], bytes]]):
+        self.responses = list(responses)
+        self.requests: list[dict] = []
+        self.connections: set[tuple[str, int]] = set()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                server.requests.append({"path": self.path, "headers": dict(self.headers)})
+                server.connections.add(self.client_address)
+                if len(server.responses) > 1:
+                    status, headers, body = server.responses.pop(0)
+                else:
+                    status, headers, body = server.responses[0]
+                self.send_response(status)
+                for k, v in headers.items():
+                    self.send_header(k, v)
+                if status != 304:
+                    self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if status != 304:
+                    self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._httpd.daemon_threads = True
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+        host, port = self._httpd.server_address[:2]
+        self.url = f"http://{host}:{port}/harvest/contents/quest/all.json"
+
+    def close(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def start(*responses):
+        server = _Server(list(responses))
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.close()
+
+
+def _ok(data) -> tuple[int, dict, bytes]:
+    return 200, {"Content-Type": "application/json"}, json.dumps(data).encode("utf-8")
+
+
+def _client(**kwargs) -> tuple[HarvestClient, list[float]]:
+    sleeps: list[float] = []
+    return HarvestClient(sleep=sleeps.append, **kwargs), sleeps
+
+
+def test_get_json_reuses_connection(serve):
+    server = serve(_ok([{"id": 1}]))
+    client, _ = _client()
+    assert client.get_json(server.url) == [{"id": 1}]
+    assert client.get_json(server.url) == [{"id": 1}]
+    assert len(server.requests) == 2
+    assert len(server.connections) == 1
+    client.close()
+
+
+def test_not_modified_is_returned(serve):
+    server = serve((304, {"ETag": '"a1"'}, b""))
+    client, _ = _client()
+    with client.get(server.url, {"If-None-Match": '"a1"'}) as resp:
+        assert resp.status == 304
+        assert resp.headers.get("ETag") == '"a1"'
+    assert server.requests[0]["headers"]["If-None-Match"] == '"a1"'
+
+
+def test_retries_server_errors_with_backoff(serve):
+    server = serve((503, {}, b"busy"), (502, {}, b"bad"), _ok({"ok": True}))
+    client, sleeps = _client(backoff_base=0.5, backoff_max=8.0)
+    assert client.get_json(server.url) == {"ok": True}
+    assert len(server.requests) == 3
+    assert len(sleeps) == 2
+    assert 0 <= sleeps[0] <= 0.5
+    assert 0 <= sleeps[1] <= 1.0
+    assert client.breaker.failures == 0
+
+
+def test_retry_after_is_honored(serve):
+    server = serve((429, {"Retry-After": "3"}, b""), _ok([]))
+    client, sleeps = _client()
+    assert client.get_json(server.url) == []
+    assert sleeps[0] >= 3
+
+
+def test_client_error_is_not_retried(serve):
+    server = serve((404, {}, b"not found"))
+    client, sleeps = _client()
+    with pytest.raises(HarvestHTTPError) as e:
+        client.get_json(server.url)
+    assert e.value.status == 404
+    assert len(server.requests) == 1
+    assert sleeps == []
+    assert client.breaker.failures == 0
+
+
+def test_gives_up_after_max_retries(serve):
+    server = serve((500, {}, b""))
+    client, sleeps = _client(max_retries=2, failure_threshold=0)
+    with pytest.raises(HarvestHTTPError) as e:
+        client.get_json(server.url)
+    assert e.value.status == 500
+    assert len(server.requests) == 3
+    assert len(sleeps) == 2
+
+
+def test_connection_error_is_retried():
+    client, sleeps = _client(max_retries=1, connect_timeout=1.0)
+    with pytest.raises(OSError):
+        # 待ち受けていないポート
+        client.get_json("http://127.0.0.1:9/harvest/contents/quest/all.json")
+    assert len(sleeps) == 1
+
+
+def test_circuit_breaker_opens_and_resets(serve):
+    server = serve((500, {}, b""))
+    client, _ = _client(max_retries=0, failure_threshold=2)
+    for _ in range(2):
+        with pytest.raises(HarvestHTTPError):
+            client.get_json(server.url)
+    with pytest.raises(CircuitOpenError):
+        client.get_json(server.url)
+    assert len(server.requests) == 2
+
+    client.reset_breaker()
+    server.responses = [_ok([])]
+    assert client.get_json(server.url) == []
@@ -0,0 +1,70 @@
+"""rollup.py のユニットテスト"""
+
+from rollup import build_event_rollup
+
+
+def _stats(quest_id: str, reporters: list[dict], items: list[dict]) -> dict:
+    return {
+        "quest": {"questId": quest_id, "name": quest_id, "level": "90", "ap": 40},
+        "reportCount": sum(r["reportCount"] for r in reporters) + 1,
+        "validReportCount": sum(r["reportCount"] for r in reporters),
+        "totalRuns": sum(r["totalRuns"] for r in reporters),
+        "items": items,
+        "reporters": reporters,
+    }
+
+
+def _reporter(name: str, reports: int, runs: int, items: dict) -> dict:
+    return {
+        "reporter": name,
+        "xId": name.lower(),
+        "reportCount": reports,
+        "totalRuns": runs,
+        "items": items,
+    }
+
+
+def _item(name: str, drops: int, runs: int) -> dict:
+    return {"itemName": name, "totalDrops": drops, "totalRuns": runs}
+
+
+def test_merges_reporters_and_event_items_across_quests():
+    q1 = _stats(
+        "Q1",
+        [_reporter("A", 1, 10, {"ぐん肥(x3)": 5}), _reporter("B", 2, 50, {"ぐん肥(x3)": 20})],
+        [_item("ぐん肥(x3)", 25, 60), _item("心臓", 3, 60)],
+    )
+    q2 = _stats(
+        "Q2",
+        [_reporter("A", 1, 100, {"ぐん肥(x3)": 40, "ぐん肥(x1)": 7})],
+        [_item("ぐん肥(x3)", 40, 100), _item("ぐん肥(x1)", 7, 100)],
+    )
+    rollup = build_event_rollup("ev", [q1, None, q2])
+
+    assert rollup["eventId"] == "ev"
+    assert [q["questId"] for q in rollup["quests"]] == ["Q1", "Q2"]
+    assert rollup["quests"][0]["validReportCount"] == 3
+
+    a, b = rollup["reporters"]
+    assert (a["reporter"], a["reportCount"], a["totalRuns"]) == ("A", 2, 110)
+    assert [q["questId"] for q in a["quests"]] == ["Q1", "Q2"]
+    assert a["quests"][1]["items"] == {"ぐん肥(x3)": 40, "ぐん肥(x1)": 7}
+    assert (b["reporter"], b["totalRuns"]) == ("B", 50)
+
+    # 枠数報告のイベントアイテムだけを名前順に合算する
+    assert [i["itemName"] for i in rollup["eventItems"]] == ["ぐん肥(x1)", "ぐん肥(x3)"]
+    x3 = rollup["eventItems"][1]
+    assert (x3["totalDrops"], x3["totalRuns"]) == (65, 160)
+    assert x3["quests"] == [
+        {"questId": "Q1", "totalDrops": 25, "totalRuns": 60},
+        {"questId": "Q2", "totalDrops": 40, "totalRuns": 100},
+    ]
+
+
+def test_empty_event():
+    assert build_event_rollup("ev", [None]) == {
+        "eventId": "ev",
+        "quests": [],
+        "reporters": [],
+        "eventItems": [],
+    }
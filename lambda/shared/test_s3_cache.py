@@ -0,0 +1,117 @@
+"""s3_cache.py のユニットテスト"""
+
+import json
+
+import pytest
+
+from s3_cache import S3JsonCache
+
+
+class _Error(Exception):
+    def __init__(self, code):
+        super().__init__(code)
+        self.response = {"Error": {"Code": code}}
+
+
+class _Body:
+    def __init__(self, data):
+        self._data = data
+
+    def read(self):
+        return self._data
+
+
+class _FakeS3:
+    """get_object の条件付き読み込みだけを模した S3 クライアント。"""
+
+    def __init__(self):
+        self.objects = {}
+        self.requests = []
+
+    def put(self, key, data, etag):
+        self.objects[key] = (json.dumps(data).encode("utf-8"), etag)
+
+    def get_object(self, Bucket, Key, **kwargs):
+        self.requests.append((Key, kwargs.get("IfNoneMatch")))
+        if Key not in self.objects:
+            raise _Error("NoSuchKey")
+        body, etag = self.objects[Key]
+        if kwargs.get("IfNoneMatch") == etag:
+            raise _Error("304")
+        return {"Body": _Body(body), "ETag": etag}
+
+
+def test_revalidates_with_etag():
+    s3 = _FakeS3()
+    s3.put("a.json", {"x": 1}, '"v1"')
+    cache = S3JsonCache()
+    assert cache.get(s3, "b", "a.json") == ({"x": 1}, '"v1"')
+    assert cache.get(s3, "b", "a.json") == ({"x": 1}, '"v1"')
+    assert s3.requests == [("a.json", None), ("a.json", '"v1"')]
+    assert cache.take_stats() == {"hits": 1, "misses": 1, "revalidated": 1}
+    assert cache.take_stats() == {"hits": 0, "misses": 0, "revalidated": 0}
+
+
+def test_changed_object_is_fetched_again():
+    s3 = _FakeS3()
+    s3.put("a.json", {"x": 1}, '"v1"')
+    cache = S3JsonCache()
+    cache.get(s3, "b", "a.json")
+    s3.put("a.json", {"x": 2}, '"v2"')
+    assert cache.get(s3, "b", "a.json") == ({"x": 2}, '"v2"')
+
+
+def test_returned_data_is_independent_copy():
+    s3 = _FakeS3()
+    s3.put("a.json", {"events": []}, '"v1"')
+    cache = S3JsonCache()
+    data, _ = cache.get(s3, "b", "a.json")
+    data["events"].append("changed")
+    assert cache.get(s3, "b", "a.json")[0] == {"events": []}
+
+
+def test_ttl_skips_revalidation():
+    now = [0.0]
+    s3 = _FakeS3()
+    s3.put("a.json", {"x": 1}, '"v1"')
+    cache = S3JsonCache(ttl=10, clock=lambda: now[0])
+    cache.get(s3, "b", "a.json")
+    now[0] = 5
+    cache.get(s3, "b", "a.json")
+    assert len(s3.requests) == 1
+    now[0] = 20
+    cache.get(s3, "b", "a.json")
+    assert s3.requests[-1] == ("a.json", '"v1"')
+
+
+def test_put_records_own_write():
+    s3 = _FakeS3()
+    s3.put("a.json", {"x": 2}, '"v2"')
+    cache = S3JsonCache()
+    cache.put("a.json", json.dumps({"x": 2}), '"v2"')
+    assert cache.get(s3, "b", "a.json") == ({"x": 2}, '"v2"')
+    assert cache.take_stats()["hits"] == 1
+
+
+def test_large_objects_and_evicted_keys_are_not_kept():
+    s3 = _FakeS3()
+    s3.put("big.json", list(range(100)), '"v1"')
+    for key in ("a.json", "b.json", "c.json"):
+        s3.put(key, {}, '"v1"')
+    cache = S3JsonCache(max_entries=2, max_object_bytes=32)
+    for key in ("big.json", "a.json", "b.json", "c.json", "big.json", "a.json"):
+        cache.get(s3, "b", key)
+    assert cache.take_stats()["hits"] == 0
+
+
+def test_missing_key_drops_entry():
+    s3 = _FakeS3()
+    s3.put("a.json", {"x": 1}, '"v1"')
+    cache = S3JsonCache()
+    cache.get(s3, "b", "a.json")
+    del s3.objects["a.json"]
+    with pytest.raises(_Error):
+        cache.get(s3, "b", "a.json")
+    s3.put("a.json", {"x": 1}, '"v1"')
+    cache.get(s3, "b", "a.json")
+    assert s3.requests[-1] == ("a.json", None)
@@ -0,0 +1,142 @@
+"""stats.py のユニットテスト"""
+
+import math
+
+import pytest
+
+from stats import (
+    REPORT_SHARDS,
+    apply_report_to_stats,
+    build_report_shards,
+    compute_quest_stats,
+    report_shard,
+    wilson_ci,
+)
+
+
+def _report(rid: str, runcount: int, items: dict) -> dict:
+    return {"id": rid, "runcount": runcount, "items": items}
+
+
+def _by_name(stats: dict) -> dict:
+    return {s["itemName"]: s for s in stats["items"]}
+
+
+def test_wilson_ci_zero_runs():
+    assert wilson_ci(0, 0) == (0.0, 0.0)
+
+
+def test_wilson_ci_bounds():
+    lower, upper = wilson_ci(30, 100)
+    assert 0 < lower < 0.3 < upper < 1
+    assert lower == pytest.approx(0.2189, abs=1e-4)
+    assert upper == pytest.approx(0.3958, abs=1e-4)
+
+
+def test_totals_and_drop_rate():
+    reports = [
+        _report("r1", 10, {"素材A": 5, "素材B": 1}),
+        _report("r2", 20, {"素材A": 8}),
+    ]
+    stats = compute_quest_stats(reports, set())
+    items = _by_name(stats)
+    assert items["素材A"]["totalDrops"] == 13
+    assert items["素材A"]["totalRuns"] == 30
+    assert items["素材A"]["dropRate"] == pytest.approx(13 / 30)
+    assert items["素材B"]["totalRuns"] == 10
+    assert stats["validReportCount"] == 2
+    assert stats["totalRuns"] == 30
+
+
+def test_null_value_not_counted():
+    """値が null のアイテムは周回数にも含めない"""
+    reports = [
+        _report("r1", 10, {"礼装": None, "素材A": 5}),
+        _report("r2", 20, {"礼装": 2}),
+    ]
+    items = _by_name(compute_quest_stats(reports, set()))
+    assert items["礼装"]["totalDrops"] == 2
+    assert items["礼装"]["totalRuns"] == 20
+    assert items["礼装"]["sampleCount"] == 1
+
+
+def test_excluded_reports_skipped():
+    reports = [
+        _report("r1", 10, {"素材A": 5}),
+        _report("r2", 10, {"素材A": 500, "素材B": 1}),
+    ]
+    stats = compute_quest_stats(reports, {"r2"})
+    items = _by_name(stats)
+    assert items["素材A"]["totalDrops"] == 5
+    assert "素材B" not in items
+    assert stats["reportCount"] == 2
+    assert stats["validReportCount"] == 1
+
+
+def test_mean_and_std_dev_match_two_pass():
+    reports = [
+        _report("r1", 10, {"素材A": 5}),
+        _report("r2", 20, {"素材A": 8}),
+        _report("r3", 40, {"素材A": 30}),
+    ]
+    per_run = [0.5, 0.4, 0.75]
+    mean = sum(per_run) / 3
+    std_dev = math.sqrt(sum((v - mean) ** 2 for v in per_run) / 3)
+    item = _by_name(compute_quest_stats(reports, set()))["素材A"]
+    assert item["mean"] == pytest.approx(mean)
+    assert item["stdDev"] == pytest.approx(std_dev)
+    assert item["sampleCount"] == 3
+
+
+def test_item_order_is_first_appearance():
+    reports = [
+        _report("r1", 10, {"素材B": 1, "素材A": 5}),
+        _report("r2", 10, {"素材C": 1, "素材A": 5}),
+    ]
+    names = [s["itemName"] for s in compute_quest_stats(reports, set())["items"]]
+    assert names == ["素材B", "素材A", "素材C"]
+
+
+def test_reporter_totals():
+    """報告者ごとの報告数・周回数・ドロップ数を有効報告だけで集計する"""
+    reports = [
+        {**_report("r1", 10, {"素材A": 5, "礼装": None}), "reporter": "u1", "reporterName": "U1"},
+        {**_report("r2", 20, {"素材A": 8}), "reporter": "u1", "reporterName": "U1"},
+        {**_report("r3", 30, {"素材A": 1}), "reporter": "", "reporterName": ""},
+        {**_report("r4", 40, {"素材A": 100}), "reporter": "u1", "reporterName": "U1"},
+    ]
+    stats = compute_quest_stats(reports, {"r4"})
+    assert stats["reporters"] == [
+        {"reporter": "U1", "xId": "u1", "reportCount": 2, "totalRuns": 30, "items": {"素材A": 13}},
+        {"reporter": "匿名", "xId": "", "reportCount": 1, "totalRuns": 30, "items": {"素材A": 1}},
+    ]
+
+
+def test_apply_report_matches_full_computation():
+    """報告1件の除外・除外解除の差分更新が全件からの計算と一致する"""
+    reports = [
+        _report("r1", 10, {"素材A": 5, "礼装": None}),
+        _report("r2", 20, {"素材A": 8, "素材B": 2}),
+        _report("r3", 30, {"素材A": 1}),
+    ]
+    stats = compute_quest_stats(reports, set())
+    items = _by_name(stats)
+    apply_report_to_stats(stats, items, reports[1], -1)
+    expected = compute_quest_stats(reports, {"r2"})
+    assert (stats["validReportCount"], stats["totalRuns"]) == (2, 40)
+    for name, item in _by_name(expected).items():
+        for field, value in item.items():
+            assert items[name][field] == pytest.approx(value), (name, field)
+    apply_report_to_stats(stats, items, reports[1], 1)
+    assert items["素材B"]["totalDrops"] == 2
+    assert items["素材A"]["mean"] == pytest.approx(
+        _by_name(compute_quest_stats(reports, set()))["素材A"]["mean"]
+    )
+
+
+def test_report_shards_index_every_report_without_note():
+    reports = [{**_report(f"r{i}", 10, {"素材A": i}), "note": "メモ"} for i in range(40)]
+    shards = build_report_shards(reports)
+    assert len(shards) == REPORT_SHARDS
+    assert sum(len(shard) for shard in shards) == 40
+    assert shards[report_shard("r7")]["r7"] == {"runcount": 10, "items": {"素材A": 7}}
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""exclusions.json をクエスト単位のシャード (exclusions/<questId>.json) と索引に分割する。
+
+一度だけ実行する移行ツール。既存の exclusions.json は削除しない。
+
+    ./migrate_exclusions.py --bucket <S3 バケット名> [--dry-run]
+"""
+
+import argparse
+import json
+import logging
+
+import boto3
+
+logger = logging.getLogger(__name__)
+
+LEGACY_KEY = "exclusions.json"
+EXCLUSIONS_PREFIX = "exclusions/"
+EXCLUSIONS_INDEX_KEY = "exclusions/_index.json"
+
+
+def put_json(s3, bucket: str, key: str, data: dict | list) -> None:
+    s3.put_object(
+        Bucket=bucket,
+        Key=key,
+        Body=json.dumps(data, ensure_ascii=False, indent=2),
+        ContentType="application/json",
+    )
+
+
+def main(args: argparse.Namespace):
+    s3 = boto3.client("s3")
+    obj = s3.get_object(Bucket=args.bucket, Key=LEGACY_KEY)
+    legacy: dict[str, list[dict]] = json.loads(obj["Body"].read().decode("utf-8"))
+
+    index: dict[str, dict] = {}
+    for quest_id, exclusions in legacy.items():
+        if not exclusions:
+            continue
+        key = f"{EXCLUSIONS_PREFIX}{quest_id}.json"
+        logger.info("%s: %d exclusion(s)", key, len(exclusions))
+        if not args.dry_run:
+            put_json(s3, args.bucket, key, exclusions)
+        index[quest_id] = {"count": len(exclusions)}
+
+    logger.info("%s: %d quest(s)", EXCLUSIONS_INDEX_KEY, len(index))
+    if not args.dry_run:
+        put_json(s3, args.bucket, EXCLUSIONS_INDEX_KEY, {"quests": index})
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--bucket", "-b", required=True)
+    parser.add_argument("--dry-run", "-n", action="store_true")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    args = parse_args()
+    main(args)
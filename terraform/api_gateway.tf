@@ -3,10 +3,11 @@ resource "aws_apigatewayv2_api" "admin" {
   protocol_type = "HTTP"
 
   cors_configuration {
-    allow_origins = var.admin_cors_origins
-    allow_methods = ["GET", "POST", "PUT", "DELETE", "OPTIONS"]
-    allow_headers = ["Content-Type", "Authorization"]
-    max_age       = 3600
+    allow_origins  = var.admin_cors_origins
+    allow_methods  = ["GET", "POST", "PUT", "DELETE", "OPTIONS"]
+    allow_headers  = ["Content-Type", "Authorization", "If-Match", "If-None-Match"]
+    expose_headers = ["ETag"]
+    max_age        = 3600
   }
 }
 
@@ -92,6 +93,14 @@ resource "aws_apigatewayv2_route" "put_exclusions" {
   authorizer_id      = aws_apigatewayv2_authorizer.cognito.id
 }
 
+resource "aws_apigatewayv2_route" "get_anomalies" {
+  api_id             = aws_apigatewayv2_api.admin.id
+  route_key          = "GET /anomalies/{eventId}"
+  target             = "integrations/${aws_apigatewayv2_integration.admin_api.id}"
+  authorization_type = "JWT"
+  authorizer_id      = aws_apigatewayv2_authorizer.cognito.id
+}
+
 resource "aws_apigatewayv2_route" "get_harvest_quests" {
   api_id             = aws_apigatewayv2_api.admin.id
   route_key          = "GET /harvest/quests"
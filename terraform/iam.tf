@@ -68,6 +68,23 @@ resource "aws_iam_role_policy" "aggregator_s3" {
   policy = data.aws_iam_policy_document.aggregator_s3.json
 }
 
+# コーディネーターモードでワーカー関数を呼び出す
+data "aws_iam_policy_document" "aggregator_invoke" {
+  count = var.aggregator_fanout_enabled ? 1 : 0
+
+  statement {
+    actions   = ["lambda:InvokeFunction"]
+    resources = aws_lambda_function.aggregator_worker[*].arn
+  }
+}
+
+resource "aws_iam_role_policy" "aggregator_invoke" {
+  count  = var.aggregator_fanout_enabled ? 1 : 0
+  name   = "invoke-worker"
+  role   = aws_iam_role.aggregator_lambda.id
+  policy = data.aws_iam_policy_document.aggregator_invoke[0].json
+}
+
 resource "aws_iam_role_policy_attachment" "aggregator_logs" {
   role       = aws_iam_role.aggregator_lambda.name
   policy_arn = "arn:aws:iam::aws:policy/service-role/AWSLambdaBasicExecutionRole"
@@ -1,3 +1,48 @@
+# --- Shared layer (lambda/shared: Harvest クライアント・S3 キャッシュ・イベント集計・AWS クライアント・異常検出・ドロップ統計) ---
+
+# レイヤーの python/ 以下は実行時に sys.path に追加される
+data "archive_file" "shared" {
+  type        = "zip"
+  output_path = "${path.module}/.build/shared.zip"
+
+  source {
+    content  = file("${path.module}/../lambda/shared/harvest_client.py")
+    filename = "python/harvest_client.py"
+  }
+
+  source {
+    content  = file("${path.module}/../lambda/shared/s3_cache.py")
+    filename = "python/s3_cache.py"
+  }
+
+  source {
+    content  = file("${path.module}/../lambda/shared/rollup.py")
+    filename = "python/rollup.py"
+  }
+
+  source {
+    content  = file("${path.module}/../lambda/shared/aws_clients.py")
+    filename = "python/aws_clients.py"
+  }
+
+  source {
+    content  = file("${path.module}/../lambda/shared/anomalies.py")
+    filename = "python/anomalies.py"
+  }
+
+  source {
+    content  = file("${path.module}/../lambda/shared/stats.py")
+    filename = "python/stats.py"
+  }
+}
+
+resource "aws_lambda_layer_version" "shared" {
+  layer_name          = "eventstats-shared"
+  filename            = data.archive_file.shared.output_path
+  source_code_hash    = data.archive_file.shared.output_base64sha256
+  compatible_runtimes = ["python3.12"]
+}
+
 data "archive_file" "admin_api" {
   type        = "zip"
   source_dir  = "${path.module}/../lambda/admin_api"
@@ -11,12 +56,14 @@ resource "aws_lambda_function" "admin_api" {
   runtime          = "python3.12"
   filename         = data.archive_file.admin_api.output_path
   source_code_hash = data.archive_file.admin_api.output_base64sha256
+  layers           = [aws_lambda_layer_version.shared.arn]
   timeout          = 10
   memory_size      = 128
 
   environment {
     variables = {
-      S3_BUCKET_NAME = aws_s3_bucket.data.bucket
+      S3_BUCKET_NAME      = aws_s3_bucket.data.bucket
+      HARVEST_CATALOG_TTL = "600"
     }
   }
 }
@@ -29,6 +76,15 @@ data "archive_file" "aggregator" {
   output_path = "${path.module}/.build/aggregator.zip"
 }
 
+locals {
+  # ワーカー (クエスト1件の処理) の timeout (秒)。ファンアウトしない場合は集計 Lambda 全体の timeout
+  aggregator_worker_timeout = 120
+  # コーディネーターはワーカーの同期呼び出しの応答を待つため、ワーカーより長い timeout にする。
+  # 同時実行数 (FANOUT_MAX_CONCURRENCY) を超えたクエストは前のワーカーの完了後に呼び出す
+  aggregator_coordinator_timeout = 900
+}
+
+# EventBridge から呼び出す関数。ファンアウトする場合はコーディネーターとして動作する
 resource "aws_lambda_function" "aggregator" {
   function_name    = "eventstats-aggregator"
   role             = aws_iam_role.aggregator_lambda.arn
@@ -36,7 +92,32 @@ resource "aws_lambda_function" "aggregator" {
   runtime          = "python3.12"
   filename         = data.archive_file.aggregator.output_path
   source_code_hash = data.archive_file.aggregator.output_base64sha256
-  timeout          = 120
+  layers           = [aws_lambda_layer_version.shared.arn]
+  timeout          = var.aggregator_fanout_enabled ? local.aggregator_coordinator_timeout : local.aggregator_worker_timeout
+  memory_size      = 128
+
+  environment {
+    variables = {
+      S3_BUCKET_NAME        = aws_s3_bucket.data.bucket
+      FANOUT_ENABLED        = var.aggregator_fanout_enabled ? "1" : "0"
+      SCHEDULE_TICK_MINUTES = "30" # eventbridge.tf のスケジュールの間隔 (分)
+      WORKER_FUNCTION_NAME  = join("", aws_lambda_function.aggregator_worker[*].function_name)
+      WORKER_TIMEOUT        = tostring(local.aggregator_worker_timeout)
+    }
+  }
+}
+
+# ファンアウトする場合のワーカー。同じハンドラでクエスト1件だけを処理する
+resource "aws_lambda_function" "aggregator_worker" {
+  count            = var.aggregator_fanout_enabled ? 1 : 0
+  function_name    = "eventstats-aggregator-worker"
+  role             = aws_iam_role.aggregator_lambda.arn
+  handler          = "handler.lambda_handler"
+  runtime          = "python3.12"
+  filename         = data.archive_file.aggregator.output_path
+  source_code_hash = data.archive_file.aggregator.output_base64sha256
+  layers           = [aws_lambda_layer_version.shared.arn]
+  timeout          = local.aggregator_worker_timeout
   memory_size      = 128
 
   environment {
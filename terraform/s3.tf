@@ -21,3 +21,22 @@ resource "aws_s3_bucket_cors_configuration" "data" {
     max_age_seconds = 3600
   }
 }
+
+# 差分ファイル (deltas/) は連鎖を打ち切った後は参照されないため、一定期間で削除する。
+# クライアントは差分が欠けていればスナップショット (中間 JSON) を取得し直す
+resource "aws_s3_bucket_lifecycle_configuration" "data" {
+  bucket = aws_s3_bucket.data.id
+
+  rule {
+    id     = "expire-deltas"
+    status = "Enabled"
+
+    filter {
+      prefix = "deltas/"
+    }
+
+    expiration {
+      days = var.delta_retention_days
+    }
+  }
+}
@@ -10,6 +10,12 @@ variable "s3_bucket_name" {
   default     = "eventstats-data"
 }
 
+variable "aggregator_fanout_enabled" {
+  description = "Dispatch each quest to a separate aggregator worker function (the scheduled function becomes a coordinator with a longer timeout)"
+  type        = bool
+  default     = false
+}
+
 variable "admin_cors_origins" {
   description = "Allowed CORS origins for admin UI"
   type        = list(string)
@@ -18,3 +24,9 @@ variable "admin_cors_origins" {
     "https://fgosc.github.io",
   ]
 }
+
+variable "delta_retention_days" {
+  description = "Days to keep per-run delta files (deltas/) before S3 expires them"
+  type        = number
+  default     = 30
+}
@@ -1,6 +1,7 @@
 import type React from "react";
 import { Outlet, useMatch, useNavigate, useParams } from "react-router-dom";
 import { fetchEvents, fetchExclusions } from "./api";
+import { LoadingError } from "./components/LoadingError";
 import { formatPeriod } from "./formatters";
 import { useFetchData } from "./hooks/useFetchData";
 import { getHighestQuest, parseLevel } from "./routeUtils";
@@ -21,29 +22,33 @@ export interface LayoutContext {
 }
 
 export function AppLayout() {
-  const { data, loading, error } = useFetchData(
-    async (signal) => {
-      const [eventsRes, exclusionsRes] = await Promise.all([
-        fetchEvents(signal),
-        fetchExclusions(signal),
-      ]);
-      return { events: eventsRes.events, exclusions: exclusionsRes };
-    },
-    [],
-    { events: [] as EventData[], exclusions: {} as ExclusionsMap },
-  );
-  const { events, exclusions } = data;
+  const {
+    data: events,
+    loading,
+    error,
+  } = useFetchData(async (signal) => (await fetchEvents(signal)).events, [], [] as EventData[]);
 
   const navigate = useNavigate();
   const { eventId, questId } = useParams<{ eventId: string; questId: string }>();
   const reportersMatch = useMatch("/events/:eventId/reporters");
   const eventItemSummaryMatch = useMatch("/events/:eventId/event-items");
 
+  const selectedEvent = events.find((e) => e.eventId === eventId);
+  // 除外リストは選択中イベントのクエスト分のシャードだけを取得する
+  const {
+    data: exclusions,
+    loading: exclusionsLoading,
+    error: exclusionsError,
+  } = useFetchData(
+    (signal) => fetchExclusions(selectedEvent?.quests.map((q) => q.questId) ?? [], signal),
+    [selectedEvent],
+    {} as ExclusionsMap,
+  );
+
   if (loading) return <p>読み込み中...</p>;
   if (error) return <p style={{ color: "red" }}>エラー: {error}</p>;
   if (events.length === 0) return <p>イベントが登録されていません。</p>;
 
-  const selectedEvent = events.find((e) => e.eventId === eventId);
   const showReporterSummary = reportersMatch !== null;
   const showEventItemSummary = eventItemSummaryMatch !== null;
 
@@ -130,7 +135,11 @@ export function AppLayout() {
         </div>
       )}
 
-      <Outlet context={{ events, exclusions } satisfies LayoutContext} />
+      {exclusionsLoading || exclusionsError ? (
+        <LoadingError loading={exclusionsLoading} error={exclusionsError} />
+      ) : (
+        <Outlet context={{ events, exclusions } satisfies LayoutContext} />
+      )}
 
       <footer style={{ marginTop: "2rem", color: "#999", fontSize: "0.75rem" }}>
         rev: {__GIT_REVISION__}
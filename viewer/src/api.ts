@@ -1,4 +1,11 @@
-import type { EventsResponse, ExclusionsMap, QuestData } from "./types";
+import type {
+  EventRollup,
+  EventsResponse,
+  Exclusion,
+  ExclusionsIndex,
+  ExclusionsMap,
+  QuestData,
+} from "./types";
 
 /**
  * 環境変数 VITE_DATA_URL からデータ取得先のベース URL を返す。
@@ -18,13 +25,38 @@ export async function fetchEvents(signal?: AbortSignal): Promise<EventsResponse>
 }
 
 /**
- * exclusions.json を取得して除外リストを返す。
- * ファイルが存在しない場合（403/404 等）は空オブジェクトを返す。
+ * 除外リストの索引 (exclusions/_index.json) を取得し、除外リストを持つクエスト ID の Set を返す。
+ * 索引が存在しない場合（403/404 等）は空の Set を返す。
  */
-export async function fetchExclusions(signal?: AbortSignal): Promise<ExclusionsMap> {
-  const res = await fetch(`${getDataUrl()}/exclusions.json`, { signal });
-  if (!res.ok) return {};
-  return res.json();
+async function fetchExclusionsIndex(signal?: AbortSignal): Promise<Set<string>> {
+  const res = await fetch(`${getDataUrl()}/exclusions/_index.json`, { signal });
+  if (!res.ok) return new Set();
+  const index: ExclusionsIndex = await res.json();
+  return new Set(Object.keys(index.quests));
+}
+
+/**
+ * 指定クエストの除外リストをクエスト ID をキーとするマップで返す。
+ * 索引に載っているクエストのシャード (exclusions/<questId>.json) だけを取得する。
+ * シャードが存在しない場合（403/404 等）はそのクエストを空リストとして扱う。
+ * @param questIds 除外リストが必要なクエスト ID のリスト
+ * @param signal フェッチのキャンセル用シグナル
+ */
+export async function fetchExclusions(
+  questIds: string[],
+  signal?: AbortSignal,
+): Promise<ExclusionsMap> {
+  if (questIds.length === 0) return {};
+  const indexed = await fetchExclusionsIndex(signal);
+  const targets = questIds.filter((id) => indexed.has(id));
+  const shards = await Promise.all(
+    targets.map(async (questId) => {
+      const res = await fetch(`${getDataUrl()}/exclusions/${questId}.json`, { signal });
+      const exclusions: Exclusion[] = res.ok ? await res.json() : [];
+      return [questId, exclusions] as const;
+    }),
+  );
+  return Object.fromEntries(shards);
 }
 
 /**
@@ -47,3 +79,20 @@ export async function fetchQuestData(
   if (!res.ok) throw new Error(`Failed to fetch quest data: ${res.status}`);
   return res.json();
 }
+
+/**
+ * 指定イベントの集計 JSON (<eventId>/rollup.json) を取得する。
+ * 集計 Lambda の対応前に終了したイベント等では未作成のため、
+ * 403/404 は null を返す（呼び出し側で全クエストの集計 JSON から集計する）。
+ * @param eventId イベント ID（JSON パスの一部）
+ * @param signal フェッチのキャンセル用シグナル
+ */
+export async function fetchEventRollup(
+  eventId: string,
+  signal?: AbortSignal,
+): Promise<EventRollup | null> {
+  const res = await fetch(`${getDataUrl()}/${eventId}/rollup.json`, { signal });
+  if (res.status === 403 || res.status === 404) return null;
+  if (!res.ok) throw new Error(`Failed to fetch event rollup: ${res.status}`);
+  return res.json();
+}
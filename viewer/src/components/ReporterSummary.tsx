@@ -1,12 +1,18 @@
 import React, { useMemo } from "react";
-import { fetchQuestData } from "../api";
+import { fetchEventRollup, fetchQuestData } from "../api";
 import { formatTimestamp } from "../formatters";
 import { useFetchData } from "../hooks/useFetchData";
 import { useFixedSortState } from "../hooks/useSortState";
 import { useToggleSet } from "../hooks/useToggleSet";
 import { sortItemNames } from "../itemPriority";
-import type { ReportDetail, SortKey } from "../reporterSummaryUtils";
-import { aggregateReporters, DEFAULT_SORT, sortRows } from "../reporterSummaryUtils";
+import type { ReportDetail, ReporterRow, SortKey } from "../reporterSummaryUtils";
+import {
+  aggregateReporters,
+  DEFAULT_SORT,
+  reportDetailsOf,
+  reportersFromRollup,
+  sortRows,
+} from "../reporterSummaryUtils";
 import type { ExclusionsMap, Quest, QuestData } from "../types";
 import { LoadingError } from "./LoadingError";
 import { StatsBar } from "./StatsBar";
@@ -97,23 +103,68 @@ function DetailTable({ details }: { details: ReportDetail[] }) {
   );
 }
 
+/**
+ * rollup.json から作った集計行の明細。展開した時に、報告者の報告があるクエストの
+ * 集計 JSON だけを取得して報告ごとの明細を作る。
+ */
+function LazyDetailTable({
+  eventId,
+  row,
+  exclusions,
+}: {
+  eventId: string;
+  row: ReporterRow;
+  exclusions: ExclusionsMap;
+}) {
+  const { data, loading, error } = useFetchData(
+    async (signal) => {
+      const results = await Promise.all(
+        row.questIds.map((questId) => fetchQuestData(eventId, questId, signal)),
+      );
+      const questData = results.filter((d): d is QuestData => d !== null);
+      return reportDetailsOf(row.reporter, questData, exclusions);
+    },
+    [eventId, row, exclusions],
+    [] as ReportDetail[],
+  );
+  if (loading || error) return <LoadingError loading={loading} error={error} />;
+  return <DetailTable details={data} />;
+}
+
+/**
+ * 報告者ごとの集計行を取得する。
+ * イベント集計 JSON（rollup.json）があればそれだけを使い（明細は展開時に LazyDetailTable が取得する）、
+ * 未作成の場合は全クエストの集計 JSON を取得して明細ごと集計する。
+ */
+async function fetchReporterRows(
+  eventId: string,
+  quests: Quest[],
+  exclusions: ExclusionsMap,
+  signal: AbortSignal,
+): Promise<ReporterRow[]> {
+  const rollup = await fetchEventRollup(eventId, signal);
+  if (rollup) return reportersFromRollup(rollup);
+
+  const results = await Promise.all(quests.map((q) => fetchQuestData(eventId, q.questId, signal)));
+  return aggregateReporters(
+    results.filter((d): d is QuestData => d !== null),
+    exclusions,
+  );
+}
+
 export function ReporterSummary({ eventId, quests, exclusions }: Props) {
   const {
-    data: questData,
+    data: rawRows,
     loading,
     error,
   } = useFetchData(
-    (signal) =>
-      Promise.all(quests.map((q) => fetchQuestData(eventId, q.questId, signal))).then((results) =>
-        results.filter((d): d is QuestData => d !== null),
-      ),
-    [eventId, quests],
-    [] as QuestData[],
+    (signal) => fetchReporterRows(eventId, quests, exclusions, signal),
+    [eventId, quests, exclusions],
+    [] as ReporterRow[],
   );
   const { sort, toggleSort } = useFixedSortState<SortKey>(DEFAULT_SORT);
   const { set: expanded, toggle: toggleExpanded } = useToggleSet();
 
-  const rawRows = useMemo(() => aggregateReporters(questData, exclusions), [questData, exclusions]);
   const rows = useMemo(() => sortRows(rawRows, sort), [rawRows, sort]);
 
   if (loading || error) return <LoadingError loading={loading} error={error} />;
@@ -190,7 +241,11 @@ export function ReporterSummary({ eventId, quests, exclusions }: Props) {
                   {isExpanded && (
                     <tr>
                       <td colSpan={6} style={detailCellStyle}>
-                        <DetailTable details={r.details} />
+                        {r.details ? (
+                          <DetailTable details={r.details} />
+                        ) : (
+                          <LazyDetailTable eventId={eventId} row={r} exclusions={exclusions} />
+                        )}
                       </td>
                     </tr>
                   )}
@@ -1,12 +1,17 @@
 import { Navigate, useOutletContext, useParams } from "react-router-dom";
 import type { LayoutContext } from "../AppLayout";
 import { aggregate } from "../aggregate";
-import { fetchQuestData } from "../api";
+import { fetchEventRollup, fetchQuestData } from "../api";
 import { EventItemSummaryView, type QuestExpected } from "../components/EventItemSummaryView";
 import { LoadingError } from "../components/LoadingError";
 import { useFetchData } from "../hooks/useFetchData";
 import { parseLevel } from "../routeUtils";
-import { calcEventItemExpected, classifyStats } from "../summaryUtils";
+import {
+  calcEventItemExpected,
+  classifyStats,
+  eventItemsByQuest,
+  type EventItemTotals,
+} from "../summaryUtils";
 
 export function EventItemSummaryPage() {
   const { eventId } = useParams<{ eventId: string }>();
@@ -26,19 +31,29 @@ export function EventItemSummaryPage() {
         (a, b) => parseLevel(a.level) - parseLevel(b.level),
       );
 
-      const results = await Promise.all(
-        sortedQuests.map((q) => fetchQuestData(event.eventId, q.questId, signal)),
-      );
+      // イベント集計 JSON があればそれだけを使い、未作成なら全クエストの集計 JSON から集計する
+      let results: (EventItemTotals[] | null)[];
+      const rollup = await fetchEventRollup(event.eventId, signal);
+      if (rollup) {
+        const byQuest = eventItemsByQuest(rollup);
+        results = sortedQuests.map((q) => byQuest.get(q.questId) ?? null);
+      } else {
+        const questData = await Promise.all(
+          sortedQuests.map((q) => fetchQuestData(event.eventId, q.questId, signal)),
+        );
+        results = questData.map((data, i) => {
+          if (data === null) return null;
+          const questExclusions = exclusions[sortedQuests[i].questId] ?? [];
+          return classifyStats(aggregate(data.reports, questExclusions)).eventItems;
+        });
+      }
 
       const qe: QuestExpected[] = [];
       for (let i = 0; i < sortedQuests.length; i++) {
-        const data = results[i];
-        if (data === null) continue;
+        const eventItems = results[i];
+        if (eventItems === null) continue;
 
         const quest = sortedQuests[i];
-        const questExclusions = exclusions[quest.questId] ?? [];
-        const stats = aggregate(data.reports, questExclusions);
-        const { eventItems } = classifyStats(stats);
         const expected = calcEventItemExpected(eventItems);
         if (expected.length > 0) {
           qe.push({ quest, data: expected });
@@ -1,7 +1,12 @@
 import { describe, expect, test } from "vitest";
 import type { ReporterRow, SortState } from "./reporterSummaryUtils";
-import { aggregateReporters, sortRows } from "./reporterSummaryUtils";
-import type { ExclusionsMap, QuestData } from "./types";
+import {
+  aggregateReporters,
+  reportDetailsOf,
+  reportersFromRollup,
+  sortRows,
+} from "./reporterSummaryUtils";
+import type { EventRollup, ExclusionsMap, QuestData } from "./types";
 
 function makeQuestData(
   questId: string,
@@ -11,6 +16,7 @@ function makeQuestData(
     reporter: string;
     reporterName: string;
     runcount: number;
+    items?: Record<string, number | null>;
   }>,
 ): QuestData {
   return {
@@ -20,7 +26,7 @@ function makeQuestData(
       ...r,
       timestamp: "2026-01-01T00:00:00Z",
       note: "",
-      items: {},
+      items: r.items ?? {},
       warnings: [],
     })),
   };
@@ -72,6 +78,7 @@ describe("aggregateReporters", () => {
     expect(rows[0].reportCount).toBe(2);
     expect(rows[0].totalRuns).toBe(150);
     expect(rows[0].details).toHaveLength(2);
+    expect(rows[0].questIds).toEqual(["q1", "q2"]);
   });
 
   test("除外対象の報告を除く", () => {
@@ -107,24 +114,79 @@ describe("aggregateReporters", () => {
     expect(rows[0].reporter).toBe("匿名");
   });
 
-  test("details にクエスト名と周回数が記録される", () => {
+  test("details に報告ごとの明細が記録される", () => {
     const data = [
       makeQuestData("q1", "初級", [
-        { id: "r1", reporter: "user1", reporterName: "User 1", runcount: 50 },
+        {
+          id: "r1",
+          reporter: "user1",
+          reporterName: "User 1",
+          runcount: 50,
+          items: { 心臓: 3, 牙: null },
+        },
       ]),
     ];
     const rows = aggregateReporters(data, {});
-    expect(rows[0].details[0].questName).toBe("初級");
-    expect(rows[0].details[0].runcount).toBe(50);
-    expect(rows[0].details[0].reportId).toBe("r1");
+    expect(rows[0].details).toEqual([
+      {
+        reportId: "r1",
+        questName: "初級",
+        runcount: 50,
+        items: { 心臓: 3, 牙: null },
+        timestamp: "2026-01-01T00:00:00Z",
+      },
+    ]);
+  });
+});
+
+describe("reportersFromRollup", () => {
+  test("明細は展開時に取得するため null にし、報告のあるクエストを記録する", () => {
+    const rollup: EventRollup = {
+      eventId: "ev",
+      quests: [],
+      reporters: [
+        {
+          reporter: "User 1",
+          xId: "user1",
+          reportCount: 2,
+          totalRuns: 150,
+          quests: [
+            { questId: "q1", reportCount: 1, totalRuns: 100, items: { 心臓: 3 } },
+            { questId: "q2", reportCount: 1, totalRuns: 50, items: {} },
+          ],
+        },
+      ],
+      eventItems: [],
+      lastUpdated: "2026-01-01T00:00:00Z",
+    };
+    const rows = reportersFromRollup(rollup);
+    expect(rows).toHaveLength(1);
+    expect(rows[0].reportCount).toBe(2);
+    expect(rows[0].details).toBeNull();
+    expect(rows[0].questIds).toEqual(["q1", "q2"]);
+  });
+});
+
+describe("reportDetailsOf", () => {
+  test("指定した報告者の除外されていない報告だけを明細にする", () => {
+    const data = [
+      makeQuestData("q1", "初級", [
+        { id: "r1", reporter: "user1", reporterName: "User 1", runcount: 50 },
+        { id: "r2", reporter: "user2", reporterName: "User 2", runcount: 30 },
+        { id: "r3", reporter: "user1", reporterName: "User 1", runcount: 20 },
+      ]),
+    ];
+    const exclusions: ExclusionsMap = { q1: [{ reportId: "r3", reason: "外れ値" }] };
+    const details = reportDetailsOf("User 1", data, exclusions);
+    expect(details.map((d) => [d.reportId, d.questName, d.runcount])).toEqual([["r1", "初級", 50]]);
   });
 });
 
 describe("sortRows", () => {
   const rows: ReporterRow[] = [
-    { reporter: "A", xId: "a", reportCount: 3, totalRuns: 100, details: [] },
-    { reporter: "B", xId: "b", reportCount: 1, totalRuns: 300, details: [] },
-    { reporter: "C", xId: "c", reportCount: 2, totalRuns: 200, details: [] },
+    { reporter: "A", xId: "a", reportCount: 3, totalRuns: 100, details: [], questIds: [] },
+    { reporter: "B", xId: "b", reportCount: 1, totalRuns: 300, details: [], questIds: [] },
+    { reporter: "C", xId: "c", reportCount: 2, totalRuns: 200, details: [], questIds: [] },
   ];
 
   test("totalRuns 昇順", () => {
@@ -1,5 +1,5 @@
 import { getReporterName } from "./reportTableUtils";
-import type { ExclusionsMap, QuestData, SortDir } from "./types";
+import type { EventRollup, ExclusionsMap, QuestData, Report, SortDir } from "./types";
 
 export interface ReportDetail {
   reportId: string;
@@ -14,7 +14,10 @@ export interface ReporterRow {
   xId: string;
   reportCount: number;
   totalRuns: number;
-  details: ReportDetail[];
+  /** 報告ごとの明細。rollup.json から作った行では null（展開時に reportDetailsOf で作る） */
+  details: ReportDetail[] | null;
+  /** 報告のあるクエストの ID（明細の取得対象を絞り込むのに使う） */
+  questIds: string[];
 }
 
 export type SortKey = "reportCount" | "totalRuns";
@@ -22,11 +25,22 @@ export type SortState = { key: SortKey; dir: SortDir };
 
 export const DEFAULT_SORT: SortState = { key: "totalRuns", dir: "desc" };
 
+function toReportDetail(qd: QuestData, r: Report): ReportDetail {
+  return {
+    reportId: r.id,
+    questName: qd.quest.name,
+    runcount: r.runcount,
+    items: r.items,
+    timestamp: r.timestamp,
+  };
+}
+
 /**
  * 全クエストデータから報告者ごとの集計行を作成する。
  * 各クエストの除外リストに含まれる報告はスキップする。
  * 同一報告者（reporterName 優先、なければ reporter）の報告をまとめ、
  * 報告回数・合計周回数・明細リストを集計する。
+ * イベント集計 JSON（rollup.json）が未作成のイベントで使う。
  * @param allQuestData 全クエストのデータ（クエスト情報 + 報告リスト）
  * @param exclusions クエスト ID をキーとする除外リストのマップ
  * @returns 報告者ごとの集計行（ReporterRow）の配列
@@ -35,7 +49,7 @@ export function aggregateReporters(
   allQuestData: QuestData[],
   exclusions: ExclusionsMap,
 ): ReporterRow[] {
-  const map = new Map<string, ReporterRow>();
+  const map = new Map<string, ReporterRow & { details: ReportDetail[] }>();
 
   for (const qd of allQuestData) {
     const excludedIds = new Set((exclusions[qd.quest.questId] ?? []).map((e) => e.reportId));
@@ -50,16 +64,12 @@ export function aggregateReporters(
         reportCount: 0,
         totalRuns: 0,
         details: [],
+        questIds: [],
       };
       entry.reportCount += 1;
       entry.totalRuns += r.runcount;
-      entry.details.push({
-        reportId: r.id,
-        questName: qd.quest.name,
-        runcount: r.runcount,
-        items: r.items,
-        timestamp: r.timestamp,
-      });
+      entry.details.push(toReportDetail(qd, r));
+      if (!entry.questIds.includes(qd.quest.questId)) entry.questIds.push(qd.quest.questId);
       map.set(name, entry);
     }
   }
@@ -67,6 +77,47 @@ export function aggregateReporters(
   return [...map.values()];
 }
 
+/**
+ * イベント集計 JSON（rollup.json）の報告者リストを報告者ごとの集計行に変換する。
+ * 除外リストは集計 Lambda・管理 API で適用済み。
+ * rollup.json は報告ごとの明細を含まないため details は null にし、
+ * 展開時に questIds のクエストの集計 JSON を取得して reportDetailsOf で作る。
+ * @param rollup イベント集計 JSON
+ */
+export function reportersFromRollup(rollup: EventRollup): ReporterRow[] {
+  return rollup.reporters.map((r) => ({
+    reporter: r.reporter,
+    xId: r.xId,
+    reportCount: r.reportCount,
+    totalRuns: r.totalRuns,
+    details: null,
+    questIds: r.quests.map((q) => q.questId),
+  }));
+}
+
+/**
+ * クエストデータから1人の報告者の報告ごとの明細を作る。除外リストに含まれる報告はスキップする。
+ * rollup.json から作った集計行を展開した時に使う。
+ * @param reporter 報告者名（ReporterRow.reporter）
+ * @param questData 報告者の報告があるクエストのデータ
+ * @param exclusions クエスト ID をキーとする除外リストのマップ
+ */
+export function reportDetailsOf(
+  reporter: string,
+  questData: QuestData[],
+  exclusions: ExclusionsMap,
+): ReportDetail[] {
+  const details: ReportDetail[] = [];
+  for (const qd of questData) {
+    const excludedIds = new Set((exclusions[qd.quest.questId] ?? []).map((e) => e.reportId));
+    for (const r of qd.reports) {
+      if (excludedIds.has(r.id) || getReporterName(r) !== reporter) continue;
+      details.push(toReportDetail(qd, r));
+    }
+  }
+  return details;
+}
+
 /**
  * ソートキー・方向に従って報告者行を並び替える。
  * @param rows 並び替え対象の報告者行リスト
@@ -2,11 +2,12 @@ import { describe, expect, test } from "vitest";
 import {
   calcEventItemExpected,
   classifyStats,
+  eventItemsByQuest,
   extractBaseName,
   extractModifier,
   sortByBaseAndModifier,
 } from "./summaryUtils";
-import type { ItemStats } from "./types";
+import type { EventRollup, ItemStats } from "./types";
 
 function makeStats(itemName: string, totalDrops = 100, totalRuns = 100): ItemStats {
   return {
@@ -176,3 +177,38 @@ describe("calcEventItemExpected", () => {
     expect(calcEventItemExpected([])).toEqual([]);
   });
 });
+
+describe("eventItemsByQuest", () => {
+  test("イベントアイテムをクエストごとに振り分ける", () => {
+    const rollup: EventRollup = {
+      eventId: "ev",
+      quests: [],
+      reporters: [],
+      eventItems: [
+        {
+          itemName: "ぐん肥(x1)",
+          totalDrops: 300,
+          totalRuns: 200,
+          quests: [
+            { questId: "q1", totalDrops: 200, totalRuns: 100 },
+            { questId: "q2", totalDrops: 100, totalRuns: 100 },
+          ],
+        },
+        {
+          itemName: "ぐん肥(x3)",
+          totalDrops: 50,
+          totalRuns: 100,
+          quests: [{ questId: "q1", totalDrops: 50, totalRuns: 100 }],
+        },
+      ],
+      lastUpdated: "2026-01-01T00:00:00Z",
+    };
+    const byQuest = eventItemsByQuest(rollup);
+    expect(byQuest.get("q1")).toEqual([
+      { itemName: "ぐん肥(x1)", totalDrops: 200, totalRuns: 100 },
+      { itemName: "ぐん肥(x3)", totalDrops: 50, totalRuns: 100 },
+    ]);
+    expect(byQuest.get("q2")).toHaveLength(1);
+    expect(calcEventItemExpected(byQuest.get("q1") ?? [])[0].base).toBeCloseTo(3.5);
+  });
+});
@@ -1,6 +1,9 @@
 import { RE_EVENT_ITEM, RE_POINT, RE_QP } from "./constants";
 import { isKnownItem } from "./itemPriority";
-import type { ItemStats } from "./types";
+import type { EventRollup, ItemStats } from "./types";
+
+/** イベントアイテムの合計ドロップ数・周回数（期待値の計算に必要な項目） */
+export type EventItemTotals = Pick<ItemStats, "itemName" | "totalDrops" | "totalRuns">;
 
 /**
  * アイテム統計リストを種別ごとに分類する。
@@ -93,9 +96,10 @@ export interface EventItemExpected {
  * - `totalSlots`: 全報告の合計ドロップ枠数
  * - `totalRuns`: 合算に用いた最大周回数（キーごとのずれを MAX で吸収）
  *
- * @param eventItems `classifyStats()` で分類されたイベントアイテムの統計リスト
+ * @param eventItems `classifyStats()` で分類されたイベントアイテムの統計リスト、
+ *   またはイベント集計 JSON のクエストごとの内訳（`eventItemsByQuest()`）
  */
-export function calcEventItemExpected(eventItems: ItemStats[]): EventItemExpected[] {
+export function calcEventItemExpected(eventItems: EventItemTotals[]): EventItemExpected[] {
   const grouped = new Map<
     string,
     { slots: number; base: number; totalRuns: number; totalSlots: number }
@@ -128,3 +132,19 @@ export function calcEventItemExpected(eventItems: ItemStats[]): EventItemExpecte
     }))
     .sort((a, b) => a.baseName.localeCompare(b.baseName));
 }
+
+/**
+ * イベント集計 JSON（rollup.json）のイベントアイテムをクエスト ID ごとに振り分ける。
+ * @returns クエスト ID をキーとする、そのクエストのイベントアイテムの合計値リスト
+ */
+export function eventItemsByQuest(rollup: EventRollup): Map<string, EventItemTotals[]> {
+  const byQuest = new Map<string, EventItemTotals[]>();
+  for (const item of rollup.eventItems) {
+    for (const q of item.quests) {
+      const list = byQuest.get(q.questId) ?? [];
+      list.push({ itemName: item.itemName, totalDrops: q.totalDrops, totalRuns: q.totalRuns });
+      byQuest.set(q.questId, list);
+    }
+  }
+  return byQuest;
+}
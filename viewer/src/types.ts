@@ -47,6 +47,10 @@ export interface Exclusion {
 
 export type ExclusionsMap = Record<string, Exclusion[]>;
 
+export interface ExclusionsIndex {
+  quests: Record<string, { count: number }>;
+}
+
 export type SortDir = "asc" | "desc";
 
 export interface ItemStats {
@@ -64,3 +68,39 @@ export interface ItemOutlierStats {
   stdDev: number;
   sampleCount: number;
 }
+
+export interface RollupQuest extends Quest {
+  reportCount: number;
+  validReportCount: number;
+  totalRuns: number;
+}
+
+export interface RollupReporterQuest {
+  questId: string;
+  reportCount: number;
+  totalRuns: number;
+  items: Record<string, number>;
+}
+
+export interface RollupReporter {
+  reporter: string;
+  xId: string;
+  reportCount: number;
+  totalRuns: number;
+  quests: RollupReporterQuest[];
+}
+
+export interface RollupEventItem {
+  itemName: string;
+  totalDrops: number;
+  totalRuns: number;
+  quests: Array<{ questId: string; totalDrops: number; totalRuns: number }>;
+}
+
+export interface EventRollup {
+  eventId: string;
+  quests: RollupQuest[];
+  reporters: RollupReporter[];
+  eventItems: RollupEventItem[];
+  lastUpdated: string;
+}